@@ -0,0 +1,92 @@
+"""
+Billing/dbconn.py
+=================
+Per-process database connection reuse instrumentation.
+
+Counts units of work (HTTP requests, worker loop iterations) and new
+DB connections opened by this process (connection_created signal).
+Every DB_STATS_LOG_EVERY units a line like
+
+    DB CONN pid=812 mode=persistent units=1000 opened=3 reuse=99.7%
+
+is logged, so reuse can be compared per gunicorn worker / daemon
+straight from `docker compose logs`.
+
+See DB_POOL_MODE in settings for the pooling modes.
+"""
+
+import logging
+import os
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_units = 0
+_opened = 0
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    global _opened
+    with _lock:
+        _opened += 1
+
+
+connection_created.connect(_on_connection_created, dispatch_uid="billing_dbconn_stats")
+
+
+def stats():
+    """Snapshot of this process's counters."""
+    with _lock:
+        units, opened = _units, _opened
+    reuse = (1 - min(opened, units) / units) * 100 if units else 0.0
+    return {
+        "pid": os.getpid(),
+        "mode": settings.DB_POOL_MODE,
+        "units": units,
+        "opened": opened,
+        "reuse_pct": round(reuse, 1),
+    }
+
+
+def note_unit():
+    """Record one unit of work; logs the reuse line every DB_STATS_LOG_EVERY units."""
+    global _units
+    with _lock:
+        _units += 1
+        units = _units
+    every = settings.DB_STATS_LOG_EVERY
+    if every and units % every == 0:
+        s = stats()
+        logger.warning(
+            "DB CONN pid=%s mode=%s units=%s opened=%s reuse=%.1f%%",
+            s["pid"], s["mode"], s["units"], s["opened"], s["reuse_pct"],
+        )
+
+
+@sync_and_async_middleware
+class ConnectionStatsMiddleware:
+    """Counts each request as a unit; async-capable so ASGI needs no thread."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        note_unit()
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        note_unit()
+        return response
@@ -82,8 +82,18 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+
+    "Billing.dbconn.ConnectionStatsMiddleware",
 ]
 
+# The ASGI worker (web-async: long-poll / SSE payment status) needs every
+# middleware to be async-capable, otherwise Django runs the whole chain in
+# sync_to_async and each waiting request holds an executor thread.
+# WhiteNoise is sync-only; nginx serves /static/ there anyway.
+ASGI_MIDDLEWARE = [m for m in MIDDLEWARE if m != "whitenoise.middleware.WhiteNoiseMiddleware"]
+if os.getenv("DJANGO_ASGI", "").lower() in ("1", "true", "yes"):
+    MIDDLEWARE = ASGI_MIDDLEWARE
+
 # ==================================================
 # CORS SETTINGS
 # ==================================================
@@ -125,14 +135,35 @@ TEMPLATES = [
 # ==================================================
 DATABASE_URL = (os.getenv("DATABASE_URL") or "").strip()
 
+# DB_POOL_MODE:
+#   persistent (default) — each gunicorn/cron/worker process keeps its TLS
+#                          connection open for DB_CONN_MAX_AGE seconds and
+#                          health-checks it before reuse.
+#   pgbouncer            — DATABASE_URL points at pgbouncer (transaction
+#                          pooling). Persistent client connections to the
+#                          bouncer; SSL to it controlled by DB_SSL_REQUIRE.
+#   off                  — new connection per request (old behaviour).
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "persistent").strip().lower()
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "300"))
+# Log per-process connection reuse every N requests / worker loops (0 = never)
+DB_STATS_LOG_EVERY = int(os.getenv("DB_STATS_LOG_EVERY", "1000"))
+
+if DB_POOL_MODE not in ("persistent", "pgbouncer", "off"):
+    raise RuntimeError(f"Unknown DB_POOL_MODE={DB_POOL_MODE!r} (persistent | pgbouncer | off)")
+
 if DATABASE_URL:
     DATABASES = {
         "default": dj_database_url.parse(
             DATABASE_URL,
-            conn_max_age=0,
-            ssl_require=True,
+            conn_max_age=0 if DB_POOL_MODE == "off" else DB_CONN_MAX_AGE,
+            conn_health_checks=DB_POOL_MODE != "off",
+            ssl_require=(
+                os.getenv("DB_SSL_REQUIRE", "true").lower() in ("1", "true", "yes", "y")
+                if DB_POOL_MODE == "pgbouncer" else True
+            ),
         )
     }
+    # Required behind pgbouncer transaction pooling; harmless otherwise
     DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
 else:
     if not DEBUG:
@@ -174,6 +205,8 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 # ==================================================
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Uploads that must never be served by nginx (e.g. voucher CSV imports)
+PRIVATE_UPLOAD_ROOT = BASE_DIR / "private_media"
 
 # ==================================================
 # UPLOAD LIMITS (IMPORTANT FOR VIDEO)
@@ -200,10 +233,12 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER)
 # ==================================================
 # CACHE (Redis — shared across all gunicorn workers)
 # ==================================================
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/1")
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": os.getenv("REDIS_URL", "redis://redis:6379/1"),
+        "LOCATION": REDIS_URL,
     }
 }
 
@@ -8,6 +8,9 @@ from django.db.models import Sum, Count, Q
 from decimal import Decimal
 from datetime import timedelta
 
+from analytics.services import rollups
+from payments.services.metrics import payment_metrics
+
 from .models import Vendor
 from sms.services.notifications import notify_vendor_approval
 
@@ -32,34 +35,27 @@ class SpotPayAdminSite(AdminSite):
         month_start = now - timedelta(days=30)
 
         # ── existing txn stats ──
-        txn_qs = Payment.objects.filter(purpose="TRANSACTION", initiated_at__gte=month_start)
-        success_qs = txn_qs.filter(status="SUCCESS")
-        failed_count = txn_qs.filter(status="FAILED").count()
-        pending_count = txn_qs.filter(status="PENDING").count()
-        total_count = txn_qs.count()
-        success_count = success_qs.count()
+        txn_metrics = payment_metrics(
+            Payment.objects.filter(purpose="TRANSACTION", initiated_at__gte=month_start)
+        )
+        failed_count = txn_metrics.failed_count
+        pending_count = txn_metrics.pending_count
+        total_count = txn_metrics.total_count
+        success_count = txn_metrics.success_count
 
-        trend_labels, trend_values = [], []
-        days_since_monday = today.weekday()
-        for offset in range(days_since_monday, -1, -1):
-            day = today - timedelta(days=offset)
-            total = Payment.objects.filter(
-                purpose="TRANSACTION", status="SUCCESS", completed_at__date=day
-            ).aggregate(t=Sum("amount"))["t"] or Decimal("0")
-            trend_labels.append(day.strftime("%a %d"))
-            trend_values.append(float(total))
+        platform_rollups = rollups.daily_rows()
+        week_series = rollups.daily_series(
+            platform_rollups, rollups.last_days(today.weekday() + 1, today=today)
+        )
+        trend_labels = [day.strftime("%a %d") for day, _, _ in week_series]
+        trend_values = [float(total) for _, total, _ in week_series]
 
         monthly_labels, monthly_revenue, monthly_payers = [], [], []
-        for offset in range(11, -1, -1):
-            month_date = (now - timedelta(days=offset * 30)).replace(day=1)
+        for month_date, rev, _ in rollups.monthly_series(platform_rollups, rollups.last_months(12, today=today)):
             month_end = (month_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            rev = Payment.objects.filter(
-                purpose="TRANSACTION", status="SUCCESS",
-                completed_at__gte=month_date, completed_at__lt=month_end
-            ).aggregate(t=Sum("amount"))["t"] or Decimal("0")
             payers = Payment.objects.filter(
                 purpose="TRANSACTION", status="SUCCESS",
-                completed_at__gte=month_date, completed_at__lt=month_end
+                completed_at__date__gte=month_date, completed_at__date__lt=month_end
             ).values("phone").distinct().count()
             monthly_labels.append(month_date.strftime("%b %Y"))
             monthly_revenue.append(float(rev))
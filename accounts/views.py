@@ -24,6 +24,9 @@ from sms.models import VendorSMSWallet
 from wallets.models import VendorWallet, WithdrawalRequest, WalletTransaction
 from sms.services.notifications import notify_withdrawal_status, notify_vendor_approval, notify_vendor_registration, notify_admin_new_vendor
 
+from analytics.services import rollups
+from payments.services.metrics import payment_metrics
+
 from .forms import VendorRegistrationForm, VendorProfileForm
 from .models import Vendor
 from hotspot.models import HotspotLocation
@@ -124,17 +127,17 @@ def admin_dashboard(request):
     }
     start_dt = period_start_map.get(period)
 
-    transactions_scope = Payment.objects.filter(
+    all_transactions = Payment.objects.filter(
         purpose="TRANSACTION",
         vendor__isnull=False
     )
+    transactions_scope = all_transactions
     if start_dt:
         transactions_scope = transactions_scope.filter(initiated_at__gte=start_dt)
 
-    total_platform_sales = (
-        transactions_scope.filter(status="SUCCESS").aggregate(total=Sum("amount"))["total"]
-        or Decimal("0.00")
-    )
+    # Period status breakdown + today/week/month revenue cards in one query
+    metrics = payment_metrics(all_transactions, counts_since=start_dt)
+    total_platform_sales = metrics.success_revenue
 
     total_vendors = Vendor.objects.count()
     active_vendors = Vendor.objects.filter(status="ACTIVE").count()
@@ -143,10 +146,10 @@ def admin_dashboard(request):
     total_locations = HotspotLocation.objects.count()
     active_locations = HotspotLocation.objects.filter(status="ACTIVE").count()
 
-    total_transactions = transactions_scope.count()
-    successful_transactions = transactions_scope.filter(status="SUCCESS").count()
-    failed_transactions = transactions_scope.filter(status="FAILED").count()
-    pending_transactions = transactions_scope.filter(status="PENDING").count()
+    total_transactions = metrics.total_count
+    successful_transactions = metrics.success_count
+    failed_transactions = metrics.failed_count
+    pending_transactions = metrics.pending_count
 
     total_wallet_balance = (
         VendorWallet.objects.aggregate(total=Sum("balance"))["total"]
@@ -184,25 +187,14 @@ def admin_dashboard(request):
         )
 
     # Mon-Sun weekly trend for admin chart
-    admin_trend_labels = []
-    admin_trend_values = []
+    platform_rollups = rollups.daily_rows()
     today_date = timezone.localdate()
-    days_since_monday = today_date.weekday()
-    for day_offset in range(days_since_monday, -1, -1):
-        day = today_date - timedelta(days=day_offset)
-        day_total = (
-            Payment.objects.filter(
-                purpose="TRANSACTION",
-                status="SUCCESS",
-                completed_at__date=day
-            ).aggregate(total=Sum("amount"))["total"]
-            or Decimal("0.00")
-        )
-        admin_trend_labels.append(day.strftime("%a %d"))
-        admin_trend_values.append(float(day_total))
+    week_series = rollups.daily_series(platform_rollups, rollups.last_days(today_date.weekday() + 1))
+    admin_trend_labels = [day.strftime("%a %d") for day, _, _ in week_series]
+    admin_trend_values = [float(total) for _, total, _ in week_series]
 
     # vendor success rate for doughnut
-    success_rate = round((successful_transactions / total_transactions) * 100) if total_transactions > 0 else 0
+    success_rate = metrics.success_rate
 
     from sms.models import SMSPurchase, SMSProvider
     import requests as http_requests
@@ -229,29 +221,16 @@ def admin_dashboard(request):
         or 0
     )
 
-    today_date = timezone.localdate()
-    now2 = timezone.now()
-    week_start2 = now2 - timedelta(days=today_date.weekday())
-    month_start2 = now2.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    success_qs_all = Payment.objects.filter(purpose="TRANSACTION", status="SUCCESS")
-    today_revenue = success_qs_all.filter(completed_at__date=today_date).aggregate(t=Sum("amount"))["t"] or Decimal("0")
-    weekly_revenue = success_qs_all.filter(completed_at__gte=week_start2).aggregate(t=Sum("amount"))["t"] or Decimal("0")
-    monthly_revenue_total = success_qs_all.filter(completed_at__gte=month_start2).aggregate(t=Sum("amount"))["t"] or Decimal("0")
-
-    weekly_chart_labels, weekly_chart_values = [], []
-    for offset in range(today_date.weekday(), -1, -1):
-        day = today_date - timedelta(days=offset)
-        val = success_qs_all.filter(completed_at__date=day).aggregate(t=Sum("amount"))["t"] or Decimal("0")
-        weekly_chart_labels.append(day.strftime("%a"))
-        weekly_chart_values.append(float(val))
-
-    monthly_chart_labels, monthly_chart_values = [], []
-    for offset in range(29, -1, -1):
-        day = today_date - timedelta(days=offset)
-        val = success_qs_all.filter(completed_at__date=day).aggregate(t=Sum("amount"))["t"] or Decimal("0")
-        monthly_chart_labels.append(day.strftime("%d %b"))
-        monthly_chart_values.append(float(val))
+    today_revenue = metrics.today_revenue
+    weekly_revenue = metrics.week_revenue
+    monthly_revenue_total = metrics.month_revenue
+
+    weekly_chart_labels = [day.strftime("%a") for day, _, _ in week_series]
+    weekly_chart_values = admin_trend_values
+
+    month_series = rollups.daily_series(platform_rollups, rollups.last_days(30))
+    monthly_chart_labels = [day.strftime("%d %b") for day, _, _ in month_series]
+    monthly_chart_values = [float(total) for _, total, _ in month_series]
 
     pending_vendors_list = Vendor.objects.filter(status='PENDING').select_related('user').order_by('created_at')
     all_vendors_list = Vendor.objects.select_related('user').order_by('-created_at')[:20]
@@ -506,65 +485,35 @@ def vendor_dashboard(request):
         purpose="TRANSACTION"
     )
 
-    successful_payments_qs = vendor_payments.filter(status="SUCCESS")
     today = timezone.localdate()
-    now = timezone.now()
-    week_start = today - timedelta(days=today.weekday())  # Monday of current week
-    month_start = now.replace(day=1)
-    year_start = now.replace(month=1, day=1)
 
     # Location filter — applies to cards, charts AND transactions table
     location_filter = request.GET.get('location', '').strip()
     if location_filter:
-        successful_payments_qs = successful_payments_qs.filter(location_id=location_filter)
         vendor_payments = vendor_payments.filter(location_id=location_filter)
 
-    total_payments_received = (
-        successful_payments_qs.aggregate(total=Sum("amount"))["total"]
-        or Decimal("0.00")
-    )
-    todays_payments = successful_payments_qs.filter(
-        completed_at__date=today
-    )
-    todays_payments_total = (
-        todays_payments.aggregate(total=Sum("amount"))["total"]
-        or Decimal("0.00")
-    )
+    # Every summary card in one query
+    metrics = payment_metrics(vendor_payments, today=today)
+    total_payments_received = metrics.total_revenue
+    todays_payments_total = metrics.today_revenue
+    weekly_payments_total = metrics.week_revenue
+    monthly_payments_total = metrics.month_revenue
+    annual_payments_total = metrics.year_revenue
 
-    weekly_payments_total = (
-        successful_payments_qs.filter(completed_at__date__gte=week_start).aggregate(total=Sum("amount"))["total"]
-        or Decimal("0.00")
-    )
-    monthly_payments_total = (
-        successful_payments_qs.filter(completed_at__gte=month_start).aggregate(total=Sum("amount"))["total"]
-        or Decimal("0.00")
-    )
-    annual_payments_total = (
-        successful_payments_qs.filter(completed_at__gte=year_start).aggregate(total=Sum("amount"))["total"]
-        or Decimal("0.00")
-    )
+    vendor_rollups = rollups.daily_rows(vendor=vendor, location_id=location_filter)
 
-    trend_labels = []
-    trend_values = []
-    weekly_buyers_counts = []
-    days_since_monday = today.weekday()  # 0=Mon, 6=Sun
-    for day_offset in range(days_since_monday, -1, -1):
-        day = today - timedelta(days=day_offset)
-        day_total = (
-            successful_payments_qs.filter(completed_at__date=day).aggregate(total=Sum("amount"))["total"]
-            or Decimal("0.00")
-        )
-        day_buyers = successful_payments_qs.filter(completed_at__date=day).count()
-        trend_labels.append(day.strftime("%a"))
-        trend_values.append(float(day_total))
-        weekly_buyers_counts.append(day_buyers)
+    # Mon → today
+    week_series = rollups.daily_series(vendor_rollups, rollups.last_days(today.weekday() + 1, today=today))
+    trend_labels = [day.strftime("%a") for day, _, _ in week_series]
+    trend_values = [float(total) for _, total, _ in week_series]
+    weekly_buyers_counts = [buyers for _, _, buyers in week_series]
 
-    successful_payments_count = successful_payments_qs.count()
-    pending_payments_count = vendor_payments.filter(status="PENDING").count()
-    failed_payments_count = vendor_payments.filter(status="FAILED").count()
+    successful_payments_count = metrics.success_count
+    pending_payments_count = metrics.pending_count
+    failed_payments_count = metrics.failed_count
 
     # Calculate progress bar percentages
-    total_payments_count = vendor_payments.count()
+    total_payments_count = metrics.total_count
     if total_payments_count > 0:
         successful_percentage = round((successful_payments_count / total_payments_count) * 100)
         pending_failed_count = pending_payments_count + failed_payments_count
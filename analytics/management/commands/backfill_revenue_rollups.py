@@ -0,0 +1,63 @@
+"""
+management/commands/backfill_revenue_rollups.py
+===============================================
+Rebuilds the HourlyRevenue / DailyRevenue rollups from Payment.
+
+  python manage.py backfill_revenue_rollups            # everything
+  python manage.py backfill_revenue_rollups --days 2   # yesterday + today
+  python manage.py backfill_revenue_rollups --since 2025-01-01
+
+Works one month at a time so a full backfill never holds a long
+transaction. Safe to re-run — each range is replaced, not added to.
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from analytics.services.rollups import rebuild
+from payments.models import Payment
+
+
+class Command(BaseCommand):
+    help = "Rebuild revenue rollup tables from successful payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=str, default="",
+                            help="First local day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--days", type=int, default=0,
+                            help="Rebuild only the last N days (including today)")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+
+        if options["days"]:
+            start = today - timedelta(days=options["days"] - 1)
+        elif options["since"]:
+            try:
+                start = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+        else:
+            first = Payment.objects.filter(
+                purpose="TRANSACTION", status="SUCCESS", completed_at__isnull=False,
+            ).aggregate(first=Min("completed_at"))["first"]
+            if not first:
+                self.stdout.write("No successful payments — nothing to backfill")
+                return
+            start = timezone.localdate(first)
+
+        chunk_start = start
+        total_hourly = total_daily = 0
+        while chunk_start <= today:
+            next_month = (chunk_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+            chunk_end = min(next_month - timedelta(days=1), today)
+            hourly, daily = rebuild(chunk_start, chunk_end)
+            total_hourly += hourly
+            total_daily += daily
+            self.stdout.write(f"  ✅ {chunk_start} → {chunk_end}: {daily} daily / {hourly} hourly rows")
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(f"Done. {total_daily} daily / {total_hourly} hourly rows")
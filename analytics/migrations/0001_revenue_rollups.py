@@ -0,0 +1,52 @@
+# Generated by Django 4.2.17 on 2026-10-17 20:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('packages', '0003_package_schedule_type_package_scheduled_date_and_more'),
+        ('hotspot', '0009_add_ros_version_ovpn'),
+        ('accounts', '0003_sms_notifications_enabled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customers', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hour', models.DateTimeField()),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hotspot.hotspotlocation')),
+                ('package', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='packages.package')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'hour'], name='hourly_rev_vendor_idx')],
+                'unique_together': {('hour', 'vendor', 'location', 'package')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customers', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hotspot.hotspotlocation')),
+                ('package', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='packages.package')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'day'], name='daily_rev_vendor_idx'), models.Index(fields=['day'], name='daily_rev_day_idx')],
+                'unique_together': {('day', 'vendor', 'location', 'package')},
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_buckets(apps, schema_editor):
+    """Fold NULL-keyed duplicates (allowed by the old unique_together) into one row."""
+    for model_name, period in (("HourlyRevenue", "hour"), ("DailyRevenue", "day")):
+        model = apps.get_model("analytics", model_name)
+        keys = (period, "vendor_id", "location_id", "package_id")
+        dupes = (
+            model.objects.filter(models.Q(location__isnull=True) | models.Q(package__isnull=True))
+            .values(*keys).annotate(n=Count("id"), revenue_sum=Sum("revenue"), customers_sum=Sum("customers"))
+            .filter(n__gt=1).order_by()
+        )
+        for dupe in dupes:
+            rows = model.objects.filter(**{key: dupe[key] for key in keys}).order_by("id")
+            keep = rows.first()
+            rows.exclude(pk=keep.pk).delete()
+            model.objects.filter(pk=keep.pk).update(revenue=dupe["revenue_sum"], customers=dupe["customers_sum"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotspot', '0009_add_ros_version_ovpn'),
+        ('packages', '0004_package_available_days'),
+        ('analytics', '0001_revenue_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dailyrevenue',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='hourlyrevenue',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='dailyrevenue',
+            name='location',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='hotspot.hotspotlocation'),
+        ),
+        migrations.AlterField(
+            model_name='dailyrevenue',
+            name='package',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='packages.package'),
+        ),
+        migrations.AlterField(
+            model_name='hourlyrevenue',
+            name='location',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='hotspot.hotspotlocation'),
+        ),
+        migrations.AlterField(
+            model_name='hourlyrevenue',
+            name='package',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='packages.package'),
+        ),
+        migrations.RunPython(merge_duplicate_buckets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(models.F('day'), models.F('vendor'), django.db.models.functions.comparison.Coalesce(models.F('location'), models.Value(0)), django.db.models.functions.comparison.Coalesce(models.F('package'), models.Value(0)), name='daily_rev_bucket_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyrevenue',
+            constraint=models.UniqueConstraint(models.F('hour'), models.F('vendor'), django.db.models.functions.comparison.Coalesce(models.F('location'), models.Value(0)), django.db.models.functions.comparison.Coalesce(models.F('package'), models.Value(0)), name='hourly_rev_bucket_uniq'),
+        ),
+    ]
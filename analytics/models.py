@@ -1,3 +1,77 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 
-# Create your models here.
+
+# =====================================================
+# REVENUE ROLLUPS
+# =====================================================
+# Pre-aggregated successful TRANSACTION payments per
+# vendor × location × package, bucketed by completed_at.
+# Maintained incrementally by payments.services.settlement
+# and rebuilt with `manage.py backfill_revenue_rollups`.
+# Dashboards and charts read these instead of scanning Payment.
+#
+# A payment without a location / package lands in the NULL bucket; the
+# unique constraints coalesce NULL to 0 so there is exactly one such row
+# per bucket (plain unique_together treats NULLs as distinct). Rows keep
+# the id of a deleted location / package instead of being set to NULL,
+# which could collide with an existing NULL bucket.
+
+def _bucket_key(period):
+    return (
+        F(period), F("vendor"),
+        Coalesce(F("location"), Value(0)), Coalesce(F("package"), Value(0)),
+    )
+
+
+class RevenueRollup(models.Model):
+    vendor = models.ForeignKey("accounts.Vendor", on_delete=models.CASCADE, related_name="+")
+    location = models.ForeignKey(
+        "hotspot.HotspotLocation", on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name="+",
+    )
+    package = models.ForeignKey(
+        "packages.Package", on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name="+",
+    )
+
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    customers = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class HourlyRevenue(RevenueRollup):
+    # Start of the hour (aware, local time)
+    hour = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(*_bucket_key("hour"), name="hourly_rev_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["vendor", "hour"], name="hourly_rev_vendor_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} | {self.hour:%Y-%m-%d %H:00} | {self.revenue}"
+
+
+class DailyRevenue(RevenueRollup):
+    # Local calendar day
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(*_bucket_key("day"), name="daily_rev_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["vendor", "day"], name="daily_rev_vendor_idx"),
+            models.Index(fields=["day"], name="daily_rev_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} | {self.day} | {self.revenue}"
@@ -0,0 +1,279 @@
+"""
+analytics/services/rollups.py
+=============================
+Hourly / daily revenue rollups per vendor × location × package.
+
+Write side:
+  - record_payment()  → called by settle_success() inside the settle
+                        transaction; bumps the hour and day rows for a
+                        successful TRANSACTION payment.
+  - rebuild()         → recomputes a date range from Payment
+                        (manage.py backfill_revenue_rollups).
+
+Read side: small helpers that answer the dashboard / chart questions
+with one grouped query each instead of a query per bucket.
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from analytics.models import DailyRevenue, HourlyRevenue
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+
+
+# ---------------------------------------------------------------------------
+# Write side
+# ---------------------------------------------------------------------------
+
+def _hour_start(dt):
+    return timezone.localtime(dt).replace(minute=0, second=0, microsecond=0)
+
+
+def _bump(model, keys, amount, count=1):
+    """Add amount/count to the rollup row for `keys`, creating it if needed."""
+    updated = model.objects.filter(**keys).update(
+        revenue=F("revenue") + amount,
+        customers=F("customers") + count,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(revenue=amount, customers=count, **keys)
+    except IntegrityError:
+        # Another settle created the row first
+        model.objects.filter(**keys).update(
+            revenue=F("revenue") + amount,
+            customers=F("customers") + count,
+            updated_at=timezone.now(),
+        )
+
+
+def record_payment(payment):
+    """Add one successful TRANSACTION payment to the hourly and daily rollups."""
+    if payment.purpose != "TRANSACTION" or payment.status != "SUCCESS":
+        return
+    if not payment.vendor_id or not payment.completed_at:
+        return
+
+    keys = {
+        "vendor_id": payment.vendor_id,
+        "location_id": payment.location_id,
+        "package_id": payment.package_id,
+    }
+    _bump(HourlyRevenue, {**keys, "hour": _hour_start(payment.completed_at)}, payment.amount)
+    _bump(DailyRevenue, {**keys, "day": timezone.localdate(payment.completed_at)}, payment.amount)
+
+
+def _insert_rebuilt(model, rows, period):
+    """
+    bulk_create rebuilt rows. A settle that commits between rebuild's
+    DELETE and this insert may have created one of the buckets again;
+    then each row is written on its own, overwriting such a bucket with
+    the rebuilt totals.
+    """
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=1000)
+        return
+    except IntegrityError:
+        logger.warning("%s rebuild raced a settle; overwriting recreated buckets", model.__name__)
+    for row in rows:
+        keys = {
+            period: getattr(row, period),
+            "vendor_id": row.vendor_id,
+            "location_id": row.location_id,
+            "package_id": row.package_id,
+        }
+        updated = model.objects.filter(**keys).update(
+            revenue=row.revenue, customers=row.customers, updated_at=timezone.now(),
+        )
+        if not updated:
+            row.save(force_insert=True)
+
+
+def rebuild(start_day, end_day):
+    """
+    Recompute rollups for local days start_day..end_day (inclusive)
+    from Payment. Returns (hourly_rows, daily_rows) written.
+    """
+    from payments.models import Payment
+
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.combine(start_day, time.min), tz)
+    end_dt = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min), tz)
+
+    source = (
+        Payment.objects
+        .filter(
+            purpose="TRANSACTION",
+            status="SUCCESS",
+            vendor__isnull=False,
+            completed_at__gte=start_dt,
+            completed_at__lt=end_dt,
+        )
+    )
+    group = ("vendor_id", "location_id", "package_id")
+
+    hourly = (
+        source.annotate(bucket=TruncHour("completed_at", tzinfo=tz))
+        .values("bucket", *group)
+        .annotate(revenue=Sum("amount"), customers=Count("id"))
+        .order_by()
+    )
+    daily = (
+        source.annotate(bucket=TruncDate("completed_at", tzinfo=tz))
+        .values("bucket", *group)
+        .annotate(revenue=Sum("amount"), customers=Count("id"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        HourlyRevenue.objects.filter(hour__gte=start_dt, hour__lt=end_dt).delete()
+        DailyRevenue.objects.filter(day__gte=start_day, day__lte=end_day).delete()
+
+        hourly_rows = [
+            HourlyRevenue(
+                hour=row["bucket"], vendor_id=row["vendor_id"], location_id=row["location_id"],
+                package_id=row["package_id"], revenue=row["revenue"], customers=row["customers"],
+            )
+            for row in hourly
+        ]
+        daily_rows = [
+            DailyRevenue(
+                day=row["bucket"], vendor_id=row["vendor_id"], location_id=row["location_id"],
+                package_id=row["package_id"], revenue=row["revenue"], customers=row["customers"],
+            )
+            for row in daily
+        ]
+        _insert_rebuilt(HourlyRevenue, hourly_rows, "hour")
+        _insert_rebuilt(DailyRevenue, daily_rows, "day")
+
+    return len(hourly_rows), len(daily_rows)
+
+
+# ---------------------------------------------------------------------------
+# Read side
+# ---------------------------------------------------------------------------
+
+def daily_rows(vendor=None, location_id=None):
+    qs = DailyRevenue.objects.all()
+    if vendor is not None:
+        qs = qs.filter(vendor=vendor)
+    if location_id:
+        qs = qs.filter(location_id=location_id)
+    return qs
+
+
+def hourly_rows(vendor=None, location_id=None):
+    qs = HourlyRevenue.objects.all()
+    if vendor is not None:
+        qs = qs.filter(vendor=vendor)
+    if location_id:
+        qs = qs.filter(location_id=location_id)
+    return qs
+
+
+def daily_series(qs, days):
+    """[(day, revenue, customers)] for each day in `days`, zero-filled."""
+    totals = {
+        row["day"]: row
+        for row in (
+            qs.filter(day__gte=min(days), day__lte=max(days))
+            .values("day")
+            .annotate(revenue=Sum("revenue"), customers=Sum("customers"))
+            .order_by()
+        )
+    }
+    return [
+        (day, totals.get(day, {}).get("revenue") or ZERO, totals.get(day, {}).get("customers") or 0)
+        for day in days
+    ]
+
+
+def hourly_series(qs, hours):
+    """[(hour, revenue, customers)] for each hour start in `hours`, zero-filled."""
+    totals = {
+        row["hour"]: row
+        for row in (
+            qs.filter(hour__gte=min(hours), hour__lte=max(hours))
+            .values("hour")
+            .annotate(revenue=Sum("revenue"), customers=Sum("customers"))
+            .order_by()
+        )
+    }
+    return [
+        (hour, totals.get(hour, {}).get("revenue") or ZERO, totals.get(hour, {}).get("customers") or 0)
+        for hour in hours
+    ]
+
+
+def monthly_series(qs, months):
+    """
+    [(month_start, revenue, customers)] for each first-of-month date in
+    `months`, zero-filled.
+    """
+    totals = {}
+    for row in (
+        qs.filter(day__gte=min(months))
+        .values("day__year", "day__month")
+        .annotate(revenue=Sum("revenue"), customers=Sum("customers"))
+        .order_by()
+    ):
+        totals[(row["day__year"], row["day__month"])] = row
+    series = []
+    for month in months:
+        row = totals.get((month.year, month.month), {})
+        series.append((month, row.get("revenue") or ZERO, row.get("customers") or 0))
+    return series
+
+
+def last_hours(count, now=None):
+    """Start of the current hour and the count-1 hours before it, oldest first."""
+    current = _hour_start(now or timezone.now())
+    return [current - timedelta(hours=h) for h in range(count - 1, -1, -1)]
+
+
+def last_days(count, today=None):
+    today = today or timezone.localdate()
+    return [today - timedelta(days=d) for d in range(count - 1, -1, -1)]
+
+
+def last_months(count, today=None):
+    """First day of the current month and the count-1 months before it, oldest first."""
+    month = (today or timezone.localdate()).replace(day=1)
+    months = [month]
+    for _ in range(count - 1):
+        month = (month - timedelta(days=1)).replace(day=1)
+        months.append(month)
+    return list(reversed(months))
+
+
+def top_packages(qs, limit=6):
+    return list(
+        qs.values("package__name")
+        .annotate(sales=Sum("customers"), revenue=Sum("revenue"))
+        .order_by("-sales")[:limit]
+    )
+
+
+def by_location(qs):
+    """{location_id: (revenue, customers)}"""
+    return {
+        row["location_id"]: (row["revenue"] or ZERO, row["customers"] or 0)
+        for row in (
+            qs.values("location_id")
+            .annotate(revenue=Sum("revenue"), customers=Sum("customers"))
+            .order_by()
+        )
+    }
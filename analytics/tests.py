@@ -1,3 +1,147 @@
+"""
+analytics/tests.py
+Tests for the revenue rollups — incremental maintenance on settle,
+backfill parity with Payment, and the chart helpers.
+
+Run with:
+    python manage.py test analytics
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Vendor
+from analytics.models import DailyRevenue, HourlyRevenue
+from analytics.services import rollups
+from payments.models import Payment
+from payments.services.metrics import rollup_metrics
+from payments.services.settlement import settle_success
+from payments.tests.test_settlement import _make_payment, _make_vendor
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _settle(payment):
+    payment = Payment.objects.get(pk=payment.pk)
+    settle_success(payment, {"status": "SUCCESSFUL"}, source="TEST")
+    return payment
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestRevenueRollups(TestCase):
+
+    def setUp(self):
+        self.vendor = _make_vendor()
+        self.payment = _make_payment(self.vendor)
+
+    def test_settle_bumps_hourly_and_daily(self):
+        _settle(self.payment)
+        second = Payment.objects.create(
+            payer_type="CLIENT", purpose="TRANSACTION", vendor=self.vendor,
+            location=self.payment.location, package=self.payment.package,
+            phone="256700000002", amount=Decimal("500"), provider_reference="KWA-REF-2",
+        )
+        _settle(second)
+
+        day = DailyRevenue.objects.get(vendor=self.vendor)
+        self.assertEqual(day.revenue, Decimal("1500"))
+        self.assertEqual(day.customers, 2)
+        self.assertEqual(HourlyRevenue.objects.aggregate(t=Sum("revenue"))["t"], Decimal("1500"))
+
+    def test_null_bucket_is_a_single_row(self):
+        day = timezone.localdate()
+        rollups._bump(DailyRevenue, {"vendor_id": self.vendor.pk, "location_id": None,
+                                     "package_id": None, "day": day}, Decimal("100"))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyRevenue.objects.create(vendor=self.vendor, day=day, revenue=Decimal("1"))
+        rollups._bump(DailyRevenue, {"vendor_id": self.vendor.pk, "location_id": None,
+                                     "package_id": None, "day": day}, Decimal("50"))
+
+        row = DailyRevenue.objects.get()
+        self.assertEqual((row.revenue, row.customers), (Decimal("150"), 2))
+
+    def test_deleting_a_location_keeps_its_rollups(self):
+        _settle(self.payment)
+        location_id = self.payment.location_id
+        self.payment.location.delete()
+        self.assertEqual(DailyRevenue.objects.get().location_id, location_id)
+
+    def test_non_transaction_payments_are_ignored(self):
+        self.payment.purpose = "SUBSCRIPTION"
+        self.payment.save(update_fields=["purpose"])
+        _settle(self.payment)
+        self.assertFalse(DailyRevenue.objects.exists())
+
+    def test_rebuild_matches_incremental(self):
+        _settle(self.payment)
+        before = list(DailyRevenue.objects.values_list("day", "revenue", "customers"))
+
+        today = timezone.localdate()
+        rollups.rebuild(today - timedelta(days=1), today)
+
+        self.assertEqual(list(DailyRevenue.objects.values_list("day", "revenue", "customers")), before)
+        self.assertEqual(HourlyRevenue.objects.count(), 1)
+
+    def test_rebuild_overwrites_a_bucket_recreated_mid_rebuild(self):
+        _settle(self.payment)
+        day = DailyRevenue.objects.get()
+        bulk_create = DailyRevenue.objects.bulk_create
+
+        def racing_bulk_create(rows, **kwargs):
+            # A settle recreates the bucket after rebuild's DELETE
+            DailyRevenue.objects.create(
+                day=day.day, vendor=self.vendor, location_id=day.location_id, package_id=day.package_id,
+                revenue=Decimal("1000"), customers=1,
+            )
+            return bulk_create(rows, **kwargs)
+
+        today = timezone.localdate()
+        with patch.object(DailyRevenue.objects, "bulk_create", side_effect=racing_bulk_create):
+            self.assertEqual(rollups.rebuild(today - timedelta(days=1), today), (1, 1))
+
+        self.assertEqual(
+            list(DailyRevenue.objects.values_list("day", "revenue", "customers")), [(day.day, Decimal("1000"), 1)],
+        )
+
+    def test_summary_and_series(self):
+        _settle(self.payment)
+        qs = rollups.daily_rows(vendor=self.vendor)
+
+        metrics = rollup_metrics(qs)
+        self.assertEqual(metrics.today_revenue, Decimal("1000"))
+        self.assertEqual(metrics.total_customers, 1)
+
+        series = rollups.daily_series(qs, rollups.last_days(7))
+        self.assertEqual(len(series), 7)
+        self.assertEqual(series[-1][1], Decimal("1000"))
+        self.assertEqual(series[0][1], Decimal("0.00"))
+
+        hours = rollups.hourly_series(rollups.hourly_rows(vendor=self.vendor), rollups.last_hours(24))
+        self.assertEqual(hours[-1][2], 1)
+
+        months = rollups.monthly_series(qs, rollups.last_months(12))
+        self.assertEqual(len(months), 12)
+        self.assertEqual(months[-1][1], Decimal("1000"))
+
+    def test_analytics_data_reads_rollups(self):
+        _settle(self.payment)
+        Vendor.objects.filter(pk=self.vendor.pk).update(status="ACTIVE")
+        self.client.force_login(self.vendor.user)
+        Payment.objects.all().delete()  # charts must not touch Payment
 
-# Create your tests here.
+        for period, buckets in (("daily", 24), ("weekly", 7), ("monthly", 30), ("annual", 12)):
+            data = self.client.get("/analytics/data/", {"period": period}).json()
+            self.assertEqual(len(data["labels"]), buckets)
+            self.assertEqual(sum(data["revenue"]), 1000.0)
+        self.assertEqual(data["summary"]["total_customers"], 1)
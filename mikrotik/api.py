@@ -5,11 +5,21 @@ MikroTik API client — supports both protocols:
 
 api_mode is stored on the RouterConnection model after test_connection().
 All public functions accept a router object and dispatch to the right protocol.
+Calls run on pooled, already-authenticated sessions (see mikrotik/sessions.py).
+
+Bulk provisioning (add_hotspot_users) pipelines the /ip/hotspot/user/add
+commands over one socket (tagged sentences, PIPELINE_DEPTH in flight) and
+verifies the whole batch with a single filtered print.
 """
-import requests
-import librouteros
-from librouteros import connect as ros_connect
-from librouteros.exceptions import TrapError, FatalError
+from librouteros.exceptions import TrapError
+from librouteros.protocol import compose_word
+
+from . import sessions
+
+# Tagged add commands written before reading their replies
+PIPELINE_DEPTH = 100
+# Names OR-ed together in one verification print
+VERIFY_CHUNK = 200
 
 
 # ─── Helpers ─────────────────────────────────────────────────────────────────
@@ -18,28 +28,45 @@ def _is_binary_port(port):
     return port in (8728, 8729)
 
 
-def _rest_session(router):
-    s = requests.Session()
-    s.auth = (router.api_username, router.api_password)
-    s.timeout = 8
-    return s
-
-
 def _rest_base(router):
     scheme = "https" if router.port in (443, 8729) else "http"
     return f"{scheme}://{router.host}:{router.port}/rest"
 
 
-def _binary_connect(router):
-    """Open a librouteros connection. Caller must close it."""
-    use_ssl = router.port == 8729
-    return ros_connect(
-        host=router.host,
-        username=router.api_username,
-        password=router.api_password,
-        port=router.port,
-        ssl_wrapper=librouteros.create_ssl_context() if use_ssl else None,
-    )
+def _user_params(username, profile_name, limit_uptime, limit_bytes_total, shared_users):
+    return {
+        "name": username,
+        "password": username,
+        "profile": profile_name,
+        "limit-uptime": limit_uptime,
+        "limit-bytes-total": str(limit_bytes_total) if limit_bytes_total else "0",
+        "shared-users": str(shared_users),
+    }
+
+
+def _name_query(usernames):
+    """RouterOS query words matching any of `usernames` (name=a OR name=b …)."""
+    words = [f"name={name}" for name in usernames]
+    if len(words) > 1:
+        words.append("#" + "|" * (len(words) - 1))
+    return words
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _split_reply(words):
+    """Raw reply words → (attributes, tag). librouteros' parser can't read .tag."""
+    attrs, tag = {}, None
+    for word in words:
+        if word.startswith(".tag="):
+            tag = int(word[5:])
+        elif word.startswith("="):
+            key, _, value = word[1:].partition("=")
+            attrs[key] = value
+    return attrs, tag
 
 
 # ─── Connection Test ──────────────────────────────────────────────────────────
@@ -53,17 +80,17 @@ def test_connection(router):
     # Always try binary on port 8728/8729; also try binary on other ports
     # because some admins run API on non-standard ports.
     try:
-        api = _binary_connect(router)
+        api = sessions.connect_binary(router)
         list(api(cmd="/system/identity/print"))
         api.close()
         router.api_mode = "binary"
         return True, None
-    except Exception as bin_err:
-        pass
+    except Exception as e:
+        bin_err = e
 
     # Fall back to REST
     try:
-        r = _rest_session(router).get(f"{_rest_base(router)}/system/identity")
+        r = sessions.connect_rest(router).get(f"{_rest_base(router)}/system/identity")
         if r.status_code == 200:
             router.api_mode = "rest"
             return True, None
@@ -72,13 +99,25 @@ def test_connection(router):
         return False, f"Binary: {bin_err} | REST: {rest_err}"
 
 
+def ping(router):
+    """Cheap reachability check on a pooled session. Returns (ok, error_or_None)."""
+    try:
+        if router.api_mode == "rest":
+            r = sessions.call(router, lambda s: s.get(f"{_rest_base(router)}/system/identity"))
+            return (True, None) if r.status_code == 200 else (False, f"HTTP {r.status_code}")
+        sessions.call(router, lambda api: list(api(cmd="/system/identity/print")))
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
+
 # ─── Get Hotspot Profiles ─────────────────────────────────────────────────────
 
 def get_hotspot_profiles(router):
     """Returns (list_of_profile_dicts, error_or_None)."""
     if router.api_mode == "rest":
         try:
-            r = _rest_session(router).get(f"{_rest_base(router)}/ip/hotspot/user/profile")
+            r = sessions.call(router, lambda s: s.get(f"{_rest_base(router)}/ip/hotspot/user/profile"))
             if r.status_code == 200:
                 return r.json(), None
             return [], f"HTTP {r.status_code}"
@@ -86,9 +125,7 @@ def get_hotspot_profiles(router):
             return [], str(e)
     else:
         try:
-            api = _binary_connect(router)
-            profiles = list(api(cmd="/ip/hotspot/user/profile/print"))
-            api.close()
+            profiles = sessions.call(router, lambda api: list(api(cmd="/ip/hotspot/user/profile/print")))
             return profiles, None
         except Exception as e:
             return [], str(e)
@@ -98,115 +135,152 @@ def get_hotspot_profiles(router):
 
 def add_hotspot_user(router, username, profile_name, limit_uptime, limit_bytes_total=None, shared_users=1):
     """Push a voucher user to MikroTik and verify it was created."""
-    if router.api_mode == "rest":
-        return _rest_add_user(router, username, profile_name, limit_uptime, limit_bytes_total, shared_users)
-    else:
-        return _binary_add_user(router, username, profile_name, limit_uptime, limit_bytes_total, shared_users)
+    results = add_hotspot_users(router, [username], profile_name, limit_uptime, limit_bytes_total, shared_users)
+    return results[username]
 
 
-def _rest_add_user(router, username, profile_name, limit_uptime, limit_bytes_total, shared_users):
-    payload = {
-        "name": username,
-        "password": username,
-        "profile": profile_name,
-        "limit-uptime": limit_uptime,
-        "limit-bytes-total": str(limit_bytes_total) if limit_bytes_total else "0",
-        "shared-users": str(shared_users),
-    }
+def add_hotspot_users(router, usernames, profile_name, limit_uptime, limit_bytes_total=None, shared_users=1):
+    """
+    Push many voucher users over one pooled session and verify them with
+    one filtered print. Returns {username: (ok, error_or_None)}.
+    """
+    usernames = list(usernames)
+    params = [
+        _user_params(name, profile_name, limit_uptime, limit_bytes_total, shared_users)
+        for name in usernames
+    ]
     try:
-        r = _rest_session(router).put(f"{_rest_base(router)}/ip/hotspot/user", json=payload)
-        if r.status_code not in (200, 201):
-            return False, r.text
-        return verify_hotspot_user(router, username)
+        if router.api_mode == "rest":
+            errors = sessions.call(router, lambda s: _rest_add_users(router, s, params))
+        else:
+            errors = sessions.call(router, lambda api: _binary_add_users(api, params))
     except Exception as e:
-        return False, str(e)
+        return {name: (False, str(e)) for name in usernames}
 
+    to_verify = [name for name in usernames if name not in errors]
+    results = {name: (False, err) for name, err in errors.items()}
+    if to_verify:
+        results.update(verify_hotspot_users(router, to_verify))
+    return results
 
-def _binary_add_user(router, username, profile_name, limit_uptime, limit_bytes_total, shared_users):
-    try:
-        api = _binary_connect(router)
-        params = {
-            "name": username,
-            "password": username,
-            "profile": profile_name,
-            "limit-uptime": limit_uptime,
-            "limit-bytes-total": str(limit_bytes_total) if limit_bytes_total else "0",
-            "shared-users": str(shared_users),
-        }
-        api(cmd="/ip/hotspot/user/add", **params)
-        api.close()
-        return verify_hotspot_user(router, username)
-    except TrapError as e:
-        return False, f"MikroTik error: {e}"
-    except Exception as e:
-        return False, str(e)
+
+def _rest_add_users(router, s, params):
+    """REST has no batch add — PUT each user over the same keep-alive session."""
+    errors = {}
+    url = f"{_rest_base(router)}/ip/hotspot/user"
+    for payload in params:
+        r = s.put(url, json=payload)
+        if r.status_code not in (200, 201):
+            errors[payload["name"]] = r.text
+    return errors
+
+
+def _binary_add_users(api, params):
+    """
+    Write up to PIPELINE_DEPTH tagged add sentences, then read the replies
+    (one !done per command, preceded by !trap on failure).
+    """
+    errors = {}
+    for chunk in _chunks(list(enumerate(params)), PIPELINE_DEPTH):
+        for tag, user in chunk:
+            words = [compose_word(key, value) for key, value in user.items()]
+            api.protocol.writeSentence("/ip/hotspot/user/add", *words, f".tag={tag}")
+
+        done = 0
+        while done < len(chunk):
+            reply_word, words = api.protocol.readSentence()
+            attrs, tag = _split_reply(words)
+            if reply_word == "!trap":
+                message = attrs.get("message", "trap")
+                # Already on the router (earlier push / retried pipeline) — verify decides
+                if "already have" not in message:
+                    errors[params[tag]["name"]] = f"MikroTik error: {message}"
+            elif reply_word == "!done":
+                done += 1
+    return errors
 
 
 # ─── Verify Hotspot User ──────────────────────────────────────────────────────
 
 def verify_hotspot_user(router, username):
     """Confirm user exists on router and is not disabled."""
-    if router.api_mode == "rest":
-        try:
-            r = _rest_session(router).get(
-                f"{_rest_base(router)}/ip/hotspot/user",
-                params={"name": username}
-            )
-            if r.status_code != 200:
-                return False, f"Verify HTTP {r.status_code}"
-            data = r.json()
-            if not data:
-                return False, "User not found on router after push"
-            if data[0].get("disabled", "false") == "true":
-                return False, "User created but is disabled on router"
-            return True, None
-        except Exception as e:
-            return False, str(e)
-    else:
-        try:
-            api = _binary_connect(router)
-            results = list(api(cmd="/ip/hotspot/user/print", **{"?name": username}))
-            api.close()
-            if not results:
-                return False, "User not found on router after push"
-            if results[0].get("disabled", "false") == "true":
-                return False, "User created but is disabled on router"
-            return True, None
-        except Exception as e:
-            return False, str(e)
+    return verify_hotspot_users(router, [username])[username]
+
+
+def verify_hotspot_users(router, usernames):
+    """
+    Confirm each user exists on the router and is not disabled, using one
+    filtered print per VERIFY_CHUNK names. Returns {username: (ok, error_or_None)}.
+    """
+    usernames = list(usernames)
+    found = {}
+    try:
+        for chunk in _chunks(usernames, VERIFY_CHUNK):
+            if router.api_mode == "rest":
+                rows = sessions.call(router, lambda s: _rest_print_users(router, s, chunk))
+            else:
+                rows = sessions.call(router, lambda api: _binary_print_users(api, chunk))
+            for row in rows:
+                found[row.get("name")] = row
+    except Exception as e:
+        return {name: (False, str(e)) for name in usernames}
+
+    results = {}
+    for name in usernames:
+        row = found.get(name)
+        if row is None:
+            results[name] = (False, "User not found on router after push")
+        elif str(row.get("disabled", "false")).lower() in ("true", "yes"):
+            results[name] = (False, "User created but is disabled on router")
+        else:
+            results[name] = (True, None)
+    return results
+
+
+def _rest_print_users(router, s, usernames):
+    r = s.post(
+        f"{_rest_base(router)}/ip/hotspot/user/print",
+        json={".proplist": ["name", "disabled"], ".query": _name_query(usernames)},
+    )
+    if r.status_code != 200:
+        raise RuntimeError(f"Verify HTTP {r.status_code}")
+    return r.json()
+
+
+def _binary_print_users(api, usernames):
+    query = [f"?{word}" for word in _name_query(usernames)]
+    return [
+        {"name": row.get("name"), "disabled": row.get("disabled", False)}
+        for row in api.rawCmd("/ip/hotspot/user/print", "=.proplist=name,disabled", *query)
+    ]
 
 
 # ─── Remove Hotspot User ──────────────────────────────────────────────────────
 
 def remove_hotspot_user(router, username):
     if router.api_mode == "rest":
-        try:
-            r = _rest_session(router).get(
-                f"{_rest_base(router)}/ip/hotspot/user",
-                params={"name": username}
-            )
+        def _remove(s):
+            r = s.get(f"{_rest_base(router)}/ip/hotspot/user", params={"name": username})
             if r.status_code != 200 or not r.json():
                 return False, "User not found"
             uid = r.json()[0][".id"]
-            d = _rest_session(router).delete(f"{_rest_base(router)}/ip/hotspot/user/{uid}")
+            d = s.delete(f"{_rest_base(router)}/ip/hotspot/user/{uid}")
             return d.status_code in (200, 204), d.text
-        except Exception as e:
-            return False, str(e)
     else:
-        try:
-            api = _binary_connect(router)
+        def _remove(api):
             results = list(api(cmd="/ip/hotspot/user/print", **{"?name": username}))
             if not results:
-                api.close()
                 return False, "User not found"
             uid = results[0][".id"]
-            api(cmd="/ip/hotspot/user/remove", **{".id": uid})
-            api.close()
+            list(api(cmd="/ip/hotspot/user/remove", **{".id": uid}))
             return True, None
-        except TrapError as e:
-            return False, f"MikroTik error: {e}"
-        except Exception as e:
-            return False, str(e)
+
+    try:
+        return sessions.call(router, _remove)
+    except TrapError as e:
+        return False, f"MikroTik error: {e}"
+    except Exception as e:
+        return False, str(e)
 
 
 # ─── Active Sessions ──────────────────────────────────────────────────────────
@@ -214,7 +288,7 @@ def remove_hotspot_user(router, username):
 def get_active_sessions(router):
     if router.api_mode == "rest":
         try:
-            r = _rest_session(router).get(f"{_rest_base(router)}/ip/hotspot/active")
+            r = sessions.call(router, lambda s: s.get(f"{_rest_base(router)}/ip/hotspot/active"))
             if r.status_code == 200:
                 return r.json(), None
             return [], f"HTTP {r.status_code}"
@@ -222,9 +296,27 @@ def get_active_sessions(router):
             return [], str(e)
     else:
         try:
-            api = _binary_connect(router)
-            sessions = list(api(cmd="/ip/hotspot/active/print"))
-            api.close()
-            return sessions, None
+            active = sessions.call(router, lambda api: list(api(cmd="/ip/hotspot/active/print")))
+            return active, None
         except Exception as e:
             return [], str(e)
+
+
+# ─── System Resources ─────────────────────────────────────────────────────────
+
+def get_resources(router):
+    """/system/resource (cpu-load, free-memory, total-memory, uptime …). Returns (dict, error_or_None)."""
+    if router.api_mode == "rest":
+        try:
+            r = sessions.call(router, lambda s: s.get(f"{_rest_base(router)}/system/resource"))
+            if r.status_code == 200:
+                return r.json(), None
+            return {}, f"HTTP {r.status_code}"
+        except Exception as e:
+            return {}, str(e)
+    else:
+        try:
+            rows = sessions.call(router, lambda api: list(api(cmd="/system/resource/print")))
+            return (rows[0] if rows else {}), None
+        except Exception as e:
+            return {}, str(e)
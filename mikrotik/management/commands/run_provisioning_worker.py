@@ -0,0 +1,97 @@
+"""
+management/commands/run_provisioning_worker.py
+==============================================
+Long-running worker that pushes queued MikroTik voucher batches to their
+routers (see mikrotik/services/provisioning.py).
+
+--threads jobs run in parallel, always for different routers — a router
+never gets more than one provisioning session at a time, and an offline
+router only backs off its own job. Several containers can run side by
+side (jobs and routers are claimed with SKIP LOCKED).
+Use --once to drain the due jobs a single time.
+"""
+
+import logging
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from Billing import dbconn
+from mikrotik import sessions
+from mikrotik.services.provisioning import claim_next_job, run_job
+
+logger = logging.getLogger(__name__)
+
+STATUS_LINES = {
+    "DONE": "  ✅ Batch {batch}: {pushed}/{total} pushed to {router}",
+    "PENDING": "  ⏳ Batch {batch}: {router} unreachable, retry scheduled",
+    "FAILED": "  ❌ Batch {batch} → {router} failed: {error}",
+}
+
+
+class Command(BaseCommand):
+    help = "Push queued MikroTik voucher batches to routers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4,
+                            help="Routers provisioned in parallel (default 4)")
+        parser.add_argument("--idle-sleep", type=float, default=2.0,
+                            help="Seconds to sleep when nothing is due (default 2.0)")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain due jobs once and exit")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+
+        if options["once"]:
+            self._loop(options, once=True)
+            sessions.close_all()
+            return
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self.stdout.write("Provisioning worker started")
+
+        threads = [
+            threading.Thread(target=self._loop, args=(options,), name=f"provision-{i}", daemon=True)
+            for i in range(max(1, options["threads"]))
+        ]
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=1.0)
+
+        sessions.close_all()
+        self.stdout.write("Provisioning worker stopped")
+
+    def _loop(self, options, once=False):
+        try:
+            while not self._stopping:
+                close_old_connections()
+                dbconn.note_unit()
+                job = None
+                try:
+                    job = claim_next_job()
+                    if job:
+                        status = run_job(job)
+                        job.refresh_from_db()
+                        self.stdout.write(STATUS_LINES[status].format(
+                            batch=job.batch.uuid, router=job.router.name, pushed=job.pushed_count,
+                            total=job.total, error=job.error,
+                        ))
+                except Exception as exc:
+                    logger.error("Provisioning worker loop error: %s", exc)
+
+                if job is None:
+                    if once:
+                        break
+                    time.sleep(options["idle_sleep"])
+        finally:
+            connection.close()
+
+    def _stop(self, signum, frame):
+        self._stopping = True
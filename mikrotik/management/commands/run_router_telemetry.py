@@ -0,0 +1,83 @@
+"""
+management/commands/run_router_telemetry.py
+===========================================
+Long-running collector that polls every active MikroTik router on a
+fixed interval (reachability, latency, active sessions, resources) and
+records the results (see mikrotik/services/telemetry.py). Once an hour
+it rolls raw samples up into hourly rows and applies retention.
+
+Run as its own container (see docker-compose.yml). Run a single
+instance. Use --once to poll once (and run maintenance) and exit.
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Billing import dbconn
+from mikrotik import sessions
+from mikrotik.models import RouterConnection
+from mikrotik.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+MAINTAIN_EVERY = 3600
+
+
+class Command(BaseCommand):
+    help = "Poll MikroTik routers and record health / session telemetry"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=60.0,
+                            help="Seconds between poll rounds (default 60)")
+        parser.add_argument("--workers", type=int, default=16,
+                            help="Routers polled concurrently (default 16)")
+        parser.add_argument("--once", action="store_true",
+                            help="Poll once, run maintenance and exit")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        last_maintain = 0.0
+
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.stdout.write("Router telemetry collector started")
+
+        try:
+            while not self._stopping:
+                started = time.monotonic()
+                close_old_connections()
+                dbconn.note_unit()
+                try:
+                    routers = list(RouterConnection.objects.filter(is_active=True))
+                    results = telemetry.poll_all(routers, workers=options["workers"])
+                    telemetry.record(results)
+                    down = sum(1 for r in results if not r["reachable"])
+                    self.stdout.write(f"  📡 Polled {len(results)} router(s), {down} unreachable")
+
+                    if options["once"] or time.monotonic() - last_maintain >= MAINTAIN_EVERY:
+                        rolled, (raw, hourly) = telemetry.maintain()
+                        last_maintain = time.monotonic()
+                        self.stdout.write(f"  🗜 Rolled up {rolled} hour(s); pruned {raw} raw, {hourly} hourly")
+                except Exception as exc:
+                    logger.error("Router telemetry loop error: %s", exc)
+
+                if options["once"]:
+                    break
+                self._sleep(options["interval"] - (time.monotonic() - started))
+        finally:
+            sessions.close_all()
+
+        self.stdout.write("Router telemetry collector stopped")
+
+    def _sleep(self, seconds):
+        deadline = time.monotonic() + max(0.0, seconds)
+        while not self._stopping and time.monotonic() < deadline:
+            time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
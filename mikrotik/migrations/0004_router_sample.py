@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mikrotik', '0003_provisioning_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouterSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('RAW', 'Raw'), ('HOUR', 'Hourly')], default='RAW', max_length=4)),
+                ('sampled_at', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=1)),
+                ('up_samples', models.PositiveIntegerField(default=0)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('active_sessions', models.PositiveIntegerField(blank=True, null=True)),
+                ('cpu_load', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('free_memory', models.BigIntegerField(blank=True, null=True)),
+                ('total_memory', models.BigIntegerField(blank=True, null=True)),
+                ('uptime_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('router', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='mikrotik.routerconnection')),
+            ],
+            options={
+                'ordering': ['-sampled_at'],
+                'indexes': [models.Index(fields=['period', 'sampled_at'], name='mikrotik_sample_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='routersample',
+            constraint=models.UniqueConstraint(fields=('router', 'period', 'sampled_at'), name='mikrotik_sample_unique'),
+        ),
+    ]
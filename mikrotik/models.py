@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 from accounts.models import Vendor
 from hotspot.models import HotspotLocation
 
@@ -72,7 +73,12 @@ class VoucherBatch(models.Model):
 
     @property
     def failed_count(self):
-        return self.vouchers.filter(pushed_to_router=False).count()
+        return self.vouchers.filter(pushed_to_router=False).exclude(push_error="").count()
+
+    @property
+    def active_job(self):
+        """The batch's queued / running provisioning job, if any."""
+        return self.provisioning_jobs.filter(status__in=ProvisioningJob.ACTIVE_STATUSES).first()
 
 
 class MikrotikVoucher(models.Model):
@@ -97,3 +103,90 @@ class MikrotikVoucher(models.Model):
 
     def __str__(self):
         return self.code
+
+
+class ProvisioningJob(models.Model):
+    """
+    Vouchers of a batch waiting to be pushed to its router, drained by
+    manage.py run_provisioning_worker (see mikrotik/services/provisioning.py).
+    Only one job per router runs at a time; an unreachable router puts the
+    job back as PENDING with a backoff (next_attempt_at).
+    """
+    STATUS_PENDING = "PENDING"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+    STATUSES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    batch = models.ForeignKey(VoucherBatch, on_delete=models.CASCADE, related_name="provisioning_jobs")
+    router = models.ForeignKey(RouterConnection, on_delete=models.CASCADE, related_name="provisioning_jobs")
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING)
+
+    total = models.PositiveIntegerField(default=0)
+    pushed_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="mikrotik_provision_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"Provision batch {self.batch.uuid} → {self.router} ({self.status})"
+
+
+class RouterSample(models.Model):
+    """
+    Telemetry time series written by manage.py run_router_telemetry
+    (see mikrotik/services/telemetry.py). RAW rows are single polls kept
+    for a couple of days; HOUR rows are per-hour rollups kept for months
+    (samples / up_samples give the reachability ratio).
+    """
+    PERIOD_RAW = "RAW"
+    PERIOD_HOUR = "HOUR"
+    PERIODS = [(PERIOD_RAW, "Raw"), (PERIOD_HOUR, "Hourly")]
+
+    router = models.ForeignKey(RouterConnection, on_delete=models.CASCADE, related_name="samples")
+    period = models.CharField(max_length=4, choices=PERIODS, default=PERIOD_RAW)
+    sampled_at = models.DateTimeField()
+
+    samples = models.PositiveIntegerField(default=1)
+    up_samples = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    active_sessions = models.PositiveIntegerField(null=True, blank=True)
+    cpu_load = models.PositiveSmallIntegerField(null=True, blank=True)
+    free_memory = models.BigIntegerField(null=True, blank=True)
+    total_memory = models.BigIntegerField(null=True, blank=True)
+    uptime_seconds = models.PositiveIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ["-sampled_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["router", "period", "sampled_at"], name="mikrotik_sample_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["period", "sampled_at"], name="mikrotik_sample_period_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.router} @ {self.sampled_at:%Y-%m-%d %H:%M} ({self.period})"
+
+    @property
+    def reachable(self):
+        return self.up_samples > 0
@@ -0,0 +1,203 @@
+"""
+mikrotik/services/provisioning.py
+=================================
+Background push of MikroTik voucher batches to their router.
+
+generate / batch_retry only enqueue a ProvisioningJob; run_provisioning_worker
+drains the queue:
+
+  claim_next_job() → oldest due job whose router has no other job
+                     running (jobs and router rows are claimed with
+                     SKIP LOCKED, so several worker threads/containers
+                     never open two sessions to the same router)
+  run_job()        → ping the router, then push the batch's unpushed
+                     vouchers PUSH_CHUNK at a time over one pooled,
+                     pipelined session (api.add_hotspot_users), writing
+                     per-voucher results with one bulk_update per chunk
+                     and progress onto the job row
+
+An unreachable router (failed ping, or a chunk where nothing got through)
+puts the job back as PENDING with exponential backoff instead of making
+each voucher wait out its own timeout; after MAX_ATTEMPTS it is FAILED.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from mikrotik import api as mt
+from mikrotik.models import MikrotikVoucher, ProvisioningJob, RouterConnection
+
+logger = logging.getLogger(__name__)
+
+PUSH_CHUNK = 100
+# A RUNNING job whose worker stopped heartbeating is picked up again
+STALE_LOCK = timedelta(minutes=5)
+# Candidate jobs looked at per claim (jobs for busy routers are skipped)
+CLAIM_SCAN = 20
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(minutes=30)
+
+
+def push_limits(profile):
+    """(limit-uptime, limit-bytes-total) for a voucher profile, e.g. ("24:00:00", None)."""
+    limit_uptime = f"{profile.validity_hours:02d}:00:00"
+    limit_bytes = (profile.data_limit_mb * 1024 * 1024) if profile.data_limit_mb else None
+    return limit_uptime, limit_bytes
+
+
+def push_vouchers(router, profile, vouchers):
+    """Push `vouchers` in one pipelined call and bulk-save the outcome. Returns (pushed, failed, first_error)."""
+    limit_uptime, limit_bytes = push_limits(profile)
+    results = mt.add_hotspot_users(
+        router, [v.code for v in vouchers], profile.name, limit_uptime, limit_bytes, profile.shared_users
+    )
+    pushed, failed, first_error = 0, 0, ""
+    for voucher in vouchers:
+        ok, err = results[voucher.code]
+        voucher.pushed_to_router = ok
+        voucher.push_error = "" if ok else (err or "Push failed")
+        if ok:
+            pushed += 1
+        else:
+            failed += 1
+            first_error = first_error or voucher.push_error
+    MikrotikVoucher.objects.bulk_update(vouchers, ["pushed_to_router", "push_error"], batch_size=500)
+    return pushed, failed, first_error
+
+
+# ---------------------------------------------------------------------------
+# Queue
+# ---------------------------------------------------------------------------
+
+def enqueue(batch):
+    """Queue the batch's unpushed vouchers. A vendor retry makes a backed-off job due now."""
+    job = batch.active_job
+    if job:
+        if job.status == ProvisioningJob.STATUS_PENDING:
+            ProvisioningJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now(), attempts=0)
+        return job
+    return ProvisioningJob.objects.create(
+        batch=batch,
+        router=batch.router,
+        total=batch.vouchers.filter(pushed_to_router=False).count(),
+    )
+
+
+def claim_next_job():
+    """Claim the oldest due job whose router is free. Returns None when nothing is due."""
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = (
+            ProvisioningJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ProvisioningJob.STATUS_PENDING, next_attempt_at__lte=now)
+                | Q(status=ProvisioningJob.STATUS_RUNNING, locked_at__lt=now - STALE_LOCK)
+            )
+            .order_by("next_attempt_at", "id")[:CLAIM_SCAN]
+        )
+        for job in candidates:
+            # Holding the router row serialises the "is it busy?" check below
+            router = (
+                RouterConnection.objects.select_for_update(skip_locked=True)
+                .filter(pk=job.router_id).first()
+            )
+            if router is None:
+                continue
+            busy = (
+                ProvisioningJob.objects
+                .filter(router_id=job.router_id, status=ProvisioningJob.STATUS_RUNNING,
+                        locked_at__gte=now - STALE_LOCK)
+                .exclude(pk=job.pk)
+                .exists()
+            )
+            if busy:
+                continue
+            job.status = ProvisioningJob.STATUS_RUNNING
+            job.locked_at = now
+            job.attempts += 1
+            job.save(update_fields=["status", "locked_at", "attempts"])
+            job.router = router
+            return job
+    return None
+
+
+def run_job(job):
+    """Push one job's vouchers. Returns the job's new status."""
+    batch, router = job.batch, job.router
+    if not router.is_active:
+        return _finish(job, ProvisioningJob.STATUS_FAILED, error="Router is disabled.")
+
+    ok, err = mt.ping(router)
+    if not ok:
+        return _retry_later(job, f"Router unreachable: {err}")
+    RouterConnection.objects.filter(pk=router.pk).update(last_seen=timezone.now())
+
+    pending = batch.vouchers.filter(pushed_to_router=False).order_by("id")
+    last_id = 0
+    while True:
+        vouchers = list(pending.filter(id__gt=last_id)[:PUSH_CHUNK])
+        if not vouchers:
+            break
+        last_id = vouchers[-1].id
+
+        pushed, failed, first_error = push_vouchers(router, batch.profile, vouchers)
+        ProvisioningJob.objects.filter(pk=job.pk).update(
+            pushed_count=F("pushed_count") + pushed,
+            failed_count=_failed_in(batch),
+            locked_at=timezone.now(),
+        )
+        if pushed == 0:
+            return _retry_later(job, first_error)
+
+    job.refresh_from_db(fields=["pushed_count", "failed_count"])
+    return _finish(job, ProvisioningJob.STATUS_DONE)
+
+
+def _failed_in(batch):
+    return batch.vouchers.filter(pushed_to_router=False).exclude(push_error="").count()
+
+
+def _backoff(attempts):
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def _retry_later(job, error):
+    if job.attempts >= MAX_ATTEMPTS:
+        return _finish(job, ProvisioningJob.STATUS_FAILED, error=error)
+    logger.warning("Provisioning job %s (router %s) backing off: %s", job.pk, job.router_id, error)
+    job.status = ProvisioningJob.STATUS_PENDING
+    job.error = error[:2000]
+    job.locked_at = None
+    job.next_attempt_at = timezone.now() + _backoff(job.attempts)
+    job.save(update_fields=["status", "error", "locked_at", "next_attempt_at"])
+    return job.status
+
+
+def _finish(job, status, error=""):
+    job.status = status
+    job.error = error[:2000]
+    job.locked_at = None
+    job.completed_at = timezone.now()
+    job.save(update_fields=["status", "error", "locked_at", "completed_at"])
+    return status
+
+
+def job_progress(job):
+    """JSON-ready progress for the batch page."""
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "total": job.total,
+        "pushed": job.pushed_count,
+        "failed": job.failed_count,
+        "attempts": job.attempts,
+        "next_attempt_at": job.next_attempt_at.isoformat() if job.status == ProvisioningJob.STATUS_PENDING else None,
+        "error": job.error,
+        "done": job.status in (ProvisioningJob.STATUS_DONE, ProvisioningJob.STATUS_FAILED),
+    }
@@ -0,0 +1,244 @@
+"""
+mikrotik/services/telemetry.py
+==============================
+Router health / session telemetry, collected by run_router_telemetry.
+
+Every interval the collector polls all active routers concurrently
+(reachability + latency, active hotspot sessions, /system/resource) over
+the pooled sessions and:
+
+  record()   → one RAW RouterSample row per router (bulk insert),
+               last_seen for every reachable router (one UPDATE), and a
+               snapshot per router in the cache (router_telemetry:<pk>)
+               holding the latest numbers and the active-session rows
+  maintain() → hourly: roll completed hours of RAW samples up into HOUR
+               rows, then drop RAW rows older than RAW_RETENTION and
+               HOUR rows older than HOUR_RETENTION
+
+Pages read snapshot()/snapshots() instead of dialling routers over the
+VPN, so polling cost depends on the number of routers, not page views.
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from mikrotik import api as mt
+from mikrotik.models import RouterConnection, RouterSample
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TIMEOUT = 10 * 60
+# Session rows kept in a snapshot (the count is always exact)
+SNAPSHOT_MAX_SESSIONS = 500
+RAW_RETENTION = timedelta(days=2)
+HOUR_RETENTION = timedelta(days=90)
+
+_UPTIME_RE = re.compile(r"(\d+)([wdhms])")
+_UPTIME_UNITS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+
+
+def snapshot_key(router_id):
+    return f"router_telemetry:{router_id}"
+
+
+def parse_uptime(value):
+    """RouterOS uptime ("1w2d3h4m5s") → seconds."""
+    if value in (None, ""):
+        return None
+    return sum(int(n) * _UPTIME_UNITS[unit] for n, unit in _UPTIME_RE.findall(str(value)))
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Polling
+# ---------------------------------------------------------------------------
+
+def poll(router):
+    """Poll one router. Never raises — failures are part of the sample."""
+    started = time.monotonic()
+    ok, err = mt.ping(router)
+    result = {
+        "router_id": router.pk,
+        "reachable": ok,
+        "latency_ms": int((time.monotonic() - started) * 1000) if ok else None,
+        "sessions": None,
+        "resources": {},
+        "error": "" if ok else (err or "unreachable"),
+    }
+    if not ok:
+        return result
+
+    active, err = mt.get_active_sessions(router)
+    if err is None:
+        result["sessions"] = active
+    resources, res_err = mt.get_resources(router)
+    result["resources"] = resources
+    result["error"] = err or res_err or ""
+    return result
+
+
+def poll_all(routers, workers=16):
+    routers = list(routers)
+    if not routers:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(routers)))) as pool:
+        return list(pool.map(poll, routers))
+
+
+def _sample(result, now):
+    resources = result["resources"]
+    sessions = result["sessions"]
+    return RouterSample(
+        router_id=result["router_id"],
+        period=RouterSample.PERIOD_RAW,
+        sampled_at=now,
+        samples=1,
+        up_samples=1 if result["reachable"] else 0,
+        latency_ms=result["latency_ms"],
+        active_sessions=len(sessions) if sessions is not None else None,
+        cpu_load=_int(resources.get("cpu-load")),
+        free_memory=_int(resources.get("free-memory")),
+        total_memory=_int(resources.get("total-memory")),
+        uptime_seconds=parse_uptime(resources.get("uptime")),
+        error=(result["error"] or "")[:255],
+    )
+
+
+def record(results, now=None):
+    """Store one poll round: RAW samples, last_seen, cache snapshots."""
+    now = now or timezone.now()
+    samples = [_sample(result, now) for result in results]
+    RouterSample.objects.bulk_create(samples, ignore_conflicts=True)
+
+    up_ids = [result["router_id"] for result in results if result["reachable"]]
+    if up_ids:
+        RouterConnection.objects.filter(pk__in=up_ids).update(last_seen=now)
+
+    snapshots = {}
+    for result, sample in zip(results, samples):
+        sessions = result["sessions"]
+        snapshots[snapshot_key(result["router_id"])] = {
+            "collected_at": now.isoformat(),
+            "reachable": result["reachable"],
+            "latency_ms": sample.latency_ms,
+            "active_sessions": sample.active_sessions,
+            "cpu_load": sample.cpu_load,
+            "free_memory": sample.free_memory,
+            "total_memory": sample.total_memory,
+            "uptime_seconds": sample.uptime_seconds,
+            "error": sample.error,
+            # None when unreachable or the session list couldn't be read
+            "sessions": sessions[:SNAPSHOT_MAX_SESSIONS] if sessions is not None else None,
+        }
+    try:
+        cache.set_many(snapshots, SNAPSHOT_TIMEOUT)
+    except Exception as exc:
+        logger.warning("Router telemetry snapshot write failed: %s", exc)
+    return samples
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _load(data):
+    if data:
+        data = dict(data, collected_at=parse_datetime(data["collected_at"]))
+    return data
+
+
+def snapshot(router):
+    """Latest collected snapshot for a router (None if the collector hasn't seen it lately)."""
+    try:
+        return _load(cache.get(snapshot_key(router.pk)))
+    except Exception as exc:
+        logger.warning("Router telemetry snapshot read failed: %s", exc)
+        return None
+
+
+def snapshots(routers):
+    """{router_id: snapshot} for many routers in one cache round trip."""
+    keys = {snapshot_key(r.pk): r.pk for r in routers}
+    try:
+        found = cache.get_many(list(keys))
+    except Exception as exc:
+        logger.warning("Router telemetry snapshot read failed: %s", exc)
+        return {}
+    return {keys[key]: _load(data) for key, data in found.items()}
+
+
+# ---------------------------------------------------------------------------
+# Downsampling / retention
+# ---------------------------------------------------------------------------
+
+def rollup(now=None):
+    """Roll completed hours of RAW samples into HOUR rows. Returns rows written."""
+    now = now or timezone.now()
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    since = current_hour - RAW_RETENTION
+    last = RouterSample.objects.filter(period=RouterSample.PERIOD_HOUR).aggregate(m=Max("sampled_at"))["m"]
+    if last:
+        since = max(since, last + timedelta(hours=1))
+
+    rows = (
+        RouterSample.objects
+        .filter(period=RouterSample.PERIOD_RAW, sampled_at__gte=since, sampled_at__lt=current_hour)
+        .annotate(hour=TruncHour("sampled_at"))
+        .values("router_id", "hour")
+        .annotate(
+            n=Count("id"), up=Sum("up_samples"), latency=Avg("latency_ms"),
+            peak_sessions=Max("active_sessions"), cpu=Avg("cpu_load"),
+            min_free=Min("free_memory"), total=Max("total_memory"), uptime=Max("uptime_seconds"),
+        )
+    )
+    hourly = [
+        RouterSample(
+            router_id=row["router_id"],
+            period=RouterSample.PERIOD_HOUR,
+            sampled_at=row["hour"],
+            samples=row["n"],
+            up_samples=row["up"] or 0,
+            latency_ms=round(row["latency"]) if row["latency"] is not None else None,
+            active_sessions=row["peak_sessions"],
+            cpu_load=round(row["cpu"]) if row["cpu"] is not None else None,
+            free_memory=row["min_free"],
+            total_memory=row["total"],
+            uptime_seconds=row["uptime"],
+        )
+        for row in rows
+    ]
+    RouterSample.objects.bulk_create(hourly, ignore_conflicts=True)
+    return len(hourly)
+
+
+def prune(now=None):
+    now = now or timezone.now()
+    raw, _ = RouterSample.objects.filter(
+        period=RouterSample.PERIOD_RAW, sampled_at__lt=now - RAW_RETENTION,
+    ).delete()
+    hourly, _ = RouterSample.objects.filter(
+        period=RouterSample.PERIOD_HOUR, sampled_at__lt=now - HOUR_RETENTION,
+    ).delete()
+    return raw, hourly
+
+
+def maintain(now=None):
+    now = now or timezone.now()
+    rolled = rollup(now)
+    pruned = prune(now)
+    return rolled, pruned
@@ -0,0 +1,172 @@
+"""
+Per-process pool of authenticated MikroTik API sessions.
+
+Opening a librouteros connection costs a TCP (often VPN) round trip plus
+the login exchange, so sessions are kept per RouterConnection and reused
+by every api.py call made from the same worker:
+
+  - binary → an open librouteros Api (one socket, already logged in)
+  - rest   → a RestSession (keep-alive requests.Session whose calls
+             default to REST_TIMEOUT)
+
+    with session(router) as conn:
+        list(conn(cmd="/system/identity/print"))
+
+Idle sessions are closed after IDLE_TIMEOUT seconds. A session that
+raised inside the block (other than a RouterOS !trap) is discarded
+rather than returned, so a dropped socket is never handed out twice.
+The pool key includes the host/port/credentials, so editing a router
+never reuses an old login.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import librouteros
+import requests
+from librouteros import connect as ros_connect
+from librouteros.exceptions import ConnectionClosed, FatalError, TrapError
+
+IDLE_TIMEOUT = 60
+# Idle sessions kept per router (concurrent callers each get their own)
+MAX_IDLE_PER_ROUTER = 2
+CONNECT_TIMEOUT = 10
+REST_TIMEOUT = 8
+
+_lock = threading.Lock()
+_idle = {}   # pool key → [(conn, last_used)]
+
+
+def _pool_key(router):
+    return (router.pk, router.api_mode, router.host, router.port, router.api_username, router.api_password)
+
+
+def connect_binary(router):
+    """Open a librouteros connection. Caller must close it."""
+    use_ssl = router.port == 8729
+    return ros_connect(
+        host=router.host,
+        username=router.api_username,
+        password=router.api_password,
+        port=router.port,
+        timeout=CONNECT_TIMEOUT,
+        ssl_wrapper=librouteros.create_ssl_context() if use_ssl else None,
+    )
+
+
+class RestSession(requests.Session):
+    """requests.Session with a default per-request timeout (Session has no such setting)."""
+
+    def __init__(self, timeout=REST_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def connect_rest(router):
+    s = RestSession()
+    s.auth = (router.api_username, router.api_password)
+    return s
+
+
+def _open(router):
+    if router.api_mode == "rest":
+        return connect_rest(router)
+    return connect_binary(router)
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _evict_expired(now):
+    """Pop idle sessions older than IDLE_TIMEOUT (caller holds _lock)."""
+    expired = []
+    for key in list(_idle):
+        fresh = []
+        for entry in _idle[key]:
+            (fresh if now - entry[1] < IDLE_TIMEOUT else expired).append(entry)
+        if fresh:
+            _idle[key] = fresh
+        else:
+            del _idle[key]
+    return [conn for conn, _ in expired]
+
+
+def _checkout(router):
+    now = time.monotonic()
+    with _lock:
+        expired = _evict_expired(now)
+        entries = _idle.get(_pool_key(router))
+        conn = entries.pop()[0] if entries else None
+    for stale in expired:
+        _close(stale)
+    return conn
+
+
+def _checkin(router, conn):
+    key = _pool_key(router)
+    with _lock:
+        entries = _idle.setdefault(key, [])
+        if len(entries) < MAX_IDLE_PER_ROUTER:
+            entries.append((conn, time.monotonic()))
+            return
+    _close(conn)
+
+
+@contextmanager
+def session(router):
+    """Borrow a pooled (or new) session for `router`; returned on clean exit."""
+    conn = _checkout(router) or _open(router)
+    try:
+        yield conn
+    except TrapError:
+        # Command-level error — the session itself is still in sync
+        _checkin(router, conn)
+        raise
+    except BaseException:
+        _close(conn)
+        raise
+    _checkin(router, conn)
+
+
+def call(router, fn):
+    """
+    Run fn(conn) on a pooled session. A pooled binary socket may have been
+    dropped by the router while idle, so a connection-level failure on a
+    reused session is retried once on a fresh one.
+    """
+    conn = _checkout(router)
+    if conn is not None:
+        try:
+            result = fn(conn)
+        except (OSError, ConnectionClosed, FatalError):
+            _close(conn)
+        except TrapError:
+            _checkin(router, conn)
+            raise
+        except BaseException:
+            _close(conn)
+            raise
+        else:
+            _checkin(router, conn)
+            return result
+
+    with session(router) as conn:
+        return fn(conn)
+
+
+def close_all():
+    """Close every idle session (tests, worker shutdown)."""
+    with _lock:
+        conns = [conn for entries in _idle.values() for conn, _ in entries]
+        _idle.clear()
+    for conn in conns:
+        _close(conn)
@@ -0,0 +1,302 @@
+"""
+mikrotik/tests.py
+Tests for pooled router sessions, pipelined hotspot user provisioning,
+the background provisioning queue and router telemetry.
+
+Run with:
+    python manage.py test mikrotik
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from mikrotik import api as mt
+from mikrotik import sessions
+from mikrotik.models import (
+    MikrotikVoucher, ProvisioningJob, RouterConnection, RouterSample, VoucherBatch, VoucherProfile,
+)
+from mikrotik.services import provisioning, telemetry
+from payments.tests.test_settlement import _make_vendor
+from vouchers.services.codegen import create_codes
+
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeProtocol:
+    """Answers tagged /ip/hotspot/user/add sentences like RouterOS does."""
+
+    def __init__(self, router_users, trap_names=()):
+        self.router_users = router_users
+        self.trap_names = set(trap_names)
+        self.replies = []
+        self.writes = 0
+
+    def writeSentence(self, cmd, *words):
+        self.writes += 1
+        attrs = dict(w[1:].split("=", 1) for w in words if w.startswith("="))
+        tag = next(w for w in words if w.startswith(".tag="))
+        if attrs["name"] in self.trap_names:
+            self.replies.append(("!trap", ("=message=failure: bad profile", tag)))
+        else:
+            self.router_users[attrs["name"]] = False
+        self.replies.append(("!done", ("=ret=*1", tag)))
+
+    def readSentence(self):
+        return self.replies.pop(0)
+
+
+class _FakeApi:
+
+    def __init__(self, router_users, trap_names=()):
+        self.protocol = _FakeProtocol(router_users, trap_names)
+        self.router_users = router_users
+        self.prints = 0
+        self.closed = False
+
+    def rawCmd(self, cmd, *words):
+        self.prints += 1
+        names = {w[len("?name="):] for w in words if w.startswith("?name=")}
+        return [{"name": n, "disabled": d} for n, d in self.router_users.items() if n in names]
+
+    def close(self):
+        self.closed = True
+
+
+def _make_batch(vendor, router=None, quantity=5):
+    router = router or RouterConnection.objects.create(vendor=vendor, name="Main", host="10.0.0.1", port=8728)
+    profile = VoucherProfile.objects.create(vendor=vendor, router=router, name="1h", validity_hours=1)
+    batch = VoucherBatch.objects.create(vendor=vendor, router=router, profile=profile, quantity=quantity)
+    create_codes(MikrotikVoucher, batch, quantity)
+    return batch
+
+
+def _all_ok(router, usernames, *args):
+    return {name: (True, None) for name in usernames}
+
+
+def _router(pk=1):
+    return SimpleNamespace(
+        pk=pk, api_mode="binary", host="10.0.0.1", port=8728,
+        api_username="admin", api_password="x",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestPipelinedProvisioning(SimpleTestCase):
+
+    def setUp(self):
+        sessions.close_all()
+        self.addCleanup(sessions.close_all)
+
+    def test_batch_add_uses_one_connection_and_one_print(self):
+        router_users = {}
+        fake = _FakeApi(router_users, trap_names={"c3"})
+        codes = [f"c{i}" for i in range(250)]
+
+        with patch.object(sessions, "connect_binary", return_value=fake) as connect:
+            results = mt.add_hotspot_users(_router(), codes, "1h", "01:00:00")
+
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(fake.protocol.writes, 250)
+        self.assertEqual(fake.prints, 2)   # VERIFY_CHUNK = 200
+        self.assertEqual(results["c3"], (False, "MikroTik error: failure: bad profile"))
+        self.assertEqual(sum(ok for ok, _ in results.values()), 249)
+
+    def test_session_reused_between_calls(self):
+        fake = _FakeApi({})
+        with patch.object(sessions, "connect_binary", return_value=fake) as connect:
+            mt.add_hotspot_user(_router(), "a1", "1h", "01:00:00")
+            mt.verify_hotspot_user(_router(), "a1")
+        self.assertEqual(connect.call_count, 1)
+        self.assertFalse(fake.closed)
+
+    def test_dropped_pooled_socket_retried_on_fresh_one(self):
+        dead, fresh = _FakeApi({}), _FakeApi({"a1": False})
+        dead.rawCmd = lambda *a: (_ for _ in ()).throw(ConnectionResetError())
+        with patch.object(sessions, "connect_binary", side_effect=[dead, fresh]):
+            with sessions.session(_router()):
+                pass
+            self.assertEqual(mt.verify_hotspot_user(_router(), "a1"), (True, None))
+        self.assertTrue(dead.closed)
+
+    def test_idle_sessions_evicted(self):
+        fake = _FakeApi({})
+        with patch.object(sessions, "connect_binary", return_value=fake):
+            with sessions.session(_router()):
+                pass
+        with patch.object(sessions.time, "monotonic", return_value=10**9):
+            self.assertIsNone(sessions._checkout(_router()))
+        self.assertTrue(fake.closed)
+
+    def test_rest_session_calls_default_to_a_timeout(self):
+        conn = sessions.connect_rest(SimpleNamespace(api_username="admin", api_password="x"))
+        with patch("requests.Session.request") as request:
+            conn.get("http://10.0.0.1/rest/system/identity")
+            conn.get("http://10.0.0.1/rest/system/resource", timeout=2)
+        self.assertEqual(
+            [call.kwargs["timeout"] for call in request.call_args_list], [sessions.REST_TIMEOUT, 2],
+        )
+
+    def test_disabled_user_reported(self):
+        fake = _FakeApi({"a1": True})
+        with patch.object(sessions, "connect_binary", return_value=fake):
+            self.assertEqual(
+                mt.verify_hotspot_user(_router(), "a1"),
+                (False, "User created but is disabled on router"),
+            )
+
+
+class TestProvisioningQueue(TestCase):
+
+    def setUp(self):
+        self.vendor = _make_vendor()
+        self.batch = _make_batch(self.vendor)
+
+    def test_job_pushes_batch_and_bulk_updates(self):
+        job = provisioning.enqueue(self.batch)
+        self.assertEqual(job.total, 5)
+        self.assertEqual(provisioning.enqueue(self.batch).pk, job.pk)
+
+        claimed = provisioning.claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        with patch.object(mt, "ping", return_value=(True, None)), \
+                patch.object(mt, "add_hotspot_users", side_effect=_all_ok) as add:
+            self.assertEqual(provisioning.run_job(claimed), ProvisioningJob.STATUS_DONE)
+
+        self.assertEqual(add.call_count, 1)
+        job.refresh_from_db()
+        self.assertEqual((job.pushed_count, job.failed_count), (5, 0))
+        self.assertFalse(self.batch.vouchers.filter(pushed_to_router=False).exists())
+
+    def test_unreachable_router_backs_off(self):
+        provisioning.enqueue(self.batch)
+        job = provisioning.claim_next_job()
+        with patch.object(mt, "ping", return_value=(False, "timed out")), \
+                patch.object(mt, "add_hotspot_users") as add:
+            self.assertEqual(provisioning.run_job(job), ProvisioningJob.STATUS_PENDING)
+
+        add.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertIsNone(provisioning.claim_next_job())
+
+        # Vendor retry makes it due again
+        provisioning.enqueue(self.batch)
+        self.assertEqual(provisioning.claim_next_job().pk, job.pk)
+
+    def test_one_job_per_router_at_a_time(self):
+        second = _make_batch(self.vendor, router=self.batch.router)
+        other_router = _make_batch(_make_vendor(username="vendor2"))
+        for batch in (self.batch, second, other_router):
+            provisioning.enqueue(batch)
+
+        first = provisioning.claim_next_job()
+        nxt = provisioning.claim_next_job()
+        self.assertNotEqual(first.router_id, nxt.router_id)
+        self.assertIsNone(provisioning.claim_next_job())
+
+    def test_partial_failures_recorded_per_voucher(self):
+        provisioning.enqueue(self.batch)
+        job = provisioning.claim_next_job()
+        bad = self.batch.vouchers.order_by("id").first().code
+
+        def _some_fail(router, usernames, *args):
+            return {n: (False, "MikroTik error: bad") if n == bad else (True, None) for n in usernames}
+
+        with patch.object(mt, "ping", return_value=(True, None)), \
+                patch.object(mt, "add_hotspot_users", side_effect=_some_fail):
+            provisioning.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.pushed_count, job.failed_count), ("DONE", 4, 1))
+        self.assertEqual(self.batch.failed_count, 1)
+        self.assertEqual(MikrotikVoucher.objects.get(code=bad).push_error, "MikroTik error: bad")
+
+
+@override_settings(CACHES=LOCMEM)
+class TestRouterTelemetry(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        vendor = _make_vendor()
+        self.up = RouterConnection.objects.create(vendor=vendor, name="Up", host="10.0.0.1", port=8728)
+        self.down = RouterConnection.objects.create(vendor=vendor, name="Down", host="10.0.0.2", port=8728)
+
+    def _poll(self):
+        def ping(router):
+            return (True, None) if router.pk == self.up.pk else (False, "timed out")
+
+        with patch.object(mt, "ping", side_effect=ping), \
+                patch.object(mt, "get_active_sessions", return_value=([{"user": "abc"}, {"user": "def"}], None)), \
+                patch.object(mt, "get_resources", return_value=(
+                    {"cpu-load": 7, "free-memory": 1000, "total-memory": 4000, "uptime": "1d2h3m4s"}, None)):
+            return telemetry.poll_all([self.up, self.down], workers=2)
+
+    def test_poll_records_samples_and_snapshots(self):
+        telemetry.record(self._poll())
+
+        up = RouterSample.objects.get(router=self.up)
+        self.assertEqual((up.up_samples, up.active_sessions, up.cpu_load), (1, 2, 7))
+        self.assertEqual(up.uptime_seconds, 86400 + 2 * 3600 + 3 * 60 + 4)
+        self.assertEqual(RouterSample.objects.get(router=self.down).error, "timed out")
+
+        self.up.refresh_from_db()
+        self.down.refresh_from_db()
+        self.assertIsNotNone(self.up.last_seen)
+        self.assertIsNone(self.down.last_seen)
+
+        snaps = telemetry.snapshots([self.up, self.down])
+        self.assertEqual([s["user"] for s in snaps[self.up.pk]["sessions"]], ["abc", "def"])
+        self.assertFalse(snaps[self.down.pk]["reachable"])
+
+    def test_failed_session_fetch_shown_as_error(self):
+        with patch.object(mt, "ping", return_value=(True, None)), \
+                patch.object(mt, "get_active_sessions", return_value=([], "trap: not permitted")), \
+                patch.object(mt, "get_resources", return_value=({}, None)):
+            telemetry.record([telemetry.poll(self.up)])
+        self.assertIsNone(telemetry.snapshot(self.up)["sessions"])
+
+        vendor = self.up.vendor
+        vendor.status = "ACTIVE"
+        vendor.save()
+        self.client.force_login(vendor.user)
+        with patch.object(mt, "get_active_sessions") as live, \
+                patch("mikrotik.views.render", return_value=HttpResponse()) as render:
+            self.client.get(f"/mikrotik/sessions/{self.up.pk}/")
+        live.assert_not_called()
+        context = render.call_args.args[2]
+        self.assertEqual((context["sessions"], context["error"]), ([], "trap: not permitted"))
+
+    def test_rollup_and_retention(self):
+        now = timezone.now().replace(minute=30, second=0, microsecond=0)
+        hour = now.replace(minute=0) - timedelta(hours=1)
+        for minute, up in ((0, 1), (20, 1), (40, 0)):
+            RouterSample.objects.create(
+                router=self.up, sampled_at=hour + timedelta(minutes=minute),
+                up_samples=up, latency_ms=10 * (minute + 10), active_sessions=minute,
+            )
+        old = RouterSample.objects.create(router=self.up, sampled_at=now - timedelta(days=3), up_samples=1)
+
+        self.assertEqual(telemetry.rollup(now), 1)
+        self.assertEqual(telemetry.rollup(now), 0)   # already rolled up
+        hourly = RouterSample.objects.get(period=RouterSample.PERIOD_HOUR)
+        self.assertEqual((hourly.sampled_at, hourly.samples, hourly.up_samples), (hour, 3, 2))
+        self.assertEqual((hourly.latency_ms, hourly.active_sessions), (300, 40))
+
+        self.assertEqual(telemetry.prune(now), (1, 0))
+        self.assertFalse(RouterSample.objects.filter(pk=old.pk).exists())
@@ -17,5 +17,6 @@ urlpatterns = [
     path("batches/", views.batch_list, name="batch_list"),
     path("batches/<uuid:uuid>/print/", views.batch_print, name="batch_print"),
     path("batches/<uuid:uuid>/retry/", views.batch_retry, name="batch_retry"),
+    path("batches/<uuid:uuid>/progress/", views.batch_progress, name="batch_progress"),
     path("sessions/<int:router_pk>/", views.sessions, name="sessions"),
 ]
@@ -1,14 +1,15 @@
-import random
-import string
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Prefetch
 from django.http import JsonResponse
 from django.utils import timezone
 
 from accounts.models import Vendor
-from .models import RouterConnection, VoucherProfile, VoucherBatch, MikrotikVoucher
+from .models import RouterConnection, VoucherProfile, VoucherBatch, MikrotikVoucher, ProvisioningJob
 from . import api as mt
+from .services import provisioning, telemetry
+from vouchers.services.codegen import create_codes
 
 
 def _get_vendor(request):
@@ -31,10 +32,6 @@ def _vendor_required(view_func):
     return wrapper
 
 
-def _generate_code(length=8):
-    return "".join(random.choices(string.ascii_lowercase + string.digits, k=length))
-
-
 # ─── Dashboard ───────────────────────────────────────────────────────────────
 
 @login_required
@@ -58,7 +55,10 @@ def dashboard(request):
 @_vendor_required
 def router_list(request):
     vendor = _get_vendor(request)
-    routers = RouterConnection.objects.filter(vendor=vendor).select_related("location")
+    routers = list(RouterConnection.objects.filter(vendor=vendor).select_related("location"))
+    snaps = telemetry.snapshots(routers)
+    for router in routers:
+        router.telemetry = snaps.get(router.pk)
     return render(request, "mikrotik/router_list.html", {"vendor": vendor, "routers": routers})
 
 
@@ -206,39 +206,11 @@ def generate(request):
         batch = VoucherBatch.objects.create(
             vendor=vendor, router=router, profile=profile, quantity=quantity
         )
+        create_codes(MikrotikVoucher, batch, quantity)
 
-        # Build limit-uptime string e.g. "24:00:00"
-        h = profile.validity_hours
-        limit_uptime = f"{h:02d}:00:00"
-        limit_bytes = (profile.data_limit_mb * 1024 * 1024) if profile.data_limit_mb else None
-
-        pushed, failed = 0, 0
-        for _ in range(quantity):
-            # ensure unique code
-            for attempt in range(10):
-                code = _generate_code()
-                if not MikrotikVoucher.objects.filter(code=code).exists():
-                    break
-
-            ok, err = mt.add_hotspot_user(router, code, profile.name, limit_uptime, limit_bytes, profile.shared_users)
-            MikrotikVoucher.objects.create(
-                batch=batch, code=code,
-                pushed_to_router=ok,
-                push_error="" if ok else (err or ""),
-            )
-            if ok:
-                pushed += 1
-            else:
-                failed += 1
-
-        if failed == 0:
-            messages.success(request, f"{pushed} vouchers generated and pushed to router.")
-        else:
-            messages.warning(
-                request,
-                f"{pushed} pushed successfully, {failed} failed (router unreachable or error). "
-                "Vouchers saved — you can retry push later."
-            )
+        # Pushed to the router by run_provisioning_worker
+        provisioning.enqueue(batch)
+        messages.success(request, f"{quantity} vouchers generated — pushing to router in the background.")
         return redirect("mikrotik:batch_list")
 
     return render(request, "mikrotik/generate.html", {"vendor": vendor, "profiles": profiles})
@@ -249,46 +221,46 @@ def generate(request):
 @login_required
 @_vendor_required
 def batch_retry(request, uuid):
-    """Re-push all failed vouchers in a batch to the router."""
+    """Queue the batch's unpushed vouchers for another push to the router."""
     vendor = _get_vendor(request)
     batch = get_object_or_404(VoucherBatch, uuid=uuid, vendor=vendor)
-    failed_vouchers = batch.vouchers.filter(pushed_to_router=False)
 
-    if not failed_vouchers.exists():
+    if not batch.vouchers.filter(pushed_to_router=False).exists():
         messages.info(request, "No failed vouchers in this batch.")
         return redirect("mikrotik:batch_list")
 
-    profile = batch.profile
-    router = batch.router
-    h = profile.validity_hours
-    limit_uptime = f"{h:02d}:00:00"
-    limit_bytes = (profile.data_limit_mb * 1024 * 1024) if profile.data_limit_mb else None
-
-    pushed, still_failed = 0, 0
-    for v in failed_vouchers:
-        ok, err = mt.add_hotspot_user(router, v.code, profile.name, limit_uptime, limit_bytes, profile.shared_users)
-        v.pushed_to_router = ok
-        v.push_error = "" if ok else (err or "")
-        v.save(update_fields=["pushed_to_router", "push_error"])
-        if ok:
-            pushed += 1
-        else:
-            still_failed += 1
-
-    if still_failed == 0:
-        messages.success(request, f"All {pushed} vouchers pushed successfully.")
-    else:
-        messages.warning(request, f"{pushed} pushed, {still_failed} still failing: check router connection.")
+    provisioning.enqueue(batch)
+    messages.success(request, "Retry queued — vouchers are being pushed to the router.")
     return redirect("mikrotik:batch_list")
 
 
+@login_required
+@_vendor_required
+def batch_progress(request, uuid):
+    """Push progress of a batch's latest provisioning job (polled by batch_list)."""
+    vendor = _get_vendor(request)
+    batch = get_object_or_404(VoucherBatch, uuid=uuid, vendor=vendor)
+    job = batch.provisioning_jobs.first()
+    if job is None:
+        return JsonResponse({"status": None, "done": True})
+    return JsonResponse(provisioning.job_progress(job))
+
+
 # ─── Batches & Print ─────────────────────────────────────────────────────────
 
 @login_required
 @_vendor_required
 def batch_list(request):
     vendor = _get_vendor(request)
-    batches = VoucherBatch.objects.filter(vendor=vendor).select_related("profile", "router")
+    batches = (
+        VoucherBatch.objects.filter(vendor=vendor)
+        .select_related("profile", "router")
+        .prefetch_related(Prefetch(
+            "provisioning_jobs",
+            queryset=ProvisioningJob.objects.filter(status__in=ProvisioningJob.ACTIVE_STATUSES),
+            to_attr="active_jobs",
+        ))
+    )
     return render(request, "mikrotik/batch_list.html", {"vendor": vendor, "batches": batches})
 
 
@@ -311,10 +283,19 @@ def batch_print(request, uuid):
 def sessions(request, router_pk):
     vendor = _get_vendor(request)
     router = get_object_or_404(RouterConnection, pk=router_pk, vendor=vendor)
-    active, err = mt.get_active_sessions(router)
+    # Collected by run_router_telemetry — only dial the router if it has no recent snapshot
+    snap = telemetry.snapshot(router)
+    if snap is None:
+        active, err = mt.get_active_sessions(router)
+    elif snap["sessions"] is None:
+        # Unreachable, or reachable but the session list failed
+        active, err = [], snap["error"] or "Could not read active sessions"
+    else:
+        active, err = snap["sessions"], None
     return render(request, "mikrotik/sessions.html", {
         "vendor": vendor,
         "router": router,
         "sessions": active,
         "error": err,
+        "snapshot": snap,
     })
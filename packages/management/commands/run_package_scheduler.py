@@ -0,0 +1,86 @@
+"""
+management/commands/run_package_scheduler.py
+============================================
+Long-running daemon that bumps a location's portal_data cache version
+the moment one of its scheduled packages appears or disappears (window
+start / end, see packages/services/schedule.py), so portals switch on
+time instead of up to one cache lifetime late.
+
+Sleeps until the next boundary, re-scanning at least every --max-sleep
+seconds to pick up edited schedules. Run as its own container (see
+docker-compose.yml); a single instance is enough. Use --once to bump
+everything due since --since seconds ago and exit.
+"""
+
+import logging
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from Billing import dbconn
+from packages.services import schedule
+from portal_api.services import portal_data
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Invalidate portal caches at package schedule window boundaries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-sleep", type=float, default=60.0,
+                            help="Longest sleep between scans (default 60)")
+        parser.add_argument("--since", type=float, default=60.0,
+                            help="With --once: seconds to look back (default 60)")
+        parser.add_argument("--once", action="store_true",
+                            help="Bump locations due in the last --since seconds and exit")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        last = timezone.now()
+
+        if options["once"]:
+            self._bump(last - timedelta(seconds=options["since"]), last)
+            return
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self.stdout.write("Package scheduler started")
+
+        while not self._stopping:
+            close_old_connections()
+            dbconn.note_unit()
+            sleep = options["max_sleep"]
+            try:
+                now = timezone.now()
+                self._bump(last, now)
+                last = now
+
+                boundary = schedule.next_boundary(schedule.scheduled_packages(), now)
+                if boundary:
+                    sleep = min(sleep, max(0.0, (boundary - timezone.now()).total_seconds()))
+            except Exception as exc:
+                logger.error("Package scheduler loop error: %s", exc)
+
+            self._sleep(sleep)
+
+        self.stdout.write("Package scheduler stopped")
+
+    def _bump(self, since, until):
+        location_ids = schedule.due_locations(since, until)
+        if location_ids:
+            portal_data.bump_locations(location_ids)
+            self.stdout.write(f"  🔄 Schedule change at {len(location_ids)} location(s)")
+
+    def _sleep(self, seconds):
+        # Short steps so SIGTERM is honoured promptly
+        deadline = time.monotonic() + seconds
+        while not self._stopping and time.monotonic() < deadline:
+            time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
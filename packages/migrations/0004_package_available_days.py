@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+
+def fill_available_days(apps, schema_editor):
+    from packages.models import ALL_DAYS, days_mask
+
+    Package = apps.get_model('packages', 'Package')
+    for package in Package.objects.exclude(schedule_type='ALWAYS').only('schedule_type', 'scheduled_days'):
+        mask = days_mask(package.scheduled_days) if package.schedule_type == 'WEEKDAYS' else 0
+        if mask != ALL_DAYS:
+            Package.objects.filter(pk=package.pk).update(available_days=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0003_package_schedule_type_package_scheduled_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='available_days',
+            field=models.PositiveSmallIntegerField(default=127, editable=False),
+        ),
+        migrations.RunPython(fill_available_days, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,44 @@ from django.db import models
 from django.utils import timezone
 from hotspot.models import HotspotLocation
 
+# Package.available_days: bit n set = available on weekday n (0=Mon … 6=Sun)
+ALL_DAYS = 0b1111111
+
+
+def days_mask(scheduled_days):
+    """'4,5' → bitmask of Friday + Saturday."""
+    mask = 0
+    for day in (scheduled_days or '').split(','):
+        day = day.strip()
+        if day.isdigit() and int(day) < 7:
+            mask |= 1 << int(day)
+    return mask
+
+
+class PackageQuerySet(models.QuerySet):
+
+    def available_now(self, now=None):
+        """
+        SQL version of Package.is_available_now(): active packages whose
+        schedule (weekday bitmask / date + optional time window) covers `now`.
+        """
+        now = timezone.localtime(now or timezone.now())
+        current_time = now.time()
+
+        in_window = (
+            (models.Q(scheduled_start__isnull=True) | models.Q(scheduled_start__lte=current_time))
+            & (models.Q(scheduled_end__isnull=True) | models.Q(scheduled_end__gte=current_time))
+        )
+        return (
+            self.filter(is_active=True)
+            .annotate(_today_bit=models.F('available_days').bitand(1 << now.weekday()))
+            .filter(
+                models.Q(schedule_type='ALWAYS')
+                | (models.Q(schedule_type='WEEKDAYS', _today_bit__gt=0) & in_window)
+                | (models.Q(schedule_type='DATE', scheduled_date=now.date()) & in_window)
+            )
+        )
+
 
 class Package(models.Model):
 
@@ -47,23 +85,41 @@ class Package(models.Model):
     # Optional time window within the day
     scheduled_start = models.TimeField(null=True, blank=True)
     scheduled_end = models.TimeField(null=True, blank=True)
+    # Weekday bitmask derived from schedule_type / scheduled_days on save()
+    available_days = models.PositiveSmallIntegerField(default=ALL_DAYS, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = PackageQuerySet.as_manager()
+
     class Meta:
         ordering = ['price']
 
     def __str__(self):
         return f"{self.name} - {self.location.site_name}"
 
-    def is_available_now(self):
+    def save(self, *args, **kwargs):
+        self.available_days = self.compute_available_days()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'available_days' not in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'available_days'}
+        super().save(*args, **kwargs)
+
+    def compute_available_days(self):
+        if self.schedule_type == 'ALWAYS':
+            return ALL_DAYS
+        if self.schedule_type == 'WEEKDAYS':
+            return days_mask(self.scheduled_days)
+        return 0
+
+    def is_available_now(self, now=None):
         """Returns True if this package should be shown right now."""
         if not self.is_active:
             return False
         if self.schedule_type == 'ALWAYS':
             return True
 
-        now = timezone.localtime(timezone.now())
+        now = timezone.localtime(now or timezone.now())
         today = now.date()
         current_time = now.time()
 
@@ -72,8 +128,7 @@ class Package(models.Model):
                 return False
 
         elif self.schedule_type == 'WEEKDAYS':
-            allowed = [d.strip() for d in (self.scheduled_days or '').split(',') if d.strip()]
-            if str(today.weekday()) not in allowed:
+            if not self.available_days & (1 << today.weekday()):
                 return False
 
         # Optional time window check (applies to both WEEKDAYS and DATE)
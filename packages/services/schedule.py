@@ -0,0 +1,89 @@
+"""
+packages/services/schedule.py
+=============================
+Window boundaries for scheduled packages.
+
+A WEEKDAYS / DATE package is visible from scheduled_start (or midnight)
+to scheduled_end (or the next midnight) on each day it covers. The
+moments it appears or disappears are its boundaries:
+
+  boundaries(package, since, until) → boundary datetimes in (since, until]
+  next_boundary(packages, now)      → earliest upcoming boundary
+  due_locations(since, until)       → location ids with a boundary in
+                                      (since, until] — run_package_scheduler
+                                      bumps their portal_data version then.
+
+portal_data also caps an entry's lifetime at next_boundary(), so a cached
+package list never outlives the window it was built in.
+"""
+
+from datetime import datetime, time as dtime, timedelta
+
+from django.utils import timezone
+
+from packages.models import Package
+
+# is_available_now() treats scheduled_end as inclusive
+END_GRACE = timedelta(seconds=1)
+LOOKAHEAD_DAYS = 8
+
+SCHEDULE_FIELDS = (
+    'id', 'location_id', 'is_active', 'schedule_type', 'available_days',
+    'scheduled_date', 'scheduled_start', 'scheduled_end',
+)
+
+
+def _covers(package, day):
+    if package.schedule_type == 'DATE':
+        return package.scheduled_date == day
+    return bool(package.available_days & (1 << day.weekday()))
+
+
+def _at(day, moment):
+    return timezone.make_aware(datetime.combine(day, moment))
+
+
+def boundaries(package, since, until):
+    """Start/end instants of the package's windows falling in (since, until]."""
+    if not package.is_active or package.schedule_type == 'ALWAYS':
+        return []
+
+    found = []
+    day = timezone.localtime(since).date()
+    last = timezone.localtime(until).date()
+    while day <= last:
+        if _covers(package, day):
+            start = _at(day, package.scheduled_start or dtime.min)
+            if package.scheduled_end:
+                end = _at(day, package.scheduled_end) + END_GRACE
+            else:
+                end = _at(day + timedelta(days=1), dtime.min)
+            found.extend(t for t in (start, end) if since < t <= until)
+        day += timedelta(days=1)
+    return found
+
+
+def next_boundary(packages, now=None):
+    """Earliest window start/end after `now` across `packages` (None if none)."""
+    now = now or timezone.now()
+    horizon = now + timedelta(days=LOOKAHEAD_DAYS)
+    upcoming = [t for package in packages for t in boundaries(package, now, horizon)]
+    return min(upcoming, default=None)
+
+
+def scheduled_packages():
+    return (
+        Package.objects
+        .filter(is_active=True)
+        .exclude(schedule_type='ALWAYS')
+        .only(*SCHEDULE_FIELDS)
+    )
+
+
+def due_locations(since, until):
+    """Location ids whose packages appear or disappear in (since, until]."""
+    return {
+        package.location_id
+        for package in scheduled_packages()
+        if boundaries(package, since, until)
+    }
@@ -1,3 +1,102 @@
+"""
+packages/tests.py
+Tests for the package availability index (weekday bitmask + SQL filter)
+and the schedule window boundaries used to invalidate portal caches.
+
+Run with:
+    python manage.py test packages
+"""
+
+from datetime import date, datetime, time, timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Vendor
+from django.contrib.auth.models import User
+from hotspot.models import HotspotLocation
+from packages.models import ALL_DAYS, Package, days_mask
+from packages.services import schedule
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+# Friday 2026-03-27
+FRIDAY = date(2026, 3, 27)
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+def _make_location():
+    user = User.objects.create_user(username="vendor1", password="x")
+    vendor = Vendor.objects.create(
+        user=user, company_name="Acme WiFi", contact_person="Jo",
+        business_address="Kampala", business_phone="256700000000",
+        business_email="acme@example.com",
+    )
+    return HotspotLocation.objects.create(
+        vendor=vendor, site_name="Cafe", address="Main St", town_city="Kampala",
+        status="ACTIVE", subscription_mode="PERCENTAGE",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestAvailabilityIndex(TestCase):
+
+    def setUp(self):
+        self.location = _make_location()
+        make = lambda name, **kw: Package.objects.create(location=self.location, name=name, price=1000, **kw)
+        self.always = make("Always")
+        self.weekend = make("Weekend", schedule_type="WEEKDAYS", scheduled_days="4,5")
+        self.friday_evening = make(
+            "Friday evening", schedule_type="WEEKDAYS", scheduled_days="4",
+            scheduled_start=time(18, 0), scheduled_end=time(22, 0),
+        )
+        self.holiday = make("Holiday", schedule_type="DATE", scheduled_date=FRIDAY + timedelta(days=3))
+        self.inactive = make("Off", is_active=False)
+
+    def test_bitmask_computed_on_save(self):
+        self.assertEqual(days_mask("4, 5,9,x"), 0b0110000)
+        self.assertEqual(self.always.available_days, ALL_DAYS)
+        self.assertEqual(self.weekend.available_days, 0b0110000)
+
+        self.weekend.scheduled_days = "0"
+        self.weekend.save(update_fields=["scheduled_days"])
+        self.weekend.refresh_from_db()
+        self.assertEqual(self.weekend.available_days, 0b0000001)
+
+    def test_sql_filter_matches_python_check(self):
+        moments = [
+            _at(FRIDAY, 9), _at(FRIDAY, 19), _at(FRIDAY, 23),
+            _at(FRIDAY + timedelta(days=1), 19), _at(FRIDAY + timedelta(days=2), 12),
+            _at(FRIDAY + timedelta(days=3), 12),
+        ]
+        packages = list(Package.objects.all())
+        for now in moments:
+            expected = {p.name for p in packages if p.is_available_now(now)}
+            actual = set(Package.objects.available_now(now).values_list("name", flat=True))
+            self.assertEqual(actual, expected, now)
+
+        self.assertEqual(
+            set(Package.objects.available_now(_at(FRIDAY, 19)).values_list("name", flat=True)),
+            {"Always", "Weekend", "Friday evening"},
+        )
+
+    def test_window_boundaries(self):
+        found = schedule.boundaries(self.friday_evening, _at(FRIDAY, 0), _at(FRIDAY, 23, 59))
+        self.assertEqual(found, [_at(FRIDAY, 18), _at(FRIDAY, 22) + timedelta(seconds=1)])
+        self.assertEqual(schedule.boundaries(self.always, _at(FRIDAY, 0), _at(FRIDAY, 23)), [])
+
+    def test_next_boundary_and_due_locations(self):
+        now = _at(FRIDAY, 17, 30)
+        self.assertEqual(schedule.next_boundary(schedule.scheduled_packages(), now), _at(FRIDAY, 18))
 
-# Create your tests here.
+        self.assertEqual(schedule.due_locations(now, _at(FRIDAY, 17, 59)), set())
+        self.assertEqual(schedule.due_locations(now, _at(FRIDAY, 18)), {self.location.id})
@@ -8,6 +8,10 @@ from .models import (
     Payment,
     PaymentSplit,
     PaymentVoucher,
+    SettlementJob,
+    FulfilmentWatermark,
+    PendingFulfilment,
+    WebhookInbox,
 )
 
 
@@ -225,3 +229,58 @@ class PaymentVoucherAdmin(admin.ModelAdmin):
         "voucher__code",  # assumes Voucher has code field
     )
     readonly_fields = ("issued_at",)
+
+
+@admin.register(SettlementJob)
+class SettlementJobAdmin(admin.ModelAdmin):
+    list_display = ("payment", "source", "status", "attempts", "next_attempt_at", "created_at", "completed_at")
+    list_filter = ("status", "source", "created_at")
+    search_fields = ("payment__uuid", "payment__provider_reference")
+    readonly_fields = ("created_at", "completed_at", "locked_at", "last_error")
+    actions = ["retry_now"]
+
+    def retry_now(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status=SettlementJob.STATUS_DONE).update(
+            status=SettlementJob.STATUS_PENDING,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} job(s) re-queued.")
+    retry_now.short_description = "Retry selected jobs now"
+
+
+@admin.register(FulfilmentWatermark)
+class FulfilmentWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("name", "last_completed_at", "last_payment_id", "recovered", "out_of_stock", "errored", "last_run_at")
+    readonly_fields = ("recovered", "out_of_stock", "errored", "last_run_at")
+
+
+@admin.register(PendingFulfilment)
+class PendingFulfilmentAdmin(admin.ModelAdmin):
+    list_display = ("payment", "reason", "attempts", "next_attempt_at", "created_at")
+    list_filter = ("reason", "created_at")
+    search_fields = ("payment__uuid", "payment__provider_reference")
+    readonly_fields = ("created_at", "last_error")
+    actions = ["retry_now"]
+
+    def retry_now(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.update(next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} payment(s) re-queued.")
+    retry_now.short_description = "Retry selected payments now"
+
+
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "source", "status", "outcome", "attempts", "payment", "received_at", "processed_at")
+    list_filter = ("source", "status", "outcome", "received_at")
+    search_fields = ("payment__uuid", "payment__provider_reference", "dedupe_hash")
+    readonly_fields = [f.name for f in WebhookInbox._meta.fields]
+    actions = ["replay"]
+
+    def replay(self, request, queryset):
+        from payments.services import webhook_inbox
+        results = webhook_inbox.replay(queryset)
+        summary = ", ".join(f"{outcome}={count}" for outcome, count in sorted(results.items()))
+        self.message_user(request, f"Replayed {sum(results.values())} webhook(s): {summary}")
+    replay.short_description = "Replay selected webhooks"
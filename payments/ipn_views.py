@@ -11,44 +11,56 @@ Both endpoints are registered in payments/urls.py:
   POST /payments/webhook/yoo/ipn/
   POST /payments/webhook/yoo/failure/
 
+Every webhook is first stored in the WebhookInbox
+(payments/services/webhook_inbox.py): an identical redelivery is answered
+straight away without touching Payment, and stored deliveries can be
+replayed with manage.py replay_webhooks. The _handle_* functions below
+do the actual processing for both paths and return (outcome, payment).
+
 Security note:
   These endpoints are public (no auth) because Yo! does not sign requests.
   We protect against replay by checking payment.status == "SUCCESS" before
   processing and using select_for_update() inside a transaction.
 """
 
+import json
 import logging
 
 from django.db import transaction
 from django.http import HttpResponse
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
-from datetime import timedelta
 from urllib.parse import parse_qs
 
-from payments.models import Payment
-from payments.services.payment_success import handle_payment_success
-from sms.services.sms_topup import credit_sms_wallet
-from sms.services.notifications import notify_vendor_payment_received, notify_vendor_receipt
+from payments.models import Payment, WebhookInbox
+from payments.services import references, webhook_inbox
+from payments.services.settlement import settle_success
 
 logger = logging.getLogger(__name__)
 
 
-def _parse_yoo_ipn(request) -> tuple:
+def _parse_yoo_ipn(raw: str) -> dict:
     """
     Parse the raw IPN body from Yo!.
     Yo! sends IPN as URL-encoded form data (not XML).
-    Returns (parsed_dict, raw_body_string).
     """
-    raw = request.body.decode("utf-8", errors="replace")
-    logger.warning("YOO IPN RAW: %.800s", raw)
-
-    # Yo! IPN is URL-encoded form data
     parsed = parse_qs(raw, keep_blank_values=True)
-    data = {k: v[0] for k, v in parsed.items()}
+    return {k: v[0] for k, v in parsed.items()}
+
+
+def _parse_json(raw: str):
+    """KwaPay / LivePay JSON body, or None if it isn't valid JSON."""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
 
-    return data, raw
+
+def _receive(source, request):
+    """Store the delivery and process it. Returns the outcome, or None for a duplicate."""
+    entry = webhook_inbox.receive(source, request)
+    if entry is None:
+        return None
+    return webhook_inbox.process(entry, *WEBHOOK_HANDLERS[source])
 
 
 def _extract_reference(data: dict, raw: str) -> str:
@@ -62,39 +74,8 @@ def _extract_reference(data: dict, raw: str) -> str:
 
 
 def _find_payment(reference: str):
-    """Look up Payment by UUID first, then by provider_reference.
-    Also tries stripping hyphens since we send UUID without hyphens to Yo!.
-    """
-    # Try exact UUID match (with hyphens, Django standard)
-    payment = (
-        Payment.objects.select_for_update().filter(uuid=reference).first()
-        or Payment.objects.select_for_update().filter(provider_reference=reference).first()
-    )
-    if payment:
-        return payment
-
-    # Try matching hyphen-stripped UUID (32 hex chars) back to a UUID
-    if len(reference) == 32 and reference.isalnum():
-        formatted = f"{reference[:8]}-{reference[8:12]}-{reference[12:16]}-{reference[16:20]}-{reference[20:]}"
-        return (
-            Payment.objects.select_for_update().filter(uuid=formatted).first()
-            or Payment.objects.select_for_update().filter(provider_reference=reference).first()
-        )
-
-    return None
-
-
-def _handle_subscription_renewal(payment):
-    """Extend or activate a monthly subscription by 30 days."""
-    location = payment.location
-    now = timezone.now()
-    if location.subscription_expires_at and location.subscription_expires_at > now:
-        location.subscription_expires_at += timedelta(days=30)
-    else:
-        location.subscription_expires_at = now + timedelta(days=30)
-    location.subscription_active = True
-    location.is_active = True
-    location.save(update_fields=["subscription_expires_at", "subscription_active", "is_active"])
+    """Locked Payment for a uuid (hyphenated or the hex we send Yo!) or provider_reference."""
+    return references.resolve(reference, for_update=True)
 
 
 # ---------------------------------------------------------------------------
@@ -107,16 +88,19 @@ def yoo_ipn(request):
     POST /payments/webhook/yoo/ipn/
 
     Yo! calls this URL (InstantNotificationUrl) when a deposit succeeds.
-    We mark the payment SUCCESS and trigger voucher issuance + SMS.
+    We mark the payment SUCCESS and enqueue voucher issuance + SMS.
     """
     if request.method != "POST":
         return HttpResponse("OK")
 
-    data, raw = _parse_yoo_ipn(request)
+    _receive(WebhookInbox.SOURCE_YOO_IPN, request)
+    return HttpResponse("OK")
 
+
+def _handle_yoo_ipn(data):
     # Yo! IPN form fields: amount, date_time, external_ref, msisdn, narrative, network_ref, signature
     # Presence of network_ref and msisdn means the transaction succeeded
-    reference = _extract_reference(data, raw)
+    reference = _extract_reference(data, None)
     is_success = bool(data.get("network_ref") and data.get("msisdn"))
 
     logger.warning(
@@ -126,52 +110,25 @@ def yoo_ipn(request):
 
     if not reference:
         logger.warning("YOO IPN: no reference found — ignoring")
-        return HttpResponse("OK")
+        return "no_reference", None
 
     if not is_success:
         logger.warning("YOO IPN: not a success notification — ignoring (use failure endpoint)")
-        return HttpResponse("OK")
-
-    payment_id = None
-    run_success_handler = False
+        return "ignored", None
 
     with transaction.atomic():
         payment = _find_payment(reference)
 
         if not payment:
             logger.warning("YOO IPN: no payment found for reference=%s", reference)
-            return HttpResponse("OK")
+            return "no_payment", None
 
         if payment.status == "SUCCESS":
-            return HttpResponse("OK")  # idempotent
-
-        payment.raw_callback_data = data
-        payment.mark_success(data)
-
-        if payment.purpose == "SUBSCRIPTION" and payment.location_id:
-            _handle_subscription_renewal(payment)
+            return "already_settled", payment  # idempotent
 
-        if payment.purpose == "SMS_PURCHASE" and payment.vendor_id:
-            try:
-                credit_sms_wallet(vendor=payment.vendor, amount_paid=int(payment.amount))
-            except Exception as exc:
-                payment.processor_message = f"SMS credit warning: {exc}"
-                payment.save(update_fields=["processor_message"])
+        settle_success(payment, data, source="YOO_IPN")
 
-        if payment.vendor_id:
-            if payment.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
-                notify_vendor_receipt(payment)
-            else:
-                notify_vendor_payment_received(payment)
-
-        payment_id = payment.id
-        run_success_handler = True
-
-    if run_success_handler and payment_id:
-        payment = Payment.objects.get(id=payment_id)
-        handle_payment_success(payment)
-
-    return HttpResponse("OK")
+    return "settled", payment
 
 
 # ---------------------------------------------------------------------------
@@ -184,14 +141,15 @@ def kwa_ipn(request):
     POST /payments/webhook/kwa/ipn/
     KwaPay POSTs JSON to this URL when a transaction settles.
     """
-    import json as _json
-
     if request.method != "POST":
         return HttpResponse("OK")
 
-    try:
-        data = _json.loads(request.body.decode("utf-8", errors="replace"))
-    except Exception:
+    _receive(WebhookInbox.SOURCE_KWA_IPN, request)
+    return HttpResponse("OK")
+
+
+def _handle_kwa_ipn(data):
+    if not isinstance(data, dict):
         data = {}
 
     logger.warning("KWA IPN: %s", data)
@@ -203,58 +161,31 @@ def kwa_ipn(request):
 
     if not reference:
         logger.warning("KWA IPN: no internal_reference — ignoring")
-        return HttpResponse("OK")
-
-    payment_id = None
-    run_success_handler = False
+        return "no_reference", None
 
     with transaction.atomic():
-        payment = (
-            Payment.objects.select_for_update().filter(provider_reference=reference).first()
-            or Payment.objects.select_for_update().filter(uuid=reference).first()
-        )
+        payment = references.resolve(reference, for_update=True)
 
         if not payment:
             logger.warning("KWA IPN: no payment found for reference=%s", reference)
-            return HttpResponse("OK")
+            return "no_payment", None
 
         if payment.status == "SUCCESS":
-            return HttpResponse("OK")  # idempotent
+            return "already_settled", payment  # idempotent
 
         payment.raw_callback_data = data
 
         if is_success:
-            payment.mark_success(data)
-
-            if payment.purpose == "SUBSCRIPTION" and payment.location_id:
-                _handle_subscription_renewal(payment)
-
-            if payment.purpose == "SMS_PURCHASE" and payment.vendor_id:
-                try:
-                    credit_sms_wallet(vendor=payment.vendor, amount_paid=int(payment.amount))
-                except Exception as exc:
-                    payment.processor_message = f"SMS credit warning: {exc}"
-                    payment.save(update_fields=["processor_message"])
-
-            if payment.vendor_id:
-                if payment.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
-                    notify_vendor_receipt(payment)
-                else:
-                    notify_vendor_payment_received(payment)
-
-            payment_id = payment.id
-            run_success_handler = True
+            settle_success(payment, data, source="KWA_IPN")
+            return "settled", payment
 
         elif is_failed:
             payment.mark_failed(data)
+            return "failed", payment
         else:
             payment.save(update_fields=["raw_callback_data"])
 
-    if run_success_handler and payment_id:
-        payment = Payment.objects.get(id=payment_id)
-        handle_payment_success(payment)
-
-    return HttpResponse("OK")
+    return "callback_saved", payment
 
 @csrf_exempt
 def kwa_verify(request, reference):
@@ -267,10 +198,7 @@ def kwa_verify(request, reference):
     from payments.models import PaymentProvider
     from payments.kwa_client import KwaPayClient
 
-    payment = (
-        Payment.objects.filter(provider_reference=reference).first()
-        or Payment.objects.filter(uuid=reference).first()
-    )
+    payment = references.resolve(reference)
 
     if not payment:
         return HttpResponse("Payment not found", status=404)
@@ -294,9 +222,6 @@ def kwa_verify(request, reference):
     is_success = status == "SUCCESSFUL"
     is_failed = status == "FAILED"
 
-    payment_id = None
-    run_success_handler = False
-
     with transaction.atomic():
         payment = Payment.objects.select_for_update().filter(
             provider_reference=payment.provider_reference
@@ -308,36 +233,13 @@ def kwa_verify(request, reference):
         payment.raw_callback_data = result
 
         if is_success:
-            payment.mark_success(result)
-
-            if payment.purpose == "SUBSCRIPTION" and payment.location_id:
-                _handle_subscription_renewal(payment)
-
-            if payment.purpose == "SMS_PURCHASE" and payment.vendor_id:
-                try:
-                    credit_sms_wallet(vendor=payment.vendor, amount_paid=int(payment.amount))
-                except Exception as exc:
-                    payment.processor_message = f"SMS credit warning: {exc}"
-                    payment.save(update_fields=["processor_message"])
-
-            if payment.vendor_id:
-                if payment.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
-                    notify_vendor_receipt(payment)
-                else:
-                    notify_vendor_payment_received(payment)
-
-            payment_id = payment.id
-            run_success_handler = True
+            settle_success(payment, result, source="KWA_VERIFY")
 
         elif is_failed:
             payment.mark_failed(result)
         else:
             payment.save(update_fields=["raw_callback_data"])
 
-    if run_success_handler and payment_id:
-        payment = Payment.objects.get(id=payment_id)
-        handle_payment_success(payment)
-
     return HttpResponse(f"status={status}", status=200)
 
 
@@ -352,15 +254,8 @@ def live_verify(request, reference):
     from payments.models import PaymentProvider
     from payments.live_client import LivePayClient
 
-    payment = (
-        Payment.objects.filter(provider_reference=reference).first()
-        or Payment.objects.filter(uuid=reference).first()
-    )
-    
-    # Try UUID without hyphens format
-    if not payment and len(reference) == 32 and reference.isalnum():
-        formatted_uuid = f"{reference[:8]}-{reference[8:12]}-{reference[12:16]}-{reference[16:20]}-{reference[20:]}"
-        payment = Payment.objects.filter(uuid=formatted_uuid).first()
+    # provider_reference, uuid, or the hex / 30-char reference we sent LivePay
+    payment = references.resolve(reference)
 
     if not payment:
         return HttpResponse("Payment not found", status=404)
@@ -389,9 +284,6 @@ def live_verify(request, reference):
     is_success = status == "success"
     is_failed = status == "failed"
 
-    payment_id = None
-    run_success_handler = False
-
     with transaction.atomic():
         payment = Payment.objects.select_for_update().filter(
             uuid=payment.uuid
@@ -403,36 +295,13 @@ def live_verify(request, reference):
         payment.raw_callback_data = result
 
         if is_success:
-            payment.mark_success(result)
-
-            if payment.purpose == "SUBSCRIPTION" and payment.location_id:
-                _handle_subscription_renewal(payment)
-
-            if payment.purpose == "SMS_PURCHASE" and payment.vendor_id:
-                try:
-                    credit_sms_wallet(vendor=payment.vendor, amount_paid=int(payment.amount))
-                except Exception as exc:
-                    payment.processor_message = f"SMS credit warning: {exc}"
-                    payment.save(update_fields=["processor_message"])
-
-            if payment.vendor_id:
-                if payment.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
-                    notify_vendor_receipt(payment)
-                else:
-                    notify_vendor_payment_received(payment)
-
-            payment_id = payment.id
-            run_success_handler = True
+            settle_success(payment, result, source="LIVE_VERIFY")
 
         elif is_failed:
             payment.mark_failed(result)
         else:
             payment.save(update_fields=["raw_callback_data"])
 
-    if run_success_handler and payment_id:
-        payment = Payment.objects.get(id=payment_id)
-        handle_payment_success(payment)
-
     return HttpResponse(f"status={status}", status=200)
 
 
@@ -446,26 +315,28 @@ def live_ipn(request):
     POST /payments/webhook/live/ipn/
     LivePay POSTs JSON to this URL when a transaction settles.
     """
-    import json as _json
-    from payments.models import PaymentProvider
-
     if request.method != "POST":
         return HttpResponse("OK")
 
-    logger.warning("LIVEPAY IPN RAW BODY: %.800s", request.body.decode('utf-8', errors='replace'))
-    logger.warning("LIVEPAY IPN HEADERS: X-Webhook-Signature=%s", request.headers.get('X-Webhook-Signature', 'MISSING'))
+    # Raw body and headers (X-Webhook-Signature) are kept in the WebhookInbox
+    if _receive(WebhookInbox.SOURCE_LIVE_IPN, request) == "invalid_json":
+        return HttpResponse("Invalid JSON", status=400)
 
-    try:
-        data = _json.loads(request.body.decode("utf-8", errors="replace"))
-    except Exception:
+    return HttpResponse(
+        json.dumps({"status": "received", "message": "Webhook processed successfully"}),
+        content_type="application/json"
+    )
+
+
+def _handle_live_ipn(data):
+    if not isinstance(data, dict):
         logger.error("LIVEPAY IPN: Invalid JSON payload")
-        return HttpResponse("Invalid JSON", status=400)
+        return "invalid_json", None
 
     logger.warning("LIVEPAY IPN: %s", data)
 
     # Signature verification skipped — LivePay's documented format does not match actual signatures
     # Contacted LivePay to confirm correct signing format
-    provider = PaymentProvider.objects.filter(provider_type="LIVE", is_active=True).first()
 
     # Extract transaction details
     customer_reference = data.get("customer_reference", "")
@@ -480,83 +351,38 @@ def live_ipn(request):
     reference = customer_reference or internal_reference
     if not reference:
         logger.warning("LIVEPAY IPN: no reference found — ignoring")
-        return HttpResponse("OK")
-
-    payment_id = None
-    run_success_handler = False
+        return "no_reference", None
 
     with transaction.atomic():
-        # First try to find by provider_reference (internal_reference)
-        payment = Payment.objects.select_for_update().filter(provider_reference=internal_reference).first()
-        
-        # If not found, try by UUID (customer_reference might be our UUID without hyphens)
-        if not payment and customer_reference:
-            if len(customer_reference) == 32 and customer_reference.isalnum():
-                # Convert back to UUID format
-                formatted_uuid = f"{customer_reference[:8]}-{customer_reference[8:12]}-{customer_reference[12:16]}-{customer_reference[16:20]}-{customer_reference[20:]}"
-                payment = Payment.objects.select_for_update().filter(uuid=formatted_uuid).first()
-            else:
-                # Try direct UUID match
-                payment = Payment.objects.select_for_update().filter(uuid=customer_reference).first()
+        # internal_reference is our provider_reference; customer_reference is
+        # the (30-char) uuid hex we sent — one lookup for either
+        payment = references.resolve(internal_reference, customer_reference, for_update=True)
 
         if not payment:
             logger.warning("LIVEPAY IPN: no payment found for customer_ref=%s internal_ref=%s", customer_reference, internal_reference)
-            return HttpResponse("OK")
+            return "no_payment", None
 
         if payment.status == "SUCCESS":
             logger.warning("LIVEPAY IPN: payment %s already SUCCESS — skipping", payment.uuid)
-            return HttpResponse("OK")  # idempotent
+            return "already_settled", payment  # idempotent
 
         logger.warning("LIVEPAY IPN: found payment %s status=%s is_success=%s", payment.uuid, payment.status, is_success)
 
         payment.raw_callback_data = data
 
         if is_success:
-            payment.mark_success(data)
-
-            if payment.purpose == "SUBSCRIPTION" and payment.location_id:
-                _handle_subscription_renewal(payment)
-
-            if payment.purpose == "SMS_PURCHASE" and payment.vendor_id:
-                try:
-                    credit_sms_wallet(vendor=payment.vendor, amount_paid=int(float(payment.amount)))
-                    # Credit SpotPay earnings from SMS purchase
-                    from wallets.models import SpotPayEarning
-                    SpotPayEarning.objects.get_or_create(
-                        reference=f"SMS-{payment.uuid}",
-                        defaults=dict(source='SMS_PURCHASE', amount=payment.amount)
-                    )
-                except Exception as exc:
-                    payment.processor_message = f"SMS credit warning: {exc}"
-                    payment.save(update_fields=["processor_message"])
-
-            if payment.vendor_id:
-                if payment.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
-                    notify_vendor_receipt(payment)
-                else:
-                    notify_vendor_payment_received(payment)
-
-            payment_id = payment.id
-            run_success_handler = True
+            settle_success(payment, data, source="LIVE_IPN")
+            logger.warning("LIVEPAY IPN: settlement queued for %s", payment.uuid)
+            return "settled", payment
 
         elif is_failed:
             payment.mark_failed(data)
+            return "failed", payment
         else:
             # Unknown status, just save the callback data
             payment.save(update_fields=["raw_callback_data"])
 
-    if run_success_handler and payment_id:
-        try:
-            payment = Payment.objects.get(id=payment_id)
-            handle_payment_success(payment)
-            logger.warning("LIVEPAY IPN: handle_payment_success completed for %s", payment_id)
-        except Exception as exc:
-            logger.error("LIVEPAY IPN: handle_payment_success failed for %s: %s", payment_id, exc)
-
-    return HttpResponse(
-        _json.dumps({"status": "received", "message": "Webhook processed successfully"}),
-        content_type="application/json"
-    )
+    return "callback_saved", payment
 
 
 @csrf_exempt
@@ -570,10 +396,13 @@ def yoo_failure_notification(request):
     if request.method != "POST":
         return HttpResponse("OK")
 
-    data, raw = _parse_yoo_ipn(request)
+    _receive(WebhookInbox.SOURCE_YOO_FAILURE, request)
+    return HttpResponse("OK")
+
 
+def _handle_yoo_failure(data):
     # Yo! failure notification fields: failed_transaction_reference, transaction_init_date, verification
-    reference = data.get("failed_transaction_reference") or _extract_reference(data, raw)
+    reference = data.get("failed_transaction_reference") or _extract_reference(data, None)
 
     logger.warning(
         "YOO FAILURE IPN: ref=%s data=%s",
@@ -582,19 +411,28 @@ def yoo_failure_notification(request):
 
     if not reference:
         logger.warning("YOO FAILURE IPN: no reference found — ignoring")
-        return HttpResponse("OK")
+        return "no_reference", None
 
     with transaction.atomic():
         payment = _find_payment(reference)
 
         if not payment:
             logger.warning("YOO FAILURE IPN: no payment found for reference=%s", reference)
-            return HttpResponse("OK")
+            return "no_payment", None
 
         if payment.status in ("SUCCESS", "FAILED"):
-            return HttpResponse("OK")  # idempotent
+            return "already_final", payment  # idempotent
 
         payment.raw_callback_data = data
         payment.mark_failed(data)
 
-    return HttpResponse("OK")
+    return "failed", payment
+
+
+# source → (parse raw body, handle parsed data); used by the views and replay_webhooks
+WEBHOOK_HANDLERS = {
+    WebhookInbox.SOURCE_YOO_IPN: (_parse_yoo_ipn, _handle_yoo_ipn),
+    WebhookInbox.SOURCE_YOO_FAILURE: (_parse_yoo_ipn, _handle_yoo_failure),
+    WebhookInbox.SOURCE_KWA_IPN: (_parse_json, _handle_kwa_ipn),
+    WebhookInbox.SOURCE_LIVE_IPN: (_parse_json, _handle_live_ipn),
+}
@@ -25,9 +25,11 @@ _TIMEOUT = 15
 
 class KwaPayClient:
 
-    def __init__(self, primary_api: str = None, secondary_api: str = None):
+    def __init__(self, primary_api: str = None, secondary_api: str = None, session: requests.Session = None):
         self.primary_api = (primary_api or os.environ.get("KWA_PRIMARY_API", "")).strip()
         self.secondary_api = (secondary_api or os.environ.get("KWA_SECONDARY_API", "")).strip()
+        # Optional pooled session (keep-alive) — falls back to one-shot requests
+        self._http = session or requests
 
         if not self.primary_api or not self.secondary_api:
             raise ValueError("KWA_PRIMARY_API and KWA_SECONDARY_API must be set.")
@@ -54,7 +56,7 @@ class KwaPayClient:
 
         try:
             logger.warning("KWA DEPOSIT → phone=%s amount=%s", payload.get("phone_number"), payload.get("amount"))
-            resp = requests.post(
+            resp = self._http.post(
                 f"{_BASE_URL}/deposit/",
                 json=payload,
                 timeout=_TIMEOUT,
@@ -91,7 +93,7 @@ class KwaPayClient:
 
         try:
             logger.info("KWA WITHDRAW → %s", payload.get("phone_number"))
-            resp = requests.post(
+            resp = self._http.post(
                 f"{_BASE_URL}/withdraw/",
                 json=payload,
                 timeout=_TIMEOUT,
@@ -124,7 +126,7 @@ class KwaPayClient:
         }
 
         try:
-            resp = requests.post(
+            resp = self._http.post(
                 f"{_BASE_URL}/transaction/info/",
                 json=payload,
                 timeout=_TIMEOUT,
@@ -30,10 +30,12 @@ _TIMEOUT = 15
 
 class LivePayClient:
 
-    def __init__(self, public_key: str, secret_key: str):
+    def __init__(self, public_key: str, secret_key: str, session: requests.Session = None):
         # public_key = accountNumber, secret_key = API key (Bearer token)
         self.account_number = (public_key or "").strip()
         self.api_key = (secret_key or "").strip()
+        # Optional pooled session (keep-alive) — falls back to one-shot requests
+        self._http = session or requests
 
         if not self.account_number or not self.api_key:
             raise ValueError("LivePay account_number and api_key must be set.")
@@ -67,7 +69,7 @@ class LivePayClient:
             logger.warning("LIVEPAY SEND → phone=%s amount=%s ref=%s",
                            payload["phoneNumber"], payload["amount"], ref)
 
-            resp = requests.post(
+            resp = self._http.post(
                 f"{_BASE_URL}/send-money",
                 json=payload,
                 headers={
@@ -113,7 +115,7 @@ class LivePayClient:
         }
         
         try:
-            resp = requests.get(
+            resp = self._http.get(
                 f"{_BASE_URL}/transaction-status",
                 params=params,
                 headers={
@@ -176,7 +178,7 @@ class LivePayClient:
             dict with keys: success, customer_name (if found), message
         """
         try:
-            resp = requests.post(
+            resp = self._http.post(
                 f"{_BASE_URL}/validate-number",
                 json={"phoneNumber": self._normalize_phone(phone)},
                 headers={
@@ -212,7 +214,7 @@ class LivePayClient:
             logger.warning("LIVEPAY COLLECT → phone=%s amount=%s ref=%s",
                            payload["phoneNumber"], payload["amount"], ref)
 
-            resp = requests.post(
+            resp = self._http.post(
                 f"{_BASE_URL}/collect-money",
                 json=payload,
                 headers={
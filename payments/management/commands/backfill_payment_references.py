@@ -0,0 +1,40 @@
+"""
+management/commands/backfill_payment_references.py
+==================================================
+Fills the PaymentReference lookup index for existing payments.
+
+  python manage.py backfill_payment_references
+  python manage.py backfill_payment_references --batch-size 5000
+
+New payments are indexed by Payment.save(), and an unindexed payment is
+still found (and indexed) by resolve()'s fallback query — this only saves
+those fallback queries after a deploy. Works in primary-key batches; safe
+to re-run (existing keys are skipped).
+"""
+
+from django.core.management.base import BaseCommand
+
+from payments.models import Payment
+from payments.services.references import register_many
+
+
+class Command(BaseCommand):
+    help = "Index every payment's uuid / provider / external references"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        last_pk, done = 0, 0
+        while True:
+            batch = list(
+                Payment.objects.filter(pk__gt=last_pk).order_by("pk")
+                .only("pk", "uuid", "provider_reference", "external_reference")[:options["batch_size"]]
+            )
+            if not batch:
+                break
+            register_many(batch)
+            last_pk = batch[-1].pk
+            done += len(batch)
+            self.stdout.write(f"  … {done} payments indexed")
+        self.stdout.write(f"✅ Done. Indexed references for {done} payments.")
@@ -0,0 +1,212 @@
+"""
+management/commands/benchmark_payment_queries.py
+================================================
+Seeds N synthetic payments + vouchers and times the hot query shapes
+with and without the Payment / Voucher composite indexes:
+
+  - analytics / dashboard cards   (payment_metrics for one vendor)
+  - analytics daily bucket        (vendor revenue for one day)
+  - find_voucher                  (latest SUCCESS payment by phone+location)
+  - issue_voucher                 (oldest UNUSED voucher for a package)
+  - reconciler / verify commands  (PENDING payments per provider)
+
+Everything — seed data and the temporary DROP INDEX — runs inside one
+transaction that is rolled back at the end, so the database is left
+untouched. The DROP INDEX takes a table lock for the duration, so the
+command refuses to run outside DEBUG unless --force is given.
+
+  python manage.py benchmark_payment_queries --payments 200000
+"""
+
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts.models import Vendor
+from hotspot.models import HotspotLocation
+from packages.models import Package
+from payments.models import Payment, PaymentProvider
+from payments.services.metrics import payment_metrics
+from vouchers.models import Voucher
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark hot Payment/Voucher queries with and without composite indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=50_000,
+                            help="Synthetic payments to seed (default 50000)")
+        parser.add_argument("--vendors", type=int, default=20,
+                            help="Vendors to spread payments over (default 20)")
+        parser.add_argument("--repeat", type=int, default=20,
+                            help="Timed runs per query, median reported (default 20)")
+        parser.add_argument("--force", action="store_true",
+                            help="Allow running with DEBUG off (locks tables while running)")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to run with DEBUG off — pass --force to run on this database.")
+
+        self.repeat = options["repeat"]
+        try:
+            with transaction.atomic():
+                self._seed(options["payments"], options["vendors"])
+                self._analyze()
+
+                with_idx = self._run_all()
+                self._drop_indexes()
+                self._analyze()
+                without_idx = self._run_all()
+
+                self._report(with_idx, without_idx)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write("Rolled back seed data and index changes.")
+
+    # ------------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------------
+
+    def _seed(self, n_payments, n_vendors):
+        rng = random.Random(42)
+        now = timezone.now()
+        tag = uuid.uuid4().hex[:8]
+        started = time.monotonic()
+
+        provider = PaymentProvider.objects.create(
+            name=f"bench-{tag}", provider_type="LIVE", api_key="bench", api_secret="bench", is_active=False,
+        )
+        vendors, locations, packages = [], [], []
+        for i in range(n_vendors):
+            user = User.objects.create(username=f"bench-{tag}-{i}")
+            vendor = Vendor.objects.create(
+                user=user, company_name=f"Bench {i}", contact_person="Bench",
+                business_address="-", business_phone="256700000000", business_email=f"bench{i}@example.com",
+            )
+            location = HotspotLocation.objects.create(
+                vendor=vendor, site_name=f"Bench {i}", address="-", town_city="-", status="ACTIVE",
+            )
+            vendors.append(vendor)
+            locations.append(location)
+            packages.extend(
+                Package.objects.create(location=location, name=f"P{j}", price=1000 * (j + 1))
+                for j in range(3)
+            )
+
+        payments, initiated_times = [], []
+        for i in range(n_payments):
+            package = rng.choice(packages)
+            roll = rng.random()
+            status = "SUCCESS" if roll < 0.85 else "FAILED" if roll < 0.97 else "PENDING"
+            # PENDING payments are recent, the rest spread over a year
+            max_age = 60 if status == "PENDING" else 365 * 24 * 60
+            initiated = now - timedelta(minutes=rng.randint(0, max_age))
+            initiated_times.append(initiated)
+            payments.append(Payment(
+                payer_type="CLIENT", purpose="TRANSACTION",
+                vendor_id=package.location.vendor_id, location_id=package.location_id, package=package,
+                phone=f"2567{rng.randint(0, 99_999_999):08d}",
+                amount=package.price, provider=provider, provider_reference=f"bench-{tag}-{i}",
+                status=status, completed_at=initiated + timedelta(seconds=40) if status == "SUCCESS" else None,
+            ))
+        Payment.objects.bulk_create(payments, batch_size=2000)
+        # initiated_at is auto_now_add — spread it out afterwards
+        for payment, initiated in zip(payments, initiated_times):
+            payment.initiated_at = initiated
+        Payment.objects.bulk_update(payments, ["initiated_at"], batch_size=2000)
+
+        vouchers = [
+            Voucher(
+                package=rng.choice(packages), code=f"b{tag}{i:08d}",
+                status="USED" if rng.random() < 0.9 else "UNUSED",
+            )
+            for i in range(n_payments)
+        ]
+        Voucher.objects.bulk_create(vouchers, batch_size=2000)
+
+        sample = payments[len(payments) // 2]
+        self.sample = {
+            "vendor": vendors[0],
+            "phone": sample.phone,
+            "location_uuid": HotspotLocation.objects.get(pk=sample.location_id).uuid,
+            "package": packages[0],
+            "provider": provider,
+            "day": timezone.localdate() - timedelta(days=3),
+        }
+        self.stdout.write(
+            f"Seeded {n_payments} payments / {n_payments} vouchers in {time.monotonic() - started:.1f}s"
+        )
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            for model in (Payment, Voucher):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    def _drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Payment, Voucher):
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+    # ------------------------------------------------------------------
+    # Query shapes
+    # ------------------------------------------------------------------
+
+    def _queries(self):
+        s = self.sample
+        return {
+            "dashboard cards": lambda: payment_metrics(
+                Payment.objects.filter(vendor=s["vendor"], purpose="TRANSACTION")
+            ),
+            "analytics day bucket": lambda: Payment.objects.filter(
+                vendor=s["vendor"], purpose="TRANSACTION", status="SUCCESS",
+                completed_at__date=s["day"],
+            ).aggregate(total=Sum("amount")),
+            "find_voucher": lambda: Payment.objects.filter(
+                phone=s["phone"], location__uuid=s["location_uuid"], status="SUCCESS", purpose="TRANSACTION",
+            ).order_by("-initiated_at").first(),
+            "issue_voucher": lambda: Voucher.objects.select_for_update(skip_locked=True).filter(
+                package=s["package"], status="UNUSED",
+            ).order_by("id").first(),
+            "reconciler pending": lambda: list(
+                Payment.objects.filter(
+                    status="PENDING", provider_id__in=[s["provider"].id],
+                    initiated_at__lte=timezone.now() - timedelta(minutes=1),
+                ).exclude(provider_reference=None).order_by("-initiated_at")
+                .values("id", "provider_reference")[:200]
+            ),
+        }
+
+    def _run_all(self):
+        results = {}
+        for name, query in self._queries().items():
+            query()  # warm-up
+            timings = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+        return results
+
+    def _report(self, with_idx, without_idx):
+        self.stdout.write("")
+        self.stdout.write(f"{'query':<24}{'no index ms':>14}{'indexed ms':>14}{'speed-up':>10}")
+        for name, indexed in with_idx.items():
+            plain = without_idx[name]
+            speedup = plain / indexed if indexed else 0
+            self.stdout.write(f"{name:<24}{plain:>14.2f}{indexed:>14.2f}{speedup:>9.1f}x")
+        self.stdout.write("")
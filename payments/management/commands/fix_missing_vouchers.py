@@ -1,40 +1,35 @@
 """
 management/commands/fix_missing_vouchers.py
 ============================================
-Finds SUCCESS TRANSACTION payments with no voucher issued
-and reruns handle_payment_success to issue voucher + send SMS.
+Issues vouchers (and queues their SMS) for SUCCESS TRANSACTION payments
+that never got one. Incremental — only settlements past the persisted
+watermark plus the needs-fulfilment queue are read each run
+(see payments/services/fulfilment.py).
 """
 
-import logging
 from django.core.management.base import BaseCommand
-from payments.models import Payment, PaymentVoucher
-from payments.services.payment_success import handle_payment_success
 
-logger = logging.getLogger(__name__)
+from payments.services import fulfilment
 
 
 class Command(BaseCommand):
-    help = "Issue missing vouchers for successful payments and send SMS"
+    help = "Issue missing vouchers for new settlements and the needs-fulfilment queue"
 
-    def handle(self, *args, **options):
-        # Find SUCCESS TRANSACTION payments with no voucher
-        payments = Payment.objects.filter(
-            status="SUCCESS",
-            purpose="TRANSACTION",
-        ).exclude(
-            id__in=PaymentVoucher.objects.values_list("payment_id", flat=True)
-        ).select_related("vendor", "package", "location")
-
-        self.stdout.write(f"Found {payments.count()} payments missing vouchers...")
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=fulfilment.BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=fulfilment.MAX_BATCHES,
+                            help="Max watermark batches per run")
 
-        fixed = 0
-        for payment in payments:
-            try:
-                handle_payment_success(payment)
-                fixed += 1
-                self.stdout.write(f"  ✅ Fixed payment {payment.uuid}")
-            except Exception as exc:
-                logger.error("fix_missing_vouchers error for %s: %s", payment.uuid, exc)
-                self.stdout.write(f"  ❌ Failed {payment.uuid}: {exc}")
-
-        self.stdout.write(f"Done. Fixed {fixed} payments.")
+    def handle(self, *args, **options):
+        counts = fulfilment.run(batch_size=options["batch_size"], max_batches=options["max_batches"])
+        self.stdout.write(
+            f"Done. Scanned {counts['scanned']} new, retried {counts['retried']} queued: "
+            f"✅ {counts['recovered']} recovered, 📦 {counts['out_of_stock']} out of stock, "
+            f"❌ {counts['errored']} errored, {counts['pending']} still pending."
+        )
+        stats = fulfilment.fulfilment_stats()
+        lag = stats["watermark_lag_seconds"]
+        self.stdout.write(
+            f"Totals: {stats['recovered']} recovered, {stats['out_of_stock']} out of stock, "
+            f"{stats['errored']} errored. Watermark lag: {'n/a' if lag is None else f'{lag}s'}"
+        )
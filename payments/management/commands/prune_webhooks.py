@@ -0,0 +1,28 @@
+"""
+management/commands/prune_webhooks.py
+=====================================
+Applies WebhookInbox retention: PROCESSED deliveries older than 30 days
+and any delivery older than 90 days are deleted.
+
+    python manage.py prune_webhooks
+    python manage.py prune_webhooks --dry-run
+
+Scheduled daily from scheduler_entrypoint.sh.
+"""
+
+from django.core.management.base import BaseCommand
+
+from payments.services import webhook_inbox
+
+
+class Command(BaseCommand):
+    help = "Delete provider webhooks past their retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only count the expired entries")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(f"{webhook_inbox.expired().count()} webhook(s) would be deleted.")
+            return
+        self.stdout.write(f"🧹 Deleted {webhook_inbox.prune()} expired webhook(s).")
@@ -0,0 +1,66 @@
+"""
+management/commands/replay_webhooks.py
+======================================
+Reprocess stored provider webhooks (WebhookInbox) through the same
+handlers as the live endpoints — settle_success for successes — e.g.
+after an outage left deliveries FAILED, or arrived before their payment.
+
+    python manage.py replay_webhooks                          # every FAILED entry
+    python manage.py replay_webhooks --outcome no_payment --since 2025-01-01
+    python manage.py replay_webhooks --source KWA_IPN --status RECEIVED --dry-run
+    python manage.py replay_webhooks --id 41 --id 42
+
+Replaying is safe: the handlers are idempotent on payment.status.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+
+from payments.models import WebhookInbox
+from payments.services import webhook_inbox
+
+
+def _moment(value):
+    moment = parse_datetime(value) or parse_date(value)
+    if moment is None:
+        raise CommandError(f"Not a date/datetime: {value}")
+    return moment
+
+
+class Command(BaseCommand):
+    help = "Replay stored provider webhooks through the settlement path"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--id", type=int, action="append", dest="ids", help="Entry id (repeatable)")
+        parser.add_argument("--source", choices=[s for s, _ in WebhookInbox.SOURCES])
+        parser.add_argument("--status", choices=[s for s, _ in WebhookInbox.STATUSES],
+                            help="Default FAILED (ignored with --id)")
+        parser.add_argument("--outcome", help="e.g. no_payment")
+        parser.add_argument("--since", help="received_at >= (date or datetime)")
+        parser.add_argument("--until", help="received_at < (date or datetime)")
+        parser.add_argument("--limit", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only count the matching entries")
+
+    def handle(self, *args, **options):
+        entries = WebhookInbox.objects.all()
+        if options["ids"]:
+            entries = entries.filter(pk__in=options["ids"])
+        elif options["status"] or not options["outcome"]:
+            entries = entries.filter(status=options["status"] or WebhookInbox.STATUS_FAILED)
+        if options["source"]:
+            entries = entries.filter(source=options["source"])
+        if options["outcome"]:
+            entries = entries.filter(outcome=options["outcome"])
+        if options["since"]:
+            entries = entries.filter(received_at__gte=_moment(options["since"]))
+        if options["until"]:
+            entries = entries.filter(received_at__lt=_moment(options["until"]))
+
+        ids = list(entries.order_by("received_at", "id").values_list("pk", flat=True)[:options["limit"]])
+        if options["dry_run"]:
+            self.stdout.write(f"{len(ids)} webhook(s) would be replayed.")
+            return
+
+        results = webhook_inbox.replay(WebhookInbox.objects.filter(pk__in=ids))
+        summary = ", ".join(f"{outcome}={count}" for outcome, count in sorted(results.items())) or "nothing"
+        self.stdout.write(f"🔁 Replayed {len(ids)} webhook(s): {summary}")
@@ -1,93 +1,92 @@
 """
 management/commands/retry_voucher_sms.py
 =========================================
-Finds SUCCESS TRANSACTION payments that have a voucher issued
-but no successful SMS sent, and retries sending the SMS.
+Safety net for voucher SMS. Retries themselves are scheduled by the SMS
+outbox (sms/services/dispatcher.py: backoff per message, release on
+wallet top-up), so this no longer walks every paid voucher.
+
+It finds — in one query — SUCCESS TRANSACTION payments that have a
+voucher but neither a queued/outbox SMS nor a successful SMSLog (e.g.
+paid before the outbox existed, or the enqueue itself failed), and
+queues their SMS. Voucher SMS that used up their outbox attempts (FAILED,
+never SENT) within the last REQUEUE_WINDOW get another round. Then it
+reports the outbox backlog.
 """
 
 import logging
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
-from payments.models import Payment, PaymentVoucher
-from sms.models import SMSLog
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from payments.models import PaymentVoucher
+from sms.models import OutboundSMS, SMSLog
+from sms.services import dispatcher
 from sms.services.voucher_pay import send_voucher_sms
 
 logger = logging.getLogger(__name__)
 
+# FAILED voucher SMS older than this are left alone
+REQUEUE_WINDOW = timedelta(hours=24)
+
 
 class Command(BaseCommand):
-    help = "Retry sending voucher SMS for payments where SMS failed or was not sent"
+    help = "Queue voucher SMS for paid vouchers that never reached the SMS outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=500, help="Max payments to queue per run")
 
     def handle(self, *args, **options):
-        # Find payments that have a voucher but no successful SMS log
-        payments_with_vouchers = PaymentVoucher.objects.filter(
-            payment__status="SUCCESS",
-            payment__purpose="TRANSACTION",
-        ).select_related(
-            "payment", "payment__vendor", "payment__package", "payment__location", "voucher"
+        missing = (
+            PaymentVoucher.objects.filter(
+                payment__status="SUCCESS",
+                payment__purpose="TRANSACTION",
+            )
+            .exclude(payment__phone__isnull=True).exclude(payment__phone="")
+            .annotate(
+                queued=Exists(OutboundSMS.objects.filter(payment_id=OuterRef("payment_id"))),
+                sent=Exists(SMSLog.objects.filter(payment_id=OuterRef("payment_id"), status="SENT")),
+            )
+            .filter(queued=False, sent=False)
+            .select_related("payment", "payment__vendor", "payment__package", "payment__location", "voucher")
+            .order_by("pk")[:options["limit"]]
         )
 
-        retried = 0
-        skipped = 0
-
-        for pv in payments_with_vouchers:
+        queued = 0
+        for pv in missing:
             payment = pv.payment
-            voucher = pv.voucher
-
-            if not payment.phone:
-                skipped += 1
-                continue
-
-            # Check if a successful SMS was already sent for this payment
-            already_sent = SMSLog.objects.filter(
-                payment=payment,
-                status="SENT",
-            ).exists()
-
-            if already_sent:
-                skipped += 1
-                continue
-
-            # Skip if last failure was due to insufficient balance — vendor needs to top up first
-            insufficient_balance = SMSLog.objects.filter(
-                payment=payment,
-                status="FAILED",
-                failure_reason="Insufficient SMS balance",
-            ).exists()
-
-            if insufficient_balance:
-                skipped += 1
-                continue
-
-            # Permanently skip after 3 provider send failures
-            provider_failures = SMSLog.objects.filter(
-                payment=payment,
-                status="FAILED",
-            ).exclude(
-                failure_reason="Insufficient SMS balance",
-            ).count()
-
-            if provider_failures >= 3:
-                skipped += 1
-                continue
-
             try:
-                success, result = send_voucher_sms(
+                send_voucher_sms(
                     vendor=payment.vendor,
                     phone=payment.phone,
-                    voucher_code=voucher.code,
+                    voucher_code=pv.voucher.code,
                     package_name=payment.package.name if payment.package else "Package",
                     payment=payment,
                     location=payment.location,
                 )
-
-                if success:
-                    retried += 1
-                    self.stdout.write(f"  ✅ SMS sent for payment {payment.uuid} → {payment.phone}")
-                else:
-                    self.stdout.write(f"  ❌ SMS failed for {payment.uuid}: {result}")
-
+                queued += 1
+                self.stdout.write(f"  ✅ SMS queued for payment {payment.uuid} → {payment.phone}")
             except Exception as exc:
                 logger.error("retry_voucher_sms error for %s: %s", payment.uuid, exc)
                 self.stdout.write(f"  ❌ Error {payment.uuid}: {exc}")
 
-        self.stdout.write(f"Done. Retried {retried}, skipped {skipped}.")
+        requeued = dispatcher.requeue_failed(
+            OutboundSMS.objects.filter(
+                purpose="VOUCHER_ISSUED",
+                payment__isnull=False,
+                created_at__gte=timezone.now() - REQUEUE_WINDOW,
+            )
+            .annotate(sent=Exists(SMSLog.objects.filter(payment_id=OuterRef("payment_id"), status="SENT")))
+            .filter(sent=False)
+        )
+
+        backlog = OutboundSMS.objects.aggregate(
+            due=Count("pk", filter=Q(status=OutboundSMS.STATUS_PENDING, next_attempt_at__lte=timezone.now())),
+            waiting=Count("pk", filter=Q(status=OutboundSMS.STATUS_PENDING, next_attempt_at__gt=timezone.now())),
+            parked=Count("pk", filter=Q(status=OutboundSMS.STATUS_INSUFFICIENT_BALANCE)),
+        )
+        self.stdout.write(
+            f"Done. Queued {queued}, re-queued {requeued} failed. Outbox: {backlog['due']} due, {backlog['waiting']} backing off, "
+            f"{backlog['parked']} waiting for a top-up."
+        )
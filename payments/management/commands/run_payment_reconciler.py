@@ -0,0 +1,91 @@
+"""
+management/commands/run_payment_reconciler.py
+=============================================
+Long-running daemon that reconciles PENDING LivePay and KwaPay
+payments against the provider status APIs.
+
+Status checks run concurrently over one keep-alive HTTP session,
+rate-limited per provider, and each payment is re-polled on a
+schedule that backs off with its age (see payments/services/reconciler.py).
+
+Run as its own container (see docker-compose.yml). Run a single
+instance — the poll schedule lives in process memory.
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Billing import dbconn
+from payments.services.reconciler import Reconciler, PROVIDER_TYPES
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_LINES = {
+    "settled": "  ✅ Completed payment {uuid}",
+    "failed": "  ❌ Failed payment {uuid}",
+    "timed_out": "  ⏱ Timed-out payment {uuid} (no provider status)",
+    "manual_review": "  ⚠️ Timed-out PENDING payment flagged for manual review {uuid}",
+}
+
+
+class Command(BaseCommand):
+    help = "Reconcile PENDING LivePay/KwaPay payments against provider status APIs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider", choices=PROVIDER_TYPES, action="append",
+                            help="Limit to one provider type (repeatable, default all)")
+        parser.add_argument("--workers", type=int, default=8,
+                            help="Concurrent status checks (default 8)")
+        parser.add_argument("--rate", type=float, default=5.0,
+                            help="Max status checks per second per provider (default 5)")
+        parser.add_argument("--burst", type=int, default=10,
+                            help="Token bucket size per provider (default 10)")
+        parser.add_argument("--batch-size", type=int, default=200,
+                            help="Max payments polled per cycle (default 200)")
+        parser.add_argument("--tick", type=float, default=2.0,
+                            help="Seconds between cycles (default 2.0)")
+        parser.add_argument("--once", action="store_true",
+                            help="Run a single cycle and exit")
+
+    def handle(self, *args, **options):
+        reconciler = Reconciler(
+            provider_types=options["provider"] or PROVIDER_TYPES,
+            workers=options["workers"],
+            rate=options["rate"],
+            burst=options["burst"],
+        )
+        self._stopping = False
+
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.stdout.write("Payment reconciler started")
+
+        try:
+            while not self._stopping:
+                close_old_connections()
+                dbconn.note_unit()
+                try:
+                    reconciler.run_once(limit=options["batch_size"], on_result=self._report)
+                except Exception as exc:
+                    logger.error("Payment reconciler loop error: %s", exc)
+
+                if options["once"]:
+                    break
+                time.sleep(options["tick"])
+        finally:
+            reconciler.close()
+
+        self.stdout.write("Payment reconciler stopped")
+
+    def _report(self, row, outcome):
+        line = OUTCOME_LINES.get(outcome)
+        if line:
+            self.stdout.write(line.format(uuid=row["uuid"]))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
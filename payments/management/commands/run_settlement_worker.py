@@ -0,0 +1,72 @@
+"""
+management/commands/run_settlement_worker.py
+=============================================
+Long-running worker that drains the SettlementJob queue:
+voucher issuance, commission split, voucher SMS and vendor
+notifications for every payment marked SUCCESS by a webhook,
+verify endpoint or status-polling command.
+
+Run as its own container (see docker-compose.yml). Several
+workers can run side by side — jobs are claimed with SKIP LOCKED.
+Use --once from cron or a shell to drain the queue a single time.
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Billing import dbconn
+from payments.services.settlement import process_due_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Process queued payment settlements (voucher, split, SMS, notifications)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=20,
+                            help="Jobs claimed per iteration (default 20)")
+        parser.add_argument("--idle-sleep", type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty (default 1.0)")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue once and exit")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        idle_sleep = options["idle_sleep"]
+        self._stopping = False
+
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.stdout.write("Settlement worker started")
+
+        while not self._stopping:
+            close_old_connections()
+            dbconn.note_unit()
+            try:
+                processed, succeeded = process_due_jobs(limit=batch_size)
+            except Exception as exc:
+                logger.error("Settlement worker loop error: %s", exc)
+                processed, succeeded = 0, 0
+                time.sleep(idle_sleep)
+
+            if processed:
+                self.stdout.write(f"  Settled {succeeded}/{processed} jobs")
+
+            if options["once"]:
+                if processed < batch_size:
+                    break
+                continue
+
+            if processed == 0:
+                time.sleep(idle_sleep)
+
+        self.stdout.write("Settlement worker stopped")
+
+    def _stop(self, signum, frame):
+        self._stopping = True
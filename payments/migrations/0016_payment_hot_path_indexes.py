@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0015_settlement_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['vendor', 'purpose', 'status', 'completed_at'], name='pay_vendor_purp_stat_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['purpose', 'status', 'completed_at'], name='pay_purp_stat_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['phone', 'location', 'status', '-initiated_at'], name='pay_phone_loc_stat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['provider', 'initiated_at'], name='pay_pending_provider_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0016_payment_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FulfilmentWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_payment_id', models.BigIntegerField(default=0)),
+                ('recovered', models.PositiveIntegerField(default=0)),
+                ('out_of_stock', models.PositiveIntegerField(default=0)),
+                ('errored', models.PositiveIntegerField(default=0)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PendingFulfilment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('OUT_OF_STOCK', 'Out of stock'), ('ERROR', 'Error'), ('SETTLEMENT_FAILED', 'Settlement failed')], max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_fulfilment', to='payments.payment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['next_attempt_at'], name='fulfil_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0017_voucher_fulfilment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('YOO_IPN', 'Yo! IPN'), ('YOO_FAILURE', 'Yo! failure'), ('KWA_IPN', 'KwaPay IPN'), ('LIVE_IPN', 'LivePay IPN')], max_length=20)),
+                ('dedupe_hash', models.CharField(max_length=64, unique=True)),
+                ('headers', models.JSONField(blank=True, default=dict)),
+                ('body', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('RECEIVED', 'Received'), ('PROCESSED', 'Processed'), ('FAILED', 'Failed')], default='RECEIVED', max_length=10)),
+                ('outcome', models.CharField(blank=True, max_length=30)),
+                ('attempts', models.PositiveIntegerField(default=1)),
+                ('error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='webhooks', to='payments.payment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'status', 'received_at'], name='webhook_src_stat_recv_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0018_webhook_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=500, unique=True)),
+                ('kind', models.CharField(choices=[('UUID', 'Our reference'), ('PROVIDER', 'Provider reference'), ('EXTERNAL', 'External reference')], max_length=10)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookup_references', to='payments.payment')),
+            ],
+        ),
+    ]
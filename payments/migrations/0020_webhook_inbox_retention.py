@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0019_payment_reference'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webhookinbox',
+            index=models.Index(fields=['received_at'], name='webhook_received_idx'),
+        ),
+    ]
@@ -251,6 +251,7 @@ class Payment(models.Model):
         if data is not None:
             self.raw_callback_data = data
         self.save(update_fields=["status", "completed_at", "raw_callback_data"])
+        self._publish_status()
 
     def mark_failed(self, data=None):
         if self.status == "FAILED":
@@ -259,6 +260,59 @@ class Payment(models.Model):
         if data is not None:
             self.raw_callback_data = data
         self.save(update_fields=["status", "raw_callback_data"])
+        self._publish_status()
+
+    def _publish_status(self):
+        # Wake long-poll / SSE clients once the change is committed
+        from payments.services.status_events import publish_status_on_commit
+        publish_status_on_commit(self)
+
+    REFERENCE_FIELDS = ("provider_reference", "external_reference")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_references = instance._reference_values()
+        return instance
+
+    def _reference_values(self):
+        # __dict__, so a deferred field is not loaded just to compare it
+        return tuple(self.__dict__.get(name) for name in self.REFERENCE_FIELDS)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not set(self.REFERENCE_FIELDS) & set(update_fields):
+            return
+        references = self._reference_values()
+        if adding or references != getattr(self, "_saved_references", None):
+            # Keep the PaymentReference lookup rows in step
+            from payments.services.references import register
+            register(self)
+        self._saved_references = references
+
+    class Meta:
+        indexes = [
+            # Vendor dashboards / metrics / rollup backfill
+            models.Index(
+                fields=["vendor", "purpose", "status", "completed_at"],
+                name="pay_vendor_purp_stat_done_idx",
+            ),
+            # Platform-wide admin cards and charts
+            models.Index(fields=["purpose", "status", "completed_at"], name="pay_purp_stat_done_idx"),
+            # find_voucher: latest payment by phone at a location
+            models.Index(
+                fields=["phone", "location", "status", "-initiated_at"],
+                name="pay_phone_loc_stat_idx",
+            ),
+            # Reconciler / verify commands — PENDING is a small slice of the table
+            models.Index(
+                fields=["provider", "initiated_at"],
+                name="pay_pending_provider_idx",
+                condition=models.Q(status="PENDING"),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.purpose} | {self.amount} {self.currency} | {self.status}"
@@ -312,3 +366,196 @@ class PaymentVoucher(models.Model):
 
     def __str__(self):
         return f"{self.payment.uuid} -> {self.voucher}"
+
+
+# =====================================================
+# SETTLEMENT QUEUE (DURABLE POST-PAYMENT WORK)
+# =====================================================
+# Webhooks only flip the payment to SUCCESS and enqueue a job
+# in the same DB transaction. The settlement worker
+# (manage.py run_settlement_worker) then issues the voucher,
+# records the split and sends notifications.
+class SettlementJob(models.Model):
+    STATUS_PENDING = "PENDING"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+    STATUSES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name="settlement_job"
+    )
+
+    # Which entry point settled the payment e.g. LIVE_IPN, KWA_VERIFY_CMD
+    source = models.CharField(max_length=30, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="settle_job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"Settle {self.payment.uuid} ({self.status}, attempt {self.attempts})"
+
+
+# =====================================================
+# VOUCHER FULFILMENT RECONCILER
+# =====================================================
+# fix_missing_vouchers only reads settlements past the persisted
+# (completed_at, payment id) watermark, plus the PendingFulfilment
+# queue of payments still owed a voucher
+# (see payments/services/fulfilment.py).
+class FulfilmentWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+    # Last SUCCESS payment scanned, in (completed_at, id) order
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+    last_payment_id = models.BigIntegerField(default=0)
+
+    # Running totals, exported as metrics (admin / command output)
+    recovered = models.PositiveIntegerField(default=0)
+    out_of_stock = models.PositiveIntegerField(default=0)
+    errored = models.PositiveIntegerField(default=0)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_completed_at} #{self.last_payment_id}"
+
+
+class PendingFulfilment(models.Model):
+    REASON_OUT_OF_STOCK = "OUT_OF_STOCK"
+    REASON_ERROR = "ERROR"
+    REASON_SETTLEMENT_FAILED = "SETTLEMENT_FAILED"
+    REASONS = (
+        (REASON_OUT_OF_STOCK, "Out of stock"),
+        (REASON_ERROR, "Error"),
+        (REASON_SETTLEMENT_FAILED, "Settlement failed"),
+    )
+
+    payment = models.OneToOneField(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name="pending_fulfilment"
+    )
+    reason = models.CharField(max_length=20, choices=REASONS)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at"], name="fulfil_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"Fulfil {self.payment_id} ({self.reason}, attempt {self.attempts})"
+
+
+# =====================================================
+# WEBHOOK INBOX (APPEND-ONLY)
+# =====================================================
+# Every provider callback is stored before it is processed, with
+# one INSERT … ON CONFLICT on dedupe_hash: an identical redelivery
+# is answered without touching Payment. manage.py replay_webhooks
+# reprocesses stored entries (see payments/services/webhook_inbox.py).
+class WebhookInbox(models.Model):
+    SOURCE_YOO_IPN = "YOO_IPN"
+    SOURCE_YOO_FAILURE = "YOO_FAILURE"
+    SOURCE_KWA_IPN = "KWA_IPN"
+    SOURCE_LIVE_IPN = "LIVE_IPN"
+    SOURCES = (
+        (SOURCE_YOO_IPN, "Yo! IPN"),
+        (SOURCE_YOO_FAILURE, "Yo! failure"),
+        (SOURCE_KWA_IPN, "KwaPay IPN"),
+        (SOURCE_LIVE_IPN, "LivePay IPN"),
+    )
+
+    STATUS_RECEIVED = "RECEIVED"
+    STATUS_PROCESSED = "PROCESSED"
+    STATUS_FAILED = "FAILED"
+    STATUSES = (
+        (STATUS_RECEIVED, "Received"),
+        (STATUS_PROCESSED, "Processed"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    source = models.CharField(max_length=20, choices=SOURCES)
+    # sha256 of source + raw body — provider retries resend the same body
+    dedupe_hash = models.CharField(max_length=64, unique=True)
+    headers = models.JSONField(default=dict, blank=True)
+    body = models.TextField(blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_RECEIVED)
+    # What processing did e.g. settled, failed, no_payment, already_settled
+    outcome = models.CharField(max_length=30, blank=True)
+    # Deliveries of this body (a FAILED entry is reprocessed on redelivery)
+    attempts = models.PositiveIntegerField(default=1)
+    error = models.TextField(blank=True)
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="webhooks"
+    )
+
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # replay_webhooks / admin: by source and state over a time window
+            models.Index(fields=["source", "status", "received_at"], name="webhook_src_stat_recv_idx"),
+            # webhook_inbox.prune(): retention by age
+            models.Index(fields=["received_at"], name="webhook_received_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.source} #{self.pk} ({self.status} {self.outcome})"
+
+
+# =====================================================
+# PAYMENT REFERENCE INDEX
+# =====================================================
+# Every reference a payment can be looked up by — our uuid (hex, and
+# the 30-char form sent to LivePay), the provider's reference and the
+# external reference — normalized into one unique, indexed column, so
+# webhooks and status polls resolve any of them with one query
+# (see payments/services/references.py).
+class PaymentReference(models.Model):
+    KIND_UUID = "UUID"
+    KIND_PROVIDER = "PROVIDER"
+    KIND_EXTERNAL = "EXTERNAL"
+    KINDS = (
+        (KIND_UUID, "Our reference"),
+        (KIND_PROVIDER, "Provider reference"),
+        (KIND_EXTERNAL, "External reference"),
+    )
+
+    reference = models.CharField(max_length=500, unique=True)
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name="lookup_references"
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+
+    def __str__(self):
+        return f"{self.reference} -> {self.payment_id} ({self.kind})"
@@ -0,0 +1,209 @@
+"""
+payments/services/fulfilment.py
+===============================
+Voucher fulfilment reconciler, run every few minutes by
+manage.py fix_missing_vouchers.
+
+Safety net for SUCCESS TRANSACTION payments that never got a voucher.
+Rather than anti-joining every SUCCESS payment against PaymentVoucher on
+each run, it only reads:
+
+  scan_new()      → settlements past the persisted FulfilmentWatermark
+                    (completed_at, id), batch_size at a time in index order
+                    (pay_purp_stat_done_idx). Settlements younger than
+                    SETTLE_LAG are left for the next run, so a payment
+                    whose transaction commits late is not stepped over.
+                    Payments whose SettlementJob is still PENDING / RUNNING
+                    belong to the settlement worker and are skipped;
+                    ones whose row is locked by someone else are queued.
+  process_queue() → due PendingFulfilment rows: payments that were out of
+                    stock or errored here, or whose SettlementJob FAILED
+                    (settlement.py queues them). Retried with backoff until
+                    they have a voucher.
+
+Each payment is fulfilled in its own transaction with its row locked
+(SKIP LOCKED), so overlapping runs never issue for the same payment.
+recovered / out_of_stock / errored are counted per run and added to the
+watermark row's running totals (fulfilment_stats()).
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from payments.models import FulfilmentWatermark, Payment, PaymentVoucher, PendingFulfilment, SettlementJob
+from payments.services.payment_success import handle_payment_success
+from vouchers.services.issue_voucher import NoAvailableVouchers
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "voucher_fulfilment"
+BATCH_SIZE = 200
+MAX_BATCHES = 10
+# Settlements this recent are not scanned yet (late commits, settlement worker)
+SETTLE_LAG = timedelta(minutes=2)
+# Queue retries: 5 min, 10 min, 20 min … capped at 1 hour
+BACKOFF_BASE = timedelta(minutes=5)
+BACKOFF_MAX = timedelta(hours=1)
+
+OUTCOMES = ("recovered", "out_of_stock", "errored")
+
+
+def _backoff(attempts):
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def enqueue(payment_id, reason, error="", attempts=0):
+    """Put a payment on the needs-fulfilment queue (idempotent per payment)."""
+    retry_at = timezone.now() + (_backoff(attempts) if attempts else timedelta(0))
+    PendingFulfilment.objects.update_or_create(
+        payment_id=payment_id,
+        defaults={"reason": reason, "last_error": error[:2000], "attempts": attempts, "next_attempt_at": retry_at},
+    )
+
+
+def fulfil(payment_id):
+    """
+    Issue the missing voucher for one payment, with its row locked.
+    Returns "recovered", "done" (already had one) or "busy" (another run
+    holds it). Raises NoAvailableVouchers or whatever issuance raised.
+    """
+    with transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("vendor", "package", "location", "provider")
+            .filter(pk=payment_id)
+            .first()
+        )
+        if payment is None:
+            return "busy"
+        if PaymentVoucher.objects.filter(payment_id=payment_id).exists():
+            return "done"
+        handle_payment_success(payment)
+        return "recovered" if PaymentVoucher.objects.filter(payment_id=payment_id).exists() else "done"
+
+
+def _attempt(payment_id, counts):
+    """fulfil() one payment and count the outcome. Returns (outcome, queue reason, error)."""
+    try:
+        outcome = fulfil(payment_id)
+    except NoAvailableVouchers as exc:
+        counts["out_of_stock"] += 1
+        return "out_of_stock", PendingFulfilment.REASON_OUT_OF_STOCK, str(exc)
+    except Exception as exc:
+        logger.error("Voucher fulfilment failed for payment %s: %s", payment_id, exc)
+        counts["errored"] += 1
+        return "errored", PendingFulfilment.REASON_ERROR, str(exc)
+    if outcome == "recovered":
+        counts["recovered"] += 1
+    return outcome, None, ""
+
+
+def scan_new(watermark, counts, batch_size=BATCH_SIZE, now=None):
+    """Fulfil one batch of settlements past the watermark and advance it. Returns rows scanned."""
+    now = now or timezone.now()
+    qs = Payment.objects.filter(status="SUCCESS", purpose="TRANSACTION", completed_at__lte=now - SETTLE_LAG)
+    if watermark.last_completed_at is not None:
+        qs = qs.filter(
+            Q(completed_at__gt=watermark.last_completed_at)
+            | Q(completed_at=watermark.last_completed_at, pk__gt=watermark.last_payment_id)
+        )
+    rows = list(
+        qs.annotate(
+            has_voucher=Exists(PaymentVoucher.objects.filter(payment_id=OuterRef("pk"))),
+            settling=Exists(SettlementJob.objects.filter(
+                payment_id=OuterRef("pk"),
+                status__in=(SettlementJob.STATUS_PENDING, SettlementJob.STATUS_RUNNING),
+            )),
+        )
+        .order_by("completed_at", "pk")
+        .values_list("pk", "completed_at", "vendor_id", "package_id", "has_voucher", "settling")[:batch_size]
+    )
+
+    for pk, _, vendor_id, package_id, has_voucher, settling in rows:
+        if has_voucher or settling or not vendor_id or not package_id:
+            continue
+        outcome, reason, error = _attempt(pk, counts)
+        if reason:
+            enqueue(pk, reason, error, attempts=1)
+        elif outcome == "busy":
+            # Row locked elsewhere: the watermark moves past it, so retry from the queue
+            enqueue(pk, PendingFulfilment.REASON_ERROR, "row locked", attempts=0)
+
+    if rows:
+        watermark.last_completed_at, watermark.last_payment_id = rows[-1][1], rows[-1][0]
+        FulfilmentWatermark.objects.filter(pk=watermark.pk).update(
+            last_completed_at=watermark.last_completed_at, last_payment_id=watermark.last_payment_id,
+        )
+    return len(rows)
+
+
+def process_queue(counts, limit=BATCH_SIZE, now=None):
+    """Retry due PendingFulfilment rows. Returns how many were attempted."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = list(
+            PendingFulfilment.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        # Lease the claim so an overlapping run doesn't pick the same rows
+        PendingFulfilment.objects.filter(pk__in=[item.pk for item in due]).update(
+            next_attempt_at=now + BACKOFF_MAX,
+        )
+
+    for item in due:
+        outcome, reason, error = _attempt(item.payment_id, counts)
+        if outcome in ("recovered", "done"):
+            PendingFulfilment.objects.filter(pk=item.pk).delete()
+        elif outcome == "busy":
+            PendingFulfilment.objects.filter(pk=item.pk).update(next_attempt_at=now)
+        else:
+            attempts = item.attempts + 1
+            PendingFulfilment.objects.filter(pk=item.pk).update(
+                reason=reason, attempts=attempts, last_error=error[:2000],
+                next_attempt_at=timezone.now() + _backoff(attempts),
+            )
+    return len(due)
+
+
+def run(batch_size=BATCH_SIZE, max_batches=MAX_BATCHES):
+    """
+    One reconciler pass: the due queue, then up to max_batches of new
+    settlements. Returns per-run counts: retried, scanned, recovered,
+    out_of_stock, errored, pending (queue depth afterwards).
+    """
+    watermark, _ = FulfilmentWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    counts = Counter(dict.fromkeys(OUTCOMES, 0))
+    counts["retried"] = process_queue(counts, batch_size)
+    counts["scanned"] = 0
+    for _ in range(max_batches):
+        scanned = scan_new(watermark, counts, batch_size)
+        counts["scanned"] += scanned
+        if scanned < batch_size:
+            break
+
+    FulfilmentWatermark.objects.filter(pk=watermark.pk).update(
+        last_run_at=timezone.now(),
+        **{outcome: F(outcome) + counts[outcome] for outcome in OUTCOMES},
+    )
+    counts["pending"] = PendingFulfilment.objects.count()
+    logger.info("Voucher fulfilment: %s", dict(counts))
+    return dict(counts)
+
+
+def fulfilment_stats():
+    """Running totals, queue depth and how far behind the watermark is."""
+    watermark = FulfilmentWatermark.objects.filter(name=WATERMARK_NAME).first()
+    stats = {outcome: getattr(watermark, outcome, 0) for outcome in OUTCOMES}
+    stats["pending"] = PendingFulfilment.objects.count()
+    stats["out_of_stock_pending"] = PendingFulfilment.objects.filter(
+        reason=PendingFulfilment.REASON_OUT_OF_STOCK,
+    ).count()
+    last = watermark.last_completed_at if watermark else None
+    stats["watermark_lag_seconds"] = round((timezone.now() - last).total_seconds(), 1) if last else None
+    return stats
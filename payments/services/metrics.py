@@ -0,0 +1,134 @@
+"""
+payments/services/metrics.py
+============================
+Dashboard summary cards computed in a single SQL statement.
+
+payment_metrics() runs one aggregate() over a Payment queryset with
+filtered Sum/Count expressions — all-time / today / week / month / year
+revenue and buyer counts plus the PENDING / SUCCESS / FAILED breakdown —
+instead of a dozen separate aggregate()/count() round-trips.
+
+rollup_metrics() fills the same PaymentMetrics from the analytics
+DailyRevenue rollups (revenue windows only) for pages that do not
+need the status breakdown.
+"""
+
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+ZERO = Decimal("0.00")
+
+
+@dataclass(frozen=True)
+class PaymentMetrics:
+    total_revenue: Decimal = ZERO
+    today_revenue: Decimal = ZERO
+    week_revenue: Decimal = ZERO
+    month_revenue: Decimal = ZERO
+    year_revenue: Decimal = ZERO
+
+    total_customers: int = 0
+    today_customers: int = 0
+    week_customers: int = 0
+    month_customers: int = 0
+    year_customers: int = 0
+
+    # Status breakdown — optionally scoped by initiated_at (see payment_metrics)
+    total_count: int = 0
+    success_count: int = 0
+    pending_count: int = 0
+    failed_count: int = 0
+    success_revenue: Decimal = ZERO
+
+    @property
+    def success_rate(self) -> int:
+        return round(self.success_count / self.total_count * 100) if self.total_count else 0
+
+    def as_dict(self, floats=False) -> dict:
+        data = asdict(self)
+        if floats:
+            data = {k: float(v) if isinstance(v, Decimal) else v for k, v in data.items()}
+        return data
+
+
+def _window_starts(today: date):
+    """Local-midnight datetimes for the start of today / week / month / year."""
+    tz = timezone.get_current_timezone()
+
+    def midnight(day):
+        return timezone.make_aware(datetime.combine(day, time.min), tz)
+
+    return {
+        "today": midnight(today),
+        "week": midnight(today - timedelta(days=today.weekday())),
+        "month": midnight(today.replace(day=1)),
+        "year": midnight(today.replace(month=1, day=1)),
+    }
+
+
+def payment_metrics(qs, *, today: date = None, counts_since: datetime = None) -> PaymentMetrics:
+    """
+    Every summary card for a Payment queryset in one query.
+
+    Revenue / customer windows cover SUCCESS payments by completed_at.
+    The status breakdown covers every payment in `qs`, or only those
+    initiated on/after `counts_since` when given (admin period filter).
+    """
+    today = today or timezone.localdate()
+    success = Q(status="SUCCESS")
+
+    aggregates = {
+        "total_revenue": Sum("amount", filter=success),
+        "total_customers": Count("id", filter=success),
+    }
+    for name, start in _window_starts(today).items():
+        window = success & Q(completed_at__gte=start)
+        aggregates[f"{name}_revenue"] = Sum("amount", filter=window)
+        aggregates[f"{name}_customers"] = Count("id", filter=window)
+
+    scope = Q(initiated_at__gte=counts_since) if counts_since else Q()
+    aggregates.update({
+        "total_count": Count("id", filter=scope) if counts_since else Count("id"),
+        "success_count": Count("id", filter=scope & success),
+        "pending_count": Count("id", filter=scope & Q(status="PENDING")),
+        "failed_count": Count("id", filter=scope & Q(status="FAILED")),
+        "success_revenue": Sum("amount", filter=scope & success),
+    })
+
+    result = qs.aggregate(**aggregates)
+    return PaymentMetrics(**{k: v if v is not None else ZERO for k, v in result.items()})
+
+
+def rollup_metrics(qs, *, today: date = None) -> PaymentMetrics:
+    """
+    Revenue / customer windows from a DailyRevenue queryset in one query.
+    Rollups only hold successful payments, so the status breakdown is
+    success-only.
+    """
+    today = today or timezone.localdate()
+    periods = {
+        "total": Q(),
+        "today": Q(day=today),
+        "week": Q(day__gte=today - timedelta(days=today.weekday())),
+        "month": Q(day__gte=today.replace(day=1)),
+        "year": Q(day__gte=today.replace(month=1, day=1)),
+    }
+    aggregates = {}
+    for name, cond in periods.items():
+        aggregates[f"{name}_revenue"] = Sum("revenue", filter=cond)
+        aggregates[f"{name}_customers"] = Sum("customers", filter=cond)
+
+    result = {k: v if v is not None else 0 for k, v in qs.aggregate(**aggregates).items()}
+    for key in list(result):
+        if key.endswith("_revenue"):
+            result[key] = result[key] or ZERO
+    return PaymentMetrics(
+        **result,
+        total_count=result["total_customers"],
+        success_count=result["total_customers"],
+        success_revenue=result["total_revenue"],
+    )
@@ -83,20 +83,23 @@ def handle_payment_success(payment):
                 defaults=dict(source=source, amount=spotpay_amount)
             )
 
-    if phone:
-        try:
-            send_voucher_sms(
-                vendor=vendor,
-                phone=phone,
-                voucher_code=voucher.code,
-                package_name=package.name,
-                payment=payment,
-                location=location,
-            )
-        except Exception as sms_exc:
-            import logging
-            logging.getLogger(__name__).error(
-                "send_voucher_sms failed for payment %s: %s", payment.uuid, sms_exc
-            )
+        # Queued in the voucher's transaction (outbox): a rolled-back payment
+        # never leaves an SMS behind. retry_voucher_sms re-queues any miss
+        if phone:
+            try:
+                with transaction.atomic():
+                    send_voucher_sms(
+                        vendor=vendor,
+                        phone=phone,
+                        voucher_code=voucher.code,
+                        package_name=package.name,
+                        payment=payment,
+                        location=location,
+                    )
+            except Exception as sms_exc:
+                import logging
+                logging.getLogger(__name__).error(
+                    "send_voucher_sms failed for payment %s: %s", payment.uuid, sms_exc
+                )
 
     # notify_vendor_receipt(payment)  # paused — Resend free tier limit
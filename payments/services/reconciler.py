@@ -0,0 +1,282 @@
+"""
+payments/services/reconciler.py
+===============================
+Status reconciler for LivePay / KwaPay payments that are still PENDING
+because the provider IPN never arrived (or arrived late).
+
+Replaces the old one-payment-at-a-time cron loops in
+verify_live_payments / verify_kwa_payments:
+
+  - one pooled requests.Session (keep-alive) shared by every check
+  - status checks run concurrently on a bounded thread pool
+  - a token bucket per provider keeps us under the provider rate limit
+  - each payment is re-polled on an adaptive schedule based on its age
+    (young payments often, older ones less often)
+
+Threads only do HTTP. Every DB write happens on the calling thread,
+inside transaction.atomic() with the Payment row locked, and success
+goes through settle_success() like every other entry point.
+
+Decision rules are unchanged from the old commands:
+  - older than 30 min     → one last check, then SUCCESS settles,
+                            FAILED fails, anything else is failed and
+                            flagged for manual review
+  - 1–30 min              → SUCCESS settles, FAILED fails, PENDING waits,
+                            no usable status for 10+ min fails
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.db import transaction
+from django.utils import timezone
+
+from payments.models import Payment, PaymentProvider
+from payments.live_client import LivePayClient
+from payments.kwa_client import KwaPayClient
+from payments.services.settlement import settle_success
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_TYPES = ("LIVE", "KWA")
+PROVIDER_NAMES = {"LIVE": "LivePay", "KWA": "KwaPay"}
+
+# Payments younger than this are left to the IPN
+MIN_AGE = timedelta(minutes=1)
+# Payments older than this get one final check and are resolved
+STALE_AGE = timedelta(minutes=30)
+# No usable status from the provider for this long → fail
+UNKNOWN_TIMEOUT = timedelta(minutes=10)
+
+# (age upper bound, seconds between polls)
+POLL_SCHEDULE = (
+    (timedelta(minutes=3), 10),
+    (timedelta(minutes=10), 30),
+    (STALE_AGE, 60),
+)
+
+OUTCOME_SETTLED = "settled"
+OUTCOME_FAILED = "failed"
+OUTCOME_TIMED_OUT = "timed_out"
+OUTCOME_REVIEW = "manual_review"
+OUTCOME_PENDING = "pending"
+OUTCOME_SKIPPED = "skipped"
+
+
+def poll_interval(age):
+    """
+    Seconds to wait before polling a payment of this age again. Past
+    STALE_AGE the final check normally resolves the payment; if it errored,
+    it is retried at the slowest scheduled rate, not on every tick.
+    """
+    for upper, seconds in POLL_SCHEDULE:
+        if age < upper:
+            return seconds
+    return POLL_SCHEDULE[-1][1]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens are added per second up to
+    `capacity`; acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def build_session(pool_size=10):
+    """Keep-alive session sized for `pool_size` concurrent requests."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=len(PROVIDER_TYPES), pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_client(provider, session=None):
+    if provider.provider_type == "LIVE":
+        return LivePayClient(public_key=provider.api_key, secret_key=provider.api_secret, session=session)
+    return KwaPayClient(primary_api=provider.api_key, secondary_api=provider.api_secret, session=session)
+
+
+def normalize_status(provider_type, result):
+    """Map a provider status response to SUCCESS / FAILED / PENDING (or the raw value)."""
+    if provider_type == "LIVE":
+        return LivePayClient.get_transaction_status(result)
+    status = str(result.get("status", "")).upper()
+    if status == "SUCCESSFUL":
+        return "SUCCESS"
+    return status
+
+
+def apply_result(payment_id, provider_type, result, *, now=None):
+    """
+    Apply one provider status response to a payment. Returns an OUTCOME_* code.
+    Runs on the calling thread — never call from a pool worker.
+    """
+    now = now or timezone.now()
+    status = normalize_status(provider_type, result)
+    name = PROVIDER_NAMES[provider_type]
+    source = f"{provider_type}_RECONCILER"
+
+    with transaction.atomic():
+        p = Payment.objects.select_for_update().get(pk=payment_id)
+        if p.status != "PENDING":
+            return OUTCOME_SKIPPED
+
+        age = now - p.initiated_at
+
+        if age > STALE_AGE:
+            p.raw_callback_data = result
+            if status == "SUCCESS":
+                # Customer paid — complete normally
+                settle_success(p, result, source=source)
+                return OUTCOME_SETTLED
+            if status == "FAILED":
+                # Customer was never charged — just auto-fail
+                p.mark_failed({"reason": "Payment failed on provider side"})
+                return OUTCOME_FAILED
+            # Still PENDING after 30 mins — flag for manual review.
+            # Do NOT refund automatically — transaction may still be in-flight.
+            p.mark_failed({"reason": "Payment not confirmed after 30 minutes"})
+            p.processor_message = (
+                "MANUAL REVIEW REQUIRED — timed out while still PENDING on provider. "
+                "Verify if customer was charged before refunding."
+            )
+            p.save(update_fields=["processor_message"])
+            return OUTCOME_REVIEW
+
+        if status not in ("SUCCESS", "FAILED", "PENDING"):
+            if age >= UNKNOWN_TIMEOUT:
+                p.mark_failed({"reason": f"No status from {name} after timeout"})
+                return OUTCOME_TIMED_OUT
+            return OUTCOME_PENDING
+
+        if status == "SUCCESS":
+            p.raw_callback_data = result
+            settle_success(p, result, source=source)
+            return OUTCOME_SETTLED
+
+        if status == "FAILED":
+            p.raw_callback_data = result
+            p.mark_failed(result)
+            return OUTCOME_FAILED
+
+    return OUTCOME_PENDING
+
+
+class Reconciler:
+    """
+    Polls pending LivePay / KwaPay payments concurrently.
+
+    Keep one instance alive for the life of the process so the HTTP
+    session, thread pool and per-payment poll schedule are reused.
+    """
+
+    def __init__(self, provider_types=PROVIDER_TYPES, workers=8, rate=5.0, burst=10):
+        self.provider_types = tuple(provider_types)
+        self.session = build_session(pool_size=workers)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reconciler")
+        self.buckets = {ptype: TokenBucket(rate, burst) for ptype in self.provider_types}
+        # payment id → monotonic time it is next due for a poll
+        self._next_poll = {}
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.session.close()
+
+    def _active_providers(self):
+        providers = {}
+        for ptype in self.provider_types:
+            provider = PaymentProvider.objects.filter(provider_type=ptype, is_active=True).first()
+            if provider:
+                providers[provider.id] = (ptype, build_client(provider, self.session))
+        return providers
+
+    def _check(self, ptype, client, reference):
+        self.buckets[ptype].acquire()
+        return client.check_status(reference)
+
+    def run_once(self, limit=200, on_result=None):
+        """
+        Poll every due payment (at most `limit`) and apply the results.
+        Returns {outcome: count}. `on_result(payment, outcome)` is called
+        for each applied result.
+        """
+        providers = self._active_providers()
+        counts = {}
+        if not providers:
+            return counts
+
+        now = timezone.now()
+        tick = time.monotonic()
+
+        rows = list(
+            Payment.objects
+            .filter(
+                status="PENDING",
+                provider_id__in=list(providers),
+                initiated_at__lte=now - MIN_AGE,
+            )
+            .exclude(provider_reference=None)
+            .order_by("-initiated_at")
+            .values("id", "uuid", "provider_id", "provider_reference", "initiated_at")
+        )
+
+        # Forget payments that are no longer pending
+        pending_ids = {row["id"] for row in rows}
+        for payment_id in list(self._next_poll):
+            if payment_id not in pending_ids:
+                del self._next_poll[payment_id]
+
+        due = [row for row in rows if self._next_poll.get(row["id"], 0) <= tick][:limit]
+
+        futures = {}
+        for row in due:
+            ptype, client = providers[row["provider_id"]]
+            futures[self.pool.submit(self._check, ptype, client, row["provider_reference"])] = (row, ptype)
+
+        for future in as_completed(futures):
+            row, ptype = futures[future]
+            try:
+                result = future.result()
+                outcome = apply_result(row["id"], ptype, result, now=timezone.now())
+            except Exception as exc:
+                logger.error("%s reconcile error for %s: %s", ptype, row["provider_reference"], exc)
+                outcome = OUTCOME_PENDING
+
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if outcome == OUTCOME_PENDING:
+                age = timezone.now() - row["initiated_at"]
+                self._next_poll[row["id"]] = time.monotonic() + poll_interval(age)
+            else:
+                self._next_poll.pop(row["id"], None)
+                if on_result:
+                    on_result(row, outcome)
+
+        return counts
@@ -0,0 +1,177 @@
+"""
+payments/services/references.py
+===============================
+One-query payment lookup by any reference a provider or client may send:
+
+  - our uuid, hyphenated or as the 32-char hex sent to Yo!
+  - the 30-char hex prefix sent to LivePay as customer_reference
+  - provider_reference (KwaPay / LivePay internal reference, MakyPay …)
+  - external_reference
+
+normalize() maps each of those to one key (uuids → lowercase hex), and
+PaymentReference holds a row per key, kept up to date by Payment.save()
+→ register(). resolve() is then a single indexed join instead of the
+uuid → provider_reference → reformatted-uuid → … chain of queries.
+
+Payments that never went through save() with a reference (bulk_create /
+update(), or created before the index existed) are found by one fallback
+query on Payment and registered on the way; manage.py
+backfill_payment_references fills the index up front.
+
+Hot PENDING payments — the ones being polled and called back — are kept
+in a small per-process LRU (reference key → payment id), so repeat
+lookups are a primary-key read. The mapping never changes, so the LRU
+needs no invalidation.
+"""
+
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.db.models import Q
+
+from payments.models import Payment, PaymentReference
+
+LRU_SIZE = 1024
+# LivePay caps references at 30 chars: uuid hex[:30]
+SHORT_REFERENCE_LENGTH = 30
+
+_SHORT_HEX = re.compile(r"[0-9a-fA-F]{%d}" % SHORT_REFERENCE_LENGTH)
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def normalize(reference):
+    """The PaymentReference key for a raw reference ('' if there is none)."""
+    ref = str(reference or "").strip()
+    if not ref:
+        return ""
+    try:
+        return uuid.UUID(ref).hex
+    except ValueError:
+        pass
+    if _SHORT_HEX.fullmatch(ref):
+        return ref.lower()
+    return ref
+
+
+def reference_keys(payment):
+    """{key: kind} for every reference the payment can be found by."""
+    keys = {}
+    for ref, kind in (
+        (payment.external_reference, PaymentReference.KIND_EXTERNAL),
+        (payment.provider_reference, PaymentReference.KIND_PROVIDER),
+    ):
+        key = normalize(ref)
+        if key:
+            keys[key] = kind
+    hex_uuid = uuid.UUID(str(payment.uuid)).hex
+    keys[hex_uuid] = keys[hex_uuid[:SHORT_REFERENCE_LENGTH]] = PaymentReference.KIND_UUID
+    return keys
+
+
+def register(payment):
+    """Add the payment's references to the index (existing keys are left alone)."""
+    register_many([payment])
+
+
+def register_many(payments):
+    rows = [
+        PaymentReference(reference=key, payment_id=payment.pk, kind=kind)
+        for payment in payments
+        for key, kind in reference_keys(payment).items()
+    ]
+    PaymentReference.objects.bulk_create(rows, ignore_conflicts=True, batch_size=1000)
+
+
+# ---------------------------------------------------------------------------
+# LRU (reference key → payment id)
+# ---------------------------------------------------------------------------
+
+def _lru_get(keys):
+    with _lru_lock:
+        for key in keys:
+            payment_id = _lru.get(key)
+            if payment_id is not None:
+                _lru.move_to_end(key)
+                return payment_id
+    return None
+
+
+def _lru_put(keys, payment_id):
+    with _lru_lock:
+        for key in keys:
+            _lru[key] = payment_id
+            _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _lru_drop(keys):
+    with _lru_lock:
+        for key in keys:
+            _lru.pop(key, None)
+
+
+def clear_cache():
+    with _lru_lock:
+        _lru.clear()
+
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+def _as_uuid(key):
+    try:
+        return uuid.UUID(key) if len(key) == 32 else None
+    except ValueError:
+        return None
+
+
+def _fallback(qs, references, keys):
+    """Payments not in the index yet: one query on Payment's own unique columns."""
+    raw = [str(ref).strip() for ref in references if ref]
+    cond = Q(provider_reference__in=raw)
+    uuids = [u for u in map(_as_uuid, keys) if u is not None]
+    if uuids:
+        cond |= Q(uuid__in=uuids)
+    payment = qs.filter(cond).first()
+    if payment is not None:
+        register(payment)
+    return payment
+
+
+def resolve(*references, for_update=False, select_related=()):
+    """
+    The Payment any of `references` points to, or None. With for_update
+    the Payment row is locked (SELECT … FOR UPDATE), so call it inside
+    transaction.atomic().
+    """
+    keys = [key for key in dict.fromkeys(normalize(ref) for ref in references) if key]
+    if not keys:
+        return None
+
+    qs = Payment.objects.select_related(*select_related)
+    if for_update:
+        qs = qs.select_for_update(of=("self",))
+
+    payment = None
+    payment_id = _lru_get(keys)
+    if payment_id is not None:
+        payment = qs.filter(pk=payment_id).first()
+        # Deleted since (or a reused id) — forget it and look it up properly
+        if payment is None or not set(keys) & set(reference_keys(payment)):
+            payment = None
+            _lru_drop(keys)
+    if payment is None:
+        payment = qs.filter(lookup_references__reference__in=keys).first()
+    if payment is None:
+        payment = _fallback(qs, references, keys)
+
+    if payment is not None and payment.status == "PENDING":
+        own = reference_keys(payment)
+        _lru_put([key for key in keys if key in own], payment.pk)
+    return payment
@@ -0,0 +1,203 @@
+"""
+payments/services/settlement.py
+===============================
+Single settlement path for every provider callback, verify endpoint
+and status-polling command.
+
+Two halves:
+  - settle_success()  → runs inside the caller's transaction with the
+                        Payment row locked. Flips the payment to SUCCESS,
+                        applies the cheap DB-only side effects
+                        (subscription renewal, SMS wallet credit, revenue
+                        rollups) and enqueues a SettlementJob in the same transaction.
+  - run_settlement_job() → executed by the settlement worker
+                        (manage.py run_settlement_worker). Sends vendor
+                        notifications and runs handle_payment_success
+                        (voucher issuance, split accounting, voucher SMS).
+
+Webhook handlers therefore never make outbound HTTP calls and return
+as soon as the row is committed.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from analytics.services.rollups import record_payment
+from payments.models import Payment, PendingFulfilment, SettlementJob
+from payments.services import fulfilment
+from payments.services.payment_success import handle_payment_success
+from payments.services.status_events import publish_status_on_commit
+from sms.services.sms_topup import credit_sms_wallet
+from sms.services.notifications import notify_vendor_payment_received, notify_vendor_receipt
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+# Backoff between attempts: 5s, 10s, 20s … capped at 10 minutes
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 600
+# A RUNNING job not finished after this long is assumed orphaned by a dead worker
+STALE_LOCK = timedelta(minutes=10)
+
+
+def _handle_subscription_renewal(payment):
+    """Extend or activate a monthly subscription by 30 days."""
+    location = payment.location
+    now = timezone.now()
+    if location.subscription_expires_at and location.subscription_expires_at > now:
+        location.subscription_expires_at += timedelta(days=30)
+    else:
+        location.subscription_expires_at = now + timedelta(days=30)
+    location.subscription_active = True
+    location.is_active = True
+    location.save(update_fields=["subscription_expires_at", "subscription_active", "is_active"])
+
+
+def _credit_sms_purchase(payment):
+    try:
+        # credit_sms_wallet also books the SpotPay SMS earning
+        credit_sms_wallet(vendor=payment.vendor, amount_paid=int(float(payment.amount)))
+    except Exception as exc:
+        payment.processor_message = f"SMS credit warning: {exc}"
+        payment.save(update_fields=["processor_message"])
+
+
+def enqueue_settlement(payment, source=""):
+    """
+    Record a durable settle job for a SUCCESS payment.
+    Idempotent — a payment has at most one job; re-enqueueing a finished
+    or failed job resets it to PENDING so it runs again.
+    """
+    job, created = SettlementJob.objects.get_or_create(
+        payment=payment,
+        defaults={"source": source},
+    )
+    if not created and job.status in (SettlementJob.STATUS_DONE, SettlementJob.STATUS_FAILED):
+        job.status = SettlementJob.STATUS_PENDING
+        job.next_attempt_at = timezone.now()
+        job.last_error = ""
+        job.save(update_fields=["status", "next_attempt_at", "last_error"])
+    return job
+
+
+def settle_success(payment, data=None, *, source=""):
+    """
+    Mark a locked PENDING payment SUCCESS and enqueue its settlement.
+
+    Must be called inside transaction.atomic() on a row fetched with
+    select_for_update(). Returns False if the payment was already SUCCESS.
+    """
+    if payment.status == "SUCCESS":
+        return False
+
+    payment.mark_success(data)
+    record_payment(payment)
+
+    if payment.purpose == "SUBSCRIPTION" and payment.location_id:
+        _handle_subscription_renewal(payment)
+
+    if payment.purpose == "SMS_PURCHASE" and payment.vendor_id:
+        _credit_sms_purchase(payment)
+
+    enqueue_settlement(payment, source=source)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def _backoff(attempts):
+    seconds = min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=seconds)
+
+
+def claim_due_jobs(limit=20):
+    """
+    Atomically claim up to `limit` due jobs for this worker.
+    SKIP LOCKED lets several workers drain the queue without contending.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            SettlementJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=SettlementJob.STATUS_PENDING, next_attempt_at__lte=now)
+                | Q(status=SettlementJob.STATUS_RUNNING, locked_at__lt=now - STALE_LOCK)
+            )
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        if jobs:
+            SettlementJob.objects.filter(id__in=[j.id for j in jobs]).update(
+                status=SettlementJob.STATUS_RUNNING,
+                locked_at=now,
+            )
+    return jobs
+
+
+def run_settlement_job(job):
+    """
+    Run the post-payment side effects for one job and record the outcome.
+    Returns True on success.
+    """
+    payment = (
+        Payment.objects
+        .select_related("vendor", "package", "location", "provider")
+        .get(pk=job.payment_id)
+    )
+    attempts = job.attempts + 1
+
+    try:
+        handle_payment_success(payment)
+    except Exception as exc:
+        logger.error("Settlement job %s for payment %s failed (attempt %s): %s",
+                     job.id, payment.uuid, attempts, exc)
+        failed = attempts >= MAX_ATTEMPTS
+        SettlementJob.objects.filter(pk=job.pk).update(
+            status=SettlementJob.STATUS_FAILED if failed else SettlementJob.STATUS_PENDING,
+            attempts=attempts,
+            next_attempt_at=timezone.now() + _backoff(attempts),
+            locked_at=None,
+            last_error=str(exc)[:2000],
+        )
+        if failed:
+            # Out of settlement retries — the fulfilment reconciler keeps trying
+            fulfilment.enqueue(payment.pk, PendingFulfilment.REASON_SETTLEMENT_FAILED, str(exc))
+        return False
+
+    # Voucher is issued — wake the customer's status page before notifying the vendor
+    publish_status_on_commit(payment)
+
+    # Notifications are best-effort — never retry a settled voucher for them
+    if payment.vendor_id:
+        try:
+            if payment.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
+                notify_vendor_receipt(payment)
+            else:
+                notify_vendor_payment_received(payment)
+        except Exception as exc:
+            logger.error("Settlement notification failed for payment %s: %s", payment.uuid, exc)
+
+    SettlementJob.objects.filter(pk=job.pk).update(
+        status=SettlementJob.STATUS_DONE,
+        attempts=attempts,
+        locked_at=None,
+        last_error="",
+        completed_at=timezone.now(),
+    )
+    return True
+
+
+def process_due_jobs(limit=20):
+    """Claim and run one batch. Returns (processed, succeeded)."""
+    jobs = claim_due_jobs(limit=limit)
+    succeeded = 0
+    for job in jobs:
+        if run_settlement_job(job):
+            succeeded += 1
+    return len(jobs), succeeded
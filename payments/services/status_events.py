@@ -0,0 +1,180 @@
+"""
+payments/services/status_events.py
+==================================
+Push channel for payment status changes.
+
+Publish side (sync, any process):
+  publish_status()   → Redis PUBLISH on payment_status:<uuid> whenever a
+                       payment is marked SUCCESS / FAILED (after commit)
+                       and when the settlement worker issues the voucher.
+                       Fire-and-forget — a Redis outage never breaks
+                       settlement, waiting clients fall back to re-reading
+                       the DB.
+
+Subscribe side (async, ASGI worker):
+  StatusSubscription → async context manager used by the long-poll and
+                       SSE views in payments/stream_views.py. Subscribe
+                       first, then read the snapshot, so no change can be
+                       missed in between.
+
+The message body is only a wake-up call; the DB row is always re-read,
+so the snapshot a client sees is never stale.
+"""
+
+import asyncio
+import json
+import logging
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "payment_status:"
+# How often to re-read the DB while Redis is unavailable
+FALLBACK_POLL_SECONDS = 2.0
+
+_client = None
+_async_client = None
+
+
+def channel_name(payment_uuid):
+    return f"{CHANNEL_PREFIX}{payment_uuid}"
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _client
+
+
+def _async_redis():
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.REDIS_URL, socket_connect_timeout=2)
+    return _async_client
+
+
+# ---------------------------------------------------------------------------
+# Snapshot
+# ---------------------------------------------------------------------------
+
+def status_snapshot(payment):
+    """
+    JSON-ready status for a payment, shared by the polling, long-poll
+    and SSE endpoints.
+
+    state: PENDING → PAID (SUCCESS, voucher not issued yet) → READY
+           (voucher issued), or FAILED. `final` is True once nothing
+           further will change for the client.
+    """
+    voucher_code = None
+    if payment.status == "SUCCESS":
+        try:
+            voucher_code = payment.issued_voucher.voucher.code
+        except Exception:
+            voucher_code = None
+
+    if payment.status == "FAILED":
+        state = "FAILED"
+    elif payment.status == "SUCCESS":
+        state = "READY" if voucher_code or payment.purpose != "TRANSACTION" else "PAID"
+    else:
+        state = "PENDING"
+
+    snapshot = {
+        "success": True,
+        "reference": payment.provider_reference,
+        "payment_uuid": str(payment.uuid),
+        "status": payment.status,
+        "state": state,
+        "final": state in ("READY", "FAILED"),
+        "message": (
+            "Please approve the payment on your phone."
+            if payment.status == "PENDING"
+            else "Payment successful."
+            if payment.status == "SUCCESS"
+            else "Payment failed."
+        ),
+    }
+    if payment.status == "SUCCESS":
+        snapshot["voucher"] = voucher_code
+        snapshot["hotspot_dns"] = payment.location.hotspot_dns if payment.location_id else "hot.spot"
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# Publish
+# ---------------------------------------------------------------------------
+
+def publish_status(payment):
+    """Wake any client waiting on this payment. Never raises."""
+    try:
+        _redis().publish(channel_name(payment.uuid), json.dumps({"status": payment.status}))
+    except Exception as exc:
+        logger.warning("Payment status publish failed for %s: %s", payment.uuid, exc)
+
+
+def publish_status_on_commit(payment):
+    transaction.on_commit(lambda: publish_status(payment))
+
+
+# ---------------------------------------------------------------------------
+# Subscribe
+# ---------------------------------------------------------------------------
+
+class StatusSubscription:
+    """
+    async with StatusSubscription(payment.uuid) as sub:
+        ...read snapshot...
+        notified = await sub.wait(timeout)
+    """
+
+    def __init__(self, payment_uuid):
+        self.channel = channel_name(payment_uuid)
+        self._pubsub = None
+
+    async def __aenter__(self):
+        try:
+            self._pubsub = _async_redis().pubsub()
+            await self._pubsub.subscribe(self.channel)
+        except Exception as exc:
+            logger.warning("Payment status subscribe failed for %s: %s", self.channel, exc)
+            self._pubsub = None
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.channel)
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+
+    async def wait(self, timeout):
+        """
+        Wait up to `timeout` seconds for a status message.
+        Returns True when the caller should re-read the payment.
+        """
+        if self._pubsub is None:
+            await asyncio.sleep(min(timeout, FALLBACK_POLL_SECONDS))
+            return True
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            except Exception as exc:
+                logger.warning("Payment status subscription lost for %s: %s", self.channel, exc)
+                self._pubsub = None
+                await asyncio.sleep(min(remaining, FALLBACK_POLL_SECONDS))
+                return True
+            if message is not None:
+                return True
@@ -0,0 +1,165 @@
+"""
+payments/services/webhook_inbox.py
+==================================
+Append-only inbox in front of the provider IPN handlers (ipn_views.py).
+
+  receive()  → stores the raw delivery with ONE statement:
+                   INSERT … ON CONFLICT (dedupe_hash) DO UPDATE … WHERE
+                   status = 'FAILED' OR outcome IN (RETRYABLE_OUTCOMES)
+                   OR (status = 'RECEIVED' AND received_at < now - STALE_RECEIVED)
+                   RETURNING id
+               A redelivery of a body we already have returns no row, so
+               the view answers OK without locking or even reading the
+               Payment. Only a redelivery of an entry whose processing
+               FAILED, that could not be resolved yet (no_payment: the
+               IPN beat our own Payment row), or that was stored but never
+               processed (worker killed in between: timeout, OOM,
+               redeploy) comes back (attempts + 1) and is processed again
+               — provider retries still recover.
+  process()  → runs the source's handler and records status / outcome /
+               payment on the entry.
+  replay()   → reprocesses stored entries in bulk through the same
+               handlers (settle_success path), for outage recovery —
+               manage.py replay_webhooks and the admin action.
+  prune()    → retention: the endpoints are unauthenticated, so bodies
+               are not kept forever (manage.py prune_webhooks, daily).
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from payments.models import WebhookInbox
+
+logger = logging.getLogger(__name__)
+
+# Never stored
+SKIP_HEADERS = {"cookie", "authorization"}
+REPLAY_CHUNK = 200
+# Handled, but worth handling again if the provider redelivers
+RETRYABLE_OUTCOMES = ("no_payment",)
+# RECEIVED for this long: the worker died before process(), reclaim on redelivery
+STALE_RECEIVED = timedelta(minutes=5)
+# PROCESSED entries are dropped after RETENTION, everything after FAILED_RETENTION
+RETENTION = timedelta(days=30)
+FAILED_RETENTION = timedelta(days=90)
+PRUNE_BATCH = 5000
+
+_COLUMNS = ("source", "dedupe_hash", "headers", "body", "status", "outcome", "attempts", "error", "received_at")
+
+
+def dedupe_hash(source, body):
+    return hashlib.sha256(f"{source}\n{body}".encode("utf-8")).hexdigest()
+
+
+def receive(source, request):
+    """
+    Store a delivery. Returns the new (or reclaimed FAILED / retryable /
+    stale RECEIVED) WebhookInbox entry to process, or None if it is a
+    duplicate.
+    """
+    body = request.body.decode("utf-8", errors="replace")
+    entry = WebhookInbox(
+        source=source,
+        dedupe_hash=dedupe_hash(source, body),
+        headers={k: v for k, v in request.headers.items() if k.lower() not in SKIP_HEADERS},
+        body=body,
+        received_at=timezone.now(),
+    )
+
+    qn = connection.ops.quote_name
+    table = qn(WebhookInbox._meta.db_table)
+    fields = [WebhookInbox._meta.get_field(name) for name in _COLUMNS]
+    params = [field.get_db_prep_save(getattr(entry, field.attname), connection) for field in fields]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(f.column) for f in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT ({qn('dedupe_hash')}) DO UPDATE "
+        f"SET {qn('attempts')} = {table}.{qn('attempts')} + 1, {qn('status')} = %s, "
+        # A reclaimed stale entry starts a new grace period, so a concurrent redelivery stays a duplicate
+        f"{qn('received_at')} = CASE WHEN {table}.{qn('status')} = %s "
+        f"THEN excluded.{qn('received_at')} ELSE {table}.{qn('received_at')} END "
+        f"WHERE {table}.{qn('status')} = %s "
+        f"OR {table}.{qn('outcome')} IN ({', '.join(['%s'] * len(RETRYABLE_OUTCOMES))}) "
+        f"OR ({table}.{qn('status')} = %s AND {table}.{qn('received_at')} < %s) "
+        f"RETURNING {qn('id')}, {qn('attempts')}"
+    )
+    received = WebhookInbox._meta.get_field("received_at")
+    stale_before = received.get_db_prep_value(entry.received_at - STALE_RECEIVED, connection)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [
+            WebhookInbox.STATUS_RECEIVED, WebhookInbox.STATUS_RECEIVED,
+            WebhookInbox.STATUS_FAILED, *RETRYABLE_OUTCOMES,
+            WebhookInbox.STATUS_RECEIVED, stale_before,
+        ])
+        row = cursor.fetchone()
+
+    if row is None:
+        logger.info("%s: duplicate delivery %s ignored", source, entry.dedupe_hash[:12])
+        return None
+    entry.pk, entry.attempts = row
+    return entry
+
+
+def process(entry, parse, handle):
+    """
+    Run handle(parse(entry.body)) → (outcome, payment) and record it.
+    Returns the outcome; a handler error marks the entry FAILED and is re-raised.
+    """
+    try:
+        outcome, payment = handle(parse(entry.body))
+    except Exception as exc:
+        logger.error("%s entry %s failed: %s", entry.source, entry.pk, exc)
+        WebhookInbox.objects.filter(pk=entry.pk).update(
+            status=WebhookInbox.STATUS_FAILED, error=str(exc)[:2000], processed_at=timezone.now(),
+        )
+        raise
+    WebhookInbox.objects.filter(pk=entry.pk).update(
+        status=WebhookInbox.STATUS_PROCESSED,
+        outcome=outcome,
+        payment=payment,
+        error="",
+        processed_at=timezone.now(),
+    )
+    return outcome
+
+
+def replay(entries):
+    """
+    Reprocess stored entries (a queryset) through their handlers, oldest
+    first, REPLAY_CHUNK rows at a time. Returns {outcome: count}, with
+    handler errors counted under "error".
+    """
+    from payments.ipn_views import WEBHOOK_HANDLERS
+
+    results = {}
+    for entry in entries.order_by("received_at", "id").iterator(chunk_size=REPLAY_CHUNK):
+        parse, handle = WEBHOOK_HANDLERS[entry.source]
+        try:
+            outcome = process(entry, parse, handle)
+        except Exception:
+            outcome = "error"
+        results[outcome] = results.get(outcome, 0) + 1
+    return results
+
+
+def expired(now=None):
+    """Entries past retention: PROCESSED after RETENTION, anything after FAILED_RETENTION."""
+    now = now or timezone.now()
+    return WebhookInbox.objects.filter(
+        received_at__lt=now - RETENTION, status=WebhookInbox.STATUS_PROCESSED,
+    ) | WebhookInbox.objects.filter(received_at__lt=now - FAILED_RETENTION)
+
+
+def prune(now=None):
+    """Delete expired() entries, PRUNE_BATCH rows per statement. Returns the count."""
+    stale = expired(now)
+    deleted = 0
+    while True:
+        ids = list(stale.values_list("pk", flat=True)[:PRUNE_BATCH])
+        if not ids:
+            return deleted
+        deleted += WebhookInbox.objects.filter(pk__in=ids).delete()[0]
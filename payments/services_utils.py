@@ -7,7 +7,7 @@ from hotspot.models import HotspotLocation
 from packages.models import Package
 from payments.models import Payment
 from payments.utils import get_active_provider, load_provider_adapter
-from payments.services.payment_success import handle_payment_success
+from payments.services.settlement import settle_success
 
 
 # =====================================================
@@ -112,10 +112,9 @@ def payment_success_by_reference(provider_reference: str, callback_data=None):
         if payment.status == "SUCCESS":
             return payment
 
-        payment.mark_success(callback_data)
+        # Voucher + split + SMS run on the settlement worker
+        settle_success(payment, callback_data, source="PROVIDER_WEBHOOK")
 
-    # After commit: issue voucher + link + sms (idempotent)
-    handle_payment_success(payment)
     return payment
 
 
@@ -0,0 +1,111 @@
+"""
+payments/stream_views.py
+========================
+Push-based payment status for the wait page and the captive portal.
+
+Instead of the client re-requesting /payments/status/<ref>/ every few
+seconds, it holds one request open and is answered the moment the
+settlement path publishes a change (see payments/services/status_events.py):
+
+  GET /payments/status/<ref>/wait/?state=PENDING&timeout=25
+      Long-poll. Returns as soon as the state differs from ?state, or
+      the current snapshot once `timeout` seconds pass.
+
+  GET /payments/status/<ref>/events/
+      Server-Sent Events. Streams an `event: status` frame per change
+      until the payment is final, with `: ping` heartbeats in between.
+
+Both are async views — run them under the ASGI worker (web-async in
+docker-compose.yml, routed by nginx) so an open connection holds no
+thread or DB connection while it waits. That only holds while every
+middleware in settings.ASGI_MIDDLEWARE is async-capable (Billing/asgi.py
+selects it); one sync-only middleware puts the whole chain back on a
+thread per request.
+"""
+
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+
+from payments.models import Payment
+from payments.services import references
+from payments.services.status_events import StatusSubscription, status_snapshot
+
+DEFAULT_WAIT_SECONDS = 25
+MAX_WAIT_SECONDS = 55
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_SECONDS = 120
+
+
+def _load_payment(reference):
+    payment = references.resolve(reference, select_related=("location",))
+    if not payment:
+        raise Http404
+    return payment
+
+
+def _read_snapshot(payment_id):
+    return status_snapshot(Payment.objects.select_related("location").get(pk=payment_id))
+
+
+load_payment = sync_to_async(_load_payment)
+read_snapshot = sync_to_async(_read_snapshot)
+
+
+async def payment_status_wait(request, reference):
+    payment = await load_payment(reference)
+    known_state = request.GET.get("state", "")
+    try:
+        timeout = float(request.GET.get("timeout", DEFAULT_WAIT_SECONDS))
+    except ValueError:
+        timeout = DEFAULT_WAIT_SECONDS
+    timeout = max(0.0, min(timeout, MAX_WAIT_SECONDS))
+
+    deadline = time.monotonic() + timeout
+    async with StatusSubscription(payment.uuid) as sub:
+        snapshot = await read_snapshot(payment.pk)
+        while snapshot["state"] == known_state and not snapshot["final"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if await sub.wait(remaining):
+                snapshot = await read_snapshot(payment.pk)
+
+    return JsonResponse(snapshot, headers={"Cache-Control": "no-store"})
+
+
+def _sse_frame(snapshot):
+    return f"event: status\ndata: {json.dumps(snapshot)}\n\n"
+
+
+async def _status_stream(payment):
+    deadline = time.monotonic() + SSE_MAX_SECONDS
+    async with StatusSubscription(payment.uuid) as sub:
+        snapshot = await read_snapshot(payment.pk)
+        yield _sse_frame(snapshot)
+        last_state = snapshot["state"]
+
+        while not snapshot["final"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not await sub.wait(min(remaining, SSE_HEARTBEAT_SECONDS)):
+                yield ": ping\n\n"
+                continue
+            snapshot = await read_snapshot(payment.pk)
+            if snapshot["state"] != last_state:
+                last_state = snapshot["state"]
+                yield _sse_frame(snapshot)
+
+    # Tell EventSource to reconnect later rather than immediately if we timed out
+    yield "retry: 5000\n\n"
+
+
+async def payment_status_events(request, reference):
+    payment = await load_payment(reference)
+    response = StreamingHttpResponse(_status_stream(payment), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
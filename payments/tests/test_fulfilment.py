@@ -0,0 +1,108 @@
+"""
+payments/tests/test_fulfilment.py
+Tests for the voucher fulfilment reconciler — incremental scan past the
+(completed_at, id) watermark plus the needs-fulfilment queue.
+
+Run with:
+    python manage.py test payments.tests.test_fulfilment
+"""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from payments.models import FulfilmentWatermark, Payment, PaymentVoucher, PendingFulfilment, SettlementJob
+from payments.services import fulfilment
+from payments.tests.test_settlement import _make_payment, _make_vendor
+from vouchers.models import Voucher
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _settle(payment, minutes_ago=10):
+    Payment.objects.filter(pk=payment.pk).update(
+        status="SUCCESS", completed_at=timezone.now() - timedelta(minutes=minutes_ago),
+        provider_reference=f"KWA-SETTLED-{payment.pk}",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestFulfilmentReconciler(TestCase):
+
+    def setUp(self):
+        self.vendor = _make_vendor()
+
+    def test_recovers_missing_voucher_and_advances_watermark(self):
+        payment = _make_payment(self.vendor)
+        _settle(payment)
+
+        counts = fulfilment.run()
+
+        self.assertEqual((counts["scanned"], counts["recovered"]), (1, 1))
+        self.assertTrue(PaymentVoucher.objects.filter(payment=payment).exists())
+        watermark = FulfilmentWatermark.objects.get()
+        self.assertEqual(watermark.last_payment_id, payment.pk)
+        self.assertEqual(watermark.recovered, 1)
+        # Nothing new past the watermark
+        self.assertEqual(fulfilment.run()["scanned"], 0)
+
+    def test_recent_and_settling_payments_are_left_alone(self):
+        recent = _make_payment(self.vendor, with_voucher=False)
+        _settle(recent, minutes_ago=0)
+        settling = _make_payment(_make_vendor(username="vendor2"), with_voucher=False)
+        _settle(settling)
+        SettlementJob.objects.create(payment=settling)
+
+        counts = fulfilment.run()
+
+        self.assertEqual((counts["scanned"], counts["out_of_stock"]), (1, 0))
+        self.assertFalse(PendingFulfilment.objects.exists())
+        self.assertEqual(FulfilmentWatermark.objects.get().last_payment_id, settling.pk)
+
+    def test_out_of_stock_is_queued_then_recovered(self):
+        payment = _make_payment(self.vendor, with_voucher=False)
+        _settle(payment)
+
+        counts = fulfilment.run()
+        self.assertEqual(counts["out_of_stock"], 1)
+        item = PendingFulfilment.objects.get(payment=payment)
+        self.assertEqual((item.reason, item.attempts), (PendingFulfilment.REASON_OUT_OF_STOCK, 1))
+        self.assertGreater(item.next_attempt_at, timezone.now())
+
+        # Not due yet — and not rescanned, the watermark has moved on
+        self.assertEqual(fulfilment.run()["out_of_stock"], 0)
+
+        Voucher.objects.create(package=payment.package, code="late0001")
+        PendingFulfilment.objects.update(next_attempt_at=timezone.now())
+        counts = fulfilment.run()
+
+        self.assertEqual((counts["retried"], counts["recovered"], counts["pending"]), (1, 1, 0))
+        self.assertEqual(PaymentVoucher.objects.get(payment=payment).voucher.code, "late0001")
+        self.assertEqual(fulfilment.fulfilment_stats()["recovered"], 1)
+        self.assertEqual(FulfilmentWatermark.objects.get().out_of_stock, 1)
+
+    def test_locked_payment_is_queued_not_stepped_over(self):
+        payment = _make_payment(self.vendor)
+        _settle(payment)
+
+        # Another run holds the row: fulfil()'s SKIP LOCKED select finds nothing
+        with patch.object(fulfilment.Payment.objects, "select_for_update") as select:
+            select.return_value.select_related.return_value.filter.return_value.first.return_value = None
+            counts = fulfilment.run()
+
+        self.assertEqual((counts["scanned"], counts["recovered"]), (1, 0))
+        self.assertEqual(FulfilmentWatermark.objects.get().last_payment_id, payment.pk)
+        item = PendingFulfilment.objects.get(payment=payment)
+        self.assertEqual((item.reason, item.attempts, item.last_error), (PendingFulfilment.REASON_ERROR, 0, "row locked"))
+        self.assertLessEqual(item.next_attempt_at, timezone.now())
+
+        counts = fulfilment.run()
+        self.assertEqual((counts["retried"], counts["recovered"], counts["pending"]), (1, 1, 0))
+        self.assertTrue(PaymentVoucher.objects.filter(payment=payment).exists())
@@ -0,0 +1,75 @@
+"""
+payments/tests/test_metrics.py
+Tests for the single-query dashboard metrics service.
+
+Run with:
+    python manage.py test payments.tests.test_metrics
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from payments.models import Payment
+from payments.services.metrics import PaymentMetrics, payment_metrics
+from payments.tests.test_settlement import _make_payment, _make_vendor
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestPaymentMetrics(TestCase):
+
+    def setUp(self):
+        self.vendor = _make_vendor()
+        paid = _make_payment(self.vendor)
+        paid.mark_success()
+
+        def extra(ref, status, amount, days_ago=0):
+            p = Payment.objects.create(
+                payer_type="CLIENT", purpose="TRANSACTION", vendor=self.vendor,
+                location=paid.location, package=paid.package, phone="256700000002",
+                amount=Decimal(amount), provider_reference=ref, status=status,
+                completed_at=timezone.now() - timedelta(days=days_ago) if status == "SUCCESS" else None,
+            )
+            Payment.objects.filter(pk=p.pk).update(initiated_at=timezone.now() - timedelta(days=days_ago))
+
+        extra("R-OLD", "SUCCESS", "700", days_ago=400)
+        extra("R-PEND", "PENDING", "300")
+        extra("R-FAIL", "FAILED", "200")
+
+    def test_all_cards_in_one_query(self):
+        qs = Payment.objects.filter(vendor=self.vendor, purpose="TRANSACTION")
+
+        with self.assertNumQueries(1):
+            metrics = payment_metrics(qs)
+
+        self.assertIsInstance(metrics, PaymentMetrics)
+        self.assertEqual(metrics.total_revenue, Decimal("1700"))
+        self.assertEqual(metrics.today_revenue, Decimal("1000"))
+        self.assertEqual(metrics.year_revenue, Decimal("1000"))
+        self.assertEqual(metrics.total_customers, 2)
+        self.assertEqual(metrics.today_customers, 1)
+        self.assertEqual(
+            (metrics.total_count, metrics.success_count, metrics.pending_count, metrics.failed_count),
+            (4, 2, 1, 1),
+        )
+        self.assertEqual(metrics.success_rate, 50)
+
+    def test_counts_since_scopes_status_breakdown_only(self):
+        qs = Payment.objects.filter(vendor=self.vendor, purpose="TRANSACTION")
+        metrics = payment_metrics(qs, counts_since=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(metrics.total_count, 3)
+        self.assertEqual(metrics.success_revenue, Decimal("1000"))
+        # Revenue windows are unaffected by the period scope
+        self.assertEqual(metrics.total_revenue, Decimal("1700"))
+
+    def test_empty_queryset_is_zero_filled(self):
+        metrics = payment_metrics(Payment.objects.none())
+        self.assertEqual(metrics.total_revenue, Decimal("0.00"))
+        self.assertEqual(metrics.success_rate, 0)
+        self.assertEqual(metrics.as_dict(floats=True)["week_revenue"], 0.0)
@@ -0,0 +1,111 @@
+"""
+payments/tests/test_reconciler.py
+Tests for the LivePay/KwaPay status reconciler — decision rules,
+adaptive poll schedule and concurrent polling with a mocked client.
+
+Run with:
+    python manage.py test payments.tests.test_reconciler
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from payments.models import Payment, SettlementJob
+from payments.services.reconciler import (
+    Reconciler, TokenBucket, apply_result, poll_interval,
+    OUTCOME_PENDING, OUTCOME_REVIEW, OUTCOME_SETTLED, OUTCOME_TIMED_OUT,
+)
+from payments.tests.test_settlement import _make_payment, _make_vendor
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _age(payment, minutes):
+    Payment.objects.filter(pk=payment.pk).update(
+        initiated_at=timezone.now() - timedelta(minutes=minutes)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestScheduleAndBucket(TestCase):
+
+    def test_poll_interval_backs_off_with_age(self):
+        young = poll_interval(timedelta(minutes=2))
+        middle = poll_interval(timedelta(minutes=5))
+        old = poll_interval(timedelta(minutes=20))
+        self.assertLess(young, middle)
+        self.assertLess(middle, old)
+        # A stale payment whose final check errored is not re-polled every tick
+        self.assertEqual(poll_interval(timedelta(minutes=45)), old)
+
+    def test_token_bucket_limits_burst(self):
+        bucket = TokenBucket(rate=1000, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertLess(bucket._tokens, 1)
+
+
+class TestApplyResult(TestCase):
+
+    def setUp(self):
+        self.payment = _make_payment(_make_vendor())
+
+    def test_success_settles_and_queues_job(self):
+        _age(self.payment, 2)
+        outcome = apply_result(self.payment.pk, "KWA", {"status": "SUCCESSFUL"})
+
+        self.assertEqual(outcome, OUTCOME_SETTLED)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "SUCCESS")
+        self.assertEqual(SettlementJob.objects.get(payment=self.payment).source, "KWA_RECONCILER")
+
+    def test_unknown_status_waits_then_times_out(self):
+        _age(self.payment, 2)
+        self.assertEqual(apply_result(self.payment.pk, "KWA", {"error": True}), OUTCOME_PENDING)
+
+        _age(self.payment, 11)
+        self.assertEqual(apply_result(self.payment.pk, "KWA", {"error": True}), OUTCOME_TIMED_OUT)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "FAILED")
+
+    def test_stale_pending_flagged_for_manual_review(self):
+        _age(self.payment, 31)
+        outcome = apply_result(self.payment.pk, "KWA", {"status": "PENDING"})
+
+        self.assertEqual(outcome, OUTCOME_REVIEW)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "FAILED")
+        self.assertIn("MANUAL REVIEW", self.payment.processor_message)
+
+
+class TestReconcilerRun(TestCase):
+
+    def test_polls_due_payments_and_backs_off_pending(self):
+        payment = _make_payment(_make_vendor())
+        _age(payment, 2)
+        reconciler = Reconciler(provider_types=("KWA",), workers=2)
+        try:
+            with mock.patch("payments.kwa_client.KwaPayClient.check_status",
+                            return_value={"status": "PENDING"}) as check:
+                self.assertEqual(reconciler.run_once(), {OUTCOME_PENDING: 1})
+                # Rescheduled — not polled again on the next tick
+                self.assertEqual(reconciler.run_once(), {})
+                self.assertEqual(check.call_count, 1)
+
+            with mock.patch("payments.kwa_client.KwaPayClient.check_status",
+                            return_value={"status": "SUCCESSFUL"}):
+                reconciler._next_poll.clear()
+                self.assertEqual(reconciler.run_once(), {OUTCOME_SETTLED: 1})
+        finally:
+            reconciler.close()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "SUCCESS")
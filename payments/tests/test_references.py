@@ -0,0 +1,74 @@
+"""
+payments/tests/test_references.py
+Tests for the payment reference resolver — any of a payment's references
+resolves with one indexed query, hot PENDING payments from the LRU.
+
+Run with:
+    python manage.py test payments.tests.test_references
+"""
+
+from django.test import TestCase
+
+from payments.models import Payment, PaymentReference
+from payments.services import references
+from payments.tests.test_settlement import _make_payment, _make_vendor
+
+
+class TestReferenceResolver(TestCase):
+
+    def setUp(self):
+        references.clear_cache()
+        self.payment = _make_payment(_make_vendor())
+        Payment.objects.filter(pk=self.payment.pk).update(external_reference="MTN-998877")
+        self.payment.refresh_from_db()
+        references.register(self.payment)
+
+    def test_every_reference_form_resolves_in_one_query(self):
+        hex_uuid = self.payment.uuid.hex
+        for reference in (str(self.payment.uuid), hex_uuid, hex_uuid.upper(), hex_uuid[:30],
+                          " KWA-REF-1 ", "MTN-998877"):
+            references.clear_cache()
+            with self.subTest(reference=reference), self.assertNumQueries(1):
+                self.assertEqual(references.resolve(reference), self.payment)
+
+    def test_unknown_reference_is_none(self):
+        self.assertIsNone(references.resolve("nope"))
+        self.assertIsNone(references.resolve("", None))
+
+    def test_pending_payment_is_served_from_the_lru(self):
+        references.resolve("KWA-REF-1")
+        self.assertIn("KWA-REF-1", references._lru)
+
+        PaymentReference.objects.all().delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(references.resolve("KWA-REF-1"), self.payment)
+
+    def test_settled_payment_is_not_cached(self):
+        Payment.objects.filter(pk=self.payment.pk).update(status="SUCCESS")
+        references.resolve("KWA-REF-1")
+        self.assertNotIn("KWA-REF-1", references._lru)
+
+    def test_unindexed_payment_is_found_and_indexed(self):
+        Payment.objects.filter(pk=self.payment.pk).update(provider_reference="KWA-NEW")
+
+        self.assertEqual(references.resolve("KWA-NEW"), self.payment)
+        self.assertEqual(
+            PaymentReference.objects.get(reference="KWA-NEW").kind, PaymentReference.KIND_PROVIDER,
+        )
+
+    def test_save_indexes_new_provider_reference(self):
+        self.payment.provider_reference = "KWA-SAVED"
+        self.payment.save(update_fields=["provider_reference"])
+        self.assertTrue(PaymentReference.objects.filter(reference="KWA-SAVED", payment=self.payment).exists())
+
+    def test_plain_save_does_not_touch_the_index(self):
+        payment = Payment.objects.get(pk=self.payment.pk)
+        payment.phone = "256700000009"
+        with self.assertNumQueries(1):
+            payment.save()
+
+    def test_save_indexes_reference_changed_without_update_fields(self):
+        payment = Payment.objects.get(pk=self.payment.pk)
+        payment.external_reference = "MTN-112233"
+        payment.save()
+        self.assertEqual(references.resolve("MTN-112233"), self.payment)
@@ -0,0 +1,147 @@
+"""
+payments/tests/test_settlement.py
+Tests for the settlement pipeline — webhook enqueues a job,
+worker issues the voucher, retries on failure.
+
+Run with:
+    python manage.py test payments.tests.test_settlement
+"""
+
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+
+from accounts.models import Vendor
+from hotspot.models import HotspotLocation
+from packages.models import Package
+from payments.ipn_views import kwa_ipn
+from payments.models import Payment, PaymentProvider, PaymentVoucher, SettlementJob
+from payments.services.settlement import process_due_jobs, settle_success, MAX_ATTEMPTS
+from vouchers.models import Voucher
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _make_vendor(username="vendor1"):
+    user = User.objects.create_user(username=username, password="x")
+    return Vendor.objects.create(
+        user=user,
+        company_name="Acme WiFi",
+        contact_person="Jo",
+        business_address="Kampala",
+        business_phone="256700000000",
+        business_email="acme@example.com",
+    )
+
+
+def _make_payment(vendor, *, purpose="TRANSACTION", with_voucher=True):
+    location = HotspotLocation.objects.create(
+        vendor=vendor, site_name="Cafe", address="Main St", town_city="Kampala",
+        status="ACTIVE", subscription_mode="PERCENTAGE",
+    )
+    package = Package.objects.create(location=location, name="1 Hour", price=1000)
+    if with_voucher:
+        Voucher.objects.create(package=package, code="abc12345")
+    provider = PaymentProvider.objects.create(
+        name="KwaPay", provider_type="KWA", api_key="k", api_secret="s", is_active=True,
+    )
+    return Payment.objects.create(
+        payer_type="CLIENT", purpose=purpose, vendor=vendor, location=location,
+        package=package, phone="256700000001", amount=Decimal("1000"),
+        provider=provider, provider_reference="KWA-REF-1",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestWebhookEnqueues(TestCase):
+
+    def setUp(self):
+        self.payment = _make_payment(_make_vendor())
+        self.factory = RequestFactory()
+
+    def _post(self, body):
+        request = self.factory.post(
+            "/payments/webhook/kwa/ipn/", data=json.dumps(body), content_type="application/json"
+        )
+        return kwa_ipn(request)
+
+    def test_success_marks_paid_and_queues_job_without_issuing(self):
+        resp = self._post({"internal_reference": "KWA-REF-1", "status": "SUCCESSFUL"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "SUCCESS")
+        job = SettlementJob.objects.get(payment=self.payment)
+        self.assertEqual(job.status, SettlementJob.STATUS_PENDING)
+        self.assertEqual(job.source, "KWA_IPN")
+        self.assertFalse(PaymentVoucher.objects.filter(payment=self.payment).exists())
+
+    def test_duplicate_delivery_creates_single_job(self):
+        self._post({"internal_reference": "KWA-REF-1", "status": "SUCCESSFUL"})
+        self._post({"internal_reference": "KWA-REF-1", "status": "SUCCESSFUL"})
+        self.assertEqual(SettlementJob.objects.filter(payment=self.payment).count(), 1)
+
+    def test_failed_status_does_not_queue(self):
+        self._post({"internal_reference": "KWA-REF-1", "status": "FAILED"})
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "FAILED")
+        self.assertFalse(SettlementJob.objects.exists())
+
+
+class TestSettlementWorker(TestCase):
+
+    def _settle(self, payment):
+        payment = Payment.objects.get(pk=payment.pk)
+        settle_success(payment, {"status": "SUCCESSFUL"}, source="TEST")
+
+    def test_worker_issues_voucher_and_split(self):
+        payment = _make_payment(_make_vendor())
+        self._settle(payment)
+
+        processed, succeeded = process_due_jobs()
+
+        self.assertEqual((processed, succeeded), (1, 1))
+        pv = PaymentVoucher.objects.get(payment=payment)
+        self.assertEqual(pv.voucher.code, "abc12345")
+        self.assertEqual(pv.voucher.status, "RESERVED")
+        self.assertTrue(hasattr(Payment.objects.get(pk=payment.pk), "split"))
+        self.assertEqual(SettlementJob.objects.get(payment=payment).status, SettlementJob.STATUS_DONE)
+
+    def test_out_of_stock_is_retried_with_backoff(self):
+        payment = _make_payment(_make_vendor(), with_voucher=False)
+        self._settle(payment)
+
+        process_due_jobs()
+
+        job = SettlementJob.objects.get(payment=payment)
+        self.assertEqual(job.status, SettlementJob.STATUS_PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertIn("No unused vouchers", job.last_error)
+
+        # Not due yet — nothing claimed
+        self.assertEqual(process_due_jobs(), (0, 0))
+
+        # Stock arrives, job becomes due
+        Voucher.objects.create(package=payment.package, code="late0001")
+        SettlementJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_due_jobs(), (1, 1))
+        self.assertTrue(PaymentVoucher.objects.filter(payment=payment).exists())
+
+    def test_gives_up_after_max_attempts(self):
+        payment = _make_payment(_make_vendor(), with_voucher=False)
+        self._settle(payment)
+        SettlementJob.objects.filter(payment=payment).update(attempts=MAX_ATTEMPTS - 1)
+
+        process_due_jobs()
+
+        self.assertEqual(SettlementJob.objects.get(payment=payment).status, SettlementJob.STATUS_FAILED)
@@ -0,0 +1,160 @@
+"""
+payments/tests/test_status_events.py
+Tests for the push-based payment status channel (snapshot, publish
+hooks, the long-poll view and the ASGI middleware chain).
+
+Run with:
+    python manage.py test payments.tests.test_status_events
+"""
+
+from unittest.mock import patch
+
+from asgiref.sync import SyncToAsync, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TestCase, override_settings
+
+from payments.models import PaymentVoucher
+from payments.services.status_events import channel_name, status_snapshot
+from payments.tests.test_settlement import _make_payment, _make_vendor
+from vouchers.models import Voucher
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeSubscription:
+    """Stands in for StatusSubscription; runs `on_wait` when the view waits."""
+
+    on_wait = None
+    waits = 0
+
+    def __init__(self, payment_uuid):
+        self.channel = channel_name(payment_uuid)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def wait(self, timeout):
+        type(self).waits += 1
+        if type(self).on_wait:
+            await type(self).on_wait()
+            return True
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestStatusSnapshot(TestCase):
+
+    def setUp(self):
+        self.vendor = _make_vendor()
+        self.payment = _make_payment(self.vendor)
+
+    def test_pending(self):
+        snap = status_snapshot(self.payment)
+        self.assertEqual((snap["state"], snap["final"]), ("PENDING", False))
+        self.assertNotIn("voucher", snap)
+
+    def test_paid_until_voucher_issued(self):
+        self.payment.mark_success()
+        snap = status_snapshot(self.payment)
+        self.assertEqual((snap["state"], snap["final"], snap["voucher"]), ("PAID", False, None))
+
+        voucher = Voucher.objects.get(code="abc12345")
+        PaymentVoucher.objects.create(voucher=voucher, payment=self.payment)
+        self.payment.refresh_from_db()
+        snap = status_snapshot(self.payment)
+        self.assertEqual((snap["state"], snap["final"], snap["voucher"]), ("READY", True, "abc12345"))
+
+    def test_non_voucher_purchase_is_final_on_success(self):
+        self.payment.purpose = "SMS_PURCHASE"
+        self.payment.mark_success()
+        self.assertEqual(status_snapshot(self.payment)["state"], "READY")
+
+    def test_failed(self):
+        self.payment.mark_failed()
+        snap = status_snapshot(self.payment)
+        self.assertEqual((snap["state"], snap["final"]), ("FAILED", True))
+
+
+class TestPublishHooks(TestCase):
+
+    def setUp(self):
+        self.payment = _make_payment(_make_vendor())
+
+    def test_mark_success_publishes_after_commit(self):
+        with patch("payments.services.status_events.publish_status") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.payment.mark_success()
+                publish.assert_not_called()
+        publish.assert_called_once_with(self.payment)
+
+    def test_redis_outage_does_not_raise(self):
+        with patch("payments.services.status_events._redis", side_effect=ConnectionError("down")):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.payment.mark_failed()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "FAILED")
+
+
+class TestStatusWaitView(TestCase):
+
+    def setUp(self):
+        self.payment = _make_payment(_make_vendor())
+        _FakeSubscription.on_wait = None
+        _FakeSubscription.waits = 0
+        patcher = patch("payments.stream_views.StatusSubscription", _FakeSubscription)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _url(self, reference, **params):
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return f"/payments/status/{reference}/wait/?{query}"
+
+    async def test_returns_immediately_when_state_differs(self):
+        response = await self.async_client.get(self._url(self.payment.uuid, state="", timeout=5))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "PENDING")
+        self.assertEqual(_FakeSubscription.waits, 0)
+
+    async def test_wakes_on_published_change(self):
+        payment = self.payment
+
+        async def fail_payment():
+            await sync_to_async(payment.mark_failed)()
+
+        _FakeSubscription.on_wait = fail_payment
+        response = await self.async_client.get(
+            self._url(payment.provider_reference, state="PENDING", timeout=5)
+        )
+        self.assertEqual(response.json()["state"], "FAILED")
+        self.assertEqual(_FakeSubscription.waits, 1)
+
+    async def test_timeout_returns_current_snapshot(self):
+        response = await self.async_client.get(self._url(self.payment.uuid, state="PENDING", timeout=0))
+        self.assertEqual(response.json()["state"], "PENDING")
+        self.assertEqual(response["Cache-Control"], "no-store")
+
+    async def test_unknown_reference_404(self):
+        response = await self.async_client.get(self._url("NOPE", state="PENDING"))
+        self.assertEqual(response.status_code, 404)
+
+
+class TestAsgiMiddleware(TestCase):
+
+    def test_asgi_chain_is_not_wrapped_in_sync_to_async(self):
+        with override_settings(MIDDLEWARE=settings.ASGI_MIDDLEWARE):
+            handler = ASGIHandler()
+        self.assertNotIsInstance(handler._middleware_chain, SyncToAsync)
+
+    def test_whitenoise_would_force_a_thread_per_request(self):
+        with override_settings(MIDDLEWARE=["whitenoise.middleware.WhiteNoiseMiddleware"] + settings.ASGI_MIDDLEWARE):
+            handler = ASGIHandler()
+        self.assertIsInstance(handler._middleware_chain, SyncToAsync)
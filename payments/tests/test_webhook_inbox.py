@@ -0,0 +1,150 @@
+"""
+payments/tests/test_webhook_inbox.py
+Tests for the webhook inbox — deliveries are stored once (duplicates are
+answered without touching Payment) and can be replayed.
+
+Run with:
+    python manage.py test payments.tests.test_webhook_inbox
+"""
+
+import json
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from payments import ipn_views
+from payments.ipn_views import kwa_ipn, live_ipn
+from payments.models import Payment, SettlementJob, WebhookInbox
+from payments.services import webhook_inbox
+from payments.tests.test_settlement import _make_payment, _make_vendor
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _post(view, body, path="/payments/webhook/kwa/ipn/"):
+    request = RequestFactory().post(
+        path, data=body if isinstance(body, str) else json.dumps(body),
+        content_type="application/json", HTTP_X_WEBHOOK_SIGNATURE="sig",
+    )
+    return view(request)
+
+
+SUCCESS = {"internal_reference": "KWA-REF-1", "status": "SUCCESSFUL"}
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestWebhookInbox(TestCase):
+
+    def setUp(self):
+        self.payment = _make_payment(_make_vendor())
+
+    def test_delivery_is_stored_and_processed(self):
+        _post(kwa_ipn, SUCCESS)
+
+        entry = WebhookInbox.objects.get()
+        self.assertEqual(entry.source, WebhookInbox.SOURCE_KWA_IPN)
+        self.assertEqual((entry.status, entry.outcome), (WebhookInbox.STATUS_PROCESSED, "settled"))
+        self.assertEqual(entry.payment, self.payment)
+        self.assertEqual(json.loads(entry.body), SUCCESS)
+        self.assertEqual(entry.headers["X-Webhook-Signature"], "sig")
+
+    def test_duplicate_is_rejected_with_a_single_insert(self):
+        _post(kwa_ipn, SUCCESS)
+        with self.assertNumQueries(1):
+            resp = _post(kwa_ipn, SUCCESS)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(WebhookInbox.objects.get().attempts, 1)
+        self.assertEqual(SettlementJob.objects.count(), 1)
+
+    def test_failed_entry_is_reprocessed_on_redelivery(self):
+        with patch.object(ipn_views, "settle_success", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                _post(kwa_ipn, SUCCESS)
+        entry = WebhookInbox.objects.get()
+        self.assertEqual((entry.status, entry.error), (WebhookInbox.STATUS_FAILED, "db down"))
+
+        _post(kwa_ipn, SUCCESS)
+
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.outcome, entry.attempts), (WebhookInbox.STATUS_PROCESSED, "settled", 2))
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, "SUCCESS")
+
+    def test_entry_stuck_in_received_is_reclaimed_after_the_grace_period(self):
+        # Worker killed between receive() and process()
+        with patch.object(webhook_inbox, "process"):
+            _post(kwa_ipn, SUCCESS)
+        entry = WebhookInbox.objects.get()
+        self.assertEqual(entry.status, WebhookInbox.STATUS_RECEIVED)
+
+        # Still within the grace period: treated as in flight
+        _post(kwa_ipn, SUCCESS)
+        self.assertEqual(WebhookInbox.objects.get().attempts, 1)
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, "PENDING")
+
+        WebhookInbox.objects.filter(pk=entry.pk).update(
+            received_at=timezone.now() - webhook_inbox.STALE_RECEIVED - timedelta(seconds=1),
+        )
+        _post(kwa_ipn, SUCCESS)
+
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.outcome, entry.attempts), (WebhookInbox.STATUS_PROCESSED, "settled", 2))
+        self.assertGreater(entry.received_at, timezone.now() - webhook_inbox.STALE_RECEIVED)
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, "SUCCESS")
+
+    def test_invalid_livepay_json_is_stored_and_rejected(self):
+        resp = _post(live_ipn, "not json", path="/payments/webhook/live/ipn/")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(WebhookInbox.objects.get().outcome, "invalid_json")
+
+    def test_replay_settles_entries_that_arrived_before_their_payment(self):
+        late = str(uuid.uuid4())
+        _post(kwa_ipn, {"internal_reference": late, "status": "SUCCESSFUL"})
+        self.assertEqual(WebhookInbox.objects.get().outcome, "no_payment")
+        Payment.objects.filter(pk=self.payment.pk).update(provider_reference=late)
+
+        out = StringIO()
+        call_command("replay_webhooks", "--outcome", "no_payment", stdout=out)
+
+        self.assertIn("settled=1", out.getvalue())
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, "SUCCESS")
+        self.assertEqual(WebhookInbox.objects.get().outcome, "settled")
+
+    def test_redelivery_settles_once_the_payment_exists(self):
+        late = {"internal_reference": str(uuid.uuid4()), "status": "SUCCESSFUL"}
+        _post(kwa_ipn, late)
+        self.assertEqual(WebhookInbox.objects.get().outcome, "no_payment")
+        Payment.objects.filter(pk=self.payment.pk).update(provider_reference=late["internal_reference"])
+
+        _post(kwa_ipn, late)
+
+        entry = WebhookInbox.objects.get()
+        self.assertEqual((entry.outcome, entry.attempts), ("settled", 2))
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, "SUCCESS")
+
+    def test_prune_applies_retention(self):
+        now = timezone.now()
+        for i, (status, age) in enumerate([
+            (WebhookInbox.STATUS_PROCESSED, 5),
+            (WebhookInbox.STATUS_PROCESSED, 40),
+            (WebhookInbox.STATUS_FAILED, 40),
+            (WebhookInbox.STATUS_FAILED, 100),
+        ]):
+            WebhookInbox.objects.create(
+                source=WebhookInbox.SOURCE_KWA_IPN, dedupe_hash=str(i), body="{}",
+                status=status, received_at=now - timedelta(days=age),
+            )
+
+        self.assertEqual(webhook_inbox.prune(now), 2)
+        self.assertEqual(
+            sorted(WebhookInbox.objects.values_list("dedupe_hash", flat=True)), ["0", "2"],
+        )
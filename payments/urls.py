@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from . import ipn_views
+from . import stream_views
 
 app_name = "payments"
 
@@ -32,6 +33,10 @@ urlpatterns = [
     # Payment status polling (used by portal.js)
     path("status/<str:reference>/", views.payment_status, name="payment_status"),
 
+    # Push-based status (ASGI only — see payments/stream_views.py)
+    path("status/<str:reference>/wait/", stream_views.payment_status_wait, name="payment_status_wait"),
+    path("status/<str:reference>/events/", stream_views.payment_status_events, name="payment_status_events"),
+
     # Post-payment redirect → auto-login on MikroTik
     path("success/<uuid:uuid>/", views.payment_success_redirect, name="payment_success_redirect"),
 
@@ -1,19 +1,17 @@
 from decimal import Decimal
 import json
-from datetime import timedelta
 
 from django.http import JsonResponse, HttpResponse
 from django.shortcuts import redirect, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
-from django.utils import timezone
 
 from .models import Payment, PaymentSystemConfig, PaymentSplit
 from .utils import get_active_provider, load_provider_adapter
+from .services import references
 from .services.payment_success import handle_payment_success
-
-from sms.services.sms_topup import credit_sms_wallet
-from sms.services.notifications import notify_vendor_payment_received, notify_vendor_receipt
+from .services.settlement import settle_success
+from .services.status_events import status_snapshot
 
 
 def _parse_body(request):
@@ -89,10 +87,7 @@ def initiate_payment(request):
 
 
 def payment_status(request, reference):
-    payment = (
-        Payment.objects.filter(uuid=reference).first()
-        or Payment.objects.filter(provider_reference=reference).first()
-    )
+    payment = references.resolve(reference)
     if not payment:
         from django.http import Http404
         raise Http404
@@ -116,20 +111,8 @@ def payment_status(request, reference):
                     with transaction.atomic():
                         p = Payment.objects.select_for_update().get(pk=payment.pk)
                         if p.status == "PENDING":
-                            p.mark_success(result)
-                            if p.purpose == "SMS_PURCHASE" and p.vendor_id:
-                                try:
-                                    credit_sms_wallet(vendor=p.vendor, amount_paid=int(p.amount))
-                                except Exception:
-                                    pass
-                            if p.vendor_id:
-                                if p.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
-                                    notify_vendor_receipt(p)
-                                else:
-                                    notify_vendor_payment_received(p)
+                            settle_success(p, result, source="KWA_STATUS_POLL")
                     payment.refresh_from_db()
-                    if payment.status == "SUCCESS":
-                        handle_payment_success(payment)
 
                 elif status == "FAILED" and payment.status == "PENDING":
                     with transaction.atomic():
@@ -141,40 +124,9 @@ def payment_status(request, reference):
             except Exception:
                 pass
 
-    resp = {
-        "success": True,
-        "reference": payment.provider_reference,
-        "payment_uuid": str(payment.uuid),
-        "status": payment.status,
-        "message": (
-            "Please approve the payment on your phone."
-            if payment.status == "PENDING"
-            else "Payment successful."
-            if payment.status == "SUCCESS"
-            else "Payment failed."
-        ),
-    }
-
-    if payment.status == "SUCCESS":
-        voucher_code = None
-        if hasattr(payment, "issued_voucher"):
-            try:
-                voucher_code = payment.issued_voucher.voucher.code
-            except Exception:
-                voucher_code = None
-        # If voucher not yet assigned, try issuing it now
-        if not voucher_code and payment.purpose == "TRANSACTION":
-            try:
-                handle_payment_success(payment)
-                payment.refresh_from_db()
-                if hasattr(payment, "issued_voucher"):
-                    voucher_code = payment.issued_voucher.voucher.code
-            except Exception:
-                pass
-        resp["voucher"] = voucher_code
-        resp["hotspot_dns"] = payment.location.hotspot_dns if payment.location_id else "hot.spot"
-
-    return JsonResponse(resp)
+    # PAID without a voucher yet: the settlement worker issues it (and
+    # fix_missing_vouchers retries it) — polls never settle inline
+    return JsonResponse(status_snapshot(payment))
 
 
 @csrf_exempt
@@ -201,14 +153,8 @@ def payment_callback(request):
         logger.warning(f"MAKYPAY WEBHOOK: no reference field found in data: {data}")
         return HttpResponse("OK")
 
-    payment_id = None
-    run_success_handler = False
-
     with transaction.atomic():
-        payment = (
-            Payment.objects.select_for_update().filter(provider_reference=reference).first()
-            or Payment.objects.select_for_update().filter(uuid=reference).first()
-        )
+        payment = references.resolve(reference, for_update=True)
         if not payment:
             logger.warning(f"MAKYPAY WEBHOOK: no payment found for reference={reference}")
             return HttpResponse("OK")
@@ -221,34 +167,7 @@ def payment_callback(request):
         if is_success:
             payment.external_reference = data.get("external_reference") or payment.external_reference
             payment.processor_message = data.get("processor_message") or payment.processor_message
-            payment.mark_success(data)
-
-            if payment.purpose == "SUBSCRIPTION" and payment.location_id:
-                location = payment.location
-                duration_days = 30
-                if location.subscription_expires_at and location.subscription_expires_at > timezone.now():
-                    location.subscription_expires_at += timedelta(days=duration_days)
-                else:
-                    location.subscription_expires_at = timezone.now() + timedelta(days=duration_days)
-                location.subscription_active = True
-                location.is_active = True
-                location.save(update_fields=["subscription_expires_at", "subscription_active", "is_active"])
-
-            if payment.purpose == "SMS_PURCHASE" and payment.vendor_id:
-                try:
-                    credit_sms_wallet(vendor=payment.vendor, amount_paid=int(payment.amount))
-                except Exception as exc:
-                    payment.processor_message = f"SMS credit warning: {exc}"
-                    payment.save(update_fields=["processor_message"])
-
-            if payment.vendor_id:
-                if payment.purpose in ("SMS_PURCHASE", "SUBSCRIPTION"):
-                    notify_vendor_receipt(payment)
-                else:
-                    notify_vendor_payment_received(payment)
-
-            payment_id = payment.id
-            run_success_handler = True
+            settle_success(payment, data, source="MAKYPAY_WEBHOOK")
 
         elif is_failed:
             payment.external_reference = data.get("external_reference") or payment.external_reference
@@ -257,10 +176,6 @@ def payment_callback(request):
         else:
             payment.save(update_fields=["raw_callback_data"])
 
-    if run_success_handler and payment_id:
-        payment = Payment.objects.get(id=payment_id)
-        handle_payment_success(payment)
-
     return HttpResponse("OK")
 
 
@@ -357,10 +272,7 @@ def find_voucher(request):
 
 def payment_wait(request, reference):
     from django.shortcuts import render
-    payment = (
-        Payment.objects.filter(uuid=reference).first()
-        or Payment.objects.filter(provider_reference=reference).first()
-    )
+    payment = references.resolve(reference)
     hotspot_dns = 'hot.spot'
     if payment and payment.location_id:
         hotspot_dns = payment.location.hotspot_dns or 'hot.spot'
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PortalApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portal_api'
+
+    def ready(self):
+        import portal_api.signals
@@ -0,0 +1,179 @@
+"""
+portal_api/services/bundle.py
+=============================
+Prebuilt per-location captive-portal bundles.
+
+A location's bundle is the active PortalTemplate zip with the
+{{API_BASE}} / {{LOCATION_UUID}} / {{BUY_URL}} / {{SUPPORT_PHONE}} /
+{{LOGIN_TYPE}} placeholders rendered in. It is built once and kept in
+the cache under a key derived from everything that goes into it
+(template file + upload time, placeholder values), so a new template
+upload or a location/vendor edit simply produces a new key — nothing
+needs invalidating and stale bundles age out.
+
+The cache holds a small manifest under that key (file names, content
+types, ETags) and every rendered file — and the full zip — under keys of
+their own sharing its fingerprint, so serving one file reads the
+manifest and that file, never the whole bundle — and a 304 reads only
+the manifest. A file evicted on its own is rebuilt with the rest.
+
+Each file carries its own ETag (content hash), and download_portal_zip
+answers conditional requests with 304, so a router re-fetching the
+portal costs two small queries and a cache read.
+"""
+
+import hashlib
+import io
+import mimetypes
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+BUNDLE_TIMEOUT = 24 * 60 * 60
+TEMPLATED_EXTENSIONS = (".html", ".js", ".css")
+SKIP_PREFIXES = (".vscode", ".git", "__MACOSX", ".DS_Store", "log.", "readme")
+
+CONTENT_TYPES = {
+    ".html": "text/html", ".js": "application/javascript",
+    ".css": "text/css", ".png": "image/png",
+    ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
+    ".woff": "font/woff", ".woff2": "font/woff2",
+    ".ttf": "font/ttf", ".svg": "image/svg+xml",
+}
+
+
+@dataclass
+class BundleFile:
+    content_type: str
+    etag: str
+
+
+@dataclass
+class PortalBundle:
+    """The cached manifest — contents live under file_key() / zip_key()."""
+    key: str
+    last_modified: object
+    files: dict = field(default_factory=dict)   # rel path → BundleFile
+    zip_etag: str = ""
+
+
+def placeholders(location):
+    return {
+        "{{API_BASE}}": settings.PORTAL_API_BASE_HTTP,
+        "{{LOCATION_UUID}}": str(location.uuid),
+        "{{BUY_URL}}": f"{settings.SITE_URL.replace('https://', 'http://')}/api/portal/{location.uuid}/buy/",
+        "{{SUPPORT_PHONE}}": getattr(location.vendor, "business_phone", "") or "",
+        "{{LOGIN_TYPE}}": location.login_type,
+    }
+
+
+def render_text(text, values):
+    for placeholder, value in values.items():
+        text = text.replace(placeholder, value)
+    return text
+
+
+def bundle_key(template, location):
+    values = placeholders(location)
+    fingerprint = hashlib.sha1(
+        "|".join([
+            str(template.pk), template.zip_file.name, template.uploaded_at.isoformat(),
+            *(f"{k}={v}" for k, v in sorted(values.items())),
+        ]).encode("utf-8")
+    ).hexdigest()[:20]
+    return f"portal_bundle:{location.uuid}:{fingerprint}"
+
+
+def file_key(bundle_key, rel):
+    return f"{bundle_key}:file:{hashlib.sha1(rel.encode('utf-8')).hexdigest()[:20]}"
+
+
+def zip_key(bundle_key):
+    return f"{bundle_key}:zip"
+
+
+def _etag(content):
+    return '"%s"' % hashlib.sha1(content).hexdigest()[:20]
+
+
+def _relative(name):
+    parts = name.split("/", 1)
+    return parts[1] if len(parts) == 2 else parts[0]
+
+
+def build(template, location, key=None):
+    """
+    Render every file of the template zip for this location (plus the full
+    zip). Returns (manifest, {cache key: content}).
+    """
+    values = placeholders(location)
+    bundle = PortalBundle(
+        key=key or bundle_key(template, location),
+        # When this content was built: any input change (template, location,
+        # vendor phone, API base) means a new key and so a later build
+        last_modified=timezone.now(),
+    )
+    contents = {}
+
+    out = io.BytesIO()
+    with template.zip_file.open("rb") as src, zipfile.ZipFile(src) as zf_in, \
+            zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf_out:
+        for item in zf_in.infolist():
+            rel = _relative(item.filename)
+            if not rel or rel.endswith("/") or rel in bundle.files:
+                continue
+            content = zf_in.read(item.filename)
+            ext = Path(rel).suffix.lower()
+            if ext in TEMPLATED_EXTENSIONS:
+                content = render_text(content.decode("utf-8", errors="ignore"), values).encode("utf-8")
+
+            content_type = CONTENT_TYPES.get(ext) or mimetypes.guess_type(rel)[0] or "application/octet-stream"
+            bundle.files[rel] = BundleFile(content_type, _etag(content))
+            contents[file_key(bundle.key, rel)] = content
+
+            if not any(rel.startswith(x) for x in SKIP_PREFIXES):
+                zf_out.writestr(rel, content)
+
+    contents[zip_key(bundle.key)] = out.getvalue()
+    bundle.zip_etag = _etag(contents[zip_key(bundle.key)])
+    return bundle, contents
+
+
+def _build_and_store(template, location, key):
+    bundle, contents = build(template, location, key=key)
+    # Contents first: a reader that finds the manifest finds its files
+    cache.set_many(contents, BUNDLE_TIMEOUT)
+    cache.set(key, bundle, BUNDLE_TIMEOUT)
+    return bundle, contents
+
+
+def get_bundle(template, location):
+    """Cached manifest for this template + location, built on first use."""
+    key = bundle_key(template, location)
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle, _ = _build_and_store(template, location, key)
+    return bundle
+
+
+def _content(template, location, bundle, content_key):
+    content = cache.get(content_key)
+    if content is None:
+        # Evicted apart from its manifest — rebuild the lot
+        _, contents = _build_and_store(template, location, bundle.key)
+        content = contents.get(content_key)
+    return content
+
+
+def file_content(template, location, bundle, rel):
+    """Rendered content of one file listed in the manifest."""
+    return _content(template, location, bundle, file_key(bundle.key, rel))
+
+
+def zip_content(template, location, bundle):
+    """The full bundle zip."""
+    return _content(template, location, bundle, zip_key(bundle.key))
@@ -0,0 +1,212 @@
+"""
+portal_api/services/portal_data.py
+==================================
+Cached payload for GET /api/portal/<uuid>/ (portal.js).
+
+Every location has a version number in the cache:
+
+  portal_data_ver:<uuid>            INT  bumped on any change
+  portal_data:<uuid>:<version>      DICT data + fresh_until / hard_until
+  portal_data_lock:<uuid>:<version>      single-flight recompute lock
+
+bump() is called from portal_api/signals.py (Package, Ad, HotspotLocation,
+Vendor saves/deletes, new vouchers) and from the bulk voucher paths that
+don't fire signals (upload / generate / batch delete, sell-out). A bump
+moves readers to a new key, so nothing is deleted and an edit shows up on
+the next request.
+
+Entries are fresh for FRESH_SECONDS. After that they are still served for
+up to STALE_SECONDS while exactly one request (whoever wins cache.add on
+the lock) rebuilds them, so a popular location never sends hundreds of
+phones to the DB at the same moment. On a cold key the other requests
+wait briefly for the winner instead of all running the queries.
+hard_until (subscription expiry or the next package schedule window
+start/end) is never served past, stale or not.
+"""
+
+import logging
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from hotspot.models import HotspotLocation
+from packages.services import schedule
+from vouchers.services.inventory import packages_in_stock
+
+logger = logging.getLogger(__name__)
+
+FRESH_SECONDS = 60
+STALE_SECONDS = 300
+LOCK_SECONDS = 30
+# How long a request waits for another request's rebuild of a cold key
+WAIT_SECONDS = 2.0
+WAIT_STEP = 0.05
+
+
+def _version_key(uuid):
+    return f"portal_data_ver:{uuid}"
+
+
+def _data_key(uuid, version):
+    return f"portal_data:{uuid}:{version}"
+
+
+def _lock_key(uuid, version):
+    return f"portal_data_lock:{uuid}:{version}"
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+def _bump_now(uuid):
+    try:
+        cache.set(_version_key(uuid), time.time_ns(), None)
+    except Exception as exc:
+        logger.warning("portal_data version bump failed for %s: %s", uuid, exc)
+
+
+def bump(uuid):
+    """
+    Move the location to a new cache version once the current transaction
+    commits (old entries just age out). Never raises — a cache outage
+    mustn't break the save that triggered it.
+    """
+    transaction.on_commit(partial(_bump_now, uuid))
+
+
+def bump_locations(location_ids, now=False):
+    for uuid in HotspotLocation.objects.filter(pk__in=location_ids).values_list("uuid", flat=True):
+        if now:
+            _bump_now(uuid)
+        else:
+            bump(uuid)
+
+
+def bump_package(package_id, now=False):
+    """now=True bumps immediately — for callers whose transaction is about to roll back."""
+    from packages.models import Package
+    bump_locations(Package.objects.filter(pk=package_id).values("location_id"), now=now)
+
+
+def current_version(uuid):
+    version = cache.get(_version_key(uuid))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_version_key(uuid), version, None):
+            version = cache.get(_version_key(uuid), version)
+    return version
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def build(uuid):
+    """
+    Query the payload for one location. Returns None when the location
+    isn't ACTIVE (or its vendor isn't). Ad urls are left relative —
+    portal_data makes them absolute for the requesting host.
+    """
+    location = (
+        HotspotLocation.objects
+        .filter(uuid=uuid, status="ACTIVE", vendor__status="ACTIVE")
+        .first()
+    )
+    if location is None:
+        return None
+
+    now = time.time()
+    active = location.has_active_subscription()
+    packages, ads = [], []
+    if active:
+        packages = list(location.packages.available_now())
+        stocked = packages_in_stock(p.id for p in packages)
+        packages = [p for p in packages if p.id in stocked]
+        ads = list(location.ads.filter(is_active=True))
+
+    # Never serve past the subscription expiry or the next schedule window change
+    limits = []
+    if location.subscription_mode != "PERCENTAGE" and location.subscription_expires_at:
+        limits.append(location.subscription_expires_at)
+    if active:
+        boundary = schedule.next_boundary(schedule.scheduled_packages().filter(location=location))
+        if boundary:
+            limits.append(boundary)
+    hard_until = min(limits).timestamp() if limits else None
+
+    return {
+        "data": {
+            "location": {
+                "name": location.site_name,
+            },
+            "subscription_active": active,
+            "packages": [
+                {"id": p.id, "name": p.name, "price": p.price}
+                for p in packages
+            ],
+            "ads": [
+                {"type": ad.ad_type.lower(), "url": ad.file.url}
+                for ad in ads
+            ],
+        },
+        "fresh_until": min(now + FRESH_SECONDS, hard_until or now + FRESH_SECONDS),
+        "hard_until": hard_until,
+    }
+
+
+def _store(uuid, version):
+    entry = build(uuid)
+    if entry is not None:
+        cache.set(_data_key(uuid, version), entry, FRESH_SECONDS + STALE_SECONDS)
+    return entry
+
+
+def _rebuild(uuid, version):
+    try:
+        return _store(uuid, version)
+    finally:
+        cache.delete(_lock_key(uuid, version))
+
+
+def _wait_for(uuid, version):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(_data_key(uuid, version))
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_portal_data(uuid):
+    """
+    Cached entry for this location ({"data", "fresh_until", "hard_until"}),
+    or None when the location isn't available.
+    """
+    version = current_version(uuid)
+    key = _data_key(uuid, version)
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry is not None and entry["hard_until"] is not None and now >= entry["hard_until"]:
+        entry = None
+
+    if entry is not None:
+        if now < entry["fresh_until"]:
+            return entry
+        # Stale: one request rebuilds, everyone else keeps getting the old copy
+        if cache.add(_lock_key(uuid, version), 1, LOCK_SECONDS):
+            return _rebuild(uuid, version)
+        return entry
+
+    if cache.add(_lock_key(uuid, version), 1, LOCK_SECONDS):
+        return _rebuild(uuid, version)
+
+    entry = _wait_for(uuid, version)
+    if entry is None:
+        logger.warning("portal_data rebuild for %s still running after %.1fs; building inline", uuid, WAIT_SECONDS)
+        entry = _store(uuid, version)
+    return entry
@@ -0,0 +1,44 @@
+"""
+Move a location's portal_data cache to a new version whenever something
+portal.js shows changes (see portal_api/services/portal_data.py).
+
+Vouchers only bump on creation: status changes happen on every sale and
+the buy path re-checks stock anyway. Bulk inserts / deletes call
+portal_data.bump_package() themselves.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Vendor
+from ads.models import Ad
+from hotspot.models import HotspotLocation
+from packages.models import Package
+from portal_api.services import portal_data
+from vouchers.models import Voucher
+
+
+@receiver(post_save, sender=HotspotLocation)
+@receiver(post_delete, sender=HotspotLocation)
+def bump_location(sender, instance, **kwargs):
+    portal_data.bump(instance.uuid)
+
+
+@receiver(post_save, sender=Package)
+@receiver(post_delete, sender=Package)
+@receiver(post_save, sender=Ad)
+@receiver(post_delete, sender=Ad)
+def bump_location_child(sender, instance, **kwargs):
+    portal_data.bump_locations([instance.location_id])
+
+
+@receiver(post_save, sender=Voucher)
+def bump_new_voucher(sender, instance, created, **kwargs):
+    if created:
+        portal_data.bump_package(instance.package_id)
+
+
+@receiver(post_save, sender=Vendor)
+def bump_vendor_locations(sender, instance, created, **kwargs):
+    if not created:
+        portal_data.bump_locations(instance.locations.values("pk"))
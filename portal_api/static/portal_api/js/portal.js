@@ -65,7 +65,7 @@ function openPayModal(pkgId, pkgName, pkgPrice) {
 
 function closePayModal() {
     document.getElementById("pay-modal").style.display = "none";
-    clearInterval(window._pollTimer);
+    window._pollLoop = null;
 }
 
 function setModalState(state) {
@@ -110,27 +110,38 @@ function submitPayment() {
 }
 
 function pollPaymentStatus(statusUrl, paymentUuid) {
-    var attempts = 0;
-    clearInterval(window._pollTimer);
-    window._pollTimer = setInterval(function () {
-        if (++attempts > 60) {
-            clearInterval(window._pollTimer);
-            showModalError("Timed out waiting for payment. Please try again.");
+    // Long-poll: each request is held by the server until the status
+    // changes (or ~25s pass), then we immediately wait again.
+    var deadline = Date.now() + 120000;
+    var state = "PENDING";
+    var loop = window._pollLoop = {};
+
+    function wait() {
+        if (window._pollLoop !== loop) return;
+        if (Date.now() > deadline) {
+            if (state === "PAID") {
+                onPaymentSuccess(null);
+            } else {
+                showModalError("Timed out waiting for payment. Please try again.");
+            }
             return;
         }
-        fetch(statusUrl)
-            .then(r => r.json())
+        fetch(statusUrl + "wait/?state=" + state + "&timeout=25")
+            .then(r => { if (!r.ok) throw new Error(r.status); return r.json(); })
             .then(data => {
-                if (data.status === "SUCCESS") {
-                    clearInterval(window._pollTimer);
+                if (window._pollLoop !== loop) return;
+                state = data.state || state;
+                if (data.status === "SUCCESS" && state !== "PAID") {
                     onPaymentSuccess(data.voucher, data.hotspot_dns);
                 } else if (data.status === "FAILED" || data.status === "CANCELLED") {
-                    clearInterval(window._pollTimer);
                     showModalError("Payment failed or was cancelled. Please try again.");
+                } else {
+                    wait();
                 }
             })
-            .catch(() => {});
-    }, 2000);
+            .catch(() => { setTimeout(wait, 2000); });
+    }
+    wait();
 }
 
 function onPaymentSuccess(voucherCode, hotspotDns) {
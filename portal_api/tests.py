@@ -1,3 +1,242 @@
-from django.test import TestCase
+"""
+portal_api/tests.py
+Tests for the prebuilt captive-portal bundle served by download_portal_zip
+and the versioned / stale-while-revalidate portal_data cache.
 
-# Create your tests here.
+Run with:
+    python manage.py test portal_api
+"""
+
+import datetime
+import io
+import shutil
+import tempfile
+import time
+import zipfile
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from packages.models import Package
+from payments.tests.test_settlement import _make_payment, _make_vendor
+from portal_api.models import PortalTemplate
+from portal_api.services import bundle as bundle_service
+from portal_api.services import portal_data as portal_data_service
+
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _template_zip(login_html="<a href='{{BUY_URL}}'>{{LOCATION_UUID}}</a>"):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("hotspot/login.html", login_html)
+        zf.writestr("hotspot/js/portal.js", "var API = '{{API_BASE}}'; var LOGIN = '{{LOGIN_TYPE}}';")
+        zf.writestr("hotspot/img/logo.png", b"\x89PNG")
+        zf.writestr("hotspot/.DS_Store", b"junk")
+    return SimpleUploadedFile("portal.zip", buf.getvalue(), content_type="application/zip")
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+@override_settings(CACHES=LOCMEM)
+class TestPortalBundle(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        from django.core.cache import cache
+        cache.clear()
+
+        self.location = _make_payment(_make_vendor()).location
+        self.template = PortalTemplate.objects.create(name="Default", zip_file=_template_zip())
+        self.url = f"/api/portal/{self.location.uuid}/download/"
+
+    def test_single_file_rendered_with_etag(self):
+        response = self.client.get(self.url, {"file": "login.html"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/html")
+        body = response.content.decode()
+        self.assertIn(str(self.location.uuid), body)
+        self.assertIn(f"/api/portal/{self.location.uuid}/buy/", body)
+        self.assertTrue(response["ETag"])
+        self.assertTrue(response["Last-Modified"])
+
+    def test_conditional_refetch_returns_304(self):
+        etag = self.client.get(self.url, {"file": "js/portal.js"})["ETag"]
+        response = self.client.get(self.url, {"file": "js/portal.js"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_zip_opened_once_for_many_files(self):
+        with patch.object(bundle_service, "build", wraps=bundle_service.build) as build:
+            for name in ("login.html", "js/portal.js", "img/logo.png"):
+                self.assertEqual(self.client.get(self.url, {"file": name}).status_code, 200)
+            self.client.get(self.url)
+        self.assertEqual(build.call_count, 1)
+
+    def test_files_cached_apart_from_the_manifest(self):
+        from django.core.cache import cache
+        self.client.get(self.url, {"file": "login.html"})
+        bundle = bundle_service.get_bundle(self.template, self.location)
+
+        self.assertNotIn("zip_bytes", vars(bundle))
+        self.assertEqual(cache.get(bundle_service.file_key(bundle.key, "js/portal.js"))[:7], b"var API")
+        self.assertTrue(cache.get(bundle_service.zip_key(bundle.key)))
+
+    def test_evicted_file_is_rebuilt(self):
+        from django.core.cache import cache
+        self.client.get(self.url, {"file": "login.html"})
+        bundle = bundle_service.get_bundle(self.template, self.location)
+        cache.delete(bundle_service.file_key(bundle.key, "js/portal.js"))
+
+        response = self.client.get(self.url, {"file": "js/portal.js"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("var API", response.content.decode())
+
+    def test_full_zip_skips_junk(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        names = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+        self.assertEqual(sorted(names), ["img/logo.png", "js/portal.js", "login.html"])
+
+    def test_location_change_rebuilds(self):
+        first = self.client.get(self.url, {"file": "js/portal.js"})
+        self.location.login_type = "CHAP"
+        self.location.save()
+        second = self.client.get(self.url, {"file": "js/portal.js"})
+        self.assertNotEqual(first["ETag"], second["ETag"])
+        self.assertIn("CHAP", second.content.decode())
+
+    def test_unknown_file_404(self):
+        self.assertEqual(self.client.get(self.url, {"file": "nope.html"}).status_code, 404)
+
+    def test_if_modified_since_sees_a_vendor_change(self):
+        first = self.client.get(self.url, {"file": "login.html"})
+        self.assertEqual(
+            self.client.get(self.url, {"file": "login.html"}, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code,
+            304,
+        )
+
+        # Changes the bundle but not the location or template timestamps
+        self.location.vendor.business_phone = "256700000123"
+        self.location.vendor.save()
+        later = timezone.now() + datetime.timedelta(seconds=2)
+        with patch.object(bundle_service.timezone, "now", return_value=later):
+            response = self.client.get(
+                self.url, {"file": "login.html"}, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"],
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["Last-Modified"], first["Last-Modified"])
+
+
+@override_settings(CACHES=LOCMEM)
+class TestPortalData(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        vendor = _make_vendor()
+        vendor.status = "ACTIVE"
+        vendor.save()
+        self.location = _make_payment(vendor).location
+        self.package = self.location.packages.get()
+        self.url = f"/api/portal/{self.location.uuid}/"
+
+    def _get(self, **headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url, **headers)
+
+    def test_payload_and_headers(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["subscription_active"])
+        self.assertEqual([p["id"] for p in data["packages"]], [self.package.id])
+        self.assertTrue(response["ETag"])
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("stale-while-revalidate", response["Cache-Control"])
+
+    def test_conditional_refetch_returns_304(self):
+        etag = self._get()["ETag"]
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_fresh_hit_skips_queries(self):
+        self._get()
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_package_save_bumps_version(self):
+        self._get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.package.name = "Renamed"
+            self.package.save()
+        self.assertEqual(self._get().json()["packages"][0]["name"], "Renamed")
+
+    def test_stale_entry_served_while_one_request_rebuilds(self):
+        self._get()
+        version = portal_data_service.current_version(self.location.uuid)
+        key = portal_data_service._data_key(self.location.uuid, version)
+        lock = portal_data_service._lock_key(self.location.uuid, version)
+
+        from django.core.cache import cache
+        entry = cache.get(key)
+        entry["fresh_until"] = time.time() - 1
+        entry["data"]["location"]["name"] = "Stale name"
+        cache.set(key, entry, 600)
+
+        # Someone else holds the rebuild lock → stale copy, no queries
+        cache.add(lock, 1, 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).json()["location"]["name"], "Stale name")
+        self.assertEqual(self.client.get(self.url)["Cache-Control"].split(",")[1].strip(), "max-age=0")
+
+        # Lock free → this request rebuilds
+        cache.delete(lock)
+        self.assertEqual(self.client.get(self.url).json()["location"]["name"], self.location.site_name)
+
+    def test_cold_key_waits_for_rebuild_in_flight(self):
+        version = portal_data_service.current_version(self.location.uuid)
+        from django.core.cache import cache
+        cache.add(portal_data_service._lock_key(self.location.uuid, version), 1, 30)
+
+        with patch.object(portal_data_service, "WAIT_SECONDS", 0.1), \
+                patch.object(portal_data_service, "build", wraps=portal_data_service.build) as build:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        # Nobody filled the key in time → built inline once
+        self.assertEqual(build.call_count, 1)
+
+    def test_inactive_location_404(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.status = "SUSPENDED"
+            self.location.save()
+        self.assertEqual(self._get().status_code, 404)
+
+    def test_entry_expires_at_next_schedule_boundary(self):
+        from packages.services import schedule
+        today = timezone.localdate()
+        Package.objects.create(
+            location=self.location, name="Every day, late", price=500,
+            schedule_type="WEEKDAYS", scheduled_days="0,1,2,3,4,5,6",
+            scheduled_start=datetime.time(23, 59, 58),
+        )
+        entry = portal_data_service.get_portal_data(self.location.uuid)
+        boundary = schedule.next_boundary(schedule.scheduled_packages().filter(location=self.location))
+        self.assertGreaterEqual(boundary.date(), today)
+        self.assertEqual(entry["hard_until"], boundary.timestamp())
+        self.assertLessEqual(entry["fresh_until"], boundary.timestamp())
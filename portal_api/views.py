@@ -1,23 +1,29 @@
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, get_object_or_404
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 import logging
 
 logger = logging.getLogger(__name__)
 
 from pathlib import Path
-import zipfile
-import io
+import hashlib
 import json
+import time
 
 from hotspot.models import HotspotLocation
 from portal_api.models import PortalTemplate
 from packages.models import Package
 from payments.services_utils import initiate_payment
 from payments.models import Payment
+from portal_api.services import portal_data as portal_data_service
+from portal_api.services.bundle import SKIP_PREFIXES, file_content, get_bundle, zip_content
+from vouchers.services.inventory import in_stock, packages_in_stock
 
 
 # =====================================================
@@ -25,54 +31,33 @@ from payments.models import Payment
 # GET  /api/portal/<uuid>/
 # =====================================================
 
-def portal_data(request, uuid):
-    from django.core.cache import cache
-
-    cache_key = f"portal_data_{uuid}"
-    cached = cache.get(cache_key)
-    if cached:
-        return JsonResponse(cached)
-
-    location = get_object_or_404(
-        HotspotLocation,
-        uuid=uuid,
-        status="ACTIVE",
-        vendor__status="ACTIVE"
-    )
+PORTAL_DATA_MAX_AGE = 30
 
-    packages = location.packages.filter(
-        is_active=True,
-        vouchers__status='UNUSED'
-    ).distinct().select_related('location')
 
-    packages = [p for p in packages if p.is_available_now()]
-
-    ads = location.ads.filter(is_active=True)
-
-    data = {
-        "location": {
-            "name": location.site_name,
-        },
-        "subscription_active": location.has_active_subscription(),
-        "packages": [
-            {
-                "id": p.id,
-                "name": p.name,
-                "price": p.price,
-            }
-            for p in packages
-        ] if location.has_active_subscription() else [],
-        "ads": [
-            {
-                "type": ad.ad_type.lower(),
-                "url": request.build_absolute_uri(ad.file.url),
-            }
-            for ad in ads
-        ] if location.has_active_subscription() else [],
-    }
-
-    cache.set(cache_key, data, 60)
-    return JsonResponse(data)
+def portal_data(request, uuid):
+    entry = portal_data_service.get_portal_data(uuid)
+    if entry is None:
+        raise Http404("Location not available")
+
+    data = dict(entry["data"])
+    data["ads"] = [
+        {**ad, "url": request.build_absolute_uri(ad["url"])}
+        for ad in data["ads"]
+    ]
+
+    body = json.dumps(data, cls=DjangoJSONEncoder).encode("utf-8")
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+    # Let nginx / the phone reuse it until the entry goes stale, and keep
+    # serving it while revalidating
+    max_age = max(0, min(PORTAL_DATA_MAX_AGE, int(entry["fresh_until"] - time.time())))
+    cache_control = f"public, max-age={max_age}, stale-while-revalidate={portal_data_service.STALE_SECONDS}"
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
 
 
 # =====================================================
@@ -140,7 +125,7 @@ def portal_buy_api(request, uuid):
         return JsonResponse({"success": False, "message": msg}, status=400)
 
     # Ensure vouchers exist
-    if not package.vouchers.filter(status="UNUSED").exists():
+    if not in_stock(package):
         return JsonResponse(
             {"success": False, "message": "This package is currently out of stock"},
             status=400
@@ -176,7 +161,7 @@ def download_portal_zip(request, location_uuid):
     # Public endpoint — UUID is the access key, no login required
     # MikroTik /tool fetch hits this directly
     location = get_object_or_404(
-        HotspotLocation,
+        HotspotLocation.objects.select_related("vendor"),
         uuid=location_uuid,
         status="ACTIVE"
     )
@@ -187,72 +172,44 @@ def download_portal_zip(request, location_uuid):
         from django.http import Http404
         raise Http404
 
-    support_phone = getattr(location.vendor, "business_phone", "") or ""
-
-    def replace_placeholders(text):
-        return (
-            text
-            .replace("{{API_BASE}}", settings.PORTAL_API_BASE_HTTP)
-            .replace("{{LOCATION_UUID}}", str(location.uuid))
-            .replace("{{BUY_URL}}", f"{settings.SITE_URL.replace('https://', 'http://')}/api/portal/{location.uuid}/buy/")
-            .replace("{{SUPPORT_PHONE}}", support_phone)
-            .replace("{{LOGIN_TYPE}}", location.login_type)
-        )
+    bundle = get_bundle(template, location)
 
     # --- Single file mode: ?file=login.html or ?file=js/portal.js ---
     # MikroTik fetches each file individually via this param
     file_param = request.GET.get("file", "").strip().lstrip("/")
     if file_param:
-        with zipfile.ZipFile(template.zip_file.path, "r") as zf:
-            match = None
-            for n in zf.namelist():
-                parts = n.split("/", 1)
-                rel = parts[1] if len(parts) == 2 else parts[0]
-                if rel == file_param:
-                    match = n
-                    break
-            if not match:
-                from django.http import Http404
-                raise Http404
-            content = zf.read(match)
-            ext = Path(file_param).suffix.lower()
-            if ext in (".html", ".js", ".css"):
-                content = replace_placeholders(
-                    content.decode("utf-8", errors="ignore")
-                ).encode("utf-8")
-            content_types = {
-                ".html": "text/html", ".js": "application/javascript",
-                ".css": "text/css", ".png": "image/png",
-                ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
-                ".woff": "font/woff", ".woff2": "font/woff2",
-                ".ttf": "font/ttf", ".svg": "image/svg+xml",
-            }
-            ct = content_types.get(ext, "application/octet-stream")
-            resp = HttpResponse(content, content_type=ct)
-            resp["Content-Disposition"] = f'inline; filename="{Path(file_param).name}"'
-            return resp
+        item = bundle.files.get(file_param)
+        if not item:
+            from django.http import Http404
+            raise Http404
+        return _bundle_response(
+            request, bundle, item.content_type, item.etag,
+            f'inline; filename="{Path(file_param).name}"',
+            lambda: file_content(template, location, bundle, file_param),
+        )
 
     # --- Full ZIP mode (manual download) ---
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(template.zip_file.path, "r") as zf_in:
-        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf_out:
-            for item in zf_in.infolist():
-                parts = item.filename.split("/", 1)
-                rel = parts[1] if len(parts) == 2 else parts[0]
-                if not rel or rel.endswith("/"):
-                    continue
-                if any(rel.startswith(x) for x in (".vscode", ".git", "__MACOSX", ".DS_Store", "log.", "readme")):
-                    continue
-                content = zf_in.read(item.filename)
-                if Path(rel).suffix.lower() in (".html", ".js", ".css"):
-                    content = replace_placeholders(
-                        content.decode("utf-8", errors="ignore")
-                    ).encode("utf-8")
-                zf_out.writestr(rel, content)
-
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename="hotspot-{location.site_name}.zip"'
+    return _bundle_response(
+        request, bundle, "application/zip", bundle.zip_etag,
+        f'attachment; filename="hotspot-{location.site_name}.zip"',
+        lambda: zip_content(template, location, bundle),
+    )
+
+
+def _bundle_response(request, bundle, content_type, etag, disposition, load):
+    """
+    Serve a prebuilt bundle file, answering If-None-Match / If-Modified-Since
+    with 304 — load() (the cache read of the content) only runs for a 200.
+    """
+    # Whole seconds, as sent in Last-Modified — a fractional timestamp never matches If-Modified-Since
+    last_modified = int(bundle.last_modified.timestamp())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    response = not_modified or HttpResponse(load(), content_type=content_type)
+    if not not_modified:
+        response["Content-Disposition"] = disposition
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "public, max-age=300"
     return response
 
 
@@ -315,20 +272,13 @@ def mikrotik_setup_script(request, location_uuid):
     try:
         template = PortalTemplate.objects.filter(is_active=True).first()
         if template and template.zip_file:
-            with zipfile.ZipFile(template.zip_file.path, "r") as zf:
-                for name in sorted(zf.namelist()):
-                    if name.endswith("/"):
-                        continue
-                    parts = name.split("/", 1)
-                    rel = parts[1] if len(parts) == 2 else parts[0]
-                    if not rel:
-                        continue
-                    if any(rel.startswith(x) for x in (".vscode", ".git", "__MACOSX", ".DS_Store", "log.", "readme")):
-                        continue
-                    # Use HTTP not HTTPS — ROS v6 doesn't support modern SSL certs
-                    file_url = f"http://{settings.SITE_URL.replace('https://', '').replace('http://', '')}/api/portal/{location.uuid}/download/?file={rel}"
-                    dst = f"hotspot/{rel}"
-                    fetch_cmds.append(f"/tool fetch url=\"{file_url}\" dst-path=\"{dst}\" mode=http")
+            for rel in sorted(get_bundle(template, location).files):
+                if any(rel.startswith(x) for x in SKIP_PREFIXES):
+                    continue
+                # Use HTTP not HTTPS — ROS v6 doesn't support modern SSL certs
+                file_url = f"http://{settings.SITE_URL.replace('https://', '').replace('http://', '')}/api/portal/{location.uuid}/download/?file={rel}"
+                dst = f"hotspot/{rel}"
+                fetch_cmds.append(f"/tool fetch url=\"{file_url}\" dst-path=\"{dst}\" mode=http")
     except Exception:
         pass
 
@@ -384,12 +334,9 @@ def portal_buy(request, uuid):
         return HttpResponseForbidden("SpotPay services unavailable for this location")
 
     if request.method == "GET":
-        packages = Package.objects.filter(
-            location=location,
-            is_active=True,
-            vouchers__status="UNUSED"
-        ).distinct()
-        packages = [p for p in packages if p.is_available_now()]
+        packages = list(Package.objects.filter(location=location).available_now())
+        stocked = packages_in_stock(p.id for p in packages)
+        packages = [p for p in packages if p.id in stocked]
 
         return render(
             request,
@@ -401,12 +348,9 @@ def portal_buy(request, uuid):
         package_id = request.POST.get("package")
         phone = request.POST.get("phone")
 
-        packages = Package.objects.filter(
-            location=location,
-            is_active=True,
-            vouchers__status="UNUSED"
-        ).distinct()
-        packages = [p for p in packages if p.is_available_now()]
+        packages = list(Package.objects.filter(location=location).available_now())
+        stocked = packages_in_stock(p.id for p in packages)
+        packages = [p for p in packages if p.id in stocked]
 
         if not package_id or not phone:
             return render(
@@ -492,7 +436,7 @@ def portal_buy_form(request, uuid):
     if not package.is_available_now():
         return HttpResponse('Package not available right now', status=400)
 
-    if not package.vouchers.filter(status='UNUSED').exists():
+    if not in_stock(package):
         return HttpResponse('Package out of stock', status=400)
 
     result = initiate_payment(
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:44
+
+from django.conf import settings
+# The schema these apps had before they shipped migrations (tables created
+# with migrate --run-syncdb). Existing databases: manage.py migrate --fake-initial
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vendor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company_name', models.CharField(max_length=255)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('spotpay_vendor_id', models.IntegerField(blank=True, null=True, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='vendor', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
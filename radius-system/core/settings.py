@@ -95,6 +95,9 @@ FREERADIUS_DB = {
     "name": os.getenv("FREERADIUS_DB_NAME", "radius"),
     "user": os.getenv("FREERADIUS_DB_USER", "radius"),
     "password": os.getenv("FREERADIUS_DB_PASSWORD", ""),
+    # Connections per process (radius/pool.py) and seconds to wait for one
+    "pool_size": int(os.getenv("FREERADIUS_DB_POOL_SIZE", "4")),
+    "pool_timeout": float(os.getenv("FREERADIUS_DB_POOL_TIMEOUT", "5")),
 }
 
 USE_X_FORWARDED_HOST = True
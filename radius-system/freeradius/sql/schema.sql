@@ -73,6 +73,7 @@ CREATE TABLE IF NOT EXISTS radacct (
   servicetype varchar(32) default NULL,
   framedprotocol varchar(32) default NULL,
   framedipaddress varchar(15) NOT NULL default '',
+  vendor_id int(11) NULL default NULL,
   PRIMARY KEY (radacctid),
   UNIQUE KEY acctuniqueid (acctuniqueid),
   KEY username (username),
@@ -80,7 +81,9 @@ CREATE TABLE IF NOT EXISTS radacct (
   KEY acctsessionid (acctsessionid),
   KEY acctstarttime (acctstarttime),
   KEY acctstoptime (acctstoptime),
-  KEY nasipaddress (nasipaddress)
+  KEY nasipaddress (nasipaddress),
+  KEY vendor_radacctid (vendor_id, radacctid),
+  KEY vendor_open (vendor_id, acctstoptime, radacctid)
 );
 
 CREATE TABLE IF NOT EXISTS nas (
@@ -107,3 +110,19 @@ CREATE TABLE IF NOT EXISTS radpostauth (
   KEY username (username),
   KEY authdate (authdate)
 );
+
+-- SpotPay: voucher username → owning vendor, written by the dashboard when it
+-- provisions users and never removed on disable, so session queries can be
+-- vendor-scoped with a join instead of a giant username IN (...) list.
+-- The radacct_vendor trigger copies the owner onto radacct.vendor_id, so a
+-- vendor's sessions are one (vendor_id, radacctid) index range for keyset
+-- pagination. Existing databases: manage.py backfill_radius_vendor_users.
+CREATE TABLE IF NOT EXISTS radvendoruser (
+  username varchar(64) NOT NULL,
+  vendor_id int(11) NOT NULL,
+  PRIMARY KEY (username),
+  KEY vendor_username (vendor_id, username)
+);
+
+CREATE TRIGGER radacct_vendor BEFORE INSERT ON radacct FOR EACH ROW
+  SET NEW.vendor_id = (SELECT vendor_id FROM radvendoruser WHERE username = NEW.username);
@@ -0,0 +1,262 @@
+"""
+accounting.py
+=============
+Incremental copy of FreeRADIUS radacct into RadiusSession, with usage
+rollups, run by manage.py run_radius_ingest.
+
+Each ingest() pass:
+
+  1. new rows      → radacct rows past the persisted cursor
+                     (IngestCursor "radacct" = last radacctid), read as a
+                     primary-key range, BATCH_SIZE at a time. The same
+                     range read starts REREAD_WINDOW ids below the cursor:
+                     InnoDB hands out auto-increment ids before commit, so
+                     a row can become visible after a higher id was
+                     already ingested; lookback rows we don't have yet
+                     are applied like new ones
+  2. open sessions → the current radacct rows of every RadiusSession still
+                     marked active, by primary key — this picks up interim
+                     updates and stops without relying on acctupdatetime
+                     (not indexed, and not written by every FreeRADIUS
+                     stop query)
+
+and upserts them in one local transaction together with the cursor:
+RadiusSession rows (matched on radacct_id), VoucherUsage (per voucher,
+lifetime) and ProfileUsage (per profile per day). Rollups add the
+difference between the new radacct counters and what the session row
+already held, so re-reading a session never double counts.
+
+Rows whose username is not one of our vouchers are skipped. A voucher's
+first session marks it USED. A voucher whose lifetime traffic reaches its
+profile's data limit is EXPIRED and queued for removal from FreeRADIUS
+(sync_queue) — the per-session Mikrotik-Total-Limit alone doesn't stop a
+voucher from logging in again.
+
+Reports and limit checks read these local, indexed tables; FreeRADIUS'
+database only sees primary-key reads from one process.
+"""
+
+import datetime
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import freeradius as fr
+from . import sync_queue
+from .models import IngestCursor, ProfileUsage, RadiusSession, Voucher, VoucherUsage
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "radacct"
+BATCH_SIZE = 1000
+# radacctids below the cursor re-read every pass for late-committed rows
+REREAD_WINDOW = 1000
+# radacct DATETIMEs are written by MySQL/FreeRADIUS in UTC
+RADACCT_TZ = datetime.timezone.utc
+
+SESSION_FIELDS = [
+    "username", "nas_ip", "session_id", "framed_ip", "called_station_id", "calling_station_id",
+    "bytes_in", "bytes_out", "session_time", "start_time", "stop_time", "is_active",
+]
+USAGE_FIELDS = ("sessions", "bytes_in", "bytes_out", "session_time")
+
+
+def _aware(value):
+    if value is None or timezone.is_aware(value):
+        return value
+    return timezone.make_aware(value, RADACCT_TZ)
+
+
+def _values(row):
+    """radacct row → RadiusSession field values."""
+    return {
+        "username": row["username"],
+        "nas_ip": row["nasipaddress"],
+        "session_id": row["acctuniqueid"] or f"radacct-{row['radacctid']}",
+        "framed_ip": row["framedipaddress"] or None,
+        "called_station_id": row["calledstationid"] or "",
+        "calling_station_id": row["callingstationid"] or "",
+        "bytes_in": row["acctinputoctets"] or 0,
+        "bytes_out": row["acctoutputoctets"] or 0,
+        "session_time": row["acctsessiontime"] or 0,
+        "start_time": _aware(row["acctstarttime"]),
+        "stop_time": _aware(row["acctstoptime"]),
+        "is_active": row["acctstoptime"] is None,
+    }
+
+
+def _add(totals, key, sessions, session, old, now):
+    entry = totals[key]
+    entry["sessions"] += sessions
+    for field in ("bytes_in", "bytes_out", "session_time"):
+        # Counters only grow; a reset (e.g. NAS reboot) never subtracts usage
+        entry[field] += max(getattr(session, field) - old.get(field, 0), 0)
+    seen = session.stop_time or now
+    entry["last_seen_at"] = max(entry.get("last_seen_at") or seen, seen)
+
+
+def apply_rows(rows, now=None):
+    """
+    Upsert radacct rows into RadiusSession and roll their usage up.
+    Returns (sessions written, ids of vouchers whose usage changed).
+    Call inside a transaction.
+    """
+    now = now or timezone.now()
+    rows = list({row["radacctid"]: row for row in rows}.values())
+    if not rows:
+        return 0, set()
+
+    existing = {s.radacct_id: s for s in RadiusSession.objects.filter(radacct_id__in=[r["radacctid"] for r in rows])}
+    vouchers = {
+        v.code: v for v in Voucher.objects.filter(code__in={r["username"] for r in rows})
+        .select_related("batch").only("id", "code", "status", "used_at", "batch__vendor_id", "batch__profile_id")
+    }
+
+    created, updated = [], []
+    voucher_usage = defaultdict(lambda: dict.fromkeys(USAGE_FIELDS, 0))
+    profile_usage = defaultdict(lambda: dict.fromkeys(USAGE_FIELDS, 0))
+    first_used = {}
+
+    for row in rows:
+        voucher = vouchers.get(row["username"])
+        session = existing.get(row["radacctid"])
+        values = _values(row)
+        if voucher is None:
+            # Not one of ours — or its voucher was deleted since: keep the row current, no rollups
+            if session is not None:
+                for field, value in values.items():
+                    setattr(session, field, value)
+                updated.append(session)
+            continue
+        if session is None:
+            old = {}
+            session = RadiusSession(radacct_id=row["radacctid"], vendor_id=voucher.batch.vendor_id,
+                                    voucher_id=voucher.id, **values)
+            created.append(session)
+        else:
+            old = {field: getattr(session, field) for field in ("bytes_in", "bytes_out", "session_time")}
+            for field, value in values.items():
+                setattr(session, field, value)
+            updated.append(session)
+
+        new_session = 0 if old else 1
+        day = timezone.localdate(session.start_time or now)
+        _add(voucher_usage, voucher.id, new_session, session, old, now)
+        _add(profile_usage, (voucher.batch.profile_id, day), new_session, session, old, now)
+        if voucher.status == Voucher.STATUS_UNUSED and voucher.id not in first_used:
+            first_used[voucher.id] = session.start_time or now
+
+    RadiusSession.objects.bulk_create(created, batch_size=500)
+    RadiusSession.objects.bulk_update(updated, SESSION_FIELDS, batch_size=500)
+    _roll_up_vouchers(voucher_usage)
+    _roll_up_profiles(profile_usage)
+    for voucher_id, used_at in first_used.items():
+        Voucher.objects.filter(pk=voucher_id, status=Voucher.STATUS_UNUSED).update(
+            status=Voucher.STATUS_USED, used_at=used_at,
+        )
+    return len(created) + len(updated), set(voucher_usage)
+
+
+def _roll_up_vouchers(totals):
+    if not totals:
+        return
+    found = {u.voucher_id: u for u in VoucherUsage.objects.select_for_update().filter(voucher_id__in=list(totals))}
+    missing = []
+    for voucher_id, delta in totals.items():
+        usage = found.get(voucher_id)
+        if usage is None:
+            usage = VoucherUsage(voucher_id=voucher_id)
+            missing.append(usage)
+        for field in USAGE_FIELDS:
+            setattr(usage, field, getattr(usage, field) + delta[field])
+        usage.last_seen_at = max(filter(None, (usage.last_seen_at, delta["last_seen_at"])))
+    VoucherUsage.objects.bulk_update(list(found.values()), list(USAGE_FIELDS) + ["last_seen_at"], batch_size=500)
+    VoucherUsage.objects.bulk_create(missing, batch_size=500)
+
+
+def _roll_up_profiles(totals):
+    if not totals:
+        return
+    dates = {day for _, day in totals}
+    found = {
+        (u.profile_id, u.date): u
+        for u in ProfileUsage.objects.select_for_update()
+        .filter(profile_id__in={profile_id for profile_id, _ in totals}, date__in=dates)
+    }
+    missing, changed = [], []
+    for key, delta in totals.items():
+        usage = found.get(key)
+        if usage is None:
+            usage = ProfileUsage(profile_id=key[0], date=key[1])
+            missing.append(usage)
+        else:
+            changed.append(usage)
+        for field in USAGE_FIELDS:
+            setattr(usage, field, getattr(usage, field) + delta[field])
+    ProfileUsage.objects.bulk_update(changed, list(USAGE_FIELDS), batch_size=500)
+    ProfileUsage.objects.bulk_create(missing, batch_size=500)
+
+
+def enforce_data_limits(voucher_ids):
+    """EXPIRE vouchers (among voucher_ids) whose lifetime traffic reached the profile's data limit."""
+    if not voucher_ids:
+        return []
+    over = list(
+        VoucherUsage.objects
+        .filter(voucher_id__in=list(voucher_ids), voucher__status=Voucher.STATUS_USED,
+                voucher__batch__profile__data_limit_mb__gt=0)
+        .annotate(total=F("bytes_in") + F("bytes_out"))
+        .filter(total__gte=F("voucher__batch__profile__data_limit_mb") * 1024 * 1024)
+        .values_list("voucher_id", "voucher__code")
+    )
+    if over:
+        Voucher.objects.filter(pk__in=[pk for pk, _ in over]).update(status=Voucher.STATUS_EXPIRED)
+        sync_queue.enqueue_disable([code for _, code in over])
+    return [code for _, code in over]
+
+
+# ---------------------------------------------------------------------------
+# Ingest pass
+# ---------------------------------------------------------------------------
+
+def ingest(batch_size=BATCH_SIZE):
+    """
+    One pass: new radacct rows (up to batch_size), late rows in the lookback
+    window and a refresh of open sessions.
+    Returns {"new", "late", "refreshed", "written", "expired", "more"}.
+    """
+    cursor, _ = IngestCursor.objects.get_or_create(name=CURSOR_NAME)
+    limit = batch_size + REREAD_WINDOW
+    rows = fr.radacct_after(max(cursor.position - REREAD_WINDOW, 0), limit)
+    new_rows = [row for row in rows if row["radacctid"] > cursor.position]
+    lookback = {row["radacctid"]: row for row in rows if row["radacctid"] <= cursor.position}
+    if lookback:
+        known = RadiusSession.objects.filter(radacct_id__in=list(lookback)).values_list("radacct_id", flat=True)
+        for radacct_id in known:
+            del lookback[radacct_id]
+    late_rows = list(lookback.values())
+    open_ids = set(RadiusSession.objects.filter(is_active=True, radacct_id__isnull=False)
+                   .values_list("radacct_id", flat=True))
+    refreshed = fr.radacct_rows(open_ids)
+    # Open locally but purged from radacct — nothing will ever close them
+    gone = open_ids - {row["radacctid"] for row in refreshed}
+
+    with transaction.atomic():
+        written, touched = apply_rows(refreshed + late_rows + new_rows)
+        if gone:
+            RadiusSession.objects.filter(radacct_id__in=gone).update(is_active=False)
+        expired = enforce_data_limits(touched)
+        if new_rows:
+            IngestCursor.objects.filter(pk=cursor.pk).update(position=new_rows[-1]["radacctid"])
+
+    return {
+        "new": len(new_rows),
+        "late": len(late_rows),
+        "refreshed": len(refreshed),
+        "written": written,
+        "expired": len(expired),
+        "more": len(rows) >= limit,
+    }
@@ -5,26 +5,176 @@ Direct interface to FreeRADIUS MySQL database.
 FreeRADIUS uses its own schema (radcheck, radreply, radusergroup, radgroupcheck, radgroupreply, nas, radacct).
 This module reads/writes that schema directly — no REST API needed.
 FreeRADIUS authenticates users by querying these tables in real time.
+
+All access goes through the connection pool in pool.py. The batch
+functions (add_users, disable_users, sync_groups, delete_groups,
+delete_nas_many) apply any number of rows in ONE transaction on one
+pooled connection, CHUNK usernames per statement, and raise on failure —
+they are what the write-behind queue (sync_queue.py) calls. The
+single-object helpers below them keep their old contract: log and never
+raise.
+
+Session queries are vendor-scoped without shipping every code a vendor
+ever generated as an IN (...) list. radvendoruser (username → vendor_id)
+is filled by add_users (which creates it if needed) and kept after a
+voucher is disabled; a BEFORE INSERT trigger copies the owner onto
+radacct.vendor_id, so a vendor's sessions are one range of the
+(vendor_id, radacctid) index, newest first — LIMIT stops the scan, no
+filesort:
+
+    EXPLAIN SELECT … FROM radacct a WHERE a.vendor_id = 7
+            ORDER BY a.radacctid DESC LIMIT 26
+    → type=ref, key=vendor_radacctid, Extra="Using where; Backward index scan"
+
+Open sessions use (vendor_id, acctstoptime, radacctid) the same way.
+install_vendor_column() adds the column, indexes and trigger to an
+existing radacct and fill_radacct_vendors() backfills it (manage.py
+backfill_radius_vendor_users — a deploy step). Until then the session
+queries fall back to joining radvendoruser.
 """
 
-import MySQLdb
-from django.conf import settings
 import logging
 
+from . import pool
+
 logger = logging.getLogger(__name__)
 
+# Usernames / group names per IN (...) list
+CHUNK = 500
+
+# Errors worth retrying later (MySQL down, connection dropped, pool busy)
+TRANSIENT_ERRORS = pool.DISCONNECT_ERRORS + (pool.PoolTimeout,)
 
-def _conn():
-    """Open a connection to the FreeRADIUS MySQL database."""
-    cfg = settings.FREERADIUS_DB
-    return MySQLdb.connect(
-        host=cfg["host"],
-        port=cfg["port"],
-        db=cfg["name"],
-        user=cfg["user"],
-        passwd=cfg["password"],
-        connect_timeout=5,
+# radacctids per UPDATE when backfilling radacct.vendor_id
+BACKFILL_RANGE = 50000
+
+VENDOR_USER_DDL = """
+    CREATE TABLE IF NOT EXISTS radvendoruser (
+      username varchar(64) NOT NULL,
+      vendor_id int(11) NOT NULL,
+      PRIMARY KEY (username),
+      KEY vendor_username (vendor_id, username)
     )
+"""
+RADACCT_VENDOR_DDL = """
+    ALTER TABLE radacct
+      ADD COLUMN vendor_id int(11) NULL DEFAULT NULL,
+      ADD KEY vendor_radacctid (vendor_id, radacctid),
+      ADD KEY vendor_open (vendor_id, acctstoptime, radacctid)
+"""
+RADACCT_VENDOR_TRIGGER = """
+    CREATE TRIGGER radacct_vendor BEFORE INSERT ON radacct FOR EACH ROW
+      SET NEW.vendor_id = (SELECT vendor_id FROM radvendoruser WHERE username = NEW.username)
+"""
+
+# Per-process schema state (radvendoruser created / radacct.vendor_id present)
+_schema = {"vendor_user_table": False, "radacct_vendor": None}
+
+
+def _chunks(items, size=CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _placeholders(items):
+    return ",".join(["%s"] * len(items))
+
+
+def _ensure_vendor_user_table(cur):
+    """CREATE TABLE IF NOT EXISTS radvendoruser, once per process (databases older than the table)."""
+    if not _schema["vendor_user_table"]:
+        cur.execute(VENDOR_USER_DDL)
+        _schema["vendor_user_table"] = True
+
+
+# ─── Batch writes (raise on failure) ─────────────────────────────────────────
+
+def add_users(users):
+    """
+    Create (or re-create) FreeRADIUS users from [(username, groupname, vendor_id)]:
+    Cleartext-Password in radcheck (password = username), the group link
+    in radusergroup and the owner in radvendoruser. Existing rows for those
+    usernames are replaced, so re-applying the same batch is harmless.
+    """
+    users = list({username: (username, group, vendor_id) for username, group, vendor_id in users}.values())
+    if not users:
+        return
+    with pool.transaction() as cur:
+        _ensure_vendor_user_table(cur)
+        for chunk in _chunks(users):
+            names = [username for username, _, _ in chunk]
+            cur.execute(f"DELETE FROM radcheck WHERE username IN ({_placeholders(names)})", names)
+            cur.execute(f"DELETE FROM radusergroup WHERE username IN ({_placeholders(names)})", names)
+            cur.executemany(
+                "INSERT INTO radcheck (username, attribute, op, value) VALUES (%s, %s, %s, %s)",
+                [(username, "Cleartext-Password", ":=", username) for username, _, _ in chunk]
+            )
+            cur.executemany(
+                "INSERT INTO radusergroup (username, groupname, priority) VALUES (%s, %s, %s)",
+                [(username, group, 1) for username, group, _ in chunk]
+            )
+            cur.executemany(
+                "INSERT INTO radvendoruser (username, vendor_id) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE vendor_id = VALUES(vendor_id)",
+                [(username, vendor_id) for username, _, vendor_id in chunk]
+            )
+
+
+def disable_users(usernames):
+    """Remove users from radcheck / radusergroup (they can no longer log in)."""
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return
+    with pool.transaction() as cur:
+        for chunk in _chunks(usernames):
+            cur.execute(f"DELETE FROM radcheck WHERE username IN ({_placeholders(chunk)})", chunk)
+            cur.execute(f"DELETE FROM radusergroup WHERE username IN ({_placeholders(chunk)})", chunk)
+
+
+def sync_groups(groups):
+    """
+    Replace the attributes of several groups at once.
+    `groups` is {groupname: (check_rows, reply_rows)} with rows as
+    (attribute, op, value) — see profile_attributes().
+    """
+    if not groups:
+        return
+    names = list(groups)
+    check_rows = [(g, a, op, v) for g, (check, _) in groups.items() for a, op, v in check]
+    reply_rows = [(g, a, op, v) for g, (_, reply) in groups.items() for a, op, v in reply]
+    with pool.transaction() as cur:
+        for chunk in _chunks(names):
+            cur.execute(f"DELETE FROM radgroupcheck WHERE groupname IN ({_placeholders(chunk)})", chunk)
+            cur.execute(f"DELETE FROM radgroupreply WHERE groupname IN ({_placeholders(chunk)})", chunk)
+        if check_rows:
+            cur.executemany(
+                "INSERT INTO radgroupcheck (groupname, attribute, op, value) VALUES (%s, %s, %s, %s)",
+                check_rows
+            )
+        if reply_rows:
+            cur.executemany(
+                "INSERT INTO radgroupreply (groupname, attribute, op, value) VALUES (%s, %s, %s, %s)",
+                reply_rows
+            )
+
+
+def delete_groups(groupnames):
+    groupnames = list(dict.fromkeys(groupnames))
+    if not groupnames:
+        return
+    with pool.transaction() as cur:
+        for chunk in _chunks(groupnames):
+            cur.execute(f"DELETE FROM radgroupcheck WHERE groupname IN ({_placeholders(chunk)})", chunk)
+            cur.execute(f"DELETE FROM radgroupreply WHERE groupname IN ({_placeholders(chunk)})", chunk)
+
+
+def delete_nas_many(nas_ips):
+    nas_ips = list(dict.fromkeys(nas_ips))
+    if not nas_ips:
+        return
+    with pool.transaction() as cur:
+        for chunk in _chunks(nas_ips):
+            cur.execute(f"DELETE FROM nas WHERE nasname IN ({_placeholders(chunk)})", chunk)
 
 
 # ─── NAS (MikroTik Router) ────────────────────────────────────────────────────
@@ -35,23 +185,19 @@ def sync_nas(nas_device):
     FreeRADIUS uses this to validate which routers can send auth requests.
     """
     try:
-        db = _conn()
-        cur = db.cursor()
-        cur.execute("SELECT id FROM nas WHERE nasname = %s", (nas_device.nas_ip,))
-        row = cur.fetchone()
-        if row:
-            cur.execute(
-                "UPDATE nas SET shortname=%s, secret=%s, description=%s WHERE nasname=%s",
-                (nas_device.name, nas_device.shared_secret, nas_device.description, nas_device.nas_ip)
-            )
-        else:
-            cur.execute(
-                "INSERT INTO nas (nasname, shortname, type, secret, description) VALUES (%s, %s, 'other', %s, %s)",
-                (nas_device.nas_ip, nas_device.name, nas_device.shared_secret, nas_device.description)
-            )
-        db.commit()
-        cur.close()
-        db.close()
+        with pool.transaction() as cur:
+            cur.execute("SELECT id FROM nas WHERE nasname = %s", (nas_device.nas_ip,))
+            row = cur.fetchone()
+            if row:
+                cur.execute(
+                    "UPDATE nas SET shortname=%s, secret=%s, description=%s WHERE nasname=%s",
+                    (nas_device.name, nas_device.shared_secret, nas_device.description, nas_device.nas_ip)
+                )
+            else:
+                cur.execute(
+                    "INSERT INTO nas (nasname, shortname, type, secret, description) VALUES (%s, %s, 'other', %s, %s)",
+                    (nas_device.nas_ip, nas_device.name, nas_device.shared_secret, nas_device.description)
+                )
     except Exception as e:
         logger.error("sync_nas failed for %s: %s", nas_device.nas_ip, e)
 
@@ -59,85 +205,51 @@ def sync_nas(nas_device):
 def delete_nas(nas_ip):
     """Remove a NAS entry from FreeRADIUS."""
     try:
-        db = _conn()
-        cur = db.cursor()
-        cur.execute("DELETE FROM nas WHERE nasname = %s", (nas_ip,))
-        db.commit()
-        cur.close()
-        db.close()
+        delete_nas_many([nas_ip])
     except Exception as e:
         logger.error("delete_nas failed for %s: %s", nas_ip, e)
 
 
 # ─── Group (Profile) ──────────────────────────────────────────────────────────
 
+def profile_attributes(profile):
+    """
+    (check_rows, reply_rows) for a profile's group, rows as (attribute, op, value):
+    Auth-Type / Simultaneous-Use checks; Session-Timeout, Mikrotik-Total-Limit
+    and Mikrotik-Rate-Limit replies when the profile sets them.
+    """
+    check = [
+        ("Auth-Type", ":=", "Local"),
+        ("Simultaneous-Use", ":=", str(profile.simultaneous_use)),
+    ]
+    reply = []
+    # Session-Timeout (seconds)
+    if profile.session_timeout:
+        reply.append(("Session-Timeout", ":=", str(profile.session_timeout * 60)))
+    # Data limit — MikroTik uses Mikrotik-Total-Limit (bytes)
+    if profile.data_limit_mb:
+        reply.append(("Mikrotik-Total-Limit", ":=", str(profile.data_limit_mb * 1024 * 1024)))
+    # Speed limits — MikroTik rate limit format "upload/download"
+    if profile.download_kbps or profile.upload_kbps:
+        reply.append(("Mikrotik-Rate-Limit", ":=", f"{profile.upload_kbps}k/{profile.download_kbps}k"))
+    return check, reply
+
+
 def sync_profile(profile):
     """
     Write profile attributes to FreeRADIUS radgroupcheck and radgroupreply tables.
     Group name = vendor_id_profilename to keep vendor isolation.
     """
-    group = _group_name(profile)
     try:
-        db = _conn()
-        cur = db.cursor()
-
-        # Clear existing group attributes
-        cur.execute("DELETE FROM radgroupcheck WHERE groupname = %s", (group,))
-        cur.execute("DELETE FROM radgroupreply WHERE groupname = %s", (group,))
-
-        # Auth-Type = Local (allow password check)
-        cur.execute(
-            "INSERT INTO radgroupcheck (groupname, attribute, op, value) VALUES (%s, 'Auth-Type', ':=', 'Local')",
-            (group,)
-        )
-
-        # Simultaneous-Use
-        cur.execute(
-            "INSERT INTO radgroupcheck (groupname, attribute, op, value) VALUES (%s, 'Simultaneous-Use', ':=', %s)",
-            (group, str(profile.simultaneous_use))
-        )
-
-        # Session-Timeout (seconds)
-        if profile.session_timeout:
-            cur.execute(
-                "INSERT INTO radgroupreply (groupname, attribute, op, value) VALUES (%s, 'Session-Timeout', ':=', %s)",
-                (group, str(profile.session_timeout * 60))
-            )
-
-        # Data limit — MikroTik uses Mikrotik-Total-Limit (bytes)
-        if profile.data_limit_mb:
-            limit_bytes = profile.data_limit_mb * 1024 * 1024
-            cur.execute(
-                "INSERT INTO radgroupreply (groupname, attribute, op, value) VALUES (%s, 'Mikrotik-Total-Limit', ':=', %s)",
-                (group, str(limit_bytes))
-            )
-
-        # Speed limits — MikroTik rate limit format "upload/download"
-        if profile.download_kbps or profile.upload_kbps:
-            rate = f"{profile.upload_kbps}k/{profile.download_kbps}k"
-            cur.execute(
-                "INSERT INTO radgroupreply (groupname, attribute, op, value) VALUES (%s, 'Mikrotik-Rate-Limit', ':=', %s)",
-                (group, rate)
-            )
-
-        db.commit()
-        cur.close()
-        db.close()
+        sync_groups({_group_name(profile): profile_attributes(profile)})
     except Exception as e:
         logger.error("sync_profile failed for profile %s: %s", profile.id, e)
 
 
 def delete_profile(profile):
     """Remove a profile group from FreeRADIUS."""
-    group = _group_name(profile)
     try:
-        db = _conn()
-        cur = db.cursor()
-        cur.execute("DELETE FROM radgroupcheck WHERE groupname = %s", (group,))
-        cur.execute("DELETE FROM radgroupreply WHERE groupname = %s", (group,))
-        db.commit()
-        cur.close()
-        db.close()
+        delete_groups([_group_name(profile)])
     except Exception as e:
         logger.error("delete_profile failed: %s", e)
 
@@ -150,28 +262,8 @@ def add_voucher(voucher):
     - radcheck: username + password (Cleartext-Password)
     - radusergroup: links user to their profile group
     """
-    group = _group_name(voucher.batch.profile)
     try:
-        db = _conn()
-        cur = db.cursor()
-
-        # Password
-        cur.execute("DELETE FROM radcheck WHERE username = %s", (voucher.code,))
-        cur.execute(
-            "INSERT INTO radcheck (username, attribute, op, value) VALUES (%s, 'Cleartext-Password', ':=', %s)",
-            (voucher.code, voucher.code)
-        )
-
-        # Group membership
-        cur.execute("DELETE FROM radusergroup WHERE username = %s", (voucher.code,))
-        cur.execute(
-            "INSERT INTO radusergroup (username, groupname, priority) VALUES (%s, %s, 1)",
-            (voucher.code, group)
-        )
-
-        db.commit()
-        cur.close()
-        db.close()
+        add_users([(voucher.code, _group_name(voucher.batch.profile), voucher.batch.vendor_id)])
     except Exception as e:
         logger.error("add_voucher failed for %s: %s", voucher.code, e)
 
@@ -179,13 +271,7 @@ def add_voucher(voucher):
 def disable_voucher(code):
     """Disable a voucher by removing it from FreeRADIUS."""
     try:
-        db = _conn()
-        cur = db.cursor()
-        cur.execute("DELETE FROM radcheck WHERE username = %s", (code,))
-        cur.execute("DELETE FROM radusergroup WHERE username = %s", (code,))
-        db.commit()
-        cur.close()
-        db.close()
+        disable_users([code])
     except Exception as e:
         logger.error("disable_voucher failed for %s: %s", code, e)
 
@@ -194,96 +280,203 @@ def bulk_add_vouchers(vouchers):
     """Add multiple vouchers in a single DB transaction — much faster than one by one."""
     if not vouchers:
         return
-
     group = _group_name(vouchers[0].batch.profile)
     try:
-        db = _conn()
-        cur = db.cursor()
+        add_users([(v.code, group, v.batch.vendor_id) for v in vouchers])
+    except Exception as e:
+        logger.error("bulk_add_vouchers failed: %s", e)
 
-        check_rows = [(v.code, "Cleartext-Password", ":=", v.code) for v in vouchers]
-        group_rows = [(v.code, group, 1) for v in vouchers]
 
-        cur.executemany(
-            "INSERT IGNORE INTO radcheck (username, attribute, op, value) VALUES (%s, %s, %s, %s)",
-            check_rows
-        )
-        cur.executemany(
-            "INSERT IGNORE INTO radusergroup (username, groupname, priority) VALUES (%s, %s, %s)",
-            group_rows
-        )
+# ─── Sessions (vendor-scoped, keyset-paginated) ──────────────────────────────
 
-        db.commit()
-        cur.close()
-        db.close()
-    except Exception as e:
-        logger.error("bulk_add_vouchers failed: %s", e)
+SESSION_COLUMNS = """
+    a.radacctid, a.username, a.nasipaddress, a.acctsessionid, a.framedipaddress,
+    a.calledstationid, a.callingstationid,
+    a.acctinputoctets, a.acctoutputoctets, a.acctsessiontime,
+    a.acctstarttime, a.acctstoptime
+"""
 
 
-# ─── Active Sessions ──────────────────────────────────────────────────────────
+def _fetch_dicts(cur):
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, row)) for row in cur.fetchall()]
 
-def get_active_sessions(vendor_usernames):
-    """
-    Pull active sessions from radacct for a vendor's voucher codes.
-    Returns list of dicts.
-    """
-    if not vendor_usernames:
-        return []
-    try:
-        db = _conn()
-        cur = db.cursor()
-        placeholders = ",".join(["%s"] * len(vendor_usernames))
+
+def _radacct_has_vendor(cur):
+    """Whether radacct.vendor_id exists yet (checked once per process)."""
+    if _schema["radacct_vendor"] is None:
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = 'radacct' AND column_name = 'vendor_id'"
+        )
+        _schema["radacct_vendor"] = bool(cur.fetchone()[0])
+        if not _schema["radacct_vendor"]:
+            logger.warning("radacct.vendor_id missing — run manage.py backfill_radius_vendor_users")
+    return _schema["radacct_vendor"]
+
+
+def _vendor_scope(cur):
+    """FROM … WHERE fragment selecting a vendor's radacct rows (one %s: vendor_id)."""
+    if _radacct_has_vendor(cur):
+        return "radacct a", "a.vendor_id = %s"
+    return "radacct a JOIN radvendoruser u ON u.username = a.username", "u.vendor_id = %s"
+
+
+def _vendor_sessions(vendor_id, active_only, limit, before):
+    with pool.transaction() as cur:
+        source, scope = _vendor_scope(cur)
+        where = [scope]
+        params = [vendor_id]
+        if active_only:
+            where.append("a.acctstoptime IS NULL")
+        if before:
+            where.append("a.radacctid < %s")
+            params.append(before)
         cur.execute(
             f"""
-            SELECT username, nasipaddress, acctsessionid, framedipaddress,
-                   calledstationid, callingstationid,
-                   acctinputoctets, acctoutputoctets, acctsessiontime, acctstarttime
-            FROM radacct
-            WHERE acctstoptime IS NULL
-            AND username IN ({placeholders})
-            ORDER BY acctstarttime DESC
+            SELECT {SESSION_COLUMNS}
+            FROM {source}
+            WHERE {" AND ".join(where)}
+            ORDER BY a.radacctid DESC
+            LIMIT %s
             """,
-            vendor_usernames
+            params + [limit]
         )
-        cols = [d[0] for d in cur.description]
-        rows = [dict(zip(cols, row)) for row in cur.fetchall()]
-        cur.close()
-        db.close()
-        return rows
+        return _fetch_dicts(cur)
+
+
+def get_active_sessions(vendor_id, limit=100, before=None):
+    """
+    Open sessions (acctstoptime IS NULL) of a vendor's users, newest first.
+    Pass the last row's radacctid as `before` for the next page.
+    """
+    try:
+        return _vendor_sessions(vendor_id, True, limit, before)
     except Exception as e:
         logger.error("get_active_sessions failed: %s", e)
         return []
 
 
-def get_session_history(vendor_usernames, limit=100):
-    """Pull recent session history for a vendor's users."""
-    if not vendor_usernames:
-        return []
+def count_active_sessions(vendor_id):
     try:
-        db = _conn()
-        cur = db.cursor()
-        placeholders = ",".join(["%s"] * len(vendor_usernames))
-        cur.execute(
-            f"""
-            SELECT username, nasipaddress, acctsessionid, framedipaddress,
-                   acctinputoctets, acctoutputoctets, acctsessiontime,
-                   acctstarttime, acctstoptime
-            FROM radacct
-            WHERE username IN ({placeholders})
-            ORDER BY acctstarttime DESC
-            LIMIT %s
-            """,
-            vendor_usernames + [limit]
-        )
-        cols = [d[0] for d in cur.description]
-        rows = [dict(zip(cols, row)) for row in cur.fetchall()]
-        cur.close()
-        db.close()
-        return rows
+        with pool.transaction() as cur:
+            source, scope = _vendor_scope(cur)
+            cur.execute(
+                f"SELECT COUNT(*) FROM {source} WHERE {scope} AND a.acctstoptime IS NULL",
+                (vendor_id,)
+            )
+            return cur.fetchone()[0]
+    except Exception as e:
+        logger.error("count_active_sessions failed: %s", e)
+        return 0
+
+
+def get_session_history(vendor_id, limit=100, before=None):
+    """Recent sessions (open or closed) of a vendor's users, newest first; keyset on radacctid."""
+    try:
+        return _vendor_sessions(vendor_id, False, limit, before)
     except Exception as e:
         logger.error("get_session_history failed: %s", e)
         return []
 
 
+def backfill_vendor_users(rows):
+    """Upsert [(username, vendor_id)] into radvendoruser (users provisioned before it existed)."""
+    rows = list(rows)
+    if not rows:
+        return
+    with pool.transaction() as cur:
+        _ensure_vendor_user_table(cur)
+        for chunk in _chunks(rows):
+            cur.executemany(
+                "INSERT INTO radvendoruser (username, vendor_id) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE vendor_id = VALUES(vendor_id)",
+                chunk
+            )
+
+
+def install_vendor_column():
+    """
+    Add radacct.vendor_id, its indexes and the radacct_vendor trigger where
+    missing (deploy step; safe to re-run). Returns the names of what was added.
+    """
+    added = []
+    with pool.transaction() as cur:
+        _ensure_vendor_user_table(cur)
+        _schema["radacct_vendor"] = None
+        if not _radacct_has_vendor(cur):
+            cur.execute(RADACCT_VENDOR_DDL)
+            added.append("radacct.vendor_id")
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.triggers "
+            "WHERE trigger_schema = DATABASE() AND trigger_name = 'radacct_vendor'"
+        )
+        if not cur.fetchone()[0]:
+            cur.execute(RADACCT_VENDOR_TRIGGER)
+            added.append("radacct_vendor trigger")
+    _schema["radacct_vendor"] = True
+    return added
+
+
+def fill_radacct_vendors(range_size=BACKFILL_RANGE):
+    """
+    Set radacct.vendor_id from radvendoruser on rows that predate the
+    trigger, one radacctid range per transaction. Returns rows updated.
+    """
+    with pool.transaction() as cur:
+        cur.execute("SELECT COALESCE(MAX(radacctid), 0) FROM radacct")
+        last_id = cur.fetchone()[0]
+    updated = 0
+    for low in range(0, last_id, range_size):
+        with pool.transaction() as cur:
+            cur.execute(
+                """
+                UPDATE radacct a JOIN radvendoruser u ON u.username = a.username
+                SET a.vendor_id = u.vendor_id
+                WHERE a.radacctid > %s AND a.radacctid <= %s AND a.vendor_id IS NULL
+                """,
+                (low, low + range_size)
+            )
+            updated += cur.rowcount
+    return updated
+
+
+# ─── Accounting reads (for the radacct ingester) ─────────────────────────────
+
+RADACCT_COLUMNS = """
+    radacctid, acctuniqueid, username, nasipaddress, framedipaddress,
+    calledstationid, callingstationid,
+    acctinputoctets, acctoutputoctets, acctsessiontime,
+    acctstarttime, acctstoptime
+"""
+
+
+def radacct_after(after_id, limit):
+    """radacct rows with radacctid > after_id, oldest first (primary-key range scan). Raises."""
+    with pool.transaction() as cur:
+        cur.execute(
+            f"SELECT {RADACCT_COLUMNS} FROM radacct WHERE radacctid > %s ORDER BY radacctid LIMIT %s",
+            (after_id, limit)
+        )
+        return _fetch_dicts(cur)
+
+
+def radacct_rows(radacct_ids):
+    """Current radacct rows for the given radacctids (primary-key lookups). Raises."""
+    radacct_ids = list(radacct_ids)
+    rows = []
+    if not radacct_ids:
+        return rows
+    with pool.transaction() as cur:
+        for chunk in _chunks(radacct_ids):
+            cur.execute(
+                f"SELECT {RADACCT_COLUMNS} FROM radacct WHERE radacctid IN ({_placeholders(chunk)})",
+                chunk
+            )
+            rows.extend(_fetch_dicts(cur))
+    return rows
+
+
 # ─── Helpers ──────────────────────────────────────────────────────────────────
 
 def _group_name(profile):
@@ -0,0 +1,47 @@
+"""
+management/commands/backfill_radius_vendor_users.py
+===================================================
+Deploy step for vendor-scoped session queries on the FreeRADIUS database:
+
+  1. create radvendoruser, and add radacct.vendor_id with its indexes and
+     the radacct_vendor trigger, where missing
+  2. fill radvendoruser with every existing voucher code → vendor
+  3. set radacct.vendor_id on accounting rows written before the trigger
+
+Safe to re-run (rows are upserted, filled rows are skipped). Run it before
+restarting the dashboard after upgrading; until then session pages fall
+back to the slower radvendoruser join.
+"""
+
+from django.core.management.base import BaseCommand
+
+from radius import freeradius as fr
+from radius import pool
+from radius.models import Voucher
+
+
+class Command(BaseCommand):
+    help = "Install and backfill vendor columns (radvendoruser, radacct.vendor_id) in FreeRADIUS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        rows, total = [], 0
+        try:
+            for added in fr.install_vendor_column():
+                self.stdout.write(f"  ➕ Added {added}")
+            for row in Voucher.objects.values_list("code", "batch__vendor_id").iterator(chunk_size=size):
+                rows.append(row)
+                if len(rows) >= size:
+                    fr.backfill_vendor_users(rows)
+                    total += len(rows)
+                    rows = []
+            fr.backfill_vendor_users(rows)
+            total += len(rows)
+            self.stdout.write(f"  … indexed {total} voucher(s) by vendor")
+            filled = fr.fill_radacct_vendors()
+        finally:
+            pool.close_all()
+        self.stdout.write(f"✅ Indexed {total} voucher(s) by vendor, tagged {filled} radacct row(s)")
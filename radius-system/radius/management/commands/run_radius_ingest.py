@@ -0,0 +1,76 @@
+"""
+management/commands/run_radius_ingest.py
+========================================
+Long-running ingester that copies FreeRADIUS radacct into RadiusSession
+and keeps the per-voucher / per-profile usage rollups current (see
+radius/accounting.py). Catches up in BATCH_SIZE steps without sleeping,
+then polls every --interval seconds.
+
+Run as its own container (see docker-compose.yml). Run a single
+instance. Use --once to ingest until caught up and exit.
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from radius import accounting, pool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Ingest FreeRADIUS accounting (radacct) into local sessions and usage rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=30.0,
+                            help="Seconds between passes once caught up (default 30)")
+        parser.add_argument("--batch-size", type=int, default=accounting.BATCH_SIZE,
+                            help=f"New radacct rows per pass (default {accounting.BATCH_SIZE})")
+        parser.add_argument("--once", action="store_true",
+                            help="Ingest until caught up and exit")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.stdout.write("RADIUS accounting ingester started")
+
+        try:
+            while not self._stopping:
+                close_old_connections()
+                more = False
+                try:
+                    result = accounting.ingest(options["batch_size"])
+                    more = result["more"]
+                    if result["written"] or result["expired"]:
+                        self.stdout.write(
+                            f"  📥 {result['new']} new / {result['late']} late / {result['refreshed']} open radacct row(s), "
+                            f"{result['written']} session(s) written, {result['expired']} voucher(s) over data limit"
+                        )
+                except Exception as exc:
+                    logger.error("RADIUS ingest loop error: %s", exc)
+
+                if more:
+                    continue
+                if options["once"]:
+                    break
+                self._sleep(options["interval"])
+        finally:
+            pool.close_all()
+
+        if not options["once"]:
+            self.stdout.write("RADIUS accounting ingester stopped")
+
+    def _sleep(self, seconds):
+        deadline = time.monotonic() + max(0.0, seconds)
+        while not self._stopping and time.monotonic() < deadline:
+            time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
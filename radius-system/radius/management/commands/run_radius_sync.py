@@ -0,0 +1,86 @@
+"""
+management/commands/run_radius_sync.py
+======================================
+Long-running worker that applies queued FreeRADIUS writes (voucher adds
+and disables, profile group syncs, NAS removals) in batched transactions
+over the pooled MySQL connection (see radius/sync_queue.py, radius/pool.py).
+
+Run as its own container (see docker-compose.yml). Run a single
+instance — the queue is applied strictly in order. Use --once to drain
+the due jobs a single time. Pool and queue metrics are printed every
+--stats-every seconds.
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from radius import pool, sync_queue
+
+logger = logging.getLogger(__name__)
+
+PRUNE_EVERY = 3600
+
+
+class Command(BaseCommand):
+    help = "Apply queued FreeRADIUS writes in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--idle-sleep", type=float, default=1.0,
+                            help="Seconds to sleep when nothing is due (default 1.0)")
+        parser.add_argument("--stats-every", type=float, default=60.0,
+                            help="Seconds between metrics lines (default 60)")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain due jobs once and exit")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        last_stats = last_prune = time.monotonic()
+
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.stdout.write("RADIUS sync worker started")
+
+        try:
+            while not self._stopping:
+                close_old_connections()
+                jobs = []
+                try:
+                    jobs = sync_queue.claim_jobs()
+                    if jobs:
+                        done, failed, deferred = sync_queue.run_jobs(jobs)
+                        self.stdout.write(f"  ✅ Applied {done} job(s), {failed} failed, {deferred} deferred")
+
+                    if time.monotonic() - last_prune >= PRUNE_EVERY:
+                        sync_queue.prune()
+                        last_prune = time.monotonic()
+                    if time.monotonic() - last_stats >= options["stats_every"]:
+                        self._print_stats()
+                        last_stats = time.monotonic()
+                except Exception as exc:
+                    logger.error("RADIUS sync loop error: %s", exc)
+
+                if not jobs:
+                    if options["once"]:
+                        break
+                    time.sleep(options["idle_sleep"])
+        finally:
+            pool.close_all()
+
+        if not options["once"]:
+            self.stdout.write("RADIUS sync worker stopped")
+
+    def _print_stats(self):
+        p, q = pool.stats(), sync_queue.queue_stats()
+        self.stdout.write(
+            f"  📊 pool {p['in_use']}/{p['size']} in use (peak {p['peak_in_use']}), "
+            f"{p['waits']} wait(s) {p['wait_seconds']}s, {p['timeouts']} timeout(s) · "
+            f"queue {q['pending']} pending, {q['failed']} failed, lag {q['lag_seconds']}s"
+        )
+
+    def _stop(self, signum, frame):
+        self._stopping = True
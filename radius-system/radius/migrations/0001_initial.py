@@ -0,0 +1,105 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:44
+
+# The schema these apps had before they shipped migrations (tables created
+# with migrate --run-syncdb). Existing databases: manage.py migrate --fake-initial
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('session_timeout', models.PositiveIntegerField(default=0, help_text='Minutes (0 = unlimited)')),
+                ('data_limit_mb', models.PositiveIntegerField(default=0, help_text='MB (0 = unlimited)')),
+                ('download_kbps', models.PositiveIntegerField(default=0, help_text='Kbps (0 = unlimited)')),
+                ('upload_kbps', models.PositiveIntegerField(default=0, help_text='Kbps (0 = unlimited)')),
+                ('simultaneous_use', models.PositiveIntegerField(default=1)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='accounts.vendor')),
+            ],
+            options={
+                'ordering': ['name'],
+                'unique_together': {('vendor', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VoucherBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='radius.profile')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='voucher_batches', to='accounts.vendor')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Voucher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('status', models.CharField(choices=[('UNUSED', 'Unused'), ('USED', 'Used'), ('EXPIRED', 'Expired'), ('DISABLED', 'Disabled')], default='UNUSED', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('used_at', models.DateTimeField(blank=True, null=True)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vouchers', to='radius.voucherbatch')),
+            ],
+            options={
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RadiusSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=64)),
+                ('nas_ip', models.GenericIPAddressField()),
+                ('session_id', models.CharField(max_length=64, unique=True)),
+                ('framed_ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('called_station_id', models.CharField(blank=True, max_length=50)),
+                ('calling_station_id', models.CharField(blank=True, max_length=50)),
+                ('bytes_in', models.BigIntegerField(default=0)),
+                ('bytes_out', models.BigIntegerField(default=0)),
+                ('session_time', models.PositiveIntegerField(default=0, help_text='Seconds')),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('stop_time', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='accounts.vendor')),
+            ],
+            options={
+                'ordering': ['-start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NasDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Friendly name e.g. Main Router', max_length=100)),
+                ('nas_ip', models.GenericIPAddressField(help_text='MikroTik public/VPN IP')),
+                ('shared_secret', models.CharField(help_text='RADIUS shared secret', max_length=100)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nas_devices', to='accounts.vendor')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radius', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProfileUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('bytes_in', models.BigIntegerField(default=0)),
+                ('bytes_out', models.BigIntegerField(default=0)),
+                ('session_time', models.BigIntegerField(default=0, help_text='Seconds')),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RadiusSyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('op', models.CharField(choices=[('ADD_USERS', 'Add users'), ('DISABLE_USERS', 'Disable users'), ('SYNC_GROUP', 'Sync group'), ('DELETE_GROUP', 'Delete group'), ('DELETE_NAS', 'Delete NAS')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VoucherUsage',
+            fields=[
+                ('voucher', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='radius.voucher')),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('bytes_in', models.BigIntegerField(default=0)),
+                ('bytes_out', models.BigIntegerField(default=0)),
+                ('session_time', models.BigIntegerField(default=0, help_text='Seconds')),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='radiussession',
+            name='radacct_id',
+            field=models.BigIntegerField(blank=True, help_text='radacct.radacctid', null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='radiussession',
+            name='voucher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sessions', to='radius.voucher'),
+        ),
+        migrations.AlterField(
+            model_name='radiussession',
+            name='session_id',
+            field=models.CharField(help_text='radacct.acctuniqueid', max_length=64, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='radiussession',
+            index=models.Index(fields=['vendor', '-start_time'], name='radius_session_vendor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='radiussession',
+            index=models.Index(fields=['is_active'], name='radius_session_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='radiussyncjob',
+            index=models.Index(fields=['status', 'id'], name='radius_sync_active_idx'),
+        ),
+        migrations.AddField(
+            model_name='profileusage',
+            name='profile',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_days', to='radius.profile'),
+        ),
+        migrations.AddConstraint(
+            model_name='profileusage',
+            constraint=models.UniqueConstraint(fields=('profile', 'date'), name='radius_profile_usage_day_uniq'),
+        ),
+    ]
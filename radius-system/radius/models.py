@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from accounts.models import Vendor
 import uuid
 import random
@@ -131,11 +132,16 @@ class Voucher(models.Model):
 
 
 class RadiusSession(models.Model):
-    """Active/historical RADIUS accounting sessions — synced from FreeRADIUS."""
+    """
+    Active/historical RADIUS accounting sessions — synced from FreeRADIUS
+    radacct by manage.py run_radius_ingest (see radius/accounting.py).
+    """
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="sessions")
+    voucher = models.ForeignKey("Voucher", on_delete=models.SET_NULL, null=True, blank=True, related_name="sessions")
+    radacct_id = models.BigIntegerField(unique=True, null=True, blank=True, help_text="radacct.radacctid")
     username = models.CharField(max_length=64)
     nas_ip = models.GenericIPAddressField()
-    session_id = models.CharField(max_length=64, unique=True)
+    session_id = models.CharField(max_length=64, unique=True, help_text="radacct.acctuniqueid")
     framed_ip = models.GenericIPAddressField(null=True, blank=True)
     called_station_id = models.CharField(max_length=50, blank=True)
     calling_station_id = models.CharField(max_length=50, blank=True)
@@ -149,6 +155,10 @@ class RadiusSession(models.Model):
 
     class Meta:
         ordering = ["-start_time"]
+        indexes = [
+            models.Index(fields=["vendor", "-start_time"], name="radius_session_vendor_idx"),
+            models.Index(fields=["is_active"], name="radius_session_active_idx"),
+        ]
 
     def __str__(self):
         return f"{self.username} — {self.nas_ip}"
@@ -167,3 +177,100 @@ class RadiusSession(models.Model):
         h, rem = divmod(self.session_time, 3600)
         m, s = divmod(rem, 60)
         return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+class VoucherUsage(models.Model):
+    """Lifetime usage of one voucher, summed over its RadiusSessions by the ingester."""
+    voucher = models.OneToOneField(Voucher, on_delete=models.CASCADE, primary_key=True, related_name="usage")
+    sessions = models.PositiveIntegerField(default=0)
+    bytes_in = models.BigIntegerField(default=0)
+    bytes_out = models.BigIntegerField(default=0)
+    session_time = models.BigIntegerField(default=0, help_text="Seconds")
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def bytes_total(self):
+        return self.bytes_in + self.bytes_out
+
+
+class ProfileUsage(models.Model):
+    """Daily usage per profile (day = local date the session started)."""
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="usage_days")
+    date = models.DateField()
+    sessions = models.PositiveIntegerField(default=0)
+    bytes_in = models.BigIntegerField(default=0)
+    bytes_out = models.BigIntegerField(default=0)
+    session_time = models.BigIntegerField(default=0, help_text="Seconds")
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["profile", "date"], name="radius_profile_usage_day_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.profile} {self.date}"
+
+
+class IngestCursor(models.Model):
+    """Persisted position of an incremental reader (e.g. radacct → last radacctid ingested)."""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class RadiusSyncJob(models.Model):
+    """
+    A pending write to the FreeRADIUS MySQL database (write-behind queue).
+    Views enqueue these instead of talking to MySQL; manage.py run_radius_sync
+    applies them strictly in id order, coalescing neighbouring jobs of the
+    same op into one batched transaction (see radius/sync_queue.py).
+    """
+    OP_ADD_USERS = "ADD_USERS"
+    OP_DISABLE_USERS = "DISABLE_USERS"
+    OP_SYNC_GROUP = "SYNC_GROUP"
+    OP_DELETE_GROUP = "DELETE_GROUP"
+    OP_DELETE_NAS = "DELETE_NAS"
+    OPS = [
+        (OP_ADD_USERS, "Add users"),
+        (OP_DISABLE_USERS, "Disable users"),
+        (OP_SYNC_GROUP, "Sync group"),
+        (OP_DELETE_GROUP, "Delete group"),
+        (OP_DELETE_NAS, "Delete NAS"),
+    ]
+
+    STATUS_PENDING = "PENDING"
+    STATUS_RUNNING = "RUNNING"
+    STATUS_DONE = "DONE"
+    STATUS_FAILED = "FAILED"
+    STATUSES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    op = models.CharField(max_length=20, choices=OPS)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING)
+
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "id"], name="radius_sync_active_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.op} #{self.pk} ({self.status})"
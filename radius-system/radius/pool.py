@@ -0,0 +1,218 @@
+"""
+pool.py
+=======
+Fixed-size, per-process pool of connections to the FreeRADIUS MySQL database.
+
+Every freeradius.py call borrows a connection instead of paying a TCP
+connect + MySQL handshake:
+
+    with transaction() as cur:
+        cur.execute("DELETE FROM radcheck WHERE username = %s", (code,))
+
+  - at most FREERADIUS_DB["pool_size"] connections are open (or being
+    opened) per process; a caller that finds them all busy waits up to
+    FREERADIUS_DB["pool_timeout"] seconds and then gets PoolTimeout
+    instead of piling more connections onto MySQL
+  - a connection idle for more than HEALTHCHECK_AFTER seconds is pinged
+    before it is handed out, one idle for more than IDLE_TIMEOUT is closed
+  - a connection that raised a connection-level error (or whose rollback
+    failed) is discarded, never returned to the pool
+  - transaction() commits on clean exit and rolls back otherwise, so reads
+    never leave a stale REPEATABLE READ snapshot on a pooled connection
+
+stats() reports size, in-use / peak, waits, wait time and timeouts, so
+pool saturation is visible (radius/views.py → metrics, run_radius_sync).
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import MySQLdb
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Idle connections are pinged before reuse after this many seconds …
+HEALTHCHECK_AFTER = 30
+# … and closed after this many (well inside MySQL's wait_timeout)
+IDLE_TIMEOUT = 300
+CONNECT_TIMEOUT = 5
+
+DISCONNECT_ERRORS = (MySQLdb.OperationalError, MySQLdb.InterfaceError)
+
+
+class PoolTimeout(Exception):
+    """Every pooled connection stayed busy for the whole checkout timeout."""
+
+
+_lock = threading.Lock()
+_slots = None   # BoundedSemaphore(pool_size()), created on first use
+_idle = []      # [(conn, last_used)] — most recently used last
+_stats = {
+    "checkouts": 0,
+    "in_use": 0,
+    "peak_in_use": 0,
+    "waits": 0,
+    "wait_seconds": 0.0,
+    "timeouts": 0,
+    "connects": 0,
+    "health_failures": 0,
+    "discarded": 0,
+}
+
+
+def pool_size():
+    return max(1, int(settings.FREERADIUS_DB.get("pool_size", 4)))
+
+
+def checkout_timeout():
+    return float(settings.FREERADIUS_DB.get("pool_timeout", 5))
+
+
+def connect():
+    """Open a new connection to the FreeRADIUS database. Caller must close it."""
+    cfg = settings.FREERADIUS_DB
+    return MySQLdb.connect(
+        host=cfg["host"],
+        port=cfg["port"],
+        db=cfg["name"],
+        user=cfg["user"],
+        passwd=cfg["password"],
+        connect_timeout=CONNECT_TIMEOUT,
+    )
+
+
+def _semaphore():
+    global _slots
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(pool_size())
+        return _slots
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _acquire_slot():
+    slots = _semaphore()
+    if slots.acquire(blocking=False):
+        return
+    started = time.monotonic()
+    acquired = slots.acquire(timeout=checkout_timeout())
+    with _lock:
+        _stats["waits"] += 1
+        _stats["wait_seconds"] += time.monotonic() - started
+        if not acquired:
+            _stats["timeouts"] += 1
+    if not acquired:
+        logger.warning("FreeRADIUS pool exhausted (%s connections busy)", pool_size())
+        raise PoolTimeout(f"No FreeRADIUS connection free after {checkout_timeout():g}s")
+
+
+def _take_idle():
+    """Newest idle connection (health-checked if needed), or None."""
+    now = time.monotonic()
+    with _lock:
+        expired = [conn for conn, used in _idle if now - used >= IDLE_TIMEOUT]
+        _idle[:] = [(conn, used) for conn, used in _idle if now - used < IDLE_TIMEOUT]
+        conn, used = _idle.pop() if _idle else (None, now)
+    for stale in expired:
+        _close(stale)
+
+    if conn is not None and now - used >= HEALTHCHECK_AFTER:
+        try:
+            conn.ping()
+        except Exception as exc:
+            logger.warning("Dropping dead FreeRADIUS connection: %s", exc)
+            with _lock:
+                _stats["health_failures"] += 1
+            _close(conn)
+            conn = None
+    return conn
+
+
+def _checkout():
+    _acquire_slot()
+    try:
+        conn = _take_idle()
+        if conn is None:
+            conn = connect()
+            with _lock:
+                _stats["connects"] += 1
+    except BaseException:
+        _semaphore().release()
+        raise
+    with _lock:
+        _stats["checkouts"] += 1
+        _stats["in_use"] += 1
+        _stats["peak_in_use"] = max(_stats["peak_in_use"], _stats["in_use"])
+    return conn
+
+
+def _checkin(conn, discard=False):
+    with _lock:
+        _stats["in_use"] -= 1
+        if discard:
+            _stats["discarded"] += 1
+        else:
+            _idle.append((conn, time.monotonic()))
+    if discard:
+        _close(conn)
+    _semaphore().release()
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection; it is returned on exit (discarded if broken)."""
+    conn = _checkout()
+    try:
+        yield conn
+    except DISCONNECT_ERRORS:
+        _checkin(conn, discard=True)
+        raise
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception:
+            _checkin(conn, discard=True)
+        else:
+            _checkin(conn)
+        raise
+    _checkin(conn)
+
+
+@contextmanager
+def transaction():
+    """A cursor inside one transaction: committed on clean exit, rolled back on error."""
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+            conn.commit()
+        finally:
+            cur.close()
+
+
+def stats():
+    """Pool counters for this process (size, in_use, peak_in_use, waits, …)."""
+    with _lock:
+        data = dict(_stats, idle=len(_idle))
+    data["size"] = pool_size()
+    data["wait_seconds"] = round(data["wait_seconds"], 3)
+    data["saturation"] = round(data["in_use"] / data["size"], 2)
+    return data
+
+
+def close_all():
+    """Close every idle connection (worker shutdown)."""
+    with _lock:
+        conns = [conn for conn, _ in _idle]
+        _idle.clear()
+    for conn in conns:
+        _close(conn)
@@ -0,0 +1,232 @@
+"""
+sync_queue.py
+=============
+Write-behind queue in front of the FreeRADIUS MySQL database.
+
+Views never call MySQL for writes: they enqueue a RadiusSyncJob in the
+Django database (inside their own transaction, so a rolled-back request
+leaves nothing behind) and return. manage.py run_radius_sync drains it:
+
+  claim_jobs() → up to CLAIM_BATCH of the oldest active jobs, strictly in
+                 id order — it stops at the first job that is not due yet
+                 (or still held by another worker), so a later write is
+                 never applied ahead of an earlier one
+  run_jobs()   → splits the claim into runs of neighbouring jobs with the
+                 same op and applies each run as ONE batched freeradius.py
+                 call (one pooled connection, one transaction). 1,000
+                 generated vouchers cost a handful of statements, and a
+                 burst of single-voucher disables collapses into one
+                 DELETE … IN (…)
+
+MySQL unreachable / pool exhausted (freeradius.TRANSIENT_ERRORS) puts the
+failing run and everything claimed after it back as PENDING with
+exponential backoff; after MAX_ATTEMPTS the run is FAILED. Any other
+error (bad data) fails that run immediately so it cannot block the queue.
+"""
+
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from . import freeradius as fr
+from .models import RadiusSyncJob
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH = 200
+# Usernames per ADD_USERS / DISABLE_USERS job
+JOB_CODES = 1000
+# A RUNNING job whose worker stopped is picked up again after this long
+STALE_LOCK = timedelta(minutes=5)
+MAX_ATTEMPTS = 10
+BACKOFF_BASE = timedelta(seconds=5)
+BACKOFF_MAX = timedelta(minutes=5)
+DONE_RETENTION = timedelta(days=7)
+
+
+# ---------------------------------------------------------------------------
+# Enqueue (called from views)
+# ---------------------------------------------------------------------------
+
+def _enqueue_codes(op, codes, **extra):
+    codes = list(codes)
+    jobs = [
+        RadiusSyncJob(op=op, payload=dict(extra, codes=codes[i:i + JOB_CODES]))
+        for i in range(0, len(codes), JOB_CODES)
+    ]
+    return RadiusSyncJob.objects.bulk_create(jobs)
+
+
+def enqueue_add_vouchers(vouchers):
+    """Queue a batch's vouchers for creation as FreeRADIUS users (one profile per call)."""
+    if not vouchers:
+        return []
+    batch = vouchers[0].batch
+    return _enqueue_codes(
+        RadiusSyncJob.OP_ADD_USERS, [v.code for v in vouchers],
+        group=fr._group_name(batch.profile), vendor_id=batch.vendor_id,
+    )
+
+
+def enqueue_disable(codes):
+    return _enqueue_codes(RadiusSyncJob.OP_DISABLE_USERS, codes)
+
+
+def enqueue_profile_sync(profile):
+    # The attributes are captured now, so jobs replay exactly what was saved
+    check, reply = fr.profile_attributes(profile)
+    return RadiusSyncJob.objects.create(
+        op=RadiusSyncJob.OP_SYNC_GROUP,
+        payload={"group": fr._group_name(profile), "check": check, "reply": reply},
+    )
+
+
+def enqueue_profile_delete(profile):
+    return RadiusSyncJob.objects.create(
+        op=RadiusSyncJob.OP_DELETE_GROUP, payload={"group": fr._group_name(profile)},
+    )
+
+
+def enqueue_nas_delete(nas_ip):
+    return RadiusSyncJob.objects.create(op=RadiusSyncJob.OP_DELETE_NAS, payload={"nas_ip": nas_ip})
+
+
+# ---------------------------------------------------------------------------
+# Apply (one batched FreeRADIUS transaction per run of same-op jobs)
+# ---------------------------------------------------------------------------
+
+def _apply_add_users(payloads):
+    fr.add_users([(code, p["group"], p["vendor_id"]) for p in payloads for code in p["codes"]])
+
+
+def _apply_disable_users(payloads):
+    fr.disable_users([code for p in payloads for code in p["codes"]])
+
+
+def _apply_sync_group(payloads):
+    # Later edits of the same profile win
+    fr.sync_groups({p["group"]: (p["check"], p["reply"]) for p in payloads})
+
+
+def _apply_delete_group(payloads):
+    fr.delete_groups([p["group"] for p in payloads])
+
+
+def _apply_delete_nas(payloads):
+    fr.delete_nas_many([p["nas_ip"] for p in payloads])
+
+
+APPLY = {
+    RadiusSyncJob.OP_ADD_USERS: _apply_add_users,
+    RadiusSyncJob.OP_DISABLE_USERS: _apply_disable_users,
+    RadiusSyncJob.OP_SYNC_GROUP: _apply_sync_group,
+    RadiusSyncJob.OP_DELETE_GROUP: _apply_delete_group,
+    RadiusSyncJob.OP_DELETE_NAS: _apply_delete_nas,
+}
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def claim_jobs(limit=CLAIM_BATCH):
+    """Claim the longest due prefix of the queue (in id order). Returns [] when the head isn't due."""
+    now = timezone.now()
+    with transaction.atomic():
+        # Plain FOR UPDATE (not SKIP LOCKED): a second worker waits for this
+        # claim and then sees the head RUNNING, instead of skipping past it
+        active = (
+            RadiusSyncJob.objects.select_for_update()
+            .filter(status__in=RadiusSyncJob.ACTIVE_STATUSES)
+            .order_by("id")[:limit]
+        )
+        jobs = []
+        for job in active:
+            if job.status == RadiusSyncJob.STATUS_RUNNING and job.locked_at >= now - STALE_LOCK:
+                break
+            if job.status == RadiusSyncJob.STATUS_PENDING and job.next_attempt_at > now:
+                break
+            jobs.append(job)
+        if jobs:
+            RadiusSyncJob.objects.filter(pk__in=[j.pk for j in jobs]).update(
+                status=RadiusSyncJob.STATUS_RUNNING, locked_at=now, attempts=F("attempts") + 1,
+            )
+            for job in jobs:
+                job.status, job.locked_at, job.attempts = RadiusSyncJob.STATUS_RUNNING, now, job.attempts + 1
+    return jobs
+
+
+def run_jobs(jobs):
+    """Apply claimed jobs in order. Returns (done, failed, deferred) job counts."""
+    done = failed = 0
+    runs = [list(run) for _, run in groupby(jobs, key=lambda j: j.op)]
+    for index, run in enumerate(runs):
+        try:
+            APPLY[run[0].op]([job.payload for job in run])
+        except fr.TRANSIENT_ERRORS as exc:
+            rest = [job for later in runs[index + 1:] for job in later]
+            return done, failed + _retry_later(run, rest, str(exc)), len(run) + len(rest)
+        except Exception as exc:
+            logger.error("RADIUS sync %s x%s failed: %s", run[0].op, len(run), exc)
+            _finish(run, RadiusSyncJob.STATUS_FAILED, str(exc))
+            failed += len(run)
+        else:
+            _finish(run, RadiusSyncJob.STATUS_DONE)
+            done += len(run)
+    return done, failed, 0
+
+
+def _backoff(attempts):
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def _retry_later(run, rest, error):
+    """Put the failing run (and everything after it) back. Returns how many jobs were FAILED."""
+    logger.warning("RADIUS sync deferred (%s job(s)): %s", len(run) + len(rest), error)
+    if run[0].attempts >= MAX_ATTEMPTS:
+        _finish(run, RadiusSyncJob.STATUS_FAILED, error)
+        run, gave_up = [], len(run)
+    else:
+        gave_up = 0
+    retry_at = timezone.now() + _backoff(max((j.attempts for j in run), default=1))
+    RadiusSyncJob.objects.filter(pk__in=[j.pk for j in run]).update(
+        status=RadiusSyncJob.STATUS_PENDING, locked_at=None, next_attempt_at=retry_at, error=error[:2000],
+    )
+    # Never tried this round — don't charge them an attempt
+    RadiusSyncJob.objects.filter(pk__in=[j.pk for j in rest]).update(
+        status=RadiusSyncJob.STATUS_PENDING, locked_at=None, next_attempt_at=retry_at,
+        attempts=F("attempts") - 1,
+    )
+    return gave_up
+
+
+def _finish(jobs, status, error=""):
+    RadiusSyncJob.objects.filter(pk__in=[j.pk for j in jobs]).update(
+        status=status, locked_at=None, error=error[:2000], completed_at=timezone.now(),
+    )
+
+
+def prune(now=None):
+    """Drop DONE jobs older than DONE_RETENTION (FAILED ones are kept for inspection)."""
+    now = now or timezone.now()
+    deleted, _ = RadiusSyncJob.objects.filter(
+        status=RadiusSyncJob.STATUS_DONE, completed_at__lt=now - DONE_RETENTION,
+    ).delete()
+    return deleted
+
+
+def queue_stats(now=None):
+    """Queue depth and lag: pending / running / failed counts and the oldest pending job's age."""
+    now = now or timezone.now()
+    active = RadiusSyncJob.objects.filter(status__in=RadiusSyncJob.ACTIVE_STATUSES)
+    oldest = active.aggregate(m=Min("created_at"))["m"]
+    return {
+        "pending": active.filter(status=RadiusSyncJob.STATUS_PENDING).count(),
+        "running": active.filter(status=RadiusSyncJob.STATUS_RUNNING).count(),
+        "failed": RadiusSyncJob.objects.filter(status=RadiusSyncJob.STATUS_FAILED).count(),
+        "lag_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0,
+    }
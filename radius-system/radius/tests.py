@@ -0,0 +1,462 @@
+"""
+radius/tests.py
+Tests for the radacct ingester (radius/accounting.py), the FreeRADIUS
+connection pool (radius/pool.py) and the write-behind sync queue
+(radius/sync_queue.py) and the vendor-scoped session queries
+(radius/freeradius.py). FreeRADIUS' MySQL database is never touched:
+radacct rows are plain dicts, pool.connect() hands out fake MySQLdb
+connections (answered by _FakeRadiusDatabase where SQL matters) and the
+freeradius.py calls are otherwise patched.
+
+Run with:
+    python manage.py test radius
+"""
+
+import datetime
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Vendor
+from radius import accounting, pool, sync_queue
+from radius import freeradius as fr
+from radius.models import (
+    IngestCursor, Profile, ProfileUsage, RadiusSession, RadiusSyncJob, Voucher, VoucherBatch, VoucherUsage,
+)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+START = datetime.datetime(2025, 3, 1, 9, 0)
+MB = 1024 * 1024
+
+
+def _radacct(radacctid, username, bytes_in=0, bytes_out=0, session_time=0, stop=None):
+    return {
+        "radacctid": radacctid,
+        "username": username,
+        "nasipaddress": "10.0.0.1",
+        "acctuniqueid": f"uniq-{radacctid}",
+        "framedipaddress": "192.168.88.10",
+        "calledstationid": "hotspot1",
+        "callingstationid": "AA:BB:CC:DD:EE:FF",
+        "acctinputoctets": bytes_in,
+        "acctoutputoctets": bytes_out,
+        "acctsessiontime": session_time,
+        "acctstarttime": START,
+        "acctstoptime": stop,
+    }
+
+
+def _make_voucher(code="ABCD2345", data_limit_mb=0):
+    user = User.objects.create_user(username=f"vendor-{code}", password="x")
+    vendor = Vendor.objects.create(user=user, company_name="Test ISP")
+    profile = Profile.objects.create(vendor=vendor, name="Daily", data_limit_mb=data_limit_mb)
+    batch = VoucherBatch.objects.create(vendor=vendor, profile=profile, quantity=1)
+    return Voucher.objects.create(batch=batch, code=code)
+
+
+class _FakeCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows, self.description, self.rowcount = [], None, 0
+
+    def execute(self, sql, params=()):
+        if self.conn.fail_with:
+            raise self.conn.fail_with
+        sql = " ".join(sql.split())
+        self.conn.statements.append((sql, tuple(params)))
+        if self.conn.database:
+            self.rows, self.description, self.rowcount = self.conn.database.answer(sql, tuple(params))
+
+    def executemany(self, sql, rows):
+        for params in rows:
+            self.execute(sql, params)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+
+class _FakeConnection:
+    """Stands in for a MySQLdb connection; `database` answers its queries."""
+
+    def __init__(self, database=None):
+        self.database = database
+        self.statements = []
+        self.fail_with = None
+        self.ping_error = None
+        self.commits = self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def ping(self):
+        if self.ping_error:
+            raise self.ping_error
+
+    def close(self):
+        self.closed = True
+
+
+def _reset_pool():
+    pool.close_all()
+    pool._slots = None
+    for key in pool._stats:
+        pool._stats[key] = 0
+
+
+def _use_fake_pool(test, database=None):
+    """Route pool.connect() to fake connections for one test; returns the list they are added to."""
+    _reset_pool()
+    test.addCleanup(_reset_pool)
+    conns = []
+
+    def connect():
+        conns.append(_FakeConnection(database))
+        return conns[-1]
+
+    connect_patch = patch.object(pool, "connect", side_effect=connect)
+    connect_patch.start()
+    test.addCleanup(connect_patch.stop)
+    return conns
+
+
+class _FakeRadiusDatabase:
+    """Just enough of FreeRADIUS' MySQL schema for the radacct vendor queries."""
+
+    def __init__(self, vendor_column=True, trigger=True, sessions=(), max_radacctid=0):
+        self.vendor_column, self.trigger = vendor_column, trigger
+        self.sessions, self.max_radacctid = list(sessions), max_radacctid
+
+    def answer(self, sql, params):
+        if "information_schema.columns" in sql:
+            return [(int(self.vendor_column),)], None, 1
+        if "information_schema.triggers" in sql:
+            return [(int(self.trigger),)], None, 1
+        if sql.startswith("ALTER TABLE radacct"):
+            self.vendor_column = True
+        elif sql.startswith("CREATE TRIGGER radacct_vendor"):
+            self.trigger = True
+        elif sql.startswith("SELECT COALESCE(MAX(radacctid)"):
+            return [(self.max_radacctid,)], None, 1
+        elif sql.startswith("UPDATE radacct"):
+            low, high = params
+            return [], None, high - low
+        elif sql.startswith("SELECT COUNT(*) FROM radacct"):
+            return [(len(self.sessions),)], None, 1
+        elif sql.startswith("SELECT a.radacctid"):
+            rows = [(radacctid,) for radacctid in self.sessions]
+            return rows, [("radacctid",)], len(rows)
+        return [], None, 0
+
+
+def _job(op=RadiusSyncJob.OP_DISABLE_USERS, **payload):
+    return RadiusSyncJob.objects.create(op=op, payload=payload or {"codes": ["AAAA2222"]})
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestApplyRows(TestCase):
+
+    def setUp(self):
+        self.voucher = _make_voucher()
+
+    def test_first_session_marks_voucher_used(self):
+        written, touched = accounting.apply_rows([_radacct(1, "ABCD2345", 100, 200, 60)])
+
+        self.assertEqual((written, touched), (1, {self.voucher.id}))
+        self.voucher.refresh_from_db()
+        self.assertEqual(self.voucher.status, Voucher.STATUS_USED)
+        self.assertEqual(self.voucher.used_at, accounting._aware(START))
+        session = RadiusSession.objects.get()
+        self.assertEqual((session.radacct_id, session.voucher, session.is_active), (1, self.voucher, True))
+        usage = VoucherUsage.objects.get(voucher=self.voucher)
+        self.assertEqual((usage.sessions, usage.bytes_in, usage.bytes_out, usage.session_time), (1, 100, 200, 60))
+
+    def test_interim_updates_add_only_the_difference(self):
+        accounting.apply_rows([_radacct(1, "ABCD2345", 100, 200, 60)])
+        accounting.apply_rows([_radacct(1, "ABCD2345", 150, 500, 120)])
+        accounting.apply_rows([_radacct(1, "ABCD2345", 150, 500, 120)])
+
+        usage = VoucherUsage.objects.get(voucher=self.voucher)
+        self.assertEqual((usage.sessions, usage.bytes_in, usage.bytes_out, usage.session_time), (1, 150, 500, 120))
+        day = ProfileUsage.objects.get()
+        self.assertEqual((day.sessions, day.bytes_in, day.bytes_out), (1, 150, 500))
+
+    def test_counter_reset_never_subtracts_usage(self):
+        accounting.apply_rows([_radacct(1, "ABCD2345", 1000, 1000, 600)])
+        # NAS rebooted mid-session: counters restart from zero
+        accounting.apply_rows([_radacct(1, "ABCD2345", 10, 20, 5)])
+        accounting.apply_rows([_radacct(1, "ABCD2345", 60, 20, 35)])
+
+        usage = VoucherUsage.objects.get(voucher=self.voucher)
+        self.assertEqual((usage.bytes_in, usage.bytes_out, usage.session_time), (1050, 1000, 630))
+        self.assertEqual(RadiusSession.objects.get().bytes_in, 60)
+
+    def test_second_session_and_stop(self):
+        accounting.apply_rows([_radacct(1, "ABCD2345", 100, 100, 60, stop=START)])
+        accounting.apply_rows([_radacct(2, "ABCD2345", 50, 50, 30)])
+
+        usage = VoucherUsage.objects.get(voucher=self.voucher)
+        self.assertEqual((usage.sessions, usage.bytes_in), (2, 150))
+        self.assertFalse(RadiusSession.objects.get(radacct_id=1).is_active)
+
+    def test_unknown_username_is_skipped(self):
+        self.assertEqual(accounting.apply_rows([_radacct(1, "NOTOURS")]), (0, set()))
+        self.assertFalse(RadiusSession.objects.exists())
+
+    def test_data_limit_expires_voucher_and_queues_disable(self):
+        voucher = _make_voucher("WXYZ6789", data_limit_mb=1)
+        _, touched = accounting.apply_rows([_radacct(1, "WXYZ6789", MB // 2, MB // 2)])
+
+        self.assertEqual(accounting.enforce_data_limits(touched), ["WXYZ6789"])
+        voucher.refresh_from_db()
+        self.assertEqual(voucher.status, Voucher.STATUS_EXPIRED)
+        job = RadiusSyncJob.objects.get()
+        self.assertEqual((job.op, job.payload["codes"]), (RadiusSyncJob.OP_DISABLE_USERS, ["WXYZ6789"]))
+
+    def test_under_limit_is_left_alone(self):
+        _make_voucher("WXYZ6789", data_limit_mb=1)
+        _, touched = accounting.apply_rows([_radacct(1, "WXYZ6789", 100, 100)])
+        self.assertEqual(accounting.enforce_data_limits(touched), [])
+
+
+class TestIngest(TestCase):
+
+    def setUp(self):
+        self.voucher = _make_voucher()
+
+    def test_late_committed_row_below_the_cursor_is_ingested(self):
+        IngestCursor.objects.create(name=accounting.CURSOR_NAME, position=11)
+        accounting.apply_rows([_radacct(11, "ABCD2345", stop=START)])
+        # radacctid 10 committed after 11 had been read
+        rows = [_radacct(10, "ABCD2345", 5, 5, stop=START), _radacct(11, "ABCD2345", stop=START),
+                _radacct(12, "ABCD2345", stop=START)]
+
+        with patch.object(accounting.fr, "radacct_after", return_value=rows) as after, \
+                patch.object(accounting.fr, "radacct_rows", return_value=[]):
+            result = accounting.ingest(batch_size=100)
+
+        after.assert_called_once_with(0, 100 + accounting.REREAD_WINDOW)
+        self.assertEqual((result["new"], result["late"]), (1, 1))
+        self.assertEqual(sorted(RadiusSession.objects.values_list("radacct_id", flat=True)), [10, 11, 12])
+        self.assertEqual(IngestCursor.objects.get().position, 12)
+        self.assertEqual(VoucherUsage.objects.get().sessions, 3)
+
+
+@override_settings(FREERADIUS_DB={"pool_size": 1, "pool_timeout": 0.05})
+class TestConnectionPool(SimpleTestCase):
+
+    def setUp(self):
+        self.conns = _use_fake_pool(self)
+
+    def test_connection_reused_and_committed(self):
+        for _ in range(3):
+            with pool.transaction() as cur:
+                cur.execute("DELETE FROM radcheck WHERE username = %s", ("A",))
+
+        self.assertEqual(len(self.conns), 1)
+        self.assertEqual(self.conns[0].commits, 3)
+        self.assertEqual(pool.stats()["checkouts"], 3)
+
+    def test_checkout_times_out_when_every_connection_is_busy(self):
+        with pool.connection():
+            with self.assertRaises(pool.PoolTimeout):
+                with pool.connection():
+                    pass
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        # The slot was released: the pool still works
+        with pool.connection():
+            pass
+
+    def test_connection_discarded_after_disconnect(self):
+        with self.assertRaises(pool.DISCONNECT_ERRORS[0]):
+            with pool.transaction() as cur:
+                self.conns[0].fail_with = pool.DISCONNECT_ERRORS[0](2013, "Lost connection")
+                cur.execute("SELECT 1")
+
+        self.assertTrue(self.conns[0].closed)
+        self.assertEqual(pool.stats()["discarded"], 1)
+        with pool.connection() as conn:
+            self.assertIs(conn, self.conns[1])
+
+    def test_other_errors_roll_back_and_keep_the_connection(self):
+        with self.assertRaises(ValueError):
+            with pool.transaction():
+                raise ValueError("bad row")
+
+        self.assertEqual((self.conns[0].rollbacks, self.conns[0].commits), (1, 0))
+        with pool.connection() as conn:
+            self.assertIs(conn, self.conns[0])
+
+    def test_idle_connection_pinged_and_replaced_if_dead(self):
+        with pool.connection():
+            pass
+        stale = self.conns[0]
+        stale.ping_error = pool.DISCONNECT_ERRORS[0](2006, "MySQL server has gone away")
+        pool._idle[0] = (stale, time.monotonic() - pool.HEALTHCHECK_AFTER - 1)
+
+        with pool.connection() as conn:
+            self.assertIs(conn, self.conns[1])
+        self.assertTrue(stale.closed)
+        self.assertEqual(pool.stats()["health_failures"], 1)
+
+
+@override_settings(FREERADIUS_DB={"pool_size": 1, "pool_timeout": 0.05})
+class TestVendorSessions(SimpleTestCase):
+
+    def setUp(self):
+        self.db = _FakeRadiusDatabase(sessions=[9, 8])
+        self.conns = _use_fake_pool(self, self.db)
+        self._reset_schema()
+        self.addCleanup(self._reset_schema)
+
+    @staticmethod
+    def _reset_schema():
+        fr._schema.update(vendor_user_table=False, radacct_vendor=None)
+
+    def _queries(self, prefix):
+        return [stmt for stmt in self.conns[0].statements if stmt[0].startswith(prefix)]
+
+    def test_vendor_column_scope(self):
+        rows = fr.get_active_sessions(7, limit=26)
+
+        self.assertEqual(rows, [{"radacctid": 9}, {"radacctid": 8}])
+        (sql, params), = self._queries("SELECT a.radacctid")
+        self.assertTrue(sql.endswith(
+            "FROM radacct a WHERE a.vendor_id = %s AND a.acctstoptime IS NULL ORDER BY a.radacctid DESC LIMIT %s"
+        ))
+        self.assertEqual(params, (7, 26))
+
+    def test_join_fallback_scope(self):
+        self.db.vendor_column = False
+
+        fr.get_session_history(7, limit=10)
+        self.assertEqual(fr.count_active_sessions(7), 2)
+
+        (sql, params), = self._queries("SELECT a.radacctid")
+        self.assertTrue(sql.endswith(
+            "FROM radacct a JOIN radvendoruser u ON u.username = a.username "
+            "WHERE u.vendor_id = %s ORDER BY a.radacctid DESC LIMIT %s"
+        ))
+        self.assertEqual(params, (7, 10))
+        (sql, params), = self._queries("SELECT COUNT(*) FROM radacct")
+        self.assertEqual(sql, (
+            "SELECT COUNT(*) FROM radacct a JOIN radvendoruser u ON u.username = a.username "
+            "WHERE u.vendor_id = %s AND a.acctstoptime IS NULL"
+        ))
+
+    def test_before_pages_strictly_below_the_last_id(self):
+        fr.get_session_history(7, limit=10, before=8)
+
+        (sql, params), = self._queries("SELECT a.radacctid")
+        self.assertIn("WHERE a.vendor_id = %s AND a.radacctid < %s ORDER BY a.radacctid DESC LIMIT %s", sql)
+        self.assertEqual(params, (7, 8, 10))
+
+    def test_schema_checked_once_per_process(self):
+        fr.get_active_sessions(7)
+        fr.get_session_history(7)
+        fr.count_active_sessions(7)
+
+        self.assertEqual(len(self._queries("SELECT COUNT(*) FROM information_schema.columns")), 1)
+
+    def test_install_vendor_column_is_idempotent(self):
+        self.db.vendor_column = self.db.trigger = False
+
+        self.assertEqual(fr.install_vendor_column(), ["radacct.vendor_id", "radacct_vendor trigger"])
+        self.assertEqual(fr.install_vendor_column(), [])
+
+        self.assertEqual(len(self._queries("ALTER TABLE radacct")), 1)
+        self.assertEqual(len(self._queries("CREATE TRIGGER radacct_vendor")), 1)
+        self.assertIs(fr._schema["radacct_vendor"], True)
+
+    def test_fill_radacct_vendors_walks_radacctid_ranges(self):
+        self.db.max_radacctid = 120
+
+        self.assertEqual(fr.fill_radacct_vendors(range_size=50), 150)
+        self.assertEqual([params for _, params in self._queries("UPDATE radacct")], [(0, 50), (50, 100), (100, 150)])
+
+
+class TestSyncQueue(TestCase):
+
+    def test_claim_stops_at_the_first_job_not_due(self):
+        first, blocked, _ = _job(), _job(), _job()
+        RadiusSyncJob.objects.filter(pk=blocked.pk).update(next_attempt_at=timezone.now() + datetime.timedelta(minutes=1))
+
+        claimed = sync_queue.claim_jobs()
+
+        self.assertEqual([job.pk for job in claimed], [first.pk])
+        self.assertEqual(RadiusSyncJob.objects.get(pk=first.pk).status, RadiusSyncJob.STATUS_RUNNING)
+        self.assertEqual(sync_queue.claim_jobs(), [])
+
+    def test_neighbouring_jobs_of_one_op_are_applied_together(self):
+        _job(codes=["A"]), _job(codes=["B"])
+        _job(RadiusSyncJob.OP_ADD_USERS, codes=["C"], group="v1_daily", vendor_id=1)
+        _job(codes=["D"])
+
+        with patch.object(sync_queue.fr, "disable_users") as disable, \
+                patch.object(sync_queue.fr, "add_users") as add:
+            self.assertEqual(sync_queue.run_jobs(sync_queue.claim_jobs()), (4, 0, 0))
+
+        self.assertEqual([c.args[0] for c in disable.call_args_list], [["A", "B"], ["D"]])
+        add.assert_called_once_with([("C", "v1_daily", 1)])
+        self.assertEqual(set(RadiusSyncJob.objects.values_list("status", flat=True)), {RadiusSyncJob.STATUS_DONE})
+
+    def test_transient_error_defers_the_run_and_everything_after_it(self):
+        _job(codes=["A"])
+        _job(RadiusSyncJob.OP_ADD_USERS, codes=["C"], group="v1_daily", vendor_id=1)
+        _job(codes=["D"])
+
+        with patch.object(sync_queue.fr, "disable_users") as disable, \
+                patch.object(sync_queue.fr, "add_users", side_effect=pool.PoolTimeout("busy")):
+            self.assertEqual(sync_queue.run_jobs(sync_queue.claim_jobs()), (1, 0, 2))
+
+        disable.assert_called_once_with(["A"])
+        add, later = RadiusSyncJob.objects.order_by("id")[1:]
+        self.assertEqual((add.status, add.attempts, add.error), (RadiusSyncJob.STATUS_PENDING, 1, "busy"))
+        self.assertGreater(add.next_attempt_at, timezone.now())
+        # Never tried: not charged an attempt
+        self.assertEqual((later.status, later.attempts), (RadiusSyncJob.STATUS_PENDING, 0))
+
+    def test_transient_error_fails_the_run_after_max_attempts(self):
+        job = _job()
+        RadiusSyncJob.objects.filter(pk=job.pk).update(attempts=sync_queue.MAX_ATTEMPTS - 1)
+
+        with patch.object(sync_queue.fr, "disable_users", side_effect=pool.PoolTimeout("busy")):
+            self.assertEqual(sync_queue.run_jobs(sync_queue.claim_jobs()), (0, 1, 1))
+        self.assertEqual(RadiusSyncJob.objects.get().status, RadiusSyncJob.STATUS_FAILED)
+
+    def test_data_error_fails_only_its_run(self):
+        _job(RadiusSyncJob.OP_ADD_USERS, codes=["C"], group="v1_daily", vendor_id=1)
+        _job(codes=["D"])
+
+        with patch.object(sync_queue.fr, "add_users", side_effect=ValueError("Data too long")), \
+                patch.object(sync_queue.fr, "disable_users") as disable:
+            self.assertEqual(sync_queue.run_jobs(sync_queue.claim_jobs()), (1, 1, 0))
+
+        disable.assert_called_once_with(["D"])
+        self.assertEqual(
+            list(RadiusSyncJob.objects.order_by("id").values_list("status", "error")),
+            [(RadiusSyncJob.STATUS_FAILED, "Data too long"), (RadiusSyncJob.STATUS_DONE, "")],
+        )
@@ -23,4 +23,6 @@ urlpatterns = [
     path("vouchers/<int:pk>/disable/", views.voucher_disable, name="voucher_disable"),
     # Sessions
     path("sessions/", views.sessions_view, name="sessions"),
+    # Ops
+    path("metrics/", views.metrics, name="metrics"),
 ]
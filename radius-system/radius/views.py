@@ -4,12 +4,13 @@ import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.db import transaction
 
 from accounts.models import Vendor
 from .models import NasDevice, Profile, VoucherBatch, Voucher, RadiusSession
 from . import freeradius as fr
+from . import pool, sync_queue
 
 logger = logging.getLogger(__name__)
 
@@ -45,11 +46,8 @@ def dashboard(request):
     profiles = Profile.objects.filter(vendor=vendor, is_active=True).count()
     nas_devices = NasDevice.objects.filter(vendor=vendor, is_active=True).count()
 
-    # Active sessions from FreeRADIUS
-    usernames = list(Voucher.objects.filter(
-        batch__vendor=vendor, status="USED"
-    ).values_list("code", flat=True)[:500])
-    active_sessions = fr.get_active_sessions(usernames)
+    # Active sessions from FreeRADIUS (vendor-scoped join, no code lists)
+    active_sessions = fr.get_active_sessions(vendor.pk, limit=10)
 
     return render(request, "radius/dashboard.html", {
         "vendor": vendor,
@@ -58,8 +56,8 @@ def dashboard(request):
         "used_vouchers": used_vouchers,
         "profiles_count": profiles,
         "nas_count": nas_devices,
-        "active_sessions": active_sessions[:10],
-        "active_count": len(active_sessions),
+        "active_sessions": active_sessions,
+        "active_count": fr.count_active_sessions(vendor.pk) if active_sessions else 0,
     })
 
 
@@ -103,7 +101,7 @@ def nas_delete(request, pk):
     vendor = _vendor(request)
     device = get_object_or_404(NasDevice, pk=pk, vendor=vendor)
     if request.method == "POST":
-        fr.delete_nas(device.nas_ip)
+        sync_queue.enqueue_nas_delete(device.nas_ip)
         device.delete()
         messages.success(request, "Router removed.")
     return redirect("nas_list")
@@ -147,7 +145,7 @@ def profile_add(request):
             upload_kbps=upload_kbps,
             simultaneous_use=simultaneous_use,
         )
-        fr.sync_profile(profile)
+        sync_queue.enqueue_profile_sync(profile)
         messages.success(request, f"Profile '{name}' created.")
         return redirect("profile_list")
 
@@ -167,7 +165,7 @@ def profile_edit(request, pk):
         profile.upload_kbps = int(request.POST.get("upload_kbps", 0) or 0)
         profile.simultaneous_use = int(request.POST.get("simultaneous_use", 1) or 1)
         profile.save()
-        fr.sync_profile(profile)
+        sync_queue.enqueue_profile_sync(profile)
         messages.success(request, f"Profile '{profile.name}' updated.")
         return redirect("profile_list")
 
@@ -180,7 +178,7 @@ def profile_delete(request, pk):
     vendor = _vendor(request)
     profile = get_object_or_404(Profile, pk=pk, vendor=vendor)
     if request.method == "POST":
-        fr.delete_profile(profile)
+        sync_queue.enqueue_profile_delete(profile)
         profile.delete()
         messages.success(request, "Profile deleted.")
     return redirect("profile_list")
@@ -216,8 +214,8 @@ def voucher_generate(request):
 
             Voucher.objects.bulk_create(vouchers)
 
-        # Push all to FreeRADIUS in one transaction
-        fr.bulk_add_vouchers(vouchers)
+            # Pushed to FreeRADIUS in one batch by run_radius_sync
+            sync_queue.enqueue_add_vouchers(vouchers)
 
         messages.success(request, f"{quantity} vouchers generated successfully.")
         return redirect("batch_detail", uuid=batch.uuid)
@@ -241,7 +239,7 @@ def batch_list(request):
 def batch_detail(request, uuid):
     vendor = _vendor(request)
     batch = get_object_or_404(VoucherBatch, uuid=uuid, vendor=vendor)
-    vouchers = batch.vouchers.all()
+    vouchers = batch.vouchers.select_related("usage")
     return render(request, "radius/batch_detail.html", {
         "vendor": vendor,
         "batch": batch,
@@ -255,32 +253,53 @@ def batch_delete(request, uuid):
     vendor = _vendor(request)
     batch = get_object_or_404(VoucherBatch, uuid=uuid, vendor=vendor)
     if request.method == "POST":
-        # Remove from FreeRADIUS
-        codes = list(batch.vouchers.values_list("code", flat=True))
-        for code in codes:
-            fr.disable_voucher(code)
-        batch.delete()
+        # Remove from FreeRADIUS (queued, one batched DELETE)
+        with transaction.atomic():
+            sync_queue.enqueue_disable(batch.vouchers.values_list("code", flat=True))
+            batch.delete()
         messages.success(request, "Batch deleted.")
     return redirect("batch_list")
 
 
 # ─── Export ───────────────────────────────────────────────────────────────────
 
+class _Echo:
+    """Pseudo-buffer for csv.writer — write() returns the line for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def _stream_rows(header, rows, flush_bytes=64 * 1024):
+    writer = csv.writer(_Echo())
+    buf, size = [writer.writerow(header)], 0
+    for row in rows:
+        line = writer.writerow(row)
+        buf.append(line)
+        size += len(line)
+        if size >= flush_bytes:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
 @login_required
 @_require_vendor
 def export_csv(request, uuid):
     vendor = _vendor(request)
-    batch = get_object_or_404(VoucherBatch, uuid=uuid, vendor=vendor)
-    vouchers = batch.vouchers.filter(status="UNUSED")
-
-    response = HttpResponse(content_type="text/csv")
+    batch = get_object_or_404(VoucherBatch.objects.select_related("profile"), uuid=uuid, vendor=vendor)
+    profile_name = batch.profile.name
+    rows = (
+        (code, profile_name, status, created.strftime("%Y-%m-%d %H:%M"))
+        for code, status, created in batch.vouchers.filter(status="UNUSED")
+        .values_list("code", "status", "created_at").iterator(chunk_size=2000)
+    )
+
+    response = StreamingHttpResponse(
+        _stream_rows(["Code", "Profile", "Status", "Created"], rows), content_type="text/csv"
+    )
     response["Content-Disposition"] = f'attachment; filename="vouchers-{batch.uuid}.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(["Code", "Profile", "Status", "Created"])
-    for v in vouchers:
-        writer.writerow([v.code, batch.profile.name, v.status, v.created_at.strftime("%Y-%m-%d %H:%M")])
-
     return response
 
 
@@ -301,21 +320,29 @@ def export_pdf(request, uuid):
 
 # ─── Sessions ─────────────────────────────────────────────────────────────────
 
+SESSIONS_PAGE_SIZE = 50
+
 @login_required
 @_require_vendor
 def sessions_view(request):
     vendor = _vendor(request)
-    usernames = list(Voucher.objects.filter(
-        batch__vendor=vendor
-    ).values_list("code", flat=True))
+    try:
+        before = int(request.GET.get("before") or 0) or None
+    except ValueError:
+        before = None
 
-    active = fr.get_active_sessions(usernames)
-    history = fr.get_session_history(usernames, limit=50)
+    # Keyset pages over radacct: fetch one extra row to know if there's more
+    active = fr.get_active_sessions(vendor.pk, limit=SESSIONS_PAGE_SIZE)
+    history = fr.get_session_history(vendor.pk, limit=SESSIONS_PAGE_SIZE + 1, before=before)
+    older = history[SESSIONS_PAGE_SIZE - 1]["radacctid"] if len(history) > SESSIONS_PAGE_SIZE else None
 
     return render(request, "radius/sessions.html", {
         "vendor": vendor,
         "active_sessions": active,
-        "history": history,
+        "active_count": fr.count_active_sessions(vendor.pk) if active else 0,
+        "history": history[:SESSIONS_PAGE_SIZE],
+        "history_before": before,
+        "history_older": older,
     })
 
 
@@ -327,13 +354,23 @@ def voucher_disable(request, pk):
     vendor = _vendor(request)
     voucher = get_object_or_404(Voucher, pk=pk, batch__vendor=vendor)
     if request.method == "POST":
-        fr.disable_voucher(voucher.code)
+        sync_queue.enqueue_disable([voucher.code])
         voucher.status = Voucher.STATUS_DISABLED
         voucher.save(update_fields=["status"])
         messages.success(request, f"Voucher {voucher.code} disabled.")
     return redirect("batch_detail", uuid=voucher.batch.uuid)
 
 
+# ─── Metrics ──────────────────────────────────────────────────────────────────
+
+@login_required
+def metrics(request):
+    """FreeRADIUS pool saturation (this worker process) and write-behind queue lag."""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    return JsonResponse({"pool": pool.stats(), "sync_queue": sync_queue.queue_stats()})
+
+
 # ─── MikroTik Config Script ───────────────────────────────────────────────────
 
 @login_required
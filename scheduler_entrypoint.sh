@@ -13,14 +13,18 @@ touch /var/log/cron.log
 
 cat > /etc/cron.d/spotpay << 'EOF'
 0 6 * * * root /usr/local/bin/django-cron enforce_subscriptions >> /var/log/cron.log 2>&1
-*/2 * * * * root /usr/local/bin/django-cron verify_kwa_payments >> /var/log/cron.log 2>&1
-* * * * * root /usr/local/bin/django-cron verify_live_payments >> /var/log/cron.log 2>&1
-* * * * * root sleep 30 && /usr/local/bin/django-cron verify_live_payments >> /var/log/cron.log 2>&1
+30 2 * * * root /usr/local/bin/django-cron backfill_revenue_rollups --days 2 >> /var/log/cron.log 2>&1
 */5 * * * * root /usr/local/bin/django-cron fix_missing_vouchers >> /var/log/cron.log 2>&1
 */5 * * * * root /usr/local/bin/django-cron retry_voucher_sms >> /var/log/cron.log 2>&1
+*/5 * * * * root /usr/local/bin/django-cron rebuild_voucher_inventory >> /var/log/cron.log 2>&1
+45 2 * * * root /usr/local/bin/django-cron prune_webhooks >> /var/log/cron.log 2>&1
 
 EOF
 
 chmod 0644 /etc/cron.d/spotpay
+
+# Cold start: fill the Redis voucher queues before the first cron tick
+/usr/local/bin/django-cron rebuild_voucher_inventory --all >> /var/log/cron.log 2>&1 &
+
 cron
 tail -f /var/log/cron.log
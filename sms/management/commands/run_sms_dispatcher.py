@@ -0,0 +1,67 @@
+"""
+management/commands/run_sms_dispatcher.py
+=========================================
+Long-running dispatcher for the outbound SMS queue (see
+sms/services/dispatcher.py). Every --interval seconds it claims up to
+--batch-size queued messages and sends them as one UGSMS bulk request;
+while the queue has a backlog it loops without sleeping.
+
+Run as its own container (see docker-compose.yml). Several instances can
+run side by side (messages are claimed with SKIP LOCKED).
+Use --once to drain the queue a single time.
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Billing import dbconn
+from sms.services.dispatcher import BATCH_SIZE, dispatch_once
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send queued SMS in micro-batches over the UGSMS bulk API"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0.25,
+                            help="Seconds between polls when the queue is empty (default 0.25)")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help=f"Messages per bulk request (default {BATCH_SIZE})")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue once and exit")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.stdout.write("SMS dispatcher started")
+
+        while not self._stopping:
+            close_old_connections()
+            dbconn.note_unit()
+            claimed = 0
+            try:
+                claimed, sent, failed = dispatch_once(options["batch_size"])
+                if claimed:
+                    self.stdout.write(f"  📨 Sent {sent}/{claimed} SMS, {failed} failed")
+            except Exception as exc:
+                logger.error("SMS dispatcher loop error: %s", exc)
+
+            if claimed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+        if not options["once"]:
+            self.stdout.write("SMS dispatcher stopped")
+
+    def _stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_sms_notifications_enabled'),
+        ('payments', '0016_payment_hot_path_indexes'),
+        ('sms', '0003_smslog_failure_reason_smslog_payment_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundSMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=20)),
+                ('message', models.TextField()),
+                ('purpose', models.CharField(blank=True, max_length=30)),
+                ('voucher_code', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('charged', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbound_sms', to='payments.payment')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbound_sms', to='accounts.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='sms_outbound_status_idx')],
+            },
+        ),
+    ]
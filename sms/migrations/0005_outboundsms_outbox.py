@@ -0,0 +1,37 @@
+# Generated by Django 4.2.17 on 2026-10-17 21:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms', '0004_outboundsms'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboundsms',
+            name='sms_outbound_status_idx',
+        ),
+        migrations.AddField(
+            model_name='outboundsms',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='outboundsms',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='outboundsms',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed'), ('INSUFFICIENT_BALANCE', 'Insufficient balance')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='outboundsms',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='sms_outbound_due_idx'),
+        ),
+    ]
@@ -216,3 +216,65 @@ class SMSLog(models.Model):
 
     def __str__(self):
         return f"SMS to {self.phone} | {self.voucher_code or 'no voucher'} ({self.status})"
+
+
+# =====================================================
+# 6. OUTBOUND SMS QUEUE (OUTBOX)
+# =====================================================
+# Voucher SMS are queued here and sent by run_sms_dispatcher,
+# which coalesces them into UGSMS bulk calls
+# (see sms/services/dispatcher.py).
+# Failed sends come back due at next_attempt_at (backoff);
+# INSUFFICIENT_BALANCE rows wait for the vendor's next top-up
+
+class OutboundSMS(models.Model):
+    STATUS_PENDING = "PENDING"
+    STATUS_SENDING = "SENDING"
+    STATUS_SENT = "SENT"
+    STATUS_FAILED = "FAILED"
+    STATUS_INSUFFICIENT_BALANCE = "INSUFFICIENT_BALANCE"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+        (STATUS_INSUFFICIENT_BALANCE, "Insufficient balance"),
+    )
+
+    vendor = models.ForeignKey(
+        Vendor,
+        on_delete=models.CASCADE,
+        related_name="outbound_sms"
+    )
+
+    phone = models.CharField(max_length=20)
+    message = models.TextField()
+    purpose = models.CharField(max_length=30, blank=True)
+
+    voucher_code = models.CharField(max_length=100, blank=True, null=True)
+    payment = models.ForeignKey(
+        "payments.Payment",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="outbound_sms"
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Wallet unit already debited for this message (refunded if it fails)
+    charged = models.BooleanField(default=False)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="sms_outbound_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"SMS to {self.phone} | {self.voucher_code or 'no voucher'} ({self.status})"
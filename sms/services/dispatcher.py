@@ -0,0 +1,223 @@
+"""
+sms/services/dispatcher.py
+==========================
+Outbound SMS queue, drained by run_sms_dispatcher.
+
+enqueue() only inserts an OutboundSMS row, so the payment webhook never
+waits on UGSMS or holds the vendor's wallet lock. Every few hundred
+milliseconds the dispatcher:
+
+  claim_batch()  → up to BATCH_SIZE PENDING messages that are due
+                   (next_attempt_at <= now, SKIP LOCKED, read off the
+                   (status, next_attempt_at) index), and in the same short
+                   transaction reserves one wallet unit per message for
+                   every vendor in the batch with ONE UPDATE. Messages a
+                   vendor can't pay for are parked as INSUFFICIENT_BALANCE
+                   (logged "Insufficient SMS balance", as before).
+  send_batch()   → ONE UGSMS bulk request for the whole batch (any mix of
+                   vendors) over a keep-alive session, then, in one
+                   transaction: SENT / retry / FAILED per message, ONE
+                   UPDATE refunding the units of failed messages, and the
+                   SMSLog rows via bulk_create.
+
+A failed send goes back to PENDING with exponential backoff
+(BACKOFF_BASE, doubling, capped at BACKOFF_MAX) and is FAILED after
+MAX_ATTEMPTS — a gateway outage of a few hours is ridden out, and
+requeue_failed() (retry_voucher_sms) gives FAILED voucher SMS another
+round after that. Parked messages are never polled: a wallet top-up
+calls release_deferred() (sms/signals.py), which makes them due at once.
+
+The wallet rows are only locked for the reservation / refund statements,
+never across the HTTP call. A message left SENDING by a dead dispatcher
+is picked up again after STALE_LOCK (its unit stays reserved).
+"""
+
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from sms.models import OutboundSMS, SMSLog, VendorSMSWallet
+from sms.services import sms_gateway
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+STALE_LOCK = timedelta(minutes=5)
+# 1, 2, 4 … 32 minutes, then hourly: about 4 hours of retries before FAILED
+MAX_ATTEMPTS = 10
+BACKOFF_BASE = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(hours=1)
+INSUFFICIENT_BALANCE = "Insufficient SMS balance"
+
+
+def enqueue(*, vendor, phone, message, purpose="", voucher_code=None, payment=None):
+    return OutboundSMS.objects.create(
+        vendor=vendor,
+        phone=phone,
+        message=message,
+        purpose=purpose or "",
+        voucher_code=voucher_code,
+        payment=payment,
+    )
+
+
+def _adjust_units(deltas):
+    """Apply {vendor_id: +/-units} to the wallets in one UPDATE."""
+    deltas = {vendor_id: units for vendor_id, units in deltas.items() if units}
+    if not deltas:
+        return
+    VendorSMSWallet.objects.filter(vendor_id__in=list(deltas)).update(
+        balance_units=F("balance_units") + Case(
+            *[When(vendor_id=vendor_id, then=Value(units)) for vendor_id, units in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def _log(msg, status, provider=None, reason=None):
+    message = msg.message
+    if reason == INSUFFICIENT_BALANCE and msg.voucher_code:
+        message = f"UNSENT - Insufficient SMS balance. Voucher: {msg.voucher_code}"
+    return SMSLog(
+        vendor_id=msg.vendor_id,
+        phone=msg.phone,
+        message=message,
+        voucher_code=msg.voucher_code,
+        payment_id=msg.payment_id,
+        provider=provider,
+        status=status,
+        failure_reason=reason,
+    )
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """Claim due messages and reserve their wallet units. Returns the messages to send."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundSMS.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=OutboundSMS.STATUS_PENDING, next_attempt_at__lte=now)
+                | Q(status=OutboundSMS.STATUS_SENDING, locked_at__lt=now - STALE_LOCK)
+            )
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        if not batch:
+            return []
+
+        needed = Counter(msg.vendor_id for msg in batch if not msg.charged)
+        balances = dict(
+            VendorSMSWallet.objects.select_for_update()
+            .filter(vendor_id__in=list(needed)).order_by("pk")
+            .values_list("vendor_id", "balance_units")
+        )
+        granted = {vendor_id: min(n, balances.get(vendor_id, 0)) for vendor_id, n in needed.items()}
+        _adjust_units({vendor_id: -units for vendor_id, units in granted.items()})
+
+        sending, broke = [], []
+        left = dict(granted)
+        for msg in batch:
+            if not msg.charged:
+                if left[msg.vendor_id] < 1:
+                    broke.append(msg)
+                    continue
+                left[msg.vendor_id] -= 1
+                msg.charged = True
+            msg.status, msg.locked_at = OutboundSMS.STATUS_SENDING, now
+            msg.attempts += 1
+            sending.append(msg)
+
+        OutboundSMS.objects.filter(pk__in=[m.pk for m in sending]).update(
+            status=OutboundSMS.STATUS_SENDING, locked_at=now, charged=True, attempts=F("attempts") + 1,
+        )
+        if broke:
+            OutboundSMS.objects.filter(pk__in=[m.pk for m in broke]).update(
+                status=OutboundSMS.STATUS_INSUFFICIENT_BALANCE, locked_at=None, error=INSUFFICIENT_BALANCE,
+            )
+            SMSLog.objects.bulk_create([_log(m, "FAILED", reason=INSUFFICIENT_BALANCE) for m in broke])
+    return sending
+
+
+def send_batch(batch):
+    """Send claimed messages in one bulk request and record the outcome. Returns (sent, failed)."""
+    if not batch:
+        return 0, 0
+    provider = sms_gateway._active_provider()
+    messages = [
+        {"number": sms_gateway._format_phone_ugsms(m.phone), "message_body": m.message}
+        for m in batch
+    ]
+    if provider is None:
+        results = {i: (False, "No active SMS provider") for i in range(len(batch))}
+    else:
+        try:
+            response_json = sms_gateway.post_bulk(provider, messages)
+            results = sms_gateway.bulk_results(messages, response_json)
+        except Exception as exc:
+            logger.warning("UGSMS bulk send of %s message(s) failed: %s", len(batch), exc)
+            results = {i: (False, str(exc)) for i in range(len(batch))}
+    return _record(batch, results, provider)
+
+
+def _backoff(attempts):
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def _record(batch, results, provider):
+    now = timezone.now()
+    sent_ids, failed, refunds, logs = [], defaultdict(list), Counter(), []
+    for index, msg in enumerate(batch):
+        ok, reason = results[index]
+        if ok:
+            sent_ids.append(msg.pk)
+            logs.append(_log(msg, "SENT", provider))
+        else:
+            reason = reason or "SMS send failed"
+            # Grouped by (reason, attempts) so each group is one UPDATE
+            failed[(reason, msg.attempts)].append(msg.pk)
+            refunds[msg.vendor_id] += 1
+            logs.append(_log(msg, "FAILED", provider, reason))
+
+    with transaction.atomic():
+        OutboundSMS.objects.filter(pk__in=sent_ids).update(
+            status=OutboundSMS.STATUS_SENT, locked_at=None, sent_at=now,
+        )
+        for (reason, attempts), ids in failed.items():
+            if attempts >= MAX_ATTEMPTS:
+                retry = {"status": OutboundSMS.STATUS_FAILED}
+            else:
+                retry = {"status": OutboundSMS.STATUS_PENDING, "next_attempt_at": now + _backoff(attempts)}
+            OutboundSMS.objects.filter(pk__in=ids).update(
+                locked_at=None, charged=False, error=reason, **retry,
+            )
+        _adjust_units(refunds)
+        SMSLog.objects.bulk_create(logs)
+    return len(sent_ids), sum(len(ids) for ids in failed.values())
+
+
+def release_deferred(vendor_id):
+    """Make a vendor's INSUFFICIENT_BALANCE messages due now (after a top-up). Returns how many."""
+    return OutboundSMS.objects.filter(
+        vendor_id=vendor_id, status=OutboundSMS.STATUS_INSUFFICIENT_BALANCE,
+    ).update(status=OutboundSMS.STATUS_PENDING, next_attempt_at=timezone.now(), error="")
+
+
+def requeue_failed(messages):
+    """Give FAILED messages (a queryset) a fresh round of attempts, due now. Returns how many."""
+    return OutboundSMS.objects.filter(
+        pk__in=list(messages.filter(status=OutboundSMS.STATUS_FAILED).values_list("pk", flat=True)),
+        status=OutboundSMS.STATUS_FAILED,
+    ).update(status=OutboundSMS.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now(), error="")
+
+
+def dispatch_once(limit=BATCH_SIZE):
+    """Claim and send one batch. Returns (claimed, sent, failed)."""
+    batch = claim_batch(limit)
+    sent, failed = send_batch(batch)
+    return len(batch), sent, failed
@@ -1,6 +1,10 @@
 from sms.models import SMSProvider, SMSLog
 import requests
 
+UGSMS_BULK_ENDPOINT = "https://ugsms.com/api/v2/sms/send/bulk"
+
+_http = None
+
 
 def _active_provider():
     return SMSProvider.objects.filter(is_active=True).first()
@@ -96,6 +100,74 @@ def send_sms(*, vendor, phone, message, purpose=None, voucher_code=None, payment
         return False, str(e)
 
 
+def _session():
+    """Process-wide keep-alive HTTP session (one TLS handshake, reused)."""
+    global _http
+    if _http is None:
+        _http = requests.Session()
+    return _http
+
+
+def post_bulk(provider, messages, sender_id=None, reference=None):
+    """
+    POST `messages` ([{"number", "message_body"}]) to the UGSMS bulk endpoint
+    over the keep-alive session. Returns the decoded response; raises on
+    transport errors, HTTP errors and non-UGSMS providers.
+    """
+    if not _is_ugsms_provider(provider):
+        raise ValueError(f"SMS provider '{(provider.provider_type or '').upper()}' not yet integrated")
+
+    payload = {
+        "messages": messages,
+        "sender_id": sender_id or provider.sender_id,
+    }
+    if reference:
+        payload["reference"] = reference
+
+    headers = {
+        "X-API-Key": provider.api_key,
+        "Content-Type": "application/json",
+    }
+
+    api_response = _session().post(
+        UGSMS_BULK_ENDPOINT,
+        json=payload,
+        headers=headers,
+        timeout=20,
+    )
+
+    response_json = {}
+    try:
+        response_json = api_response.json()
+    except Exception:
+        response_json = {"message": api_response.text}
+
+    if api_response.status_code >= 400:
+        raise ValueError(response_json.get("message") or "UGSMS bulk send failed")
+    return response_json
+
+
+def bulk_results(messages, response_json):
+    """
+    Per-message outcome of a bulk send: {index: (sent, reason)}.
+    Messages the response doesn't list follow the overall success flag.
+    """
+    data = response_json.get("data") or {}
+    overall = bool(response_json.get("success"))
+    default_reason = None if overall else (response_json.get("message") or "UGSMS bulk send failed")
+    results = {index: (overall, default_reason) for index in range(len(messages))}
+
+    for item in data.get("successful_messages") or []:
+        index = item.get("index")
+        if index in results:
+            results[index] = (True, None)
+    for item in data.get("failed_messages") or []:
+        index = item.get("index")
+        if index in results:
+            results[index] = (False, item.get("message") or item.get("error") or "Rejected by UGSMS")
+    return results
+
+
 def send_bulk_sms(*, vendor, messages, sender_id=None, reference=None):
     provider = _active_provider()
 
@@ -103,66 +175,26 @@ def send_bulk_sms(*, vendor, messages, sender_id=None, reference=None):
         return False, {"message": "No active SMS provider", "data": None}
 
     try:
-        provider_type = (provider.provider_type or "").upper()
-        if not _is_ugsms_provider(provider):
-            raise ValueError(f"SMS provider '{provider_type}' not yet integrated")
-
-        endpoint = "https://ugsms.com/api/v2/sms/send/bulk"
-        payload = {
-            "messages": messages,
-            "sender_id": sender_id or provider.sender_id,
-        }
-        if reference:
-            payload["reference"] = reference
-
-        headers = {
-            "X-API-Key": provider.api_key,
-            "Content-Type": "application/json",
-        }
-
-        api_response = requests.post(
-            endpoint,
-            json=payload,
-            headers=headers,
-            timeout=20,
-        )
-
-        response_json = {}
-        try:
-            response_json = api_response.json()
-        except Exception:
-            response_json = {"message": api_response.text}
-
-        if api_response.status_code >= 400:
-            raise ValueError(response_json.get("message") or "UGSMS bulk send failed")
+        response_json = post_bulk(provider, messages, sender_id=sender_id, reference=reference)
 
         data = response_json.get("data") or {}
-        successful_messages = data.get("successful_messages") or []
-        failed_messages = data.get("failed_messages") or []
-
-        for item in successful_messages:
-            index = item.get("index")
-            phone = messages[index]["number"] if index is not None and index < len(messages) else "UNKNOWN"
-            body = messages[index]["message_body"] if index is not None and index < len(messages) else ""
-            SMSLog.objects.create(
-                vendor=vendor,
-                phone=phone,
-                message=body,
-                provider=provider,
-                status="SENT",
-            )
-
-        for item in failed_messages:
+        logged = (
+            [(item, "SENT") for item in data.get("successful_messages") or []]
+            + [(item, "FAILED") for item in data.get("failed_messages") or []]
+        )
+        logs = []
+        for item, status in logged:
             index = item.get("index")
             phone = messages[index]["number"] if index is not None and index < len(messages) else "UNKNOWN"
             body = messages[index]["message_body"] if index is not None and index < len(messages) else ""
-            SMSLog.objects.create(
+            logs.append(SMSLog(
                 vendor=vendor,
                 phone=phone,
                 message=body,
                 provider=provider,
-                status="FAILED",
-            )
+                status=status,
+            ))
+        SMSLog.objects.bulk_create(logs)
 
         if not response_json.get("success"):
             return False, response_json
@@ -1,28 +1,12 @@
-from django.db import transaction
-from sms.models import VendorSMSWallet
-from .sms_gateway import send_sms
+from .dispatcher import enqueue
 
 
-@transaction.atomic
 def send_voucher_sms(*, vendor, phone, voucher_code, package_name, payment=None, location=None):
-    wallet, _ = VendorSMSWallet.objects.select_for_update().get_or_create(
-        vendor=vendor,
-        defaults={"balance_units": 0, "balance_amount": 0}
-    )
-
-    if wallet.balance_units < 1:
-        from sms.models import SMSLog
-        SMSLog.objects.create(
-            vendor=vendor,
-            phone=phone,
-            message=f"UNSENT - Insufficient SMS balance. Voucher: {voucher_code}",
-            voucher_code=voucher_code,
-            payment=payment,
-            status="FAILED",
-            failure_reason="Insufficient SMS balance",
-        )
-        return False, "Insufficient SMS balance"
-
+    """
+    Queue the voucher SMS for the customer. run_sms_dispatcher sends it
+    (batched with other queued SMS), debits the vendor's SMS wallet and
+    writes the SMSLog — or logs "Insufficient SMS balance" if it's empty.
+    """
     location_name = location.site_name if location else vendor.company_name
     dns = (location.hotspot_dns or "hot.spot") if location else "hot.spot"
     connect_link = f"http://{dns}/login?username={voucher_code}&dst=http://{dns}"
@@ -34,7 +18,7 @@ def send_voucher_sms(*, vendor, phone, voucher_code, package_name, payment=None,
         f"Tap to connect: {connect_link}"
     )
 
-    success, response = send_sms(
+    enqueue(
         vendor=vendor,
         phone=phone,
         message=message,
@@ -43,10 +27,4 @@ def send_voucher_sms(*, vendor, phone, voucher_code, package_name, payment=None,
         payment=payment,
     )
 
-    if not success:
-        return False, response
-
-    wallet.balance_units -= 1
-    wallet.save(update_fields=["balance_units"])
-
-    return True, "Voucher SMS sent successfully"
+    return True, "Voucher SMS queued"
@@ -1,8 +1,10 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from accounts.models import Vendor
 from sms.models import VendorSMSWallet
+from sms.services.dispatcher import release_deferred
 
 
 @receiver(post_save, sender=Vendor)
@@ -13,3 +15,13 @@ def create_sms_wallet(sender, instance, created, **kwargs):
             balance_units=0,
             balance_amount=0,
         )
+
+
+@receiver(post_save, sender=VendorSMSWallet)
+def release_deferred_sms(sender, instance, created, **kwargs):
+    # A top-up (or any save leaving units in the wallet) releases the vendor's
+    # INSUFFICIENT_BALANCE voucher SMS to the dispatcher once it is committed
+    if created or instance.balance_units < 1:
+        return
+    vendor_id = instance.vendor_id
+    transaction.on_commit(lambda: release_deferred(vendor_id))
@@ -1,3 +1,173 @@
+"""
+sms/tests.py
+Tests for the outbound SMS queue — voucher SMS are queued, then sent in
+micro-batches over the UGSMS bulk API with one wallet debit per batch;
+failed sends back off and retry, unpaid ones wait for a wallet top-up.
+
+Run with:
+    python manage.py test sms
+"""
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from payments.tests.test_settlement import _make_payment, _make_vendor
+from sms.models import OutboundSMS, SMSLog, SMSPricing, SMSProvider, VendorSMSWallet
+from sms.services import dispatcher, sms_gateway
+from sms.services.sms_topup import credit_sms_wallet
+from sms.services.voucher_pay import send_voucher_sms
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _set_units(vendor, units):
+    VendorSMSWallet.objects.filter(vendor=vendor).update(balance_units=units)
+
+
+def _units(vendor):
+    return VendorSMSWallet.objects.get(vendor=vendor).balance_units
+
+
+def _bulk_ok(failed_indexes=()):
+    def post_bulk(provider, messages, sender_id=None, reference=None):
+        return {
+            "success": True,
+            "data": {
+                "successful_messages": [
+                    {"index": i, "number_of_messages": 1} for i in range(len(messages)) if i not in failed_indexes
+                ],
+                "failed_messages": [{"index": i, "message": "Invalid number"} for i in failed_indexes],
+            },
+        }
+    return post_bulk
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestSMSDispatcher(TestCase):
+
+    def setUp(self):
+        self.vendor = _make_vendor()
+        self.payment = _make_payment(self.vendor)
+        SMSProvider.objects.create(name="UGSMS", provider_type="UGSMS", api_key="k", sender_id="SpotPay", is_active=True)
+        _set_units(self.vendor, 10)
+
+    def _queue(self, n, vendor=None):
+        for i in range(n):
+            send_voucher_sms(
+                vendor=vendor or self.vendor, phone=f"+25670000000{i}", voucher_code=f"code{i}",
+                package_name="1 Hour", payment=self.payment,
+            )
+
+    def test_voucher_sms_is_queued_not_sent(self):
+        with patch.object(sms_gateway, "post_bulk") as post:
+            ok, result = send_voucher_sms(
+                vendor=self.vendor, phone="256700000001", voucher_code="abc12345",
+                package_name="1 Hour", payment=self.payment,
+            )
+        post.assert_not_called()
+        self.assertTrue(ok)
+        msg = OutboundSMS.objects.get()
+        self.assertEqual(msg.status, OutboundSMS.STATUS_PENDING)
+        self.assertIn("Voucher: abc12345", msg.message)
+        self.assertEqual(_units(self.vendor), 10)
+
+    def test_queued_messages_coalesced_into_one_bulk_call(self):
+        other = _make_vendor(username="vendor2")
+        _set_units(other, 5)
+        self._queue(3)
+        self._queue(2, vendor=other)
+
+        with patch.object(sms_gateway, "post_bulk", side_effect=_bulk_ok(failed_indexes={1})) as post:
+            claimed, sent, failed = dispatcher.dispatch_once()
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(len(post.call_args[0][1]), 5)
+        self.assertEqual(post.call_args[0][1][0]["number"], "0700000000")
+        self.assertEqual((claimed, sent, failed), (5, 4, 1))
+        # The failed message's unit is refunded
+        self.assertEqual((_units(self.vendor), _units(other)), (8, 3))
+        self.assertEqual(SMSLog.objects.filter(status="SENT", payment=self.payment).count(), 4)
+        self.assertEqual(SMSLog.objects.get(status="FAILED").failure_reason, "Invalid number")
+        # Only the failed message is left, backing off
+        retry = OutboundSMS.objects.get(status=OutboundSMS.STATUS_PENDING)
+        self.assertEqual(retry.phone, "+256700000001")
+        self.assertGreater(retry.next_attempt_at, timezone.now())
+
+    def test_insufficient_balance_parks_without_sending(self):
+        _set_units(self.vendor, 1)
+        self._queue(3)
+
+        with patch.object(sms_gateway, "post_bulk", side_effect=_bulk_ok()) as post:
+            claimed, sent, failed = dispatcher.dispatch_once()
+
+        self.assertEqual(len(post.call_args[0][1]), 1)
+        self.assertEqual((claimed, sent), (1, 1))
+        self.assertEqual(_units(self.vendor), 0)
+        broke = SMSLog.objects.filter(failure_reason=dispatcher.INSUFFICIENT_BALANCE)
+        self.assertEqual(broke.count(), 2)
+        self.assertTrue(broke.first().message.startswith("UNSENT - Insufficient SMS balance"))
+        self.assertEqual(OutboundSMS.objects.filter(status=OutboundSMS.STATUS_INSUFFICIENT_BALANCE).count(), 2)
+        # Parked messages are not claimed again until the vendor tops up
+        self.assertEqual(dispatcher.dispatch_once(), (0, 0, 0))
+
+    def test_gateway_error_refunds_whole_batch_and_backs_off(self):
+        self._queue(2)
+        with patch.object(sms_gateway, "post_bulk", side_effect=ValueError("timed out")):
+            self.assertEqual(dispatcher.dispatch_once(), (2, 0, 2))
+            # Not due yet
+            self.assertEqual(dispatcher.dispatch_once(), (0, 0, 0))
+        self.assertEqual(_units(self.vendor), 10)
+        self.assertEqual(
+            set(OutboundSMS.objects.values_list("status", "charged", "attempts")),
+            {(OutboundSMS.STATUS_PENDING, False, 1)},
+        )
+        self.assertTrue(all(
+            t > timezone.now() + dispatcher.BACKOFF_BASE - timedelta(seconds=5)
+            for t in OutboundSMS.objects.values_list("next_attempt_at", flat=True)
+        ))
+
+    def test_failed_after_max_attempts(self):
+        self._queue(1)
+        with patch.object(sms_gateway, "post_bulk", side_effect=ValueError("timed out")) as post:
+            for _ in range(dispatcher.MAX_ATTEMPTS + 1):
+                OutboundSMS.objects.update(next_attempt_at=timezone.now())
+                dispatcher.dispatch_once()
+        self.assertEqual(post.call_count, dispatcher.MAX_ATTEMPTS)
+        msg = OutboundSMS.objects.get()
+        self.assertEqual((msg.status, msg.attempts, msg.error), (OutboundSMS.STATUS_FAILED, dispatcher.MAX_ATTEMPTS, "timed out"))
+        self.assertEqual(_units(self.vendor), 10)
+
+    def test_sweep_requeues_failed_voucher_sms(self):
+        self._queue(1)
+        OutboundSMS.objects.update(status=OutboundSMS.STATUS_FAILED, attempts=dispatcher.MAX_ATTEMPTS)
+
+        call_command("retry_voucher_sms", stdout=StringIO())
+
+        msg = OutboundSMS.objects.get()
+        self.assertEqual((msg.status, msg.attempts), (OutboundSMS.STATUS_PENDING, 0))
+        self.assertLessEqual(msg.next_attempt_at, timezone.now())
+
+    def test_top_up_releases_parked_messages(self):
+        SMSPricing.objects.create(price_per_sms=35, is_active=True)
+        _set_units(self.vendor, 0)
+        self._queue(2)
+        with patch.object(sms_gateway, "post_bulk", side_effect=_bulk_ok()) as post:
+            dispatcher.dispatch_once()
+            post.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                credit_sms_wallet(vendor=self.vendor, amount_paid=350)
+            self.assertEqual(OutboundSMS.objects.filter(status=OutboundSMS.STATUS_PENDING).count(), 2)
 
-# Create your tests here.
+            self.assertEqual(dispatcher.dispatch_once(), (2, 2, 0))
+        self.assertEqual(_units(self.vendor), 8)
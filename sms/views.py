@@ -254,7 +254,8 @@ def sell_voucher_sms(request):
         return JsonResponse({"success": False, "message": "Phone and package are required"}, status=400)
 
     from packages.models import Package
-    from vouchers.models import Voucher
+    from vouchers.services import inventory
+    from vouchers.services.issue_voucher import issue_voucher, NoAvailableVouchers
 
     package = Package.objects.filter(id=package_id, location__vendor=vendor, is_active=True).first()
     if not package:
@@ -265,13 +266,11 @@ def sell_voucher_sms(request):
         if not wallet or wallet.balance_units < 1:
             return JsonResponse({"success": False, "message": "Insufficient SMS balance. Please top up."}, status=400)
 
-        voucher = Voucher.objects.select_for_update().filter(package=package, status="UNUSED").first()
-        if not voucher:
+        try:
+            voucher = issue_voucher(vendor=vendor, package=package)
+        except NoAvailableVouchers:
             return JsonResponse({"success": False, "message": "No available vouchers for this package"}, status=400)
 
-        voucher.status = "RESERVED"
-        voucher.save(update_fields=["status"])
-
         wallet.balance_units -= 1
         wallet.save(update_fields=["balance_units", "updated_at"])
 
@@ -296,6 +295,7 @@ def sell_voucher_sms(request):
         with transaction.atomic():
             from vouchers.models import Voucher as V
             V.objects.filter(id=voucher.id).update(status="UNUSED")
+            transaction.on_commit(lambda: inventory.push(package.id, [voucher.id]))
             VendorSMSWallet.objects.filter(vendor=vendor).update(
                 balance_units=django_models.F("balance_units") + 1
             )
@@ -0,0 +1,39 @@
+"""
+management/commands/rebuild_voucher_inventory.py
+================================================
+Rebuilds the Redis voucher inventory queues from the Voucher table
+(see vouchers/services/inventory.py).
+
+  python manage.py rebuild_voucher_inventory              # drifted / cold packages only
+  python manage.py rebuild_voucher_inventory --all        # every package (cold start)
+  python manage.py rebuild_voucher_inventory --package 12 --package 15
+
+Runs from cron every few minutes to reconcile queues with the DB.
+Until a package is rebuilt, issuance and stock checks for it use the DB.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vouchers.services import inventory
+
+
+class Command(BaseCommand):
+    help = "Rebuild / reconcile Redis voucher inventory queues from the DB"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--package", type=int, action="append",
+                            help="Only this package id (repeatable)")
+        parser.add_argument("--all", action="store_true",
+                            help="Rebuild every package, not just drifted ones")
+
+    def handle(self, *args, **options):
+        try:
+            rebuilt = inventory.reconcile(options["package"], force=options["all"])
+        except Exception as exc:
+            raise CommandError(f"Voucher inventory rebuild failed: {exc}")
+
+        for package_id, queued, unused in rebuilt:
+            before = "cold" if queued is None else queued
+            self.stdout.write(f"  ✅ Package {package_id}: {before} → {unused} queued")
+
+        self.stdout.write(f"Rebuilt {len(rebuilt)} package queue(s)")
@@ -0,0 +1,68 @@
+"""
+management/commands/run_voucher_import_worker.py
+================================================
+Long-running worker that imports large voucher CSV uploads queued by
+voucher_list (see vouchers/services/importer.py). Progress is written
+to the VoucherImportJob row as each chunk is inserted.
+
+Run as its own container (see docker-compose.yml). Several workers
+can run side by side — jobs are claimed with SKIP LOCKED.
+Use --once to drain the queue a single time.
+"""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Billing import dbconn
+from vouchers.services.importer import claim_next_job, run_import_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Import queued voucher CSV uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--idle-sleep", type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty (default 2.0)")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue once and exit")
+
+    def handle(self, *args, **options):
+        self._stopping = False
+
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+            self.stdout.write("Voucher import worker started")
+
+        while not self._stopping:
+            close_old_connections()
+            dbconn.note_unit()
+            job = None
+            try:
+                job = claim_next_job()
+                if job:
+                    ok = run_import_job(job)
+                    if ok:
+                        self.stdout.write(
+                            f"  ✅ Import {job.pk}: {job.created_count} added, {job.skipped_count} skipped"
+                        )
+                    else:
+                        self.stdout.write(f"  ❌ Import {job.pk} failed: {job.error}")
+            except Exception as exc:
+                logger.error("Voucher import worker loop error: %s", exc)
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["idle_sleep"])
+
+        self.stdout.write("Voucher import worker stopped")
+
+    def _stop(self, signum, frame):
+        self._stopping = True
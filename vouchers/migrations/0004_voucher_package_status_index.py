@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vouchers', '0003_voucherbatchdeletionlog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['package', 'status', 'id'], name='voucher_pkg_status_id_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.17 on 2026-10-17 20:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import vouchers.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('packages', '0003_package_schedule_type_package_scheduled_date_and_more'),
+        ('vouchers', '0004_voucher_package_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoucherImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(storage=vouchers.models.voucher_import_storage, upload_to='voucher_imports/')),
+                ('source_filename', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('rows_read', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('base_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='vouchers.voucherbatch')),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='voucher_import_jobs', to='packages.package')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='voucher_import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='voucher_import_due_idx')],
+            },
+        ),
+    ]
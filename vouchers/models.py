@@ -1,8 +1,30 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 from packages.models import Package
 
 
+class PrivateUploadStorage(FileSystemStorage):
+    """FileSystemStorage rooted at PRIVATE_UPLOAD_ROOT, re-read when the setting changes (tests)."""
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_UPLOAD_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == "PRIVATE_UPLOAD_ROOT":
+            self.__dict__.pop("base_location", None)
+            self.__dict__.pop("location", None)
+
+
+def voucher_import_storage():
+    # Uploaded CSVs hold live voucher codes — keep them out of the public /media/
+    return PrivateUploadStorage()
+
+
 class VoucherBatch(models.Model):
     package = models.ForeignKey(
         Package,
@@ -94,6 +116,12 @@ class Voucher(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     used_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # issue_voucher: oldest UNUSED voucher per package; stock counts by status
+            models.Index(fields=['package', 'status', 'id'], name='voucher_pkg_status_id_idx'),
+        ]
+
     def mark_used(self):
         self.status = 'USED'
         self.used_at = timezone.now()
@@ -101,3 +129,64 @@ class Voucher(models.Model):
 
     def __str__(self):
         return f"{self.code} ({self.status})"
+
+
+class VoucherImportJob(models.Model):
+    """
+    A large CSV upload queued for the voucher import worker
+    (manage.py run_voucher_import_worker). Small uploads are imported
+    inline and never create a job.
+    """
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_DONE = 'DONE'
+    STATUS_FAILED = 'FAILED'
+    STATUSES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    package = models.ForeignKey(
+        Package,
+        on_delete=models.CASCADE,
+        related_name='voucher_import_jobs'
+    )
+    batch = models.ForeignKey(
+        VoucherBatch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs'
+    )
+    uploaded_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='voucher_import_jobs'
+    )
+    file = models.FileField(upload_to='voucher_imports/', storage=voucher_import_storage)
+    source_filename = models.CharField(max_length=255, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING)
+    rows_read = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    # Batch size before the first run — keeps created_count exact across restarts
+    base_count = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='voucher_import_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.source_filename} → {self.package.name} ({self.status})"
@@ -0,0 +1,108 @@
+"""
+vouchers/services/codegen.py
+============================
+Bulk voucher code generation.
+
+  generate_codes()  → N unique codes in one shot: `secrets` for the
+                      randomness, dedupe in memory, ONE `code__in`
+                      query per round against the DB, and only the
+                      collisions are regenerated.
+  create_codes()    → generate + chunked bulk_create(ignore_conflicts)
+                      into a batch, topping up anything lost to a
+                      concurrent generator.
+
+Works for any model with a unique `code` field and a `batch` FK
+(vouchers.Voucher, mikrotik.MikrotikVoucher).
+"""
+
+import math
+import secrets
+import string
+
+from django.db import transaction
+
+ALPHABETS = {
+    "alnum": string.ascii_lowercase + string.digits,
+    "digits": string.digits,
+    "upper": string.ascii_uppercase + string.digits,
+    # No 0/o/1/l/i — easier to read off a printed slip
+    "clear": "abcdefghjkmnpqrstuvwxyz23456789",
+}
+DEFAULT_ALPHABET = "alnum"
+DEFAULT_LENGTH = 8
+MIN_LENGTH, MAX_LENGTH = 4, 16
+
+MAX_BATCH = 50_000
+INSERT_CHUNK = 2_000
+LOOKUP_CHUNK = 5_000
+MAX_ROUNDS = 10
+
+
+class CodeSpaceExhausted(Exception):
+    pass
+
+
+def _random_code(alphabet, length, prefix):
+    return prefix + "".join(secrets.choice(alphabet) for _ in range(length))
+
+
+def _existing(qs, codes):
+    """Subset of `codes` present in `qs`, one query per LOOKUP_CHUNK codes."""
+    codes = list(codes)
+    found = set()
+    for i in range(0, len(codes), LOOKUP_CHUNK):
+        found.update(qs.filter(code__in=codes[i:i + LOOKUP_CHUNK]).values_list("code", flat=True))
+    return found
+
+
+def check_space(count, *, alphabet=ALPHABETS[DEFAULT_ALPHABET], length=DEFAULT_LENGTH):
+    """
+    Refuse batches that would fill more than 1% of the code space —
+    collisions (and retries) grow quickly past that.
+    """
+    space = len(set(alphabet)) ** length
+    if count > space // 100:
+        needed = math.ceil(math.log(count * 100, len(set(alphabet))))
+        raise CodeSpaceExhausted(
+            f"{count} codes of length {length} is too many for this alphabet — use length {needed} or more."
+        )
+
+
+def generate_codes(model, count, *, alphabet=ALPHABETS[DEFAULT_ALPHABET], length=DEFAULT_LENGTH, prefix=""):
+    """Return `count` distinct codes not present in `model` at the time of the check."""
+    check_space(count, alphabet=alphabet, length=length)
+
+    codes = set()
+    for _ in range(MAX_ROUNDS):
+        needed = count - len(codes)
+        if needed <= 0:
+            break
+        candidates = {_random_code(alphabet, length, prefix) for _ in range(needed)} - codes
+        codes |= candidates - _existing(model.objects.all(), candidates)
+    if len(codes) < count:
+        raise CodeSpaceExhausted(f"Could only generate {len(codes)} of {count} unique codes.")
+    return list(codes)
+
+
+def create_codes(model, batch, count, *, alphabet=ALPHABETS[DEFAULT_ALPHABET], length=DEFAULT_LENGTH,
+                 prefix="", **fields):
+    """
+    Insert `count` new `model` rows with fresh codes into `batch`.
+    `fields` are passed to every row (e.g. package=...). Returns the codes.
+    """
+    created = []
+    for _ in range(MAX_ROUNDS):
+        codes = generate_codes(model, count - len(created), alphabet=alphabet, length=length, prefix=prefix)
+        with transaction.atomic():
+            for i in range(0, len(codes), INSERT_CHUNK):
+                model.objects.bulk_create(
+                    [model(code=code, batch=batch, **fields) for code in codes[i:i + INSERT_CHUNK]],
+                    ignore_conflicts=True,
+                )
+        # A concurrent generator may have claimed some codes between check and insert
+        mine = _existing(model.objects.filter(batch=batch), codes)
+        created.extend(code for code in codes if code in mine)
+        if len(created) >= count:
+            return created
+    raise CodeSpaceExhausted(f"Could only insert {len(created)} of {count} codes.")
+
@@ -0,0 +1,79 @@
+"""
+vouchers/services/export.py
+===========================
+Streaming CSV export for voucher codes.
+
+Rows are pulled with values_list(...).iterator(chunk_size=...) and
+written through a pseudo-buffer into a StreamingHttpResponse, so a
+50k-code export never builds model instances or the whole file in
+memory. `gzip=True` compresses on the fly (.csv.gz).
+"""
+
+import csv
+import zlib
+
+from django.http import StreamingHttpResponse
+
+ITER_CHUNK = 2_000
+# Rows are joined into ~64 KB pieces before being sent / compressed
+FLUSH_BYTES = 64 * 1024
+
+MIKHMON_HEADER = ('username', 'password')
+
+
+class _Echo:
+    """File-like object whose write() just returns the value (see Django's streaming CSV docs)."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _buffered(lines):
+    buf, size = [], 0
+    for line in lines:
+        buf.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(buf)
+            buf, size = [], 0
+    if buf:
+        yield ''.join(buf)
+
+
+def _gzipped(chunks):
+    # wbits=31 → gzip container
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def code_rows(qs):
+    """(code, code) rows for Mikhmon-style username/password exports."""
+    for code in qs.values_list('code', flat=True).iterator(chunk_size=ITER_CHUNK):
+        yield (code, code)
+
+
+def stream_csv(header, rows, filename, *, gzip=False):
+    chunks = _buffered(csv_lines(header, rows))
+    if gzip:
+        response = StreamingHttpResponse(_gzipped(chunks), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_codes(qs, filename, *, gzip=False):
+    """Mikhmon-format (username,password) export of every code in `qs`."""
+    return stream_csv(MIKHMON_HEADER, code_rows(qs.order_by('code')), filename, gzip=gzip)
@@ -0,0 +1,199 @@
+"""
+vouchers/services/importer.py
+=============================
+Streaming CSV voucher import (Mikhmon exports and plain code lists).
+
+  import_codes()   → parse the upload row by row (TextIOWrapper over the
+                     file, never the whole file in memory), dedupe and
+                     insert in bounded chunks with ignore_conflicts.
+                     Used inline for small uploads by voucher_list.
+  enqueue_import() → store a large upload and queue a VoucherImportJob.
+  claim_next_job() / run_import_job()
+                   → executed by manage.py run_voucher_import_worker,
+                     which updates rows_read / created_count as it goes
+                     for the progress endpoint.
+
+created / skipped counts come from the batch row count, so codes that
+already exist (in the DB, earlier in the same file, or inserted by a
+concurrent upload) are always counted as skipped.
+"""
+
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from vouchers.models import Voucher, VoucherImportJob
+from vouchers.services import inventory
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2_000
+# Uploads up to this size are imported inside the request
+INLINE_MAX_BYTES = 256 * 1024
+# A RUNNING job untouched this long was abandoned by a dead worker
+STALE_LOCK = timedelta(minutes=15)
+
+CODE_COLUMNS = ('username', 'password', 'code', 'voucher', 'voucher_code')
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    skipped: int = 0
+
+
+def iter_rows(fileobj):
+    """
+    Yield the voucher code of every CSV row that has one.
+    `fileobj` is a binary file (UploadedFile / FieldFile).
+    """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.DictReader(text):
+            row = {k.strip().lower(): (v.strip() if v else '') for k, v in row.items() if k}
+            code = next((row[c] for c in CODE_COLUMNS if row.get(c)), None)
+            if code is None:
+                code = next(iter(row.values()), '')
+            if code:
+                yield code
+    finally:
+        # Leave the underlying file open for the caller
+        text.detach()
+
+
+def _insert_chunk(codes, package, batch):
+    codes = list(dict.fromkeys(codes))
+    existing = set(Voucher.objects.filter(code__in=codes).values_list('code', flat=True))
+    new = [Voucher(code=c, package=package, batch=batch) for c in codes if c not in existing]
+    if new:
+        Voucher.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+def import_codes(fileobj, package, batch, *, base_count=None, on_progress=None):
+    """
+    Stream `fileobj` into `batch`. `on_progress(rows_read, created_so_far)`
+    is called after every chunk. Returns an ImportResult.
+    """
+    if base_count is None:
+        base_count = batch.vouchers.count()
+
+    result, chunk, inserted = ImportResult(), [], 0
+    for code in iter_rows(fileobj):
+        result.rows += 1
+        chunk.append(code)
+        if len(chunk) >= CHUNK_SIZE:
+            inserted += _insert_chunk(chunk, package, batch)
+            chunk = []
+            if on_progress:
+                on_progress(result.rows, inserted)
+    if chunk:
+        inserted += _insert_chunk(chunk, package, batch)
+
+    total = batch.vouchers.count()
+    result.created = total - base_count
+    result.skipped = result.rows - result.created
+
+    batch.total_uploaded = total
+    batch.save(update_fields=['total_uploaded'])
+    inventory.refresh_on_commit(package.id)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+def enqueue_import(uploaded_file, package, batch, user):
+    return VoucherImportJob.objects.create(
+        package=package,
+        batch=batch,
+        uploaded_by=user,
+        file=uploaded_file,
+        source_filename=getattr(uploaded_file, 'name', ''),
+    )
+
+
+def claim_next_job():
+    """Claim the oldest pending (or abandoned) job. SKIP LOCKED keeps workers apart."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            VoucherImportJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=[VoucherImportJob.STATUS_PENDING, VoucherImportJob.STATUS_RUNNING])
+            .exclude(status=VoucherImportJob.STATUS_RUNNING, locked_at__gte=now - STALE_LOCK)
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job:
+            job.status = VoucherImportJob.STATUS_RUNNING
+            job.locked_at = now
+            job.save(update_fields=['status', 'locked_at'])
+    return job
+
+
+def run_import_job(job):
+    """Import one job's file. Returns True on success."""
+    batch = job.batch
+    if batch is None:
+        return _finish(job, VoucherImportJob.STATUS_FAILED, error='Voucher batch was deleted.')
+
+    if job.base_count is None:
+        job.base_count = batch.vouchers.count()
+        job.save(update_fields=['base_count'])
+
+    def progress(rows, created):
+        VoucherImportJob.objects.filter(pk=job.pk).update(
+            rows_read=rows, created_count=created, locked_at=timezone.now(),
+        )
+
+    try:
+        with job.file.open('rb') as fileobj:
+            result = import_codes(
+                fileobj, job.package, batch, base_count=job.base_count, on_progress=progress,
+            )
+    except Exception as exc:
+        logger.error("Voucher import job %s failed: %s", job.pk, exc)
+        return _finish(job, VoucherImportJob.STATUS_FAILED, error=str(exc)[:2000])
+
+    job.rows_read, job.created_count, job.skipped_count = result.rows, result.created, result.skipped
+    if not batch.vouchers.exists():
+        batch.delete()
+    if result.rows == 0:
+        return _finish(job, VoucherImportJob.STATUS_FAILED, error='No valid voucher codes found in CSV.')
+    return _finish(job, VoucherImportJob.STATUS_DONE)
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.locked_at = None
+    job.completed_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'error', 'locked_at', 'completed_at', 'rows_read', 'created_count', 'skipped_count',
+    ])
+    # The upload holds live voucher codes — don't keep it around
+    job.file.delete(save=False)
+    return status == VoucherImportJob.STATUS_DONE
+
+
+def job_progress(job):
+    """JSON-ready progress for the status endpoint."""
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'filename': job.source_filename,
+        'package': job.package.name,
+        'rows_read': job.rows_read,
+        'created': job.created_count,
+        'skipped': job.skipped_count,
+        'error': job.error,
+        'done': job.status in (VoucherImportJob.STATUS_DONE, VoucherImportJob.STATUS_FAILED),
+    }
@@ -0,0 +1,245 @@
+"""
+vouchers/services/inventory.py
+==============================
+Redis-backed voucher inventory.
+
+Per package, Redis holds a queue of UNUSED voucher ids plus a `ready`
+flag that marks the queue as built:
+
+  vinv:<package_id>:q      LIST   voucher ids, oldest first
+  vinv:<package_id>:ready  STRING set once the queue mirrors the DB
+
+  pop()              → atomic LPOP (Lua) used by issue_voucher — no
+                       range scan / row-lock contention on the voucher
+                       table during busy sales.
+  stock_levels()     → O(1) LLEN per package for portal stock checks
+                       (an empty queue is confirmed against the DB).
+  refresh_on_commit()→ rebuild a package's queue after vouchers are
+                       uploaded, generated or deleted (and bump the
+                       portal_data cache version).
+  reconcile()        → compare queue lengths with DB counts and rebuild
+                       drifted / cold packages (rebuild_voucher_inventory,
+                       run from cron).
+
+Redis is only ever a hint. The reservation itself is still a
+conditional `UPDATE ... WHERE status='UNUSED'` on the popped id, so a
+stale or duplicated id can never hand out the same voucher twice. When
+a package is cold (Redis restarted, never built) or Redis is down,
+every caller falls back to the plain DB queries.
+"""
+
+import logging
+import uuid
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from vouchers.models import Voucher
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "vinv"
+PUSH_CHUNK = 1000
+
+# Returns -1 when the queue is not built, 0 when empty, else the voucher id
+_POP_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then return -1 end
+local id = redis.call('LPOP', KEYS[1])
+if not id then return 0 end
+return tonumber(id)
+"""
+
+# Append ids only to a built queue — a cold queue is rebuilt from the DB anyway
+_PUSH_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then return 0 end
+return redis.call('RPUSH', KEYS[1], unpack(ARGV))
+"""
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _client
+
+
+def _queue_key(package_id):
+    return f"{KEY_PREFIX}:{package_id}:q"
+
+
+def _ready_key(package_id):
+    return f"{KEY_PREFIX}:{package_id}:ready"
+
+
+def _chunks(items, size=PUSH_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ---------------------------------------------------------------------------
+# Hot path
+# ---------------------------------------------------------------------------
+
+def pop(package_id):
+    """
+    Pop the next voucher id for a package.
+    Returns None when the queue is empty, cold or Redis is unreachable —
+    the caller then falls back to the DB.
+    """
+    try:
+        voucher_id = int(_redis().eval(_POP_SCRIPT, 2, _queue_key(package_id), _ready_key(package_id)))
+    except Exception as exc:
+        logger.warning("Voucher inventory pop failed for package %s: %s", package_id, exc)
+        return None
+    return voucher_id if voucher_id > 0 else None
+
+
+def push(package_id, voucher_ids):
+    """Return voucher ids to a built queue (e.g. a reservation released)."""
+    try:
+        client = _redis()
+        for chunk in _chunks(list(voucher_ids)):
+            client.eval(_PUSH_SCRIPT, 2, _queue_key(package_id), _ready_key(package_id), *chunk)
+    except Exception as exc:
+        logger.warning("Voucher inventory push failed for package %s: %s", package_id, exc)
+
+
+def stock_levels(package_ids):
+    """
+    {package_id: available count} from Redis, or None per package that
+    is cold. Every value is None when Redis is unreachable.
+    """
+    package_ids = list(package_ids)
+    if not package_ids:
+        return {}
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for package_id in package_ids:
+            pipe.exists(_ready_key(package_id))
+            pipe.llen(_queue_key(package_id))
+        results = pipe.execute()
+    except Exception as exc:
+        logger.warning("Voucher inventory stock lookup failed: %s", exc)
+        return {package_id: None for package_id in package_ids}
+
+    return {
+        package_id: (results[2 * i + 1] if results[2 * i] else None)
+        for i, package_id in enumerate(package_ids)
+    }
+
+
+def packages_in_stock(package_ids):
+    """
+    Set of package ids with at least one UNUSED voucher.
+    A non-empty queue is trusted; an empty one is confirmed against the DB
+    like a cold one — a popped id whose transaction rolled back is still
+    UNUSED but gone from the queue until the next reconcile.
+    """
+    levels = stock_levels(package_ids)
+    in_stock = {package_id for package_id, count in levels.items() if count}
+    unconfirmed = [package_id for package_id, count in levels.items() if not count]
+    if unconfirmed:
+        in_stock.update(
+            Voucher.objects.filter(package_id__in=unconfirmed, status="UNUSED")
+            .values_list("package_id", flat=True).distinct()
+        )
+    return in_stock
+
+
+def in_stock(package):
+    return package.id in packages_in_stock([package.id])
+
+
+# ---------------------------------------------------------------------------
+# Rebuild / reconcile
+# ---------------------------------------------------------------------------
+
+def rebuild(package_id):
+    """
+    Rebuild one package's queue from the DB. The new list is built under
+    a temporary key and swapped in with RENAME, so pops never see a
+    half-built queue. Returns the number of queued vouchers.
+    """
+    ids = list(
+        Voucher.objects.filter(package_id=package_id, status="UNUSED")
+        .order_by("id").values_list("id", flat=True)
+    )
+    client = _redis()
+    tmp_key = f"{_queue_key(package_id)}:build:{uuid.uuid4().hex}"
+
+    if ids:
+        pipe = client.pipeline(transaction=False)
+        for chunk in _chunks(ids):
+            pipe.rpush(tmp_key, *chunk)
+        pipe.execute()
+
+    pipe = client.pipeline(transaction=True)
+    if ids:
+        pipe.rename(tmp_key, _queue_key(package_id))
+    else:
+        pipe.delete(_queue_key(package_id))
+    pipe.set(_ready_key(package_id), 1)
+    pipe.execute()
+    return len(ids)
+
+
+def invalidate(package_id):
+    """Mark a package cold; callers use the DB until it is rebuilt."""
+    try:
+        _redis().delete(_ready_key(package_id), _queue_key(package_id))
+    except Exception as exc:
+        logger.warning("Voucher inventory invalidate failed for package %s: %s", package_id, exc)
+
+
+def refresh_on_commit(package_id):
+    """
+    Rebuild the package's queue once the current transaction commits, then
+    bump the location's portal_data version (bulk inserts / deletes fire
+    no model signals).
+    """
+    def _refresh():
+        from portal_api.services import portal_data
+
+        try:
+            rebuild(package_id)
+        except Exception as exc:
+            logger.warning("Voucher inventory rebuild failed for package %s: %s", package_id, exc)
+            invalidate(package_id)
+        portal_data.bump_package(package_id)
+
+    transaction.on_commit(_refresh)
+
+
+def reconcile(package_ids=None, *, force=False):
+    """
+    Rebuild every package whose queue is cold or whose length differs from
+    the DB UNUSED count (force=True rebuilds all).
+    Returns a list of (package_id, queued_before, unused_in_db) for rebuilt packages.
+    """
+    counts = Voucher.objects.filter(status="UNUSED")
+    if package_ids is not None:
+        counts = counts.filter(package_id__in=package_ids)
+    db_counts = dict(counts.values_list("package_id").annotate(n=Count("id")).order_by())
+
+    if package_ids is not None:
+        ids = list(package_ids)
+    else:
+        # Built-but-now-empty packages still need their queue cleared
+        built = {
+            int(key.split(b":")[1])
+            for key in _redis().scan_iter(match=f"{KEY_PREFIX}:*:ready", count=1000)
+        }
+        ids = sorted(set(db_counts) | built)
+
+    levels = stock_levels(ids)
+    rebuilt = []
+    for package_id in ids:
+        queued, unused = levels.get(package_id), db_counts.get(package_id, 0)
+        if force or queued != unused:
+            rebuild(package_id)
+            rebuilt.append((package_id, queued, unused))
+    return rebuilt
@@ -2,6 +2,10 @@ from django.db import transaction
 from django.utils import timezone
 
 from vouchers.models import Voucher
+from vouchers.services import inventory
+
+# Stale ids (already reserved / deleted) to skip before falling back to the DB
+MAX_STALE_POPS = 5
 
 
 class NoAvailableVouchers(Exception):
@@ -13,10 +17,25 @@ def issue_voucher(vendor, package):
     """
     Reserve ONE UNUSED voucher for a given package.
     Safe under high traffic:
-    - locks row with SELECT ... FOR UPDATE
+    - takes the next id from the Redis inventory queue and reserves it
+      with a conditional UPDATE (no range scan, no waiting on other sales)
+    - falls back to SELECT ... FOR UPDATE SKIP LOCKED when the queue is
+      empty, cold or Redis is down
     - prevents two users from receiving same voucher
     """
 
+    for _ in range(MAX_STALE_POPS):
+        voucher_id = inventory.pop(package.id)
+        if voucher_id is None:
+            break
+        reserved = (
+            Voucher.objects
+            .filter(pk=voucher_id, package=package, status="UNUSED")
+            .update(status="RESERVED")
+        )
+        if reserved:
+            return Voucher.objects.get(pk=voucher_id)
+
     # lock a single unused voucher
     voucher = (
         Voucher.objects
@@ -27,6 +46,10 @@ def issue_voucher(vendor, package):
     )
 
     if not voucher:
+        # Sold out — stop the portal listing it. Bumped now, not on commit:
+        # the raise below rolls this transaction (and its callbacks) back
+        from portal_api.services import portal_data
+        portal_data.bump_package(package.id, now=True)
         raise NoAvailableVouchers("No unused vouchers available for this package.")
 
     # reserve it immediately
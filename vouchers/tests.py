@@ -1,3 +1,314 @@
-from django.test import TestCase
+"""
+vouchers/tests.py
+Tests for the Redis-backed voucher inventory, issue_voucher, bulk
+code generation and the streaming CSV import / export.
 
-# Create your tests here.
+Run with:
+    python manage.py test vouchers
+"""
+
+import gzip
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from payments.tests.test_settlement import _make_payment, _make_vendor
+from vouchers.models import Voucher, VoucherBatch, VoucherImportJob
+from vouchers.services import codegen, importer, inventory
+from vouchers.services.issue_voucher import NoAvailableVouchers, issue_voucher
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeRedis:
+    """In-memory stand-in for the handful of Redis calls inventory makes."""
+
+    def __init__(self):
+        self.lists, self.strings = {}, {}
+
+    def _k(self, key):
+        return key.encode() if isinstance(key, str) else key
+
+    def exists(self, key):
+        key = self._k(key)
+        return int(key in self.strings or bool(self.lists.get(key)))
+
+    def llen(self, key):
+        return len(self.lists.get(self._k(key), []))
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(self._k(key), []).extend(str(v).encode() for v in values)
+        return len(self.lists[self._k(key)])
+
+    def rename(self, src, dst):
+        self.lists[self._k(dst)] = self.lists.pop(self._k(src))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.lists.pop(self._k(key), None)
+            self.strings.pop(self._k(key), None)
+
+    def set(self, key, value):
+        self.strings[self._k(key)] = value
+
+    def scan_iter(self, match, count=None):
+        prefix, suffix = match.split("*")
+        return [k for k in list(self.strings) if k.startswith(prefix.encode()) and k.endswith(suffix.encode())]
+
+    def eval(self, script, numkeys, queue, ready, *args):
+        if not self.exists(ready):
+            return -1 if script == inventory._POP_SCRIPT else 0
+        if script == inventory._POP_SCRIPT:
+            items = self.lists.get(self._k(queue))
+            return int(items.pop(0)) if items else 0
+        return self.rpush(queue, *args)
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestVoucherInventory(TestCase):
+
+    def setUp(self):
+        self.redis = _FakeRedis()
+        patcher = patch("vouchers.services.inventory._redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.vendor = _make_vendor()
+        self.package = _make_payment(self.vendor).package
+        Voucher.objects.create(package=self.package, code="def67890")
+
+    def test_cold_package_falls_back_to_db(self):
+        self.assertEqual(inventory.stock_levels([self.package.id]), {self.package.id: None})
+        self.assertTrue(inventory.in_stock(self.package))
+
+        voucher = issue_voucher(self.vendor, self.package)
+        self.assertEqual((voucher.code, voucher.status), ("abc12345", "RESERVED"))
+
+    def test_rebuild_then_issue_from_queue(self):
+        self.assertEqual(inventory.rebuild(self.package.id), 2)
+        self.assertEqual(inventory.stock_levels([self.package.id]), {self.package.id: 2})
+
+        # Savepoint + conditional UPDATE + fetch by pk — no scan / row lock wait
+        with self.assertNumQueries(4):
+            voucher = issue_voucher(self.vendor, self.package)
+        self.assertEqual(voucher.code, "abc12345")
+        self.assertEqual(inventory.stock_levels([self.package.id]), {self.package.id: 1})
+
+    def test_stale_queue_entries_are_skipped(self):
+        inventory.rebuild(self.package.id)
+        Voucher.objects.filter(code="abc12345").update(status="USED")
+
+        self.assertEqual(issue_voucher(self.vendor, self.package).code, "def67890")
+
+        # Queue drained — falls back to the DB, which confirms out of stock
+        with self.assertRaises(NoAvailableVouchers):
+            issue_voucher(self.vendor, self.package)
+
+    def test_sold_out_bumps_portal_despite_rollback(self):
+        Voucher.objects.filter(package=self.package).update(status="USED")
+        with patch("portal_api.services.portal_data._bump_now") as bump_now:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(NoAvailableVouchers):
+                    issue_voucher(self.vendor, self.package)
+        bump_now.assert_called_once_with(self.package.location.uuid)
+
+    def test_rolled_back_pop_does_not_hide_stock(self):
+        inventory.rebuild(self.package.id)
+        issue_voucher(self.vendor, self.package)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            issue_voucher(self.vendor, self.package)
+            raise RuntimeError("payment rolled back")
+
+        # Queue is empty but the second voucher is still UNUSED in the DB
+        self.assertEqual(inventory.stock_levels([self.package.id]), {self.package.id: 0})
+        self.assertTrue(inventory.in_stock(self.package))
+
+    def test_redis_down_uses_db(self):
+        with patch("vouchers.services.inventory._redis", side_effect=ConnectionError("down")):
+            self.assertTrue(inventory.in_stock(self.package))
+            self.assertEqual(issue_voucher(self.vendor, self.package).code, "abc12345")
+
+    def test_push_returns_released_voucher(self):
+        inventory.rebuild(self.package.id)
+        voucher = issue_voucher(self.vendor, self.package)
+        Voucher.objects.filter(pk=voucher.pk).update(status="UNUSED")
+        inventory.push(self.package.id, [voucher.pk])
+        self.assertEqual(inventory.stock_levels([self.package.id]), {self.package.id: 2})
+
+    def test_reconcile_rebuilds_drifted_packages_only(self):
+        self.assertEqual(inventory.reconcile(), [(self.package.id, None, 2)])
+        self.assertEqual(inventory.reconcile(), [])
+
+        Voucher.objects.create(package=self.package, code="ghi13579")
+        self.assertEqual(inventory.reconcile(), [(self.package.id, 2, 3)])
+
+    def test_refresh_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.refresh_on_commit(self.package.id)
+        self.assertEqual(inventory.stock_levels([self.package.id]), {self.package.id: 2})
+
+
+class TestCodeGeneration(TestCase):
+
+    def setUp(self):
+        self.package = _make_payment(_make_vendor()).package
+        self.batch = VoucherBatch.objects.create(package=self.package, source_filename="generated")
+
+    def test_one_lookup_query_per_round(self):
+        with self.assertNumQueries(1):
+            codes = codegen.generate_codes(Voucher, 3000, alphabet=codegen.ALPHABETS["clear"], length=6)
+        self.assertEqual(len(set(codes)), 3000)
+        self.assertTrue(all(len(c) == 6 and set(c) <= set(codegen.ALPHABETS["clear"]) for c in codes))
+
+    def test_collisions_are_regenerated(self):
+        existing = ["abc12345", "zzzz0000"]
+        Voucher.objects.create(package=self.package, code="zzzz0000")
+        draws = iter(existing + ["fresh001", "fresh002"])
+        with patch("vouchers.services.codegen._random_code", side_effect=lambda *a: next(draws)):
+            codes = codegen.generate_codes(Voucher, 2)
+        self.assertEqual(sorted(codes), ["fresh001", "fresh002"])
+
+    def test_create_codes_inserts_into_batch(self):
+        codes = codegen.create_codes(Voucher, self.batch, 2500, package=self.package)
+        self.assertEqual(len(codes), 2500)
+        self.assertEqual(self.batch.vouchers.filter(status="UNUSED").count(), 2500)
+
+    def test_refuses_small_code_space(self):
+        with self.assertRaises(codegen.CodeSpaceExhausted):
+            codegen.generate_codes(Voucher, 50, alphabet=codegen.ALPHABETS["digits"], length=3)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class TestVoucherImport(TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        private = override_settings(PRIVATE_UPLOAD_ROOT=root)
+        private.enable()
+        self.addCleanup(private.disable)
+
+        self.vendor = _make_vendor()
+        self.package = _make_payment(self.vendor).package
+        self.batch = VoucherBatch.objects.create(package=self.package, source_filename="export.csv")
+
+    def _csv(self, codes, header="Username,Password"):
+        body = "\ufeff" + header + "\n" + "".join(f"{c},{c}\n" for c in codes)
+        return SimpleUploadedFile("export.csv", body.encode("utf-8"), content_type="text/csv")
+
+    def test_streams_in_chunks_with_accurate_counts(self):
+        codes = [f"imp{i:05d}" for i in range(25)] + ["imp00003", "abc12345", ""]
+        progress = []
+        with patch("vouchers.services.importer.CHUNK_SIZE", 10):
+            result = importer.import_codes(
+                self._csv(codes), self.package, self.batch, on_progress=lambda *a: progress.append(a),
+            )
+
+        # 27 non-blank rows: 25 new, one repeated in the file, one already in the DB
+        self.assertEqual((result.rows, result.created, result.skipped), (27, 25, 2))
+        self.assertEqual(progress, [(10, 10), (20, 20)])
+        self.assertEqual(self.batch.vouchers.count(), 25)
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.total_uploaded, 25)
+
+    def test_plain_code_column(self):
+        result = importer.import_codes(self._csv(["one1", "two2"], header="voucher"), self.package, self.batch)
+        self.assertEqual(result.created, 2)
+
+    def test_background_job_imports_and_removes_upload(self):
+        job = importer.enqueue_import(self._csv(["bg000001", "bg000002"]), self.package, self.batch, None)
+        claimed = importer.claim_next_job()
+        self.assertEqual((claimed.pk, claimed.status), (job.pk, VoucherImportJob.STATUS_RUNNING))
+        self.assertIsNone(importer.claim_next_job())
+
+        stored = claimed.file.name
+        self.assertTrue(claimed.file.path.startswith(settings.PRIVATE_UPLOAD_ROOT))
+        self.assertTrue(claimed.file.storage.exists(stored))
+        self.assertTrue(importer.run_import_job(claimed))
+        self.assertFalse(claimed.file.storage.exists(stored))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count, job.skipped_count), ("DONE", 2, 0))
+
+    def test_progress_endpoint_is_vendor_scoped(self):
+        job = VoucherImportJob.objects.create(
+            package=self.package, batch=self.batch, file="voucher_imports/x.csv",
+            source_filename="x.csv", rows_read=4000, created_count=3990,
+        )
+        self.client.force_login(self.vendor.user)
+        data = self.client.get(f"/voucher/imports/{job.pk}/").json()
+        self.assertEqual((data["rows_read"], data["created"], data["done"]), (4000, 3990, False))
+
+        other = _make_vendor(username="vendor2")
+        self.client.force_login(other.user)
+        self.assertEqual(self.client.get(f"/voucher/imports/{job.pk}/").status_code, 404)
+
+
+class TestVoucherExport(TestCase):
+
+    def setUp(self):
+        self.vendor = _make_vendor()
+        self.package = _make_payment(self.vendor).package
+        self.batch = VoucherBatch.objects.create(package=self.package, source_filename="generated")
+        Voucher.objects.filter(package=self.package).update(batch=self.batch)
+        Voucher.objects.create(package=self.package, batch=self.batch, code="aaa00001", status="USED")
+        Voucher.objects.create(package=self.package, code="zzz00002")  # another batch
+        self.client.force_login(self.vendor.user)
+
+    def _body(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_batch_download_streams_codes(self):
+        response = self.client.get(f"/voucher/batches/{self.batch.id}/download/")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            self._body(response).decode().splitlines(),
+            ["username,password", "aaa00001,aaa00001", "abc12345,abc12345"],
+        )
+
+    def test_gzip_variant(self):
+        response = self.client.get(f"/voucher/batches/{self.batch.id}/download/?gzip=1")
+        self.assertIn('.csv.gz"', response["Content-Disposition"])
+        self.assertEqual(gzip.decompress(self._body(response)).decode().count("\n"), 3)
+
+    def test_package_export_spans_batches_and_filters_status(self):
+        response = self.client.get(f"/voucher/packages/{self.package.id}/download/?status=unused")
+        lines = self._body(response).decode().splitlines()
+        self.assertEqual(lines, ["username,password", "abc12345,abc12345", "zzz00002,zzz00002"])
+
+    def test_large_export_is_chunked(self):
+        Voucher.objects.bulk_create(
+            Voucher(package=self.package, batch=self.batch, code=f"bulk{i:06d}") for i in range(5000)
+        )
+        response = self.client.get(f"/voucher/batches/{self.batch.id}/download/")
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks).count(b"\n"), 5003)
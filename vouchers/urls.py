@@ -8,4 +8,6 @@ urlpatterns = [
     path('batches/delete/<int:id>/', views.delete_voucher_batch, name='voucher_batch_delete'),
     path('generate/', views.generate_vouchers, name='voucher_generate'),
     path('batches/<int:batch_id>/download/', views.download_batch_csv, name='voucher_batch_download'),
+    path('packages/<int:package_id>/download/', views.download_package_csv, name='voucher_package_download'),
+    path('imports/<int:job_id>/', views.import_job_status, name='voucher_import_status'),
 ]
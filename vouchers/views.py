@@ -1,27 +1,20 @@
 import csv
-import random
-import string
+from datetime import timedelta
+
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.db import transaction
 from django.db.models import Count, Q
 from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.http import JsonResponse
+from django.utils import timezone
 
-from .models import Voucher, VoucherBatch, VoucherBatchDeletionLog
+from .models import Voucher, VoucherBatch, VoucherBatchDeletionLog, VoucherImportJob
+from .services import codegen, export, importer, inventory
 from packages.models import Package
 
 
-def _generate_code(length=8):
-    """Generate a random alphanumeric voucher code like Mikhmon."""
-    chars = string.ascii_lowercase + string.digits
-    while True:
-        code = ''.join(random.choices(chars, k=length))
-        if not Voucher.objects.filter(code=code).exists():
-            return code
-
-
 @login_required
 def voucher_list(request):
     """
@@ -85,71 +78,48 @@ def voucher_list(request):
                 source_filename=getattr(csv_file, 'name', ''),
             )
 
-        decoded_file = csv_file.read().decode('utf-8-sig').splitlines()
-
-        if not decoded_file:
-            messages.error(request, "CSV file is empty.")
+        # Big Mikhmon exports would outlive the gunicorn timeout — hand them to the import worker
+        if csv_file.size > importer.INLINE_MAX_BYTES:
+            job = importer.enqueue_import(csv_file, package, batch, request.user)
+            messages.info(request,
+                f"Importing {job.source_filename} in the background — progress is shown below."
+            )
             return redirect('voucher_list')
 
-        reader = csv.DictReader(decoded_file)
-
-        codes = []
-        for row in reader:
-            row = {k.strip().lower(): (v.strip() if v else '') for k, v in row.items()}
-            code = (
-                row.get('username')
-                or row.get('password')
-                or row.get('code')
-                or row.get('voucher')
-                or row.get('voucher_code')
-                or (list(row.values())[0] if row else None)
-            )
-            if code and code.strip():
-                codes.append(code.strip())
+        try:
+            result = importer.import_codes(csv_file, package, batch)
+        except (UnicodeDecodeError, csv.Error):
+            result = None
 
-        if not codes:
+        if not result or not result.rows:
+            if not batch.vouchers.exists():
+                batch.delete()
             messages.error(request, "No valid voucher codes found in CSV.")
-            batch.delete()
             return redirect('voucher_list')
 
-        # exclude already existing codes
-        existing_codes = set(
-            Voucher.objects.filter(code__in=codes).values_list('code', flat=True)
-        )
-        new_codes = [c for c in codes if c not in existing_codes]
-        skipped_count = len(codes) - len(new_codes)
-
-        with transaction.atomic():
-            Voucher.objects.bulk_create([
-                Voucher(code=c, package=package, batch=batch)
-                for c in new_codes
-            ], ignore_conflicts=True)
-
-        created_count = len(new_codes)
-
-        batch.total_uploaded = created_count
-        if created_count == 0:
+        if result.created == 0:
             if not batch.vouchers.exists():
                 batch.delete()
             messages.warning(request,
-                f"0 new vouchers added — all {skipped_count} codes already exist in the system. "
+                f"0 new vouchers added — all {result.skipped} codes already exist in the system. "
                 f"Delete the existing batch first if you want to re-upload."
             )
             return redirect('voucher_list')
-        else:
-            batch.total_uploaded = (batch.vouchers.count())
-            batch.save(update_fields=['total_uploaded'])
-            from django.core.cache import cache
-            cache.delete(f'portal_data_{package.location.uuid}')
 
         messages.success(
             request,
-            f"{created_count} vouchers uploaded successfully. "
-            f"{skipped_count} rows skipped."
+            f"{result.created} vouchers uploaded successfully. "
+            f"{result.skipped} rows skipped."
         )
 
         return redirect('voucher_list')
 
+    # Background CSV imports still running (or finished in the last hour)
+    import_jobs = VoucherImportJob.objects.filter(
+        package__location__vendor=vendor,
+        created_at__gte=timezone.now() - timedelta(hours=1),
+    ).select_related('package')[:5]
+
     paginator = Paginator(vouchers, 50)
     page_obj = paginator.get_page(request.GET.get('page'))
 
@@ -158,6 +128,7 @@ def voucher_list(request):
         'page_obj': page_obj,
         'batches': batches,
         'filter_package_id': filter_package_id,
+        'import_jobs': import_jobs,
     })
 
 
@@ -179,13 +150,10 @@ def delete_voucher_batch(request, id):
 
     with transaction.atomic():
         from payments.models import PaymentVoucher
-        from django.core.cache import cache
         PaymentVoucher.objects.filter(voucher__batch=batch).delete()
         deleted_count, _ = batch.vouchers.all().delete()
-
-        # Clear portal cache so package disappears immediately
-        if batch.package.location_id:
-            cache.delete(f'portal_data_{batch.package.location.uuid}')
+        # Also moves the portal cache on, so the package disappears immediately
+        inventory.refresh_on_commit(batch.package_id)
 
         VoucherBatchDeletionLog.objects.create(
             batch_reference=batch.id,
@@ -245,6 +213,7 @@ def delete_voucher(request, id):
     )
 
     voucher.delete()
+    inventory.refresh_on_commit(voucher.package_id)
     messages.success(request, "Voucher deleted successfully.")
     return redirect('voucher_list')
 
@@ -264,39 +233,48 @@ def generate_vouchers(request):
 
     try:
         quantity = int(quantity)
-        if quantity < 1 or quantity > 500:
+        if quantity < 1 or quantity > codegen.MAX_BATCH:
             raise ValueError
     except ValueError:
-        messages.error(request, "Quantity must be between 1 and 500.")
+        messages.error(request, f"Quantity must be between 1 and {codegen.MAX_BATCH}.")
+        return redirect('voucher_list')
+
+    alphabet = codegen.ALPHABETS.get(request.POST.get('alphabet') or codegen.DEFAULT_ALPHABET)
+    try:
+        length = int(request.POST.get('length') or codegen.DEFAULT_LENGTH)
+    except ValueError:
+        length = 0
+    if not alphabet or not codegen.MIN_LENGTH <= length <= codegen.MAX_LENGTH:
+        messages.error(request, f"Code length must be between {codegen.MIN_LENGTH} and {codegen.MAX_LENGTH}.")
         return redirect('voucher_list')
 
     package = get_object_or_404(Package, id=package_id, location__vendor=vendor)
 
-    batch = VoucherBatch.objects.create(
-        package=package,
-        uploaded_by=request.user,
-        source_filename='generated',
-        total_uploaded=quantity,
-    )
+    try:
+        codegen.check_space(quantity, alphabet=alphabet, length=length)
+    except codegen.CodeSpaceExhausted as e:
+        messages.error(request, str(e))
+        return redirect('voucher_list')
 
-    codes = []
     with transaction.atomic():
-        for _ in range(quantity):
-            code = _generate_code()
-            codes.append(Voucher(code=code, package=package, batch=batch))
-        Voucher.objects.bulk_create(codes)
+        batch = VoucherBatch.objects.create(
+            package=package,
+            uploaded_by=request.user,
+            source_filename='generated',
+            total_uploaded=quantity,
+        )
+        codegen.create_codes(Voucher, batch, quantity, alphabet=alphabet, length=length, package=package)
+        inventory.refresh_on_commit(package.id)
 
     messages.success(request, f"{quantity} vouchers generated successfully for {package.name}.")
 
     # If download requested, return CSV
     if request.POST.get('download') == '1':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="vouchers-{package.name}-{batch.id}.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['username', 'password'])
-        for v in Voucher.objects.filter(batch=batch):
-            writer.writerow([v.code, v.code])
-        return response
+        return export.stream_codes(
+            Voucher.objects.filter(batch=batch),
+            f"vouchers-{package.name}-{batch.id}.csv",
+            gzip=request.POST.get('gzip') == '1',
+        )
 
     return redirect('voucher_list')
 
@@ -306,13 +284,41 @@ def download_batch_csv(request, batch_id):
     vendor = request.user.vendor
     batch = get_object_or_404(VoucherBatch, id=batch_id, package__location__vendor=vendor)
 
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="vouchers-{batch.package.name}-{batch.id}.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['username', 'password'])
-    for v in Voucher.objects.filter(batch=batch).order_by('code'):
-        writer.writerow([v.code, v.code])
-    return response
+    return export.stream_codes(
+        Voucher.objects.filter(batch=batch),
+        f"vouchers-{batch.package.name}-{batch.id}.csv",
+        gzip=request.GET.get('gzip') == '1',
+    )
 
 
+@login_required
+def download_package_csv(request, package_id):
+    """
+    Every voucher for a package across all its batches.
+    ?status=UNUSED limits to one status, ?gzip=1 compresses.
+    """
+    vendor = request.user.vendor
+    package = get_object_or_404(Package, id=package_id, location__vendor=vendor)
+
+    vouchers = Voucher.objects.filter(package=package)
+    status = request.GET.get('status', '').upper()
+    if status in dict(Voucher.STATUS_CHOICES):
+        vouchers = vouchers.filter(status=status)
+
+    suffix = f"-{status.lower()}" if status in dict(Voucher.STATUS_CHOICES) else ""
+    return export.stream_codes(
+        vouchers,
+        f"vouchers-{package.name}{suffix}.csv",
+        gzip=request.GET.get('gzip') == '1',
+    )
+
 
+@login_required
+def import_job_status(request, job_id):
+    """Progress of a background CSV import (polled by voucher_list)."""
+    job = get_object_or_404(
+        VoucherImportJob.objects.select_related('package'),
+        id=job_id,
+        package__location__vendor=request.user.vendor,
+    )
+    return JsonResponse(importer.job_progress(job))